@@ -0,0 +1,235 @@
+"""
+Batches of GET requests served in one call.
+
+POST /api/batch takes a list of GET paths and runs each through the whole
+application, middleware included, so sub-requests fill and use the same
+caches as separate requests. They are not coalesced with other requests
+(see app.coalesce), which do not read the batch's snapshot. Up to
+BATCH_CONCURRENCY sub-requests run at a time. The results come back in
+request order, each with its own status, headers and body.
+
+Instead of a session each, the sub-requests of a batch borrow sessions
+from the Batch, which request.state carries to get_db and get_read_db
+(see app.database). Each SnapshotPool holds up to BATCH_CONCURRENCY
+sessions on one database. On PostgreSQL the first session opens a
+read-only repeatable-read transaction and exports its snapshot; the others
+import it, so every sub-request reads the same committed state. Every
+sub-request runs inside a savepoint, so an error leaves the transaction
+usable for the next one. Edge snapshot files never change, so their
+sessions agree without one. On other databases sub-requests run one at a
+time on a single session.
+
+Reads that get_read_db would send to a replica use a second pool, on one
+replica picked for the whole batch. Batches do not share sessions on
+sharded deployments: their sub-requests open sessions as separate
+requests do, on the shards they route to.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, edge, engine, replicas, shards
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Request headers not passed on to sub-requests
+DROPPED_HEADERS = {b"content-length", b"content-type", b"transfer-encoding", b"expect"}
+# Sub-request paths that never end or would nest batches
+REFUSED_PATHS = ("/api/batch", "/api/events")
+
+# A sub-request's result: status, headers and body
+Result = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+class SnapshotPool:
+    """
+    Up to `size` sessions on one database reading the same snapshot, each
+    lent to one sub-request at a time.
+    """
+
+    def __init__(self, open_session: Callable[..., Session], size: int):
+        self.open_session = open_session
+        self.size = size
+        self.sessions: List[Session] = []
+        self.snapshot_id: Optional[str] = None
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def _open(self) -> Session:
+        if not self.sessions:
+            session = self.open_session()
+        else:
+            # The same engine, even after an edge snapshot swap
+            session = self.open_session(bind=self.sessions[0].get_bind())
+        try:
+            if session.get_bind().dialect.name == "postgresql":
+                connection = session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                if self.snapshot_id is None:
+                    connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+                    self.snapshot_id = connection.exec_driver_sql("SELECT pg_export_snapshot()").scalar()
+                else:
+                    connection.exec_driver_sql(f"SET TRANSACTION SNAPSHOT '{self.snapshot_id}'")
+                    connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+        except BaseException:
+            session.close()
+            raise
+        self.sessions.append(session)
+        return session
+
+    def start(self) -> None:
+        """
+        Open the first session now, so that a failing connection raises here.
+        """
+        with self._lock:
+            self._idle.put(self._open())
+
+    def acquire(self) -> Session:
+        with self._lock:
+            if self._idle.empty() and len(self.sessions) < self.size:
+                return self._open()
+        return self._idle.get()
+
+    @contextmanager
+    def lend(self) -> Iterator[Session]:
+        session = self.acquire()
+        savepoint = session.begin_nested() if self.snapshot_id is not None else None
+        try:
+            yield session
+        except BaseException:
+            if savepoint is None:
+                session.rollback()
+            raise
+        finally:
+            if savepoint is not None and savepoint.is_active:
+                savepoint.rollback()
+            self._idle.put(session)
+
+    def close(self) -> None:
+        for session in self.sessions:
+            session.close()
+
+class Batch:
+    """
+    The sessions the sub-requests of one batch share.
+    """
+
+    def __init__(self, concurrency: int = BATCH_CONCURRENCY):
+        if edge is None and engine.dialect.name != "postgresql":
+            concurrency = 1
+        self.concurrency = concurrency
+        self.primary = SnapshotPool(SessionLocal, concurrency)
+        self._read: Optional[Tuple[SnapshotPool, str]] = None
+        self._lock = threading.Lock()
+
+    def read_pool(self, sticky: bool) -> Tuple[SnapshotPool, str]:
+        """
+        The pool for get_read_db and its route: one replica picked for the
+        batch, or the primary as for a separate request.
+        """
+        with self._lock:
+            if self._read is None:
+                replica = replicas.pick() if replicas and not sticky else None
+                if replica is not None:
+                    pool = SnapshotPool(lambda **kwargs: SessionLocal(bind=replica.engine), self.concurrency)
+                    try:
+                        pool.start()
+                        self._read = pool, "replica"
+                    except SQLAlchemyError as e:
+                        pool.close()
+                        replicas.mark_down(replica, str(e).splitlines()[0])
+                if self._read is None:
+                    replicas.count_primary_read(sticky)
+                    self._read = self.primary, "primary"
+            return self._read
+
+    def close(self) -> None:
+        self.primary.close()
+        if self._read is not None and self._read[0] is not self.primary:
+            self._read[0].close()
+
+    async def run(self, app, scope: dict, paths: List[str]) -> List[Result]:
+        """
+        Run GET requests for `paths` through `app`, with the client, server
+        and headers of the batch request's `scope`.
+        """
+        headers = [(name, value) for name, value in scope["headers"] if name not in DROPPED_HEADERS]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(path: str) -> Result:
+            async with semaphore:
+                result = await self._get(app, scope, headers, path)
+                # Follow the redirect to the path with a trailing slash
+                location = dict(result[1]).get(b"location")
+                if result[0] in (307, 308) and location:
+                    split = urlsplit(location.decode("latin-1"))
+                    result = await self._get(app, scope, headers, split.path + (f"?{split.query}" if split.query else ""))
+                return result
+
+        return await asyncio.gather(*(run_one(path) for path in paths))
+
+    async def _get(self, app, parent: dict, headers, path: str) -> Result:
+        split = urlsplit(path)
+        scope = {
+            "type": "http",
+            "asgi": parent.get("asgi", {"version": "3.0"}),
+            "http_version": parent.get("http_version", "1.1"),
+            "method": "GET",
+            "scheme": parent.get("scheme", "http"),
+            "server": parent.get("server"),
+            "client": parent.get("client"),
+            "root_path": parent.get("root_path", ""),
+            "path": unquote(split.path),
+            "raw_path": split.path.encode(),
+            "query_string": split.query.encode(),
+            "headers": headers,
+            # Sharded sub-requests open their own sessions on their shards
+            "state": {"batch": None if shards.sharded else self},
+        }
+        done = asyncio.Event()
+        received = False
+        start: dict = {}
+        chunks: List[bytes] = []
+
+        async def receive() -> dict:
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await app(scope, receive, send)
+        except Exception:
+            # Already answered with a 500 by the application, unless it failed first
+            logger.exception("Batch sub-request GET %s failed", path)
+            if not start:
+                return 500, [(b"content-type", b"text/plain; charset=utf-8")], b"Internal Server Error"
+        finally:
+            done.set()
+        return start["status"], list(start.get("headers", [])), b"".join(chunks)
+
+def refused(path: str) -> Optional[str]:
+    """
+    Why a sub-request path is refused, or None.
+    """
+    split = urlsplit(path)
+    if split.scheme or split.netloc or not split.path.startswith("/api/"):
+        return "Sub-request paths must start with /api/"
+    if split.path.startswith(REFUSED_PATHS):
+        return f"{split.path} cannot be batched"
+    return None
@@ -0,0 +1,191 @@
+"""
+In-process caches of VDOM details (GET /api/vdoms/{id}/detail), compiled
+policy sets (app.policy_match) and facet counts (GET /api/facets).
+
+Each entry remembers the data version of its VDOM and firewall when it was
+read. Change events (see app.events) bump those versions: events naming a
+VDOM bump the VDOM's, events naming only a firewall bump the firewall's, and
+resyncs and events naming neither bump all. An entry whose versions moved
+is stale. A detail is only stored when no event arrived while it was read,
+so a read racing a change is not kept.
+
+Facet counts span whole tables, so they are versioned per entity instead:
+an entry is stale once any event touches an entity it was read from,
+including rows removed by cascades.
+
+Every API worker has its own caches. Without PostgreSQL, changes made by
+other workers publish no events here, so entries also expire after
+VDOM_DETAIL_CACHE_SECONDS, POLICY_CACHE_SECONDS and FACET_CACHE_SECONDS.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+from app.events import CASCADES, ChangeEvent, POLICY_ENTITIES, RESYNC_ENTITY, broker
+
+VDOM_DETAIL_CACHE_SIZE = int(os.getenv("VDOM_DETAIL_CACHE_SIZE", "256"))
+VDOM_DETAIL_CACHE_SECONDS = float(os.getenv("VDOM_DETAIL_CACHE_SECONDS", "60"))
+POLICY_CACHE_SIZE = int(os.getenv("POLICY_CACHE_SIZE", "64"))
+POLICY_CACHE_SECONDS = float(os.getenv("POLICY_CACHE_SECONDS", "600"))
+FACET_CACHE_SIZE = int(os.getenv("FACET_CACHE_SIZE", "128"))
+FACET_CACHE_SECONDS = float(os.getenv("FACET_CACHE_SECONDS", "300"))
+
+# Rows that carry a vdom_id; an update may have moved one from another VDOM,
+# which its event does not name
+_VDOM_CHILDREN = ("interfaces", "routes", "vips")
+
+class VDOMCache:
+    """
+    LRU cache of values per VDOM, kept fresh by change events. Keys are
+    tuples starting with the VDOM id. With `entities`, events of other
+    entities are ignored.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = VDOM_DETAIL_CACHE_SIZE,
+        ttl: float = VDOM_DETAIL_CACHE_SECONDS,
+        entities: Optional[Iterable[str]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entities = frozenset(entities) if entities is not None else None
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, tuple]" = OrderedDict()
+        self._vdom_versions: Dict[int, int] = defaultdict(int)
+        self._firewall_versions: Dict[int, int] = defaultdict(int)
+        self._epoch = 0
+        self._sequence = 0
+
+    def _version(self, vdom_id: int, firewall_id: int) -> Tuple[int, int, int]:
+        return self._epoch, self._firewall_versions[firewall_id], self._vdom_versions[vdom_id]
+
+    @property
+    def sequence(self) -> int:
+        """
+        The number of change events seen; take it before reading a value to put().
+        """
+        with self._lock:
+            return self._sequence
+
+    def get(self, key: Tuple[Hashable, ...]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            firewall_id, version, expires, value = entry
+            if version != self._version(key[0], firewall_id) or expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Tuple[Hashable, ...], firewall_id: int, value, sequence: int) -> bool:
+        """
+        Store a value read after `sequence` was taken, unless a change event
+        arrived since. Returns whether it was stored.
+        """
+        if self.max_entries <= 0:
+            return False
+        with self._lock:
+            if sequence != self._sequence:
+                return False
+            self._entries[key] = (
+                firewall_id, self._version(key[0], firewall_id), time.monotonic() + self.ttl, value
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def on_change(self, change: ChangeEvent) -> None:
+        if self.entities is not None and change.entity != RESYNC_ENTITY and change.entity not in self.entities:
+            return
+        vdom_id = change.get("vdom_id")
+        firewall_id = change.get("firewall_id")
+        with self._lock:
+            self._sequence += 1
+            if change.entity == RESYNC_ENTITY or (vdom_id is None and firewall_id is None):
+                self._epoch += 1
+            elif vdom_id is not None and not (change.entity in _VDOM_CHILDREN and change.get("op") == "update"):
+                self._vdom_versions[vdom_id] += 1
+            elif firewall_id is not None:
+                self._firewall_versions[firewall_id] += 1
+            else:
+                self._epoch += 1
+
+class EntityCache:
+    """
+    LRU cache of values read from whole tables, kept fresh by change events.
+    Each entry names the entities (table names) it was read from.
+    """
+
+    def __init__(self, max_entries: int = FACET_CACHE_SIZE, ttl: float = FACET_CACHE_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._epoch = 0
+        self._sequence = 0
+
+    def _version(self, entities: Tuple[str, ...]) -> Tuple[int, ...]:
+        return (self._epoch, *(self._versions[entity] for entity in entities))
+
+    @property
+    def sequence(self) -> int:
+        """
+        The number of change events seen; take it before reading a value to put().
+        """
+        with self._lock:
+            return self._sequence
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entities, version, expires, value = entry
+            if version != self._version(entities) or expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, entities: Iterable[str], value, sequence: int) -> bool:
+        """
+        Store a value read from `entities` after `sequence` was taken, unless
+        a change event arrived since. Returns whether it was stored.
+        """
+        if self.max_entries <= 0:
+            return False
+        entities = tuple(entities)
+        with self._lock:
+            if sequence != self._sequence:
+                return False
+            self._entries[key] = (entities, self._version(entities), time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def on_change(self, change: ChangeEvent) -> None:
+        with self._lock:
+            self._sequence += 1
+            if change.entity == RESYNC_ENTITY:
+                self._epoch += 1
+                return
+            for entity in (change.entity, *CASCADES.get(change.entity, ())):
+                self._versions[entity] += 1
+
+vdom_detail_cache = VDOMCache(entities=("firewalls", "vdoms", *_VDOM_CHILDREN))
+broker.add_listener(vdom_detail_cache.on_change)
+policy_cache = VDOMCache(
+    POLICY_CACHE_SIZE, POLICY_CACHE_SECONDS,
+    entities=("firewalls", "vdoms", *POLICY_ENTITIES)
+)
+broker.add_listener(policy_cache.on_change)
+facet_cache = EntityCache()
+broker.add_listener(facet_cache.on_change)
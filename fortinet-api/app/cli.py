@@ -0,0 +1,434 @@
+"""
+Command line entry point for maintenance jobs.
+
+Usage:
+    python -m app.cli rebuild-ip-index
+    python -m app.cli purge-tombstones --older-than-days 30
+    python -m app.cli import --replace firewalls_rows.sql vdoms_rows.sql ...
+    python -m app.cli snapshot create --label nightly
+    python -m app.cli snapshot restore 20250706T183117Z-nightly
+    python -m app.cli partitions enable --strategy list
+    python -m app.cli collect --targets targets.json --interval 300
+    python -m app.cli mock-fortios --devices 500 --write-targets targets.json
+    python -m app.cli ingest backups/ --workers 8
+    python -m app.cli history sample
+    python -m app.cli history maintain
+    python -m app.cli versions compact
+    python -m app.cli edge publish /srv/edge/netcollect.sqlite --interval 300
+    python -m app.cli shards init
+    python -m app.cli shards status
+"""
+import argparse
+import json
+import logging
+import sys
+
+from app.database import SessionLocal
+from app.sharding import SHARD_ID_SPAN, ShardingError
+
+logger = logging.getLogger(__name__)
+
+def rebuild_ip_index(args) -> int:
+    import app.models  # noqa: F401 - register all mappers
+    from app.crud.ip_address import rebuild_ip_addresses
+
+    db = SessionLocal()
+    try:
+        total = rebuild_ip_addresses(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    logger.info("Indexed %d addresses", total)
+    return 0
+
+def purge_tombstones(args) -> int:
+    from app.crud.change import purge_tombstones as purge
+
+    db = SessionLocal()
+    try:
+        deleted = purge(db, older_than_days=args.older_than_days)
+    finally:
+        db.close()
+    logger.info("Purged %d tombstones", deleted)
+    return 0
+
+def import_data(args) -> int:
+    from app.importer import run_import
+
+    sources = [(path, args.format, args.table) for path in args.sources]
+    report = run_import(
+        sources,
+        replace=args.replace,
+        rebuild_ip_index=not args.skip_ip_index,
+        index_workers=args.index_workers
+    )
+    print(report.format())
+    if args.report_json:
+        with open(args.report_json, "w") as f:
+            json.dump(report.as_dict(), f, indent=2)
+    return 0 if report.ok else 1
+
+def snapshot_create(args) -> int:
+    from app.snapshot import SnapshotError, create_snapshot, summarize
+
+    try:
+        manifest = create_snapshot(label=args.label)
+    except SnapshotError as e:
+        logger.error("%s", e)
+        return 1
+    print(json.dumps(summarize(manifest), indent=2))
+    return 0
+
+def snapshot_restore(args) -> int:
+    from app.snapshot import SnapshotError, SnapshotNotFound, restore_snapshot
+
+    try:
+        report = restore_snapshot(args.snapshot_id, workers=args.workers, rebuild_ip_index=not args.skip_ip_index)
+    except (SnapshotError, SnapshotNotFound) as e:
+        logger.error("%s", e)
+        return 1
+    print(report.format())
+    return 0 if report.ok else 1
+
+def snapshot_list(args) -> int:
+    from app.snapshot import SnapshotStore, summarize
+
+    for manifest in SnapshotStore().list_manifests():
+        summary = summarize(manifest)
+        rows = sum(summary["rows"].values())
+        print(f"{summary['id']:<40}{rows:>10} rows{summary['bytes_total']:>12} bytes{summary['bytes_new']:>12} new")
+    return 0
+
+def snapshot_delete(args) -> int:
+    from app.snapshot import SnapshotNotFound, delete_snapshot
+
+    try:
+        freed = delete_snapshot(args.snapshot_id)
+    except SnapshotNotFound as e:
+        logger.error("%s", e)
+        return 1
+    logger.info("Deleted %s, freed %d bytes", args.snapshot_id, freed)
+    return 0
+
+def partitions_enable(args) -> int:
+    from app.database import engine
+    from app.partitioning import partition_tables
+
+    partition_tables(engine, args.strategy, partitions=args.partitions, tables=args.tables)
+    return partitions_status(args)
+
+def partitions_disable(args) -> int:
+    from app.database import engine
+    from app.partitioning import unpartition_tables
+
+    unpartition_tables(engine, tables=args.tables)
+    return partitions_status(args)
+
+def partitions_sync(args) -> int:
+    from app.database import engine
+    from app.partitioning import sync_partitions
+
+    created, dropped = sync_partitions(engine)
+    logger.info("Created %d and dropped %d partitions", created, dropped)
+    return 0
+
+def partitions_status(args) -> int:
+    from app.database import engine
+    from app.partitioning import describe
+
+    with engine.connect() as connection:
+        for table, info in describe(connection).items():
+            print(f"{table:<12}{info['strategy'] or 'not partitioned':<18}{len(info['partitions']):>6} partitions")
+    return 0
+
+def _raise_open_files_limit() -> None:
+    # Every device keeps its own pooled connections open
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def collect(args) -> int:
+    import asyncio
+    from app.collector import Collector, load_targets, targets_from_db
+
+    if args.targets:
+        targets = load_targets(args.targets)
+    else:
+        db = SessionLocal()
+        try:
+            targets = targets_from_db(db, verify=not args.insecure)
+        finally:
+            db.close()
+    if not targets:
+        logger.error("No targets to poll")
+        return 1
+    _raise_open_files_limit()
+    # httpx logs every request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    collector = Collector(
+        targets,
+        concurrency=args.concurrency,
+        per_device=args.per_device,
+        retries=args.retries,
+        timeout=args.timeout,
+        writers=args.writers,
+        store=not args.dry_run
+    )
+
+    async def run():
+        try:
+            if args.interval:
+                await collector.run_forever(args.interval)
+            return await collector.run_once()
+        finally:
+            await collector.aclose()
+
+    try:
+        report = asyncio.run(run())
+    except KeyboardInterrupt:
+        return 0
+    print(report.format())
+    if args.report_json:
+        with open(args.report_json, "w") as f:
+            json.dump(report.as_dict(), f, indent=2)
+    return 0 if report.ok else 1
+
+def mock_fortios(args) -> int:
+    import asyncio
+    from app.collector.mock import MockFortiOS
+
+    _raise_open_files_limit()
+    mock = MockFortiOS(
+        devices=args.devices,
+        vdoms=args.vdoms,
+        interfaces=args.interfaces,
+        routes=args.routes,
+        vips=args.vips,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        token=args.token
+    )
+
+    async def serve():
+        base_url = await mock.start(args.host, args.port)
+        if args.write_targets:
+            with open(args.write_targets, "w") as f:
+                json.dump(mock.target_entries(), f, indent=2)
+        logger.info("Serving %d devices at %s/fw-NNNNN", args.devices, base_url)
+        try:
+            await mock.server.serve_forever()
+        finally:
+            await mock.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    logger.info("Served %(requests)d requests (%(errors)d errors) on %(connections)d connections", mock.stats())
+    return 0
+
+def ingest(args) -> int:
+    from app.collector import ingest_files
+
+    report = ingest_files(args.sources, workers=args.workers, fw_name=args.firewall, store=not args.dry_run)
+    print(report.format())
+    if args.report_json:
+        with open(args.report_json, "w") as f:
+            json.dump(report.as_dict(), f, indent=2)
+    return 0 if report.ok else 1
+
+def history_sample(args) -> int:
+    from app.database import engine
+    from app.history import record_vdom_counts
+
+    with engine.begin() as connection:
+        recorded = record_vdom_counts(connection, args.firewall_id)
+    logger.info("Recorded the counts of %d VDOMs", recorded)
+    return 0
+
+def history_maintain(args) -> int:
+    from app.database import engine
+    from app.history import maintain
+
+    summary = maintain(engine)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+def versions_compact(args) -> int:
+    from app.database import engine
+    from app.versioning import compact
+
+    summary = compact(engine)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+def edge_publish(args) -> int:
+    import time
+    from app.edge import publish_snapshot
+
+    while True:
+        started_at = time.monotonic()
+        summary = publish_snapshot(args.path)
+        print(json.dumps(summary, indent=2))
+        if not args.interval:
+            return 0
+        try:
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started_at)))
+        except KeyboardInterrupt:
+            return 0
+
+def shards_init(args) -> int:
+    from app.database import shards
+
+    try:
+        summary = shards.init(span=args.span)
+    except ShardingError as e:
+        logger.error("%s", e)
+        return 1
+    print(json.dumps(summary, indent=2))
+    return 0
+
+def shards_status(args) -> int:
+    from app.database import shards
+
+    try:
+        summary = shards.status()
+    except ShardingError as e:
+        logger.error("%s", e)
+        return 1
+    print(json.dumps(summary, indent=2))
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Fortinet API maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser("rebuild-ip-index", help="Backfill the ip_addresses search index")
+    rebuild.add_argument("--batch-size", type=int, default=5000)
+    rebuild.set_defaults(func=rebuild_ip_index)
+
+    from app.crud.change import RETENTION_DAYS
+    purge = subparsers.add_parser("purge-tombstones", help="Delete change feed tombstones past the retention window")
+    purge.add_argument("--older-than-days", type=int, default=RETENTION_DAYS)
+    purge.set_defaults(func=purge_tombstones)
+
+    from app.importer.readers import FORMATS
+    load = subparsers.add_parser("import", help="Load data from SQL dumps, CSV or NDJSON files")
+    load.add_argument("sources", nargs="+", help="Files to load (.gz allowed); - reads stdin")
+    load.add_argument("--format", choices=FORMATS, help="Source format (default: from the file extension)")
+    load.add_argument("--table", help="Table for CSV/NDJSON sources whose name does not tell")
+    load.add_argument("--replace", action="store_true", help="Empty the tables first and rebuild their indexes after the load")
+    load.add_argument("--skip-ip-index", action="store_true", help="Do not rebuild the ip_addresses search index")
+    load.add_argument("--index-workers", type=int, default=4, help="Parallel index builds after --replace")
+    load.add_argument("--report-json", help="Also write the validation report to this file")
+    load.set_defaults(func=import_data)
+
+    snapshot = subparsers.add_parser("snapshot", help="Create, list, restore and delete compressed snapshots")
+    snapshot_commands = snapshot.add_subparsers(dest="snapshot_command", required=True)
+    create = snapshot_commands.add_parser("create", help="Snapshot all tables")
+    create.add_argument("--label", help="Suffix for the snapshot id")
+    create.set_defaults(func=snapshot_create)
+    restore = snapshot_commands.add_parser("restore", help="Replace all tables with a snapshot")
+    restore.add_argument("snapshot_id")
+    restore.add_argument("--workers", type=int, default=4, help="Parallel COPY connections")
+    restore.add_argument("--skip-ip-index", action="store_true", help="Do not rebuild the ip_addresses search index")
+    restore.set_defaults(func=snapshot_restore)
+    listing = snapshot_commands.add_parser("list", help="List snapshots, newest first")
+    listing.set_defaults(func=snapshot_list)
+    delete = snapshot_commands.add_parser("delete", help="Delete a snapshot and the chunks only it uses")
+    delete.add_argument("snapshot_id")
+    delete.set_defaults(func=snapshot_delete)
+
+    from app.partitioning import DEFAULT_HASH_PARTITIONS, PARTITIONED_TABLES, STRATEGIES
+    partitions = subparsers.add_parser("partitions", help="Partition routes and interfaces by firewall")
+    partition_commands = partitions.add_subparsers(dest="partitions_command", required=True)
+    enable = partition_commands.add_parser("enable", help="Rewrite the tables as partitioned tables (locks them)")
+    enable.add_argument("--strategy", choices=STRATEGIES, required=True, help="list: one partition per firewall; hash: a fixed number")
+    enable.add_argument("--partitions", type=int, default=DEFAULT_HASH_PARTITIONS, help="Number of hash partitions")
+    enable.add_argument("--tables", nargs="+", choices=list(PARTITIONED_TABLES), default=list(PARTITIONED_TABLES))
+    enable.set_defaults(func=partitions_enable)
+    disable = partition_commands.add_parser("disable", help="Rewrite partitioned tables as plain tables (locks them)")
+    disable.add_argument("--tables", nargs="+", choices=list(PARTITIONED_TABLES), default=list(PARTITIONED_TABLES))
+    disable.set_defaults(func=partitions_disable)
+    sync = partition_commands.add_parser("sync", help="Add missing firewall partitions and drop those of deleted firewalls")
+    sync.set_defaults(func=partitions_sync)
+    status = partition_commands.add_parser("status", help="Show how the tables are partitioned")
+    status.set_defaults(func=partitions_status)
+
+    poll = subparsers.add_parser("collect", help="Poll FortiGates through the FortiOS REST API and store their data")
+    poll.add_argument("--targets", help="JSON file of targets (default: every firewall, at https://<fw_ip>)")
+    poll.add_argument("--interval", type=float, help="Poll every this many seconds instead of once")
+    poll.add_argument("--concurrency", type=int, default=64, help="Requests in flight over all devices")
+    poll.add_argument("--per-device", type=int, default=2, help="Requests in flight, and pooled connections, per device")
+    poll.add_argument("--retries", type=int, default=3, help="Retries of a failed request, with exponential backoff")
+    poll.add_argument("--timeout", type=float, default=10.0, help="Seconds per request")
+    poll.add_argument("--writers", type=int, default=4, help="Devices written to the database at the same time")
+    poll.add_argument("--insecure", action="store_true", help="Do not verify the TLS certificates of firewalls from the database")
+    poll.add_argument("--dry-run", action="store_true", help="Poll but do not write to the database")
+    poll.add_argument("--report-json", help="Also write the report of a single poll to this file")
+    poll.set_defaults(func=collect)
+
+    mock = subparsers.add_parser("mock-fortios", help="Serve simulated FortiGates to measure the collector against")
+    mock.add_argument("--host", default="127.0.0.1")
+    mock.add_argument("--port", type=int, default=8443)
+    mock.add_argument("--devices", type=int, default=200)
+    mock.add_argument("--vdoms", type=int, default=5, help="VDOMs per device")
+    mock.add_argument("--interfaces", type=int, default=20, help="Interfaces per VDOM")
+    mock.add_argument("--routes", type=int, default=200, help="Routes per VDOM")
+    mock.add_argument("--vips", type=int, default=20, help="VIPs per VDOM")
+    mock.add_argument("--latency", type=float, default=0.02, help="Seconds before each response")
+    mock.add_argument("--jitter", type=float, default=0.01, help="Up to this many more seconds, at random")
+    mock.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    mock.add_argument("--token", help="API token the requests must carry")
+    mock.add_argument("--write-targets", help="Write a targets file for collect --targets")
+    mock.set_defaults(func=mock_fortios)
+
+    offline = subparsers.add_parser("ingest", help="Load saved FortiOS configurations and CLI output")
+    offline.add_argument("sources", nargs="+", help="Files (.gz allowed) or directories of them")
+    offline.add_argument("--firewall", help="Firewall of all the files (default: from their hostname, prompt or name)")
+    offline.add_argument("--workers", type=int, help="Parser and writer processes (default: one per CPU)")
+    offline.add_argument("--dry-run", action="store_true", help="Parse but do not write to the database")
+    offline.add_argument("--report-json", help="Also write the report to this file")
+    offline.set_defaults(func=ingest)
+
+    history = subparsers.add_parser("history", help="Record and maintain interface status and VDOM count history")
+    history_commands = history.add_subparsers(dest="history_command", required=True)
+    sample = history_commands.add_parser("sample", help="Record the VDOM counts that changed since the last sample")
+    sample.add_argument("--firewall-id", type=int, help="Only this firewall's VDOMs")
+    sample.set_defaults(func=history_sample)
+    maintain = history_commands.add_parser("maintain", help="Create partitions, roll up complete days and apply retention")
+    maintain.set_defaults(func=history_maintain)
+
+    versions = subparsers.add_parser("versions", help="Maintain the row versions behind as_of queries")
+    versions_commands = versions.add_subparsers(dest="versions_command", required=True)
+    compact = versions_commands.add_parser("compact", help="Thin versions past the retention window to daily states")
+    compact.set_defaults(func=versions_compact)
+
+    edge = subparsers.add_parser("edge", help="Publish read-only SQLite snapshots for EDGE_SNAPSHOT_PATH")
+    edge_commands = edge.add_subparsers(dest="edge_command", required=True)
+    publish = edge_commands.add_parser("publish", help="Write a snapshot file, replacing the old one in one rename")
+    publish.add_argument("path", help="Snapshot file to write")
+    publish.add_argument("--interval", type=int, help="Keep publishing every this many seconds")
+    publish.set_defaults(func=edge_publish)
+
+    shard = subparsers.add_parser("shards", help="Set up and inspect the id ranges of the shards in SHARD_DATABASE_URLS")
+    shard_commands = shard.add_subparsers(dest="shards_command", required=True)
+    init = shard_commands.add_parser("init", help="Give each shard its id ranges; again after adding a shard")
+    init.add_argument("--span", type=int, default=SHARD_ID_SPAN, help="Ids per shard and table in a new epoch")
+    init.set_defaults(func=shards_init)
+    shard_status = shard_commands.add_parser("status", help="Show the epochs and how far each shard has used its ranges")
+    shard_status.set_defaults(func=shards_status)
+
+    return parser
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Coalescing of identical concurrent GET requests.
+
+Server-side rendering, the web app's prefetching and many open tabs often
+send the same GET at the same moment, and each would run the same queries
+on its own pooled connection. The coalesce_reads middleware (see app.main)
+gives each worker one flight per request key: the first request runs the
+endpoint, and identical requests arriving while it runs wait for it and
+get a copy of its response, with an X-Coalesced header. The key is the
+path, the query parameters in sorted order, the Origin header (CORS
+headers echo it) and whether the client reads from the primary (see
+app.replicas).
+
+A request joins a flight only if no change event arrived since the flight
+started (see app.events), so a read never gets rows older than a write
+it could have seen. Responses with a 5xx status, streaming responses
+(event streams, NDJSON) and failed flights are not shared; their waiters
+run the endpoint themselves. Sub-requests of a batch are not coalesced:
+their responses come from the batch's snapshot, which may be older than
+other requests' or newer than a running flight's.
+
+With COALESCE_REDIS_URL set, flights also span workers and hosts. The
+leader of a flight takes a Redis lock for at most COALESCE_LOCK_MS and
+stores its response for COALESCE_RESULT_MS when done, with the time it
+started. Leaders of other workers that find the lock poll for that response
+instead of running the endpoint, until the lock is released or expires.
+Data versions are counted per worker, so a response from another worker is
+taken only if its leader started after the last change event this worker
+received; otherwise the endpoint runs here. Responses larger than
+COALESCE_REDIS_MAX_BYTES stay in their worker. Redis errors only turn the
+cross-worker step off for the request.
+
+GET /api/database/coalescing returns the counters of the worker.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from starlette.responses import Response
+
+from app.events import broker
+from app.replicas import READ_PRIMARY_COOKIE
+
+logger = logging.getLogger(__name__)
+
+COALESCE_READS = os.getenv("COALESCE_READS", "true").lower() == "true"
+COALESCE_REDIS_URL = os.getenv("COALESCE_REDIS_URL", "")
+COALESCE_LOCK_MS = int(os.getenv("COALESCE_LOCK_MS", "3000"))
+COALESCE_RESULT_MS = int(os.getenv("COALESCE_RESULT_MS", "1000"))
+COALESCE_POLL_MS = int(os.getenv("COALESCE_POLL_MS", "10"))
+COALESCE_REDIS_MAX_BYTES = int(os.getenv("COALESCE_REDIS_MAX_BYTES", str(4 * 2**20)))
+# Streams, and per-worker state that must not be answered by another worker
+SKIPPED_PATHS = ("/api/events", "/api/database", "/api/interfaces/status/metrics")
+STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")
+REDIS_PREFIX = "netcollect:flight:"
+
+# Deletes the lock only while it is still ours
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# A response as shared: status, raw headers and body
+Shared = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+class Flight:
+    """
+    One request running in this worker, awaited by its identical followers.
+    """
+
+    def __init__(self, version: int):
+        self.version = version
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+
+def request_key(request: Request) -> str:
+    query = sorted(request.query_params.multi_items())
+    return json.dumps([
+        request.url.path.rstrip("/") or "/",
+        query,
+        request.headers.get("origin"),
+        READ_PRIMARY_COOKIE in request.cookies,
+    ])
+
+def _copy(shared: Shared, coalesced: str) -> Response:
+    status_code, raw_headers, body = shared
+    response = Response(body, status_code=status_code)
+    response.raw_headers = [*raw_headers, (b"x-coalesced", coalesced.encode())]
+    return response
+
+def _encode(shared: Shared, started: float) -> bytes:
+    status_code, raw_headers, body = shared
+    head = json.dumps([
+        started, status_code, [[name.decode("latin-1"), value.decode("latin-1")] for name, value in raw_headers]
+    ])
+    return head.encode() + b"\n" + body
+
+def _decode(payload: bytes) -> Tuple[float, Shared]:
+    # The leader's start time and its response
+    head, body = payload.split(b"\n", 1)
+    started, status_code, raw_headers = json.loads(head)
+    return started, (status_code, [(name.encode("latin-1"), value.encode("latin-1")) for name, value in raw_headers], body)
+
+class Coalescer:
+    """
+    The flights of one worker, and the Redis client that extends them
+    across workers.
+    """
+
+    def __init__(self, redis_url: str = COALESCE_REDIS_URL):
+        self.flights: Dict[str, Flight] = {}
+        self.redis = None
+        if redis_url:
+            try:
+                import redis.asyncio
+            except ImportError:
+                logger.warning("COALESCE_REDIS_URL is set but the redis package is not installed; coalescing per worker only")
+            else:
+                self.redis = redis.asyncio.from_url(redis_url)
+        self.led = 0
+        self.joined = 0
+        self.remote_joined = 0
+        self.unshared = 0
+        self.redis_errors = 0
+        self.last_redis_error: Optional[str] = None
+
+    def applies(self, request: Request) -> bool:
+        path = request.url.path
+        return (
+            COALESCE_READS and request.method == "GET" and path.startswith("/api/")
+            and not path.startswith(SKIPPED_PATHS)
+            # Batch sub-requests read the batch's snapshot (see app.batch)
+            and "batch" not in request.scope.get("state", {})
+        )
+
+    async def handle(self, request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+        key = request_key(request)
+        version = broker.version()
+        flight = self.flights.get(key)
+        if flight is not None and flight.version == version:
+            try:
+                shared = await asyncio.shield(flight.result)
+            except Exception:
+                shared = None
+            if shared is not None:
+                self.joined += 1
+                return _copy(shared, "worker")
+            self.unshared += 1
+            return await call_next(request)
+
+        flight = self.flights[key] = Flight(version)
+        try:
+            response, shared = await self._lead(key, request, call_next)
+        except BaseException as e:
+            flight.result.set_exception(e if isinstance(e, Exception) else RuntimeError("request cancelled"))
+            # Retrieved, so that a flight without followers does not log it
+            flight.result.exception()
+            raise
+        else:
+            flight.result.set_result(shared)
+        finally:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        return response
+
+    async def _lead(self, key: str, request: Request, call_next) -> Tuple[Response, Optional[Shared]]:
+        # Runs the flight, or takes the response of another worker's
+        redis_key = REDIS_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+        token = None
+        if self.redis is not None:
+            try:
+                token = uuid.uuid4().hex
+                if not await self.redis.set(redis_key + ":lock", token, nx=True, px=COALESCE_LOCK_MS):
+                    token = None
+                    payload = await self._wait_remote(redis_key)
+                    if payload:
+                        started, shared = _decode(payload)
+                        # Not if a change this worker has seen may have missed it
+                        if started >= broker.changed_at():
+                            self.remote_joined += 1
+                            return _copy(shared, "cluster"), shared
+                        self.unshared += 1
+            except Exception as e:
+                self._redis_failed(e)
+                token = None
+
+        self.led += 1
+        started = time.time()
+        response = await call_next(request)
+        if response.status_code >= 500 or response.headers.get("content-type", "").startswith(STREAMING_TYPES):
+            if token is not None:
+                await self._publish(redis_key, token, b"")
+            return response, None
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        shared = (response.status_code, list(response.raw_headers), body)
+        if token is not None:
+            # An empty result tells the waiters to run the request themselves
+            await self._publish(redis_key, token, _encode(shared, started) if len(body) <= COALESCE_REDIS_MAX_BYTES else b"")
+        return _copy(shared, "no"), shared
+
+    async def _wait_remote(self, redis_key: str) -> Optional[bytes]:
+        """
+        The response another worker stores for this key: None when its lock
+        went away without one or COALESCE_LOCK_MS passed.
+        """
+        deadline = time.monotonic() + COALESCE_LOCK_MS / 1000
+        while time.monotonic() < deadline:
+            payload, locked = await self.redis.mget(redis_key + ":result", redis_key + ":lock")
+            if payload is not None:
+                return payload
+            if locked is None:
+                return None
+            await asyncio.sleep(COALESCE_POLL_MS / 1000)
+        return None
+
+    async def _publish(self, redis_key: str, token: str, payload: bytes) -> None:
+        try:
+            async with self.redis.pipeline(transaction=True) as pipeline:
+                pipeline.set(redis_key + ":result", payload, px=COALESCE_RESULT_MS)
+                pipeline.eval(RELEASE_SCRIPT, 1, redis_key + ":lock", token)
+                await pipeline.execute()
+        except Exception as e:
+            self._redis_failed(e)
+
+    def _redis_failed(self, error: Exception) -> None:
+        self.redis_errors += 1
+        message = str(error).splitlines()[0] if str(error) else type(error).__name__
+        if message != self.last_redis_error:
+            logger.warning("Coalescing across workers skipped: %s", message)
+        self.last_redis_error = message
+
+    def stats(self) -> dict:
+        return {
+            "enabled": COALESCE_READS,
+            "redis": self.redis is not None,
+            "in_flight": len(self.flights),
+            "led": self.led,
+            "joined": self.joined,
+            "remote_joined": self.remote_joined,
+            "unshared": self.unshared,
+            "redis_errors": self.redis_errors,
+            "last_redis_error": self.last_redis_error,
+        }
+
+coalescer = Coalescer()
@@ -0,0 +1,11 @@
+"""
+Polls FortiGates through the FortiOS REST API and writes their VDOMs,
+interfaces, routes and VIPs into the database. Run it with
+`python -m app.cli collect`; `python -m app.cli mock-fortios` serves
+simulated devices to measure it against. `python -m app.cli ingest` loads
+saved configurations and CLI output of devices that cannot be polled.
+"""
+from app.collector.engine import CollectReport, Collector
+from app.collector.fortios import FortiOSClient, FortiOSError
+from app.collector.ingest import IngestReport, ingest_files
+from app.collector.targets import Target, load_targets, targets_from_db
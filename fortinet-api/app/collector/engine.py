@@ -0,0 +1,209 @@
+"""
+The collector: polls all targets concurrently on one event loop and hands
+each device's result to a small pool of writer threads.
+
+Requests are bounded by the collector's global semaphore and each device's
+own (see app.collector.fortios). Writes go through asyncio.to_thread, at
+most `writers` at a time so the database pool is not exhausted; a device
+whose results did not change since its last successful write is skipped.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.collector.fortios import FortiOSClient, FortiOSError
+from app.collector.targets import Target
+
+logger = logging.getLogger(__name__)
+
+STORED_TABLES = ("vdoms", "interfaces", "routes", "vips")
+
+class DeviceResult:
+    def __init__(self, fw_name: str):
+        self.fw_name = fw_name
+        self.fetched: Dict[str, int] = {}
+        self.loaded: Optional[Dict[str, int]] = None
+        self.unchanged = False
+        self.requests = 0
+        self.retried = 0
+        self.seconds = 0.0
+        self.error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "fw_name": self.fw_name,
+            "fetched": self.fetched,
+            "loaded": self.loaded,
+            "unchanged": self.unchanged,
+            "requests": self.requests,
+            "retried": self.retried,
+            "seconds": round(self.seconds, 3),
+            "error": self.error,
+        }
+
+class CollectReport:
+    """
+    Result of one poll of all targets.
+    """
+
+    def __init__(self, devices: List[DeviceResult], seconds: float):
+        self.devices = devices
+        self.seconds = seconds
+
+    @property
+    def ok(self) -> bool:
+        return not any(device.error for device in self.devices)
+
+    def as_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "seconds": round(self.seconds, 2),
+            "devices": [device.as_dict() for device in self.devices],
+        }
+
+    def format(self) -> str:
+        failed = [device for device in self.devices if device.error]
+        unchanged = sum(device.unchanged for device in self.devices)
+        requests = sum(device.requests for device in self.devices)
+        retried = sum(device.retried for device in self.devices)
+        lines = [f"{'table':<12}{'fetched':>10}{'loaded':>10}"]
+        for table in STORED_TABLES:
+            fetched = sum(device.fetched.get(table, 0) for device in self.devices)
+            loaded = sum((device.loaded or {}).get(table, 0) for device in self.devices)
+            lines.append(f"{table:<12}{fetched:>10}{loaded:>10}")
+        lines.extend(f"  {device.fw_name}: FAILED: {device.error}" for device in failed)
+        rate = requests / self.seconds if self.seconds else 0
+        lines.append(
+            f"{len(self.devices)} devices ({len(failed)} failed, {unchanged} unchanged), "
+            f"{requests} requests ({retried} retried) in {self.seconds:.1f}s ({rate:.0f} requests/s), "
+            f"{'OK' if self.ok else 'FAILED'}"
+        )
+        return "\n".join(lines)
+
+def _digest(data: dict) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+class Collector:
+    def __init__(
+        self,
+        targets: List[Target],
+        concurrency: int = 64,
+        per_device: int = 2,
+        retries: int = 3,
+        timeout: float = 10.0,
+        writers: int = 4,
+        store: bool = True
+    ):
+        self.targets = targets
+        self.concurrency = concurrency
+        self.per_device = per_device
+        self.retries = retries
+        self.timeout = timeout
+        self.writers = writers
+        self.store = store
+        self.clients: Dict[str, FortiOSClient] = {}
+        self.digests: Dict[str, str] = {}
+        self.global_limit: Optional[asyncio.Semaphore] = None
+        self.writer_limit: Optional[asyncio.Semaphore] = None
+        # Whether this round has started its generation (see app.versioning)
+        self.generation_started = False
+        self.generation_lock = threading.Lock()
+
+    def _client(self, target: Target) -> FortiOSClient:
+        # Kept across polls, with their pooled connections
+        client = self.clients.get(target.fw_name)
+        if client is None:
+            client = self.clients[target.fw_name] = FortiOSClient(
+                target, self.global_limit, per_device=self.per_device, retries=self.retries, timeout=self.timeout
+            )
+        return client
+
+    def _write(self, target: Target, data: dict) -> Optional[Dict[str, int]]:
+        # Runs in a worker thread; returns None when the device did not change
+        from app.collector.store import store_device
+        from app.database import shards
+
+        digest = _digest(data)
+        if self.digests.get(target.fw_name) == digest:
+            return None
+        self._start_generation()
+        db = shards.firewall_session(target.fw_name)
+        try:
+            loaded = store_device(db, target, data)
+        finally:
+            db.close()
+        self.digests[target.fw_name] = digest
+        return loaded
+
+    def _start_generation(self) -> None:
+        # The first device of a round that changed starts the round's generation
+        from app import versioning
+        from app.database import shards
+
+        with self.generation_lock:
+            if not self.generation_started:
+                # Each shard numbers its own generations
+                for engine in shards.engines:
+                    versioning.new_generation(engine, "collector", f"{len(self.targets)} devices")
+                self.generation_started = True
+
+    async def _poll(self, target: Target) -> DeviceResult:
+        result = DeviceResult(target.fw_name)
+        client = self._client(target)
+        requests, retried = client.requests, client.retried
+        started = time.perf_counter()
+        try:
+            data = await client.collect()
+            result.fetched = {
+                "vdoms": len(data["vdoms"]),
+                "interfaces": len(data["interfaces"]),
+                "routes": sum(map(len, data["routes"].values())),
+                "vips": sum(map(len, data["vips"].values())),
+            }
+            if self.store:
+                async with self.writer_limit:
+                    result.loaded = await asyncio.to_thread(self._write, target, data)
+                result.unchanged = result.loaded is None
+        except (FortiOSError, SQLAlchemyError, ValueError) as exc:
+            result.error = str(exc)
+            logger.warning("Polling %s failed: %s", target.fw_name, exc)
+        except Exception as exc:
+            # An unexpected payload or transport error fails this device only
+            result.error = f"{type(exc).__name__}: {exc}"
+            logger.exception("Polling %s failed", target.fw_name)
+        result.requests = client.requests - requests
+        result.retried = client.retried - retried
+        result.seconds = time.perf_counter() - started
+        return result
+
+    async def run_once(self) -> CollectReport:
+        if self.global_limit is None:
+            self.global_limit = asyncio.Semaphore(self.concurrency)
+            self.writer_limit = asyncio.Semaphore(self.writers)
+        started = time.perf_counter()
+        self.generation_started = False
+        devices = await asyncio.gather(*(self._poll(target) for target in self.targets))
+        return CollectReport(list(devices), time.perf_counter() - started)
+
+    async def run_forever(self, interval: float) -> None:
+        """
+        Poll every `interval` seconds, measured from the start of each poll.
+        """
+        while True:
+            started = time.monotonic()
+            report = await self.run_once()
+            failed = sum(1 for device in report.devices if device.error)
+            logger.info(
+                "Polled %d devices in %.1fs, %d failed", len(report.devices), report.seconds, failed
+            )
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*(client.aclose() for client in self.clients.values()))
+        self.clients.clear()
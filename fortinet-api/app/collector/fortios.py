@@ -0,0 +1,140 @@
+"""
+FortiOS REST API client for one device.
+
+Each client keeps one httpx connection pool to its device, so requests reuse
+kept-alive TLS connections instead of handshaking per call. Requests wait for
+a slot of the device's own semaphore and then of the collector's global one:
+a slow device queues its own requests without holding global slots. Transport
+errors, timeouts, 429 and 5xx responses are retried with exponential backoff
+and jitter.
+"""
+import asyncio
+import random
+import ssl
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.collector.targets import Target
+
+VDOM_PATH = "/api/v2/cmdb/system/vdom"
+INTERFACE_PATH = "/api/v2/cmdb/system/interface"
+ROUTE_PATH = "/api/v2/monitor/router/ipv4"
+VIP_PATH = "/api/v2/cmdb/firewall/vip"
+
+# Responses that may succeed when retried
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Seconds an idle connection is kept for the next poll
+KEEPALIVE_SECONDS = 60.0
+
+class FortiOSError(Exception):
+    pass
+
+_ssl_contexts: Dict[bool, ssl.SSLContext] = {}
+
+def _ssl_context(verify: bool) -> ssl.SSLContext:
+    # Loading the CA bundle takes tens of milliseconds; share one context per setting
+    context = _ssl_contexts.get(verify)
+    if context is None:
+        context = _ssl_contexts[verify] = httpx.create_ssl_context(verify=verify)
+    return context
+
+class FortiOSClient:
+    def __init__(
+        self,
+        target: Target,
+        global_limit: asyncio.Semaphore,
+        per_device: int = 2,
+        retries: int = 3,
+        timeout: float = 10.0,
+        backoff: float = 0.5
+    ):
+        self.target = target
+        self.global_limit = global_limit
+        self.device_limit = asyncio.Semaphore(per_device)
+        self.retries = retries
+        self.backoff = backoff
+        self.requests = 0
+        self.retried = 0
+        headers = {"Accept": "application/json"}
+        if target.token:
+            headers["Authorization"] = f"Bearer {target.token}"
+        self.client = httpx.AsyncClient(
+            base_url=target.url,
+            headers=headers,
+            verify=_ssl_context(target.verify),
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=per_device, max_keepalive_connections=per_device, keepalive_expiry=KEEPALIVE_SECONDS
+            ),
+        )
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    async def get(self, path: str, params: Optional[Dict[str, str]] = None) -> List[dict]:
+        """
+        The "results" list of a GET, retried as described above.
+        """
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                async with self.device_limit, self.global_limit:
+                    self.requests += 1
+                    response = await self.client.get(path, params=params)
+                if response.status_code in RETRY_STATUS:
+                    error = f"HTTP {response.status_code}"
+                elif response.is_error:
+                    raise FortiOSError(f"{self.target.fw_name}: GET {path}: HTTP {response.status_code}")
+                else:
+                    body = response.json()
+                    results = body.get("results") if isinstance(body, dict) else None
+                    if not isinstance(results, list):
+                        raise FortiOSError(f"{self.target.fw_name}: GET {path}: no results list")
+                    return results
+            except httpx.TransportError as exc:
+                error = f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+            except ValueError as exc:
+                raise FortiOSError(f"{self.target.fw_name}: GET {path}: invalid JSON ({exc})") from exc
+            if attempt < self.retries:
+                self.retried += 1
+                await asyncio.sleep(self._delay(attempt, response))
+        raise FortiOSError(f"{self.target.fw_name}: GET {path}: {error} after {self.retries + 1} attempts")
+
+    async def collect(self) -> dict:
+        """
+        The VDOMs and interfaces of the device and the routes and VIPs of each
+        VDOM: {"vdoms": [...], "interfaces": [...], "routes": {vdom: [...]},
+        "vips": {vdom: [...]}}.
+        """
+        interfaces = asyncio.ensure_future(self.get(INTERFACE_PATH))
+        try:
+            vdoms = await self.get(VDOM_PATH)
+        except BaseException:
+            interfaces.cancel()
+            raise
+        names = [entry["name"] for entry in vdoms if entry.get("name")]
+        # Wait for every request, so none is left running when one fails
+        results = await asyncio.gather(
+            interfaces,
+            *(self.get(ROUTE_PATH, {"vdom": name}) for name in names),
+            *(self.get(VIP_PATH, {"vdom": name}) for name in names),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return {
+            "vdoms": vdoms,
+            "interfaces": results[0],
+            "routes": dict(zip(names, results[1:1 + len(names)])),
+            "vips": dict(zip(names, results[1 + len(names):])),
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
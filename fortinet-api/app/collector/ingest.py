@@ -0,0 +1,201 @@
+"""
+Offline ingestion: parses configuration backups and CLI output files over a
+process pool, merges them per firewall and stores each firewall the way the
+collector stores a polled device.
+
+A firewall's files together describe it. Its configuration gives the VDOMs,
+interfaces, VIPs and static routes; a VDOM's routing table output replaces
+its static routes with the whole FIB, and address lists fill in the
+addresses of interfaces the configuration leaves unset (DHCP, PPPoE). Tables
+none of its files describe are left as they are in the database.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.collector.engine import STORED_TABLES, DeviceResult
+from app.collector.offline import ParsedFile, parse_file, route_entries
+from app.collector.targets import Target
+
+class IngestReport:
+    """
+    Result of one offline ingestion run.
+    """
+
+    def __init__(self, files: List[ParsedFile], firewalls: List[DeviceResult], seconds: float, workers: int):
+        self.files = files
+        self.firewalls = firewalls
+        self.seconds = seconds
+        self.workers = workers
+
+    @property
+    def ok(self) -> bool:
+        return not any(f.error for f in self.files) and not any(fw.error for fw in self.firewalls)
+
+    @property
+    def bytes(self) -> int:
+        return sum(f.bytes for f in self.files)
+
+    @property
+    def parse_rate(self) -> float:
+        """
+        Bytes parsed per second of a worker.
+        """
+        seconds = sum(f.seconds for f in self.files)
+        return self.bytes / seconds if seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "seconds": round(self.seconds, 2),
+            "workers": self.workers,
+            "bytes": self.bytes,
+            "parse_bytes_per_second": round(self.parse_rate),
+            "files": [
+                {"path": f.path, "kind": f.kind, "fw_name": f.fw_name, "bytes": f.bytes,
+                 "seconds": round(f.seconds, 3), "error": f.error}
+                for f in self.files
+            ],
+            "firewalls": [firewall.as_dict() for firewall in self.firewalls],
+        }
+
+    def format(self) -> str:
+        failed_files = [f for f in self.files if f.error]
+        failed = [firewall for firewall in self.firewalls if firewall.error]
+        lines = [f"{'table':<12}{'read':>10}{'loaded':>10}"]
+        for table in STORED_TABLES:
+            read = sum(firewall.fetched.get(table, 0) for firewall in self.firewalls)
+            loaded = sum((firewall.loaded or {}).get(table, 0) for firewall in self.firewalls)
+            lines.append(f"{table:<12}{read:>10}{loaded:>10}")
+        lines.extend(f"  {f.path}: FAILED: {f.error}" for f in failed_files)
+        lines.extend(f"  {firewall.fw_name}: FAILED: {firewall.error}" for firewall in failed)
+        megabytes = self.bytes / 1e6
+        lines.append(
+            f"{len(self.files)} files ({megabytes:.1f} MB) of {len(self.firewalls)} firewalls in {self.seconds:.1f}s "
+            f"on {self.workers} workers: parsed at {self.parse_rate / 1e6:.0f} MB/s per worker, "
+            f"{len(failed_files) + len(failed)} failed, {'OK' if self.ok else 'FAILED'}"
+        )
+        return "\n".join(lines)
+
+def _expand(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                yield from (os.path.join(directory, name) for name in sorted(names) if not name.startswith("."))
+        else:
+            yield path
+
+def merge_files(files: List[ParsedFile]) -> dict:
+    """
+    The data of one firewall from its parsed files, in the shape of
+    FortiOSClient.collect(); tables none of the files describe are None.
+    """
+    configs = [f for f in files if f.vdoms is not None]
+    if len(configs) > 1:
+        raise ValueError(f"{len(configs)} configuration files: {', '.join(f.path for f in configs)}")
+    config = configs[0] if configs else None
+
+    addresses: Dict[str, str] = {}
+    for f in files:
+        for entry in f.addresses:
+            addresses.setdefault(entry["name"], entry["ip"])
+    if config is not None:
+        interfaces = config.interfaces
+        for entry in interfaces:
+            if (not entry["ip"] or entry["ip"].startswith("0.0.0.0")) and entry["name"] in addresses:
+                entry["ip"] = addresses[entry["name"]]
+    elif addresses:
+        # Only the names and addresses are known, not the VDOMs
+        interfaces = [{"name": name, "ip": ip} for name, ip in addresses.items()]
+    else:
+        interfaces = None
+
+    routes: Dict[str, List[dict]] = {}
+    for f in files:
+        for vdom, entries in f.static_routes.items():
+            routes.setdefault(vdom, []).extend(entries)
+    fib: Dict[str, List[dict]] = {}
+    for f in files:
+        for vdom, chunks in f.fib_routes.items():
+            fib.setdefault(vdom, []).extend(route_entries(chunks))
+    routes.update(fib)
+
+    return {
+        "vdoms": config.vdoms if config else None,
+        "interfaces": interfaces,
+        "routes": routes if config or fib else None,
+        "vips": config.vips if config else None,
+    }
+
+def _init_worker() -> None:
+    # Forked workers must not use the parent's pooled connections
+    from app.database import shards
+
+    for engine in shards.engines:
+        engine.dispose(close=False)
+
+def _load(fw_name: str, files: List[ParsedFile], store: bool) -> DeviceResult:
+    # Runs in a worker: merging builds the entries, storing the rows
+    result = DeviceResult(fw_name)
+    started = time.perf_counter()
+    try:
+        data = merge_files(files)
+        result.fetched = {
+            table: len(data[table]) if table in ("vdoms", "interfaces") else sum(map(len, data[table].values()))
+            for table in STORED_TABLES
+            if data[table] is not None
+        }
+        if store:
+            # For a new firewall: the configuration's management address, else any
+            fw_ip = next((f.fw_ip for f in files if f.fw_ip), None) or next(
+                (entry["ip"].split()[0] for f in files for entry in f.addresses), None
+            )
+            from app.collector.store import store_device
+            from app.database import shards
+
+            db = shards.firewall_session(fw_name)
+            try:
+                result.loaded = store_device(db, Target(fw_name, url="", fw_ip=fw_ip), data)
+            finally:
+                db.close()
+    except (SQLAlchemyError, ValueError) as exc:
+        # Exceptions do not always survive the trip back from the worker
+        result.error = str(exc)
+    result.seconds = time.perf_counter() - started
+    return result
+
+def ingest_files(
+    paths: List[str],
+    workers: Optional[int] = None,
+    fw_name: Optional[str] = None,
+    store: bool = True
+) -> IngestReport:
+    """
+    Parse the files (directories are walked) and, with `store`, write each
+    firewall. `fw_name` assigns all files to one firewall.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    paths = list(_expand(paths))
+    # Largest first, so one big file does not finish last on its own
+    paths.sort(key=lambda path: os.path.getsize(path) if os.path.exists(path) else 0, reverse=True)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker if store else None) as pool:
+        files = list(pool.map(parse_file, paths, [fw_name] * len(paths)))
+        grouped: Dict[str, List[ParsedFile]] = {}
+        for f in files:
+            if f.error is None:
+                grouped.setdefault(f.fw_name, []).append(f)
+        if store and grouped:
+            # One generation for the whole run (see app.versioning)
+            from app import versioning
+            from app.database import shards
+
+            for engine in shards.engines:
+                versioning.new_generation(engine, "ingest", f"{len(files)} files")
+        firewalls = list(pool.map(_load, sorted(grouped), [grouped[name] for name in sorted(grouped)], [store] * len(grouped)))
+
+    return IngestReport(files, firewalls, time.perf_counter() - started, workers)
@@ -0,0 +1,220 @@
+"""
+A mock FortiOS REST API serving many simulated devices from one port, to
+measure the collector locally.
+
+Device N answers under http://host:port/fw-N/api/v2/..., which the collector
+reaches with the device's URL as its base. All devices have the same
+deterministic VDOMs, interfaces, routes and VIPs of the configured sizes.
+Every response waits `latency` seconds plus up to `jitter`, a share
+`error_rate` of them fail with 503, and with a `token` requests without it
+get 401. The server speaks HTTP/1.1 with keep-alive and counts connections
+and requests; GET /stats returns the counts, so the collector's connection
+reuse can be checked.
+"""
+import asyncio
+import json
+import random
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from app.collector.fortios import INTERFACE_PATH, ROUTE_PATH, VDOM_PATH, VIP_PATH
+from app.collector.targets import Target
+
+REASONS = {200: "OK", 401: "Unauthorized", 404: "Not Found", 503: "Service Unavailable"}
+
+def device_name(number: int) -> str:
+    return f"fw-{number:05d}"
+
+class MockFortiOS:
+    def __init__(
+        self,
+        devices: int = 200,
+        vdoms: int = 5,
+        interfaces: int = 20,
+        routes: int = 200,
+        vips: int = 20,
+        latency: float = 0.02,
+        jitter: float = 0.01,
+        error_rate: float = 0.0,
+        token: Optional[str] = None,
+        seed: int = 0
+    ):
+        self.devices = devices
+        self.vdoms = vdoms
+        self.interfaces = interfaces
+        self.routes = routes
+        self.vips = vips
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.token = token
+        self.random = random.Random(seed)
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.base_url: Optional[str] = None
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self._bodies: Dict[Tuple[str, Optional[str]], Optional[bytes]] = {}
+
+    # Simulated configuration; device numbers start at 1
+
+    def _vdom_names(self) -> List[str]:
+        return ["root"] + [f"cust-{k}" for k in range(1, self.vdoms)]
+
+    def _interfaces(self) -> List[dict]:
+        results = []
+        for k, vdom in enumerate(self._vdom_names()):
+            for j in range(self.interfaces):
+                n = k * self.interfaces + j
+                results.append({
+                    "name": f"port{j + 1}" if k == 0 else f"vlan{k}-{j}",
+                    "vdom": vdom,
+                    "ip": f"10.{n // 256 % 256}.{n % 256}.1 255.255.255.0",
+                    "type": "physical" if k == 0 else "vlan",
+                    "vlanid": 0 if k == 0 else 100 + n,
+                    "description": "",
+                    "status": "up" if j % 5 else "down",
+                    "interface": "" if k == 0 else f"port{j % 4 + 1}",
+                })
+        return results
+
+    def _routes(self, vdom: str) -> List[dict]:
+        k = self._vdom_names().index(vdom)
+        interfaces = [entry for entry in self._interfaces() if entry["vdom"] == vdom]
+        results = []
+        for r in range(self.routes):
+            interface = interfaces[r % len(interfaces)] if interfaces else {"name": "port1", "ip": "10.0.0.1 255.255.255.0"}
+            address = interface["ip"].split()[0]
+            if r < len(interfaces):
+                ip_mask, route_type, gateway = address.rsplit(".", 1)[0] + ".0/24", "connect", "0.0.0.0"
+            else:
+                ip_mask = f"{r % 224}.{r // 224 % 256}.{k % 256}.0/24"
+                route_type = ("static", "bgp", "kernel")[r % 3]
+                gateway = address.rsplit(".", 1)[0] + ".254"
+            results.append({
+                "ip_version": 4, "type": route_type, "ip_mask": ip_mask, "distance": 10, "metric": 0,
+                "gateway": gateway, "interface": interface["name"],
+            })
+        return results
+
+    def _vips(self, vdom: str) -> List[dict]:
+        k = self._vdom_names().index(vdom)
+        return [
+            {
+                "name": f"vip-{k}-{v}", "type": "static-nat",
+                "extip": f"203.0.{k % 256}.{v % 256}", "extport": "443", "extintf": "port1",
+                "mappedip": [{"range": f"192.168.{k % 256}.{v % 256}"}], "mappedport": "8443",
+            }
+            for v in range(self.vips)
+        ]
+
+    def _results(self, path: str, vdom: Optional[str]) -> Optional[List[dict]]:
+        if path == VDOM_PATH:
+            return [{"name": name} for name in self._vdom_names()]
+        if path == INTERFACE_PATH:
+            return self._interfaces()
+        if vdom not in self._vdom_names():
+            return None
+        if path == ROUTE_PATH:
+            return self._routes(vdom)
+        if path == VIP_PATH:
+            return self._vips(vdom)
+        return None
+
+    def _body(self, path: str, vdom: Optional[str]) -> Optional[bytes]:
+        # Rendered once; all devices have the same configuration
+        key = (path, vdom)
+        if key not in self._bodies:
+            results = self._results(path, vdom)
+            self._bodies[key] = None if results is None else json.dumps({
+                "http_method": "GET", "results": results, "vdom": vdom or "root",
+                "path": path.split("/")[4], "name": path.split("/")[5], "status": "success", "http_status": 200,
+            }).encode()
+        return self._bodies[key]
+
+    # HTTP
+
+    async def _respond(self, target: str, headers: Dict[str, str]) -> Tuple[int, bytes]:
+        if target == "/stats":
+            return 200, json.dumps(self.stats()).encode()
+        await asyncio.sleep(self.latency + self.random.random() * self.jitter)
+        if self.token and headers.get("authorization") != f"Bearer {self.token}":
+            return 401, b'{"http_status":401}'
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return 503, b'{"http_status":503}'
+        url = urlsplit(target)
+        device, _, path = url.path.lstrip("/").partition("/")
+        try:
+            number = int(device.rsplit("-", 1)[1])
+        except (IndexError, ValueError):
+            number = 0
+        vdom = parse_qs(url.query).get("vdom", [None])[0]
+        body = self._body("/" + path, vdom) if 1 <= number <= self.devices else None
+        if body is None:
+            return 404, b'{"http_status":404}'
+        return 200, body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                self.requests += 1
+                if method == "GET":
+                    status, body = await self._respond(target, headers)
+                else:
+                    status, body = 404, b'{"http_status":404}'
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode() + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Start serving and return the base URL; port 0 picks a free port.
+        """
+        self.server = await asyncio.start_server(self._handle, host, port, backlog=1024)
+        port = self.server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    def target_entries(self) -> List[dict]:
+        """
+        The devices as entries of a targets file (see load_targets).
+        """
+        return [
+            {"fw_name": device_name(n), "url": f"{self.base_url}/{device_name(n)}", "token": self.token,
+             "fw_ip": f"10.255.{n // 256 % 256}.{n % 256}"}
+            for n in range(1, self.devices + 1)
+        ]
+
+    def targets(self) -> List[Target]:
+        return [Target(**entry) for entry in self.target_entries()]
+
+    def stats(self) -> dict:
+        return {"connections": self.connections, "requests": self.requests, "errors": self.errors}
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
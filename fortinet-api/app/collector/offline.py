@@ -0,0 +1,387 @@
+"""
+Streaming parsers for saved FortiOS configurations and CLI output, for
+firewalls the collector cannot reach.
+
+Three kinds of text files are read:
+- configuration backups (`show full-configuration`, or `show`): VDOMs,
+  the hostname, interfaces, static routes and VIPs;
+- `get router info routing-table all` output: the routes in the FIB;
+- `diagnose ip address list` output: the addresses of the interfaces.
+
+CLI output may be a captured session with prompts ("FGT-01 (root) # get
+router info routing-table all"); the prompts give the firewall and the
+VDOM of the output after them, and output of other commands is ignored.
+
+Entries are returned in the shape of the FortiOS REST API results (the CLI
+attribute names are the API's), so the collector's mapping to the create
+schemas applies to them as is. Routing tables are the exception: they are
+kept as the pattern's matches, joined into text that is cheap to send
+between processes, and route_entries() turns them into entries when the
+firewall is loaded.
+
+Files are read in chunks: sections of a configuration that are not needed
+are skipped with one search each, and CLI output is matched chunk-wise with
+compiled patterns rather than line by line.
+"""
+import codecs
+import gzip
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+CHUNK_SIZE = 1 << 22
+
+KIND_CONFIG = "config"
+KIND_CLI = "cli"
+
+DEFAULT_VDOM = "root"
+
+# Routing table codes -> the FortiOS REST API route types (see parse.ROUTE_TYPES)
+ROUTE_CODES = {
+    "K": "kernel",
+    "C": "connect",
+    "S": "static",
+    "R": "rip",
+    "B": "bgp",
+    "O": "ospf",
+    "i": "isis",
+    "V": "bgp",
+}
+
+# A prompt and its command; the parenthesized part is the VDOM, or "global"
+_PROMPT = re.compile(r"\n([A-Za-z0-9][\w.-]*) (?:\(([\w.-]+)\) )?[#$] ?([^\n]*)")
+# A route: its code and network, or only leading blanks for the further
+# next hops of the route before; then its gateway and exit interface.
+# Possessive, as this runs over every line of the largest files.
+_ROUTE = re.compile(
+    r"\n(?:([KCSRBOiV])[*> ]*+(?:[IENLia][A12]?[*> ]++)?([\d.]++/\d++)|[ \t]++(?=\[))[ \t]*+(?:\[[\d/]++\] )?"
+    r"(?:via ([\d.]++)(?:, | \(recursive [^,\n]*+, )|is directly connected, )([^\s,()]++)"
+)
+_ADDRESS = re.compile(r"\nIP=(\d+\.\d+\.\d+\.\d+)->[\d.]+/(\d+\.\d+\.\d+\.\d+) index=\d+ devname=(\S+)")
+_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|(\S+)')
+
+ROUTE_COMMAND = "get router info routing-table"
+ADDRESS_COMMAND = "diagnose ip address list"
+
+def _unquote(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    match = _TOKEN.match(value)
+    if match is None:
+        return None
+    if match.group(1) is not None:
+        return match.group(1).replace('\\"', '"').replace("\\\\", "\\")
+    return match.group(2)
+
+def _tokens(value: Optional[str]) -> List[str]:
+    if value is None:
+        return []
+    return [quoted if quoted is not None else bare for quoted, bare in _TOKEN.findall(value)]
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+class ParsedFile:
+    """
+    What one file held. Tables the file does not describe are None;
+    routes and VIPs are {vdom_name: [entries]}, fib_routes
+    {vdom_name: [tab-separated code, network, gateway and interface lines]}.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.kind: Optional[str] = None
+        self.fw_name: Optional[str] = None
+        self.fw_ip: Optional[str] = None
+        self.vdoms: Optional[List[dict]] = None
+        self.interfaces: Optional[List[dict]] = None
+        self.addresses: List[dict] = []
+        self.static_routes: Dict[str, List[dict]] = {}
+        self.fib_routes: Dict[str, List[str]] = {}
+        self.vips: Optional[Dict[str, List[dict]]] = None
+        self.bytes = 0
+        self.seconds = 0.0
+        self.error: Optional[str] = None
+
+class _Lines:
+    """
+    The lines of a binary stream, decoded chunk by chunk. skip_section()
+    jumps to the end of a top-level configuration section, which is the
+    first "end" line at column 0 (nested sections are indented).
+    """
+
+    def __init__(self, stream, decoder, first: str):
+        self.stream = stream
+        self.decoder = decoder
+        self.buffer = first
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk, final=self.eof)
+        self.pos = 0
+        return not self.eof or bool(self.buffer)
+
+    def readline(self) -> Optional[str]:
+        end = self.buffer.find("\n", self.pos)
+        while end < 0:
+            searched = len(self.buffer) - self.pos
+            if not self._fill():
+                if self.pos >= len(self.buffer):
+                    return None
+                end = len(self.buffer)
+                break
+            end = self.buffer.find("\n", self.pos + searched)
+        line = self.buffer[self.pos:end]
+        self.pos = end + 1
+        return line[:-1] if line.endswith("\r") else line
+
+    def skip_section(self) -> None:
+        # pos is just after the newline ending the "config ..." line
+        start = self.pos - 1
+        while True:
+            end = self.buffer.find("\nend", start)
+            if end >= 0 and (end + 4 < len(self.buffer) or self.eof):
+                if end + 4 == len(self.buffer) or self.buffer[end + 4] in "\r\n":
+                    self.pos = end + 1
+                    self.readline()
+                    return
+                start = end + 4
+                continue
+            # Keep only the tail that may hold the start of "\nend"
+            self.pos = max(start, len(self.buffer) - 4)
+            if not self._fill():
+                self.pos = len(self.buffer)
+                return
+            start = 0
+
+def _read_section(lines: _Lines):
+    """
+    Read a configuration section up to its "end": its own settings and its
+    entries, each {"name": ..., attribute: raw value}. Nested sections are
+    skipped.
+    """
+    settings: Dict[str, str] = {}
+    entries: List[dict] = []
+    entry = None
+    nested = 0
+    while True:
+        line = lines.readline()
+        if line is None or line == "end":
+            return settings, entries
+        text = line.strip()
+        if nested:
+            if text.startswith("config "):
+                nested += 1
+            elif text == "end":
+                nested -= 1
+        elif text.startswith("set "):
+            key, _, value = text[4:].partition(" ")
+            (settings if entry is None else entry)[key] = value
+        elif text.startswith("edit "):
+            entry = {"name": _unquote(text[5:])}
+            entries.append(entry)
+        elif text == "next":
+            entry = None
+        elif text.startswith("config "):
+            nested = 1
+
+def _interface(entry: dict) -> dict:
+    return {
+        "name": entry["name"],
+        "vdom": _unquote(entry.get("vdom")),
+        "ip": entry.get("ip"),
+        "type": entry.get("type"),
+        "vlanid": int(entry["vlanid"]) if entry.get("vlanid", "").isdigit() else None,
+        "description": _unquote(entry.get("description")),
+        "status": entry.get("status", "up"),
+        "interface": _unquote(entry.get("interface")),
+        "allowaccess": entry.get("allowaccess", ""),
+    }
+
+def _static_route(entry: dict) -> Optional[dict]:
+    if entry.get("status") == "disable" or entry.get("blackhole") == "enable":
+        return None
+    return {
+        "type": "static",
+        "ip_mask": entry.get("dst", "0.0.0.0 0.0.0.0").replace(" ", "/", 1),
+        "gateway": entry.get("gateway"),
+        "interface": _unquote(entry.get("device")),
+    }
+
+def _vip(entry: dict) -> dict:
+    return {
+        "name": entry["name"],
+        "type": entry.get("type", "static-nat"),
+        "extip": entry.get("extip"),
+        "extport": _unquote(entry.get("extport")),
+        "extintf": _unquote(entry.get("extintf")),
+        "mappedip": [{"range": value} for value in _tokens(entry.get("mappedip"))],
+        "mappedport": _unquote(entry.get("mappedport")),
+    }
+
+def _management_ip(interfaces: List[dict]) -> Optional[str]:
+    # The address of the first interface that allows HTTPS, else of any
+    with_ip = [entry for entry in interfaces if entry["ip"] and not entry["ip"].startswith("0.0.0.0")]
+    for entry in with_ip:
+        if "https" in entry["allowaccess"].split():
+            return entry["ip"].split()[0]
+    return with_ip[0]["ip"].split()[0] if with_ip else None
+
+def _parse_config(lines: _Lines, parsed: ParsedFile) -> None:
+    vdoms: List[str] = []
+    interfaces: List[dict] = []
+    vips: Dict[str, List[dict]] = {}
+    # Column-0 "config vdom" and "config global" blocks around the sections
+    blocks: List[str] = []
+    vdom: Optional[str] = None
+    while True:
+        line = lines.readline()
+        if line is None:
+            break
+        if line.startswith("config "):
+            path = line[7:].strip()
+            if path in ("vdom", "global"):
+                blocks.append(path)
+            elif path == "system global":
+                settings, _ = _read_section(lines)
+                parsed.fw_name = _unquote(settings.get("hostname")) or parsed.fw_name
+            elif path == "system interface":
+                interfaces.extend(_interface(entry) for entry in _read_section(lines)[1])
+            elif path == "router static":
+                routes = parsed.static_routes.setdefault(vdom or DEFAULT_VDOM, [])
+                routes.extend(route for route in map(_static_route, _read_section(lines)[1]) if route)
+            elif path == "firewall vip":
+                vips.setdefault(vdom or DEFAULT_VDOM, []).extend(map(_vip, _read_section(lines)[1]))
+            else:
+                lines.skip_section()
+        elif blocks and blocks[-1] == "vdom" and line.startswith("edit "):
+            vdom = _unquote(line[5:])
+            if vdom not in vdoms:
+                vdoms.append(vdom)
+        elif line == "next":
+            vdom = None
+        elif line == "end" and blocks:
+            blocks.pop()
+            vdom = None
+
+    for entry in interfaces:
+        entry["vdom"] = entry["vdom"] or DEFAULT_VDOM
+    parsed.vdoms = [{"name": name} for name in vdoms or [DEFAULT_VDOM]]
+    parsed.interfaces = interfaces
+    parsed.vips = vips
+    parsed.fw_ip = _management_ip(interfaces)
+
+class _CliOutput:
+    """
+    Output of the supported commands, fed in chunks of whole lines.
+    """
+
+    def __init__(self, parsed: ParsedFile):
+        self.parsed = parsed
+        self.command: Optional[str] = None
+        self.vdom = DEFAULT_VDOM
+
+    def detect(self, text: str) -> None:
+        # Output saved without its prompt
+        if "Routing table for VRF" in text or "Codes: K - kernel" in text:
+            self.command = ROUTE_COMMAND
+        elif ("\n" + text).find("\nIP=") >= 0:
+            self.command = ADDRESS_COMMAND
+
+    def feed(self, text: str) -> None:
+        # text starts with "\n" and ends with a whole line
+        position = 0
+        for prompt in _PROMPT.finditer(text):
+            self._output(text, position, prompt.start())
+            fw_name, context, command = prompt.groups()
+            self.parsed.fw_name = fw_name
+            self.vdom = context if context and context not in ("global", "vdom") else DEFAULT_VDOM
+            command = " ".join(command.split())
+            self.command = next((known for known in (ROUTE_COMMAND, ADDRESS_COMMAND) if command.startswith(known)), None)
+            position = prompt.end()
+        self._output(text, position, len(text))
+
+    def _output(self, text: str, start: int, end: int) -> None:
+        if self.command == ROUTE_COMMAND:
+            matches = _ROUTE.findall(text, start, end)
+            if matches:
+                self.parsed.fib_routes.setdefault(self.vdom, []).append("\n".join(map("\t".join, matches)))
+        elif self.command == ADDRESS_COMMAND:
+            self.parsed.addresses.extend(
+                {"name": name, "ip": f"{address} {mask}"}
+                for address, mask, name in _ADDRESS.findall(text, start, end)
+                if not address.startswith("127.")
+            )
+
+def route_entries(chunks: List[str]) -> List[dict]:
+    """
+    The routing table matches of a VDOM as route entries. A match without a
+    code is a further next hop of the route before it.
+    """
+    entries = []
+    code = network = None
+    for line in "\n".join(chunks).split("\n"):
+        match_code, match_network, gateway, interface = line.split("\t")
+        if match_code:
+            code, network = match_code, match_network
+        elif network is None:
+            continue
+        entries.append({"type": ROUTE_CODES[code], "ip_mask": network, "gateway": gateway or None, "interface": interface})
+    return entries
+
+def _parse_cli(stream, decoder, first: str, parsed: ParsedFile) -> None:
+    output = _CliOutput(parsed)
+    output.detect(first[:1 << 16])
+    rest = ""
+    text = first
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        text += decoder.decode(chunk, final=not chunk)
+        if chunk:
+            cut = text.rfind("\n") + 1
+            text, rest = text[:cut], text[cut:]
+        output.feed("\n" + text)
+        if not chunk:
+            break
+        text = rest
+
+def parse_file(path: str, fw_name: Optional[str] = None) -> ParsedFile:
+    """
+    Parse a configuration or CLI output file (optionally gzipped). The
+    firewall is `fw_name` if given, else the configured hostname or the
+    prompt, else the file name up to its first dot. Never raises: errors
+    are returned in ParsedFile.error.
+    """
+    parsed = ParsedFile(path)
+    started = time.perf_counter()
+    try:
+        parsed.bytes = os.path.getsize(path)
+        with _open(path) as stream:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            head = chunk = stream.read(CHUNK_SIZE)
+            # Enough of the start to tell the kind of file
+            while chunk and len(head) < 4096:
+                chunk = stream.read(CHUNK_SIZE)
+                head += chunk
+            first = decoder.decode(head, final=not chunk)
+            opening = first.lstrip()
+            if opening.startswith("#config-version") or opening.startswith("config "):
+                parsed.kind = KIND_CONFIG
+                _parse_config(_Lines(stream, decoder, first), parsed)
+            else:
+                parsed.kind = KIND_CLI
+                _parse_cli(stream, decoder, first, parsed)
+    except (OSError, EOFError, ValueError) as exc:
+        parsed.error = str(exc)
+    if fw_name or not parsed.fw_name:
+        parsed.fw_name = fw_name or os.path.basename(path).split(".")[0]
+    parsed.seconds = time.perf_counter() - started
+    return parsed
@@ -0,0 +1,152 @@
+"""
+Maps FortiOS REST API results to the create schemas.
+
+Values are written the way the existing data has them: masks as prefix
+lengths, empty strings and 0.0.0.0 as NULL, route types as the importer
+names them and next hop details in the "<type> interface with ip
+<address>/<prefix> is <status>" form.
+"""
+import ipaddress
+from typing import Dict, List, Optional, Tuple
+
+from app.schemas.interface import InterfaceCreate
+from app.schemas.route import RouteCreate
+from app.schemas.vdom import VDOMCreate
+from app.schemas.vip import VIPCreate
+
+# FortiOS route types -> route_type
+ROUTE_TYPES = {
+    "connect": "connected",
+    "static": "static",
+    "bgp": "BGP",
+    "ospf": "OSPF",
+    "kernel": "FIB",
+}
+
+UNSET_ADDRESS = "0.0.0.0"
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _address(value) -> Optional[str]:
+    # The first address of "a.b.c.d", "a.b.c.d mask", "a.b.c.d/len" or a "first-last" range
+    value = _text(value)
+    if value is None:
+        return None
+    value = value.split()[0].split("-")[0].split("/")[0]
+    try:
+        address = str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+    return None if address == UNSET_ADDRESS else address
+
+def _port(value) -> Optional[int]:
+    value = _text(value)
+    if value is None:
+        return None
+    try:
+        port = int(value.split("-")[0])
+    except ValueError:
+        return None
+    return port or None
+
+def split_interface_ip(value) -> Tuple[Optional[str], Optional[str]]:
+    """
+    "10.0.0.1 255.255.255.0" -> ("10.0.0.1", "24"); unset addresses give
+    (None, None).
+    """
+    value = _text(value)
+    if value is None:
+        return None, None
+    try:
+        interface = ipaddress.ip_interface(value.replace(" ", "/", 1))
+    except ValueError:
+        return None, None
+    if str(interface.ip) == UNSET_ADDRESS:
+        return None, None
+    return str(interface.ip), str(interface.network.prefixlen)
+
+def parse_vdoms(results: List[dict], firewall_id: int) -> List[VDOMCreate]:
+    return [
+        VDOMCreate(firewall_id=firewall_id, vdom_name=entry["name"], vdom_index=index)
+        for index, entry in enumerate(results)
+        if entry.get("name")
+    ]
+
+def parse_interfaces(results: List[dict], firewall_id: int, vdom_ids: Dict[str, int]) -> List[InterfaceCreate]:
+    interfaces = []
+    for entry in results:
+        if not entry.get("name"):
+            continue
+        ip_address, mask = split_interface_ip(entry.get("ip"))
+        interfaces.append(InterfaceCreate(
+            firewall_id=firewall_id,
+            vdom_id=vdom_ids.get(entry.get("vdom")),
+            interface_name=entry["name"],
+            ip_address=ip_address,
+            mask=mask,
+            type=_text(entry.get("type")) or "unknown",
+            vlan_id=entry.get("vlanid") or None,
+            description=_text(entry.get("description")),
+            status=_text(entry.get("status")),
+            physical_interface_name=_text(entry.get("interface")),
+        ))
+    return interfaces
+
+def interface_details(entry: dict) -> str:
+    """
+    The exit_interface_details text of routes leaving through an interface.
+    """
+    ip_address, mask = split_interface_ip(entry.get("ip"))
+    kind = _text(entry.get("type")) or "unknown"
+    status = _text(entry.get("status")) or "unknown"
+    if ip_address is None:
+        return f"{kind} interface is {status}"
+    return f"{kind} interface with ip {ip_address}/{mask} is {status}"
+
+def parse_routes(results: List[dict], vdom_id: int, details: Dict[str, str]) -> List[RouteCreate]:
+    """
+    `details` maps interface names to their interface_details().
+    """
+    routes = []
+    for entry in results:
+        try:
+            network = ipaddress.ip_network(entry.get("ip_mask", ""), strict=False)
+        except ValueError:
+            continue
+        exit_interface = _text(entry.get("interface"))
+        if exit_interface is None:
+            continue
+        route_type = _text(entry.get("type")) or "unknown"
+        routes.append(RouteCreate(
+            vdom_id=vdom_id,
+            destination_network=str(network.network_address),
+            mask_length=network.prefixlen,
+            route_type=ROUTE_TYPES.get(route_type, route_type),
+            gateway=_address(entry.get("gateway")),
+            exit_interface_name=exit_interface,
+            exit_interface_details=details.get(exit_interface),
+        ))
+    return routes
+
+def parse_vips(results: List[dict], vdom_id: int) -> List[VIPCreate]:
+    vips = []
+    for entry in results:
+        mapped = entry.get("mappedip") or []
+        external_ip = _address(entry.get("extip"))
+        mapped_ip = _address(mapped[0].get("range")) if mapped else None
+        if external_ip is None or mapped_ip is None:
+            continue
+        vips.append(VIPCreate(
+            vdom_id=vdom_id,
+            external_ip=external_ip,
+            external_port=_port(entry.get("extport")),
+            mapped_ip=mapped_ip,
+            mapped_port=_port(entry.get("mappedport")),
+            vip_type=_text(entry.get("type")),
+            external_interface=_text(entry.get("extintf")),
+        ))
+    return vips
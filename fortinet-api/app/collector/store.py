@@ -0,0 +1,90 @@
+"""
+Writes what the collector read from one device through the bulk replace
+paths of the crud modules: the firewall's VDOMs are synced by name, then its
+interfaces, routes and VIPs are each replaced in one transaction.
+
+Offline ingestion (app.collector.ingest) may not know every table of a
+firewall; tables that are None in the data are left as they are.
+"""
+from typing import Dict
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import app.crud.firewall as firewall_crud
+import app.crud.interface as interface_crud
+import app.crud.route as route_crud
+import app.crud.vdom as vdom_crud
+import app.crud.vip as vip_crud
+from app import history
+from app.collector import parse
+from app.collector.targets import Target
+from app.models.interface import Interface
+from app.models.vdom import VDOM
+from app.schemas.firewall import FirewallCreate
+
+def store_device(db: Session, target: Target, data: dict) -> Dict[str, int]:
+    """
+    Store the result of FortiOSClient.collect() for a target, creating its
+    firewall if needed. Returns the number of rows loaded per table.
+    """
+    firewall = firewall_crud.get_firewall_by_name(db, target.fw_name)
+    firewall_id = firewall.firewall_id if firewall else None
+    if firewall_id is None:
+        if not target.address:
+            raise ValueError(f"{target.fw_name} is a new firewall and its address is not known")
+        taken = firewall_crud.get_firewall_by_ip(db, target.address)
+        if taken is not None:
+            raise ValueError(f"{target.fw_name}: {target.address} is already the address of {taken.fw_name}")
+    vdom_names = []
+    interfaces = data["interfaces"]
+    if firewall_id is not None and data["vdoms"] is None:
+        vdom_names = list(db.scalars(
+            select(VDOM.vdom_name).where(VDOM.firewall_id == firewall_id).order_by(VDOM.vdom_index, VDOM.vdom_id)
+        ))
+    if firewall_id is not None and interfaces is None:
+        # For the exit interface details of the routes
+        interfaces = [
+            {"name": name, "ip": f"{ip_address} {mask}" if ip_address else None, "type": kind, "status": status}
+            for name, ip_address, mask, kind, status in db.execute(
+                select(Interface.interface_name, Interface.ip_address, Interface.mask, Interface.type, Interface.status)
+                .where(Interface.firewall_id == firewall_id)
+            )
+        ]
+    # The crud functions below take the partition lock first thing in their
+    # transactions (see partitioning.lock_partition_ddl); end the reads' ones
+    db.commit()
+    if firewall_id is None:
+        firewall_id = firewall_crud.create_firewall(
+            db, FirewallCreate(fw_name=target.fw_name, fw_ip=target.address)
+        ).firewall_id
+        db.commit()
+
+    vdoms = data["vdoms"]
+    if vdoms is None:
+        # Keep the stored VDOMs and add those the other tables name
+        for name in [*(data["routes"] or {}), *(data["vips"] or {})]:
+            if name not in vdom_names:
+                vdom_names.append(name)
+        vdoms = [{"name": name} for name in vdom_names]
+    vdom_ids = vdom_crud.sync_firewall_vdoms(db, firewall_id, parse.parse_vdoms(vdoms, firewall_id))
+    loaded = {"vdoms": len(vdom_ids)}
+
+    details = {entry["name"]: parse.interface_details(entry) for entry in interfaces or [] if entry.get("name")}
+    if data["interfaces"] is not None:
+        _, loaded["interfaces"], _ = interface_crud.replace_firewall_interfaces(
+            db, firewall_id, parse.parse_interfaces(data["interfaces"], firewall_id, vdom_ids)
+        )
+    if data["routes"] is not None:
+        routes = []
+        for name, vdom_id in vdom_ids.items():
+            routes.extend(parse.parse_routes(data["routes"].get(name, []), vdom_id, details))
+        _, loaded["routes"], _ = route_crud.replace_firewall_routes(db, firewall_id, routes)
+    if data["vips"] is not None:
+        vips = []
+        for name, vdom_id in vdom_ids.items():
+            vips.extend(parse.parse_vips(data["vips"].get(name, []), vdom_id))
+        _, loaded["vips"] = vip_crud.replace_firewall_vips(db, firewall_id, vips)
+    history.record_vdom_counts(db.connection(), firewall_id)
+    db.commit()
+    return loaded
@@ -0,0 +1,66 @@
+"""
+The FortiGates to poll: a JSON file listing them, or the firewalls table.
+"""
+import json
+import os
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+# API token for the targets that do not name their own
+TOKEN_ENV = "FORTIOS_TOKEN"
+
+class Target:
+    def __init__(
+        self,
+        fw_name: str,
+        url: str,
+        token: Optional[str] = None,
+        verify: bool = True,
+        fw_ip: Optional[str] = None
+    ):
+        self.fw_name = fw_name
+        self.url = url
+        self.token = token
+        self.verify = verify
+        self.fw_ip = fw_ip
+
+    @property
+    def address(self) -> str:
+        """
+        The fw_ip stored for a new firewall: given, or the host of the URL.
+        """
+        return self.fw_ip or urlsplit(self.url).hostname
+
+def load_targets(path: str) -> List[Target]:
+    """
+    Read a JSON list of {"fw_name", "url", "token", "verify", "fw_ip"}
+    objects; only fw_name and url are required.
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    default_token = os.getenv(TOKEN_ENV)
+    targets = []
+    for number, entry in enumerate(entries, 1):
+        if not entry.get("fw_name") or not entry.get("url"):
+            raise ValueError(f"{path}: target {number} needs fw_name and url")
+        targets.append(Target(
+            fw_name=entry["fw_name"],
+            url=entry["url"].rstrip("/"),
+            token=entry.get("token") or default_token,
+            verify=entry.get("verify", True),
+            fw_ip=entry.get("fw_ip"),
+        ))
+    return targets
+
+def targets_from_db(db, verify: bool = True) -> List[Target]:
+    """
+    One target per firewall, at https://<fw_ip> with the token of the
+    FORTIOS_TOKEN environment variable.
+    """
+    from app.models.firewall import Firewall
+
+    token = os.getenv(TOKEN_ENV)
+    return [
+        Target(fw_name=fw_name, url=f"https://{fw_ip}", token=token, verify=verify, fw_ip=fw_ip)
+        for fw_name, fw_ip in db.query(Firewall.fw_name, Firewall.fw_ip).order_by(Firewall.fw_name)
+    ]
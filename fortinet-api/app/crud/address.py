@@ -0,0 +1,105 @@
+from operator import attrgetter
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from app.models.address import Address, AddressGroup
+from app.schemas.address import AddressCreate, AddressUpdate, AddressGroupCreate, AddressGroupUpdate
+
+def get_address(db: Session, address_id: int) -> Optional[Address]:
+    return db.query(Address).filter(Address.address_id == address_id).first()
+
+def get_address_by_name(db: Session, vdom_id: int, name: str) -> Optional[Address]:
+    return db.query(Address).filter(Address.vdom_id == vdom_id, Address.name == name).first()
+
+# The order of the lists on loaded objects, for merging the pages of shards (see app.sharding)
+NAME_SORT_KEY = attrgetter("vdom_id", "name")
+
+def get_addresses(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    vdom_id: Optional[int] = None,
+    name: Optional[str] = None,
+    type: Optional[str] = None
+) -> Tuple[List[Address], int]:
+    query = db.query(Address)
+    if vdom_id:
+        query = query.filter(Address.vdom_id == vdom_id)
+    if name:
+        query = query.filter(Address.name.ilike(f"%{name}%"))
+    if type:
+        query = query.filter(Address.type == type)
+    total_count = query.count()
+    addresses = query.order_by(Address.vdom_id, Address.name).offset(skip).limit(limit).all()
+    return addresses, total_count
+
+def create_address(db: Session, address: AddressCreate) -> Address:
+    db_address = Address(**address.model_dump())
+    db.add(db_address)
+    db.commit()
+    db.refresh(db_address)
+    return db_address
+
+def update_address(db: Session, address_id: int, address: AddressUpdate) -> Optional[Address]:
+    db_address = get_address(db, address_id)
+    if db_address is None:
+        return None
+    for key, value in address.model_dump(exclude_unset=True).items():
+        setattr(db_address, key, value)
+    db.commit()
+    db.refresh(db_address)
+    return db_address
+
+def delete_address(db: Session, address_id: int) -> bool:
+    db_address = get_address(db, address_id)
+    if db_address is None:
+        return False
+    db.delete(db_address)
+    db.commit()
+    return True
+
+def get_address_group(db: Session, group_id: int) -> Optional[AddressGroup]:
+    return db.query(AddressGroup).filter(AddressGroup.group_id == group_id).first()
+
+def get_address_group_by_name(db: Session, vdom_id: int, name: str) -> Optional[AddressGroup]:
+    return db.query(AddressGroup).filter(AddressGroup.vdom_id == vdom_id, AddressGroup.name == name).first()
+
+def get_address_groups(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    vdom_id: Optional[int] = None,
+    name: Optional[str] = None
+) -> Tuple[List[AddressGroup], int]:
+    query = db.query(AddressGroup)
+    if vdom_id:
+        query = query.filter(AddressGroup.vdom_id == vdom_id)
+    if name:
+        query = query.filter(AddressGroup.name.ilike(f"%{name}%"))
+    total_count = query.count()
+    groups = query.order_by(AddressGroup.vdom_id, AddressGroup.name).offset(skip).limit(limit).all()
+    return groups, total_count
+
+def create_address_group(db: Session, group: AddressGroupCreate) -> AddressGroup:
+    db_group = AddressGroup(**group.model_dump())
+    db.add(db_group)
+    db.commit()
+    db.refresh(db_group)
+    return db_group
+
+def update_address_group(db: Session, group_id: int, group: AddressGroupUpdate) -> Optional[AddressGroup]:
+    db_group = get_address_group(db, group_id)
+    if db_group is None:
+        return None
+    for key, value in group.model_dump(exclude_unset=True).items():
+        setattr(db_group, key, value)
+    db.commit()
+    db.refresh(db_group)
+    return db_group
+
+def delete_address_group(db: Session, group_id: int) -> bool:
+    db_group = get_address_group(db, group_id)
+    if db_group is None:
+        return False
+    db.delete(db_group)
+    db.commit()
+    return True
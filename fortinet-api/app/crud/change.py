@@ -0,0 +1,160 @@
+import base64
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, joinedload, noload
+from sqlalchemy import text, tuple_
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.models.firewall import Firewall
+from app.models.vdom import VDOM
+from app.models.interface import Interface
+from app.models.route import Route
+from app.models.vip import VIP
+from app.models.tombstone import Tombstone
+
+# Entities in the feed, keyed by table name, with their primary key column
+CHANGE_ENTITIES = {
+    "firewalls": (Firewall, Firewall.firewall_id),
+    "vdoms": (VDOM, VDOM.vdom_id),
+    "interfaces": (Interface, Interface.interface_id),
+    "routes": (Route, Route.route_id),
+    "vips": (VIP, VIP.vip_id),
+}
+TOMBSTONE_CURSOR = "deleted"
+# Lookups that hold the values of dictionary-encoded columns (see app.dictionary)
+LOOKUP_RELATIONSHIPS = {
+    "routes": (Route.route_type_entry, Route.nexthop),
+}
+
+# Tombstones older than this are purged; older tokens require a full resync
+RETENTION_DAYS = int(os.getenv("CHANGE_FEED_RETENTION_DAYS", "30"))
+# Outside PostgreSQL, rows younger than this are held back in case their
+# transaction has not committed yet
+FALLBACK_LAG_SECONDS = int(os.getenv("CHANGE_FEED_LAG_SECONDS", "10"))
+
+Cursor = Tuple[datetime, int]
+
+class InvalidChangeToken(ValueError):
+    pass
+
+class ExpiredChangeToken(ValueError):
+    pass
+
+def encode_token(cursors: Dict[str, Cursor]) -> str:
+    payload = {name: [ts.isoformat(), last_id] for name, (ts, last_id) in cursors.items()}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+def decode_token(token: Optional[str]) -> Dict[str, Cursor]:
+    if not token:
+        return {}
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return {name: (datetime.fromisoformat(ts), int(last_id)) for name, (ts, last_id) in payload.items()}
+    except (ValueError, TypeError):
+        raise InvalidChangeToken("Invalid change token")
+
+def shard_cursors(cursors: Dict[str, Cursor], shard: int) -> Dict[str, Cursor]:
+    """
+    The cursors of one shard in a token of every shard: shard 0's under
+    their own names, so that tokens from before sharding keep their place,
+    the others' prefixed with "<shard>/".
+    """
+    if shard == 0:
+        return {name: cursor for name, cursor in cursors.items() if "/" not in name}
+    prefix = f"{shard}/"
+    return {name[len(prefix):]: cursor for name, cursor in cursors.items() if name.startswith(prefix)}
+
+def merge_changes(
+    results: Sequence[Tuple[Dict[str, dict], Dict[str, Cursor], bool]]
+) -> Tuple[Dict[str, dict], Dict[str, Cursor], bool]:
+    """
+    One page from the get_changes results of every shard, in shard order,
+    with the cursors of all of them.
+    """
+    changes: Dict[str, Dict[str, List]] = {name: {"upserted": [], "deleted": []} for name in CHANGE_ENTITIES}
+    next_cursors = {}
+    has_more = False
+    for shard, (shard_changes, shard_next, shard_more) in enumerate(results):
+        for name, entity_changes in shard_changes.items():
+            changes[name]["upserted"].extend(entity_changes["upserted"])
+            changes[name]["deleted"].extend(entity_changes["deleted"])
+        next_cursors.update({name if shard == 0 else f"{shard}/{name}": cursor for name, cursor in shard_next.items()})
+        has_more = has_more or shard_more
+    return changes, next_cursors, has_more
+
+def get_horizon(db: Session) -> datetime:
+    """
+    Return the timestamp below which every change is committed and visible.
+
+    last_updated and deleted_at hold the transaction start time, so a row can
+    become visible after rows with later timestamps. On PostgreSQL the horizon
+    is the start of the oldest transaction that is still writing.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return db.execute(text(
+            "SELECT LEAST(now(), COALESCE(("
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+            "), now()))::timestamp"
+        )).scalar()
+    return datetime.utcnow() - timedelta(seconds=FALLBACK_LAG_SECONDS)
+
+def _page(query, ts_column, id_column, cursor: Optional[Cursor], horizon: datetime, limit: int):
+    query = query.filter(ts_column < horizon)
+    if cursor:
+        query = query.filter(tuple_(ts_column, id_column) > tuple_(*cursor))
+    return query.order_by(ts_column, id_column).limit(limit).all()
+
+def get_changes(
+    db: Session,
+    cursors: Dict[str, Cursor],
+    limit: int = 500
+) -> Tuple[Dict[str, dict], Dict[str, Cursor], bool]:
+    """
+    Return rows upserted and deleted since the cursors, at most `limit` per
+    entity and for tombstones, with the advanced cursors and a has_more flag.
+    """
+    if cursors:
+        oldest = min(ts for ts, _ in cursors.values())
+        if oldest < datetime.utcnow() - timedelta(days=RETENTION_DAYS):
+            raise ExpiredChangeToken("Change token is older than the retention window")
+
+    horizon = get_horizon(db)
+    changes = {name: {"upserted": [], "deleted": []} for name in CHANGE_ENTITIES}
+    next_cursors = {}
+    has_more = False
+
+    for name, (model, id_column) in CHANGE_ENTITIES.items():
+        # Relationships are not part of the feed; skip their lazy loads
+        loads = [joinedload(relationship) for relationship in LOOKUP_RELATIONSHIPS.get(name, ())]
+        rows = _page(
+            db.query(model).options(noload("*"), *loads),
+            model.last_updated, id_column, cursors.get(name), horizon, limit
+        )
+        changes[name]["upserted"] = rows
+        if len(rows) == limit:
+            has_more = True
+            next_cursors[name] = (rows[-1].last_updated, getattr(rows[-1], id_column.key))
+        else:
+            next_cursors[name] = (horizon, 0)
+
+    tombstones = _page(
+        db.query(Tombstone), Tombstone.deleted_at, Tombstone.tombstone_id,
+        cursors.get(TOMBSTONE_CURSOR), horizon, limit
+    )
+    for tombstone in tombstones:
+        if tombstone.entity in changes:
+            changes[tombstone.entity]["deleted"].append(tombstone.entity_id)
+    if len(tombstones) == limit:
+        has_more = True
+        next_cursors[TOMBSTONE_CURSOR] = (tombstones[-1].deleted_at, tombstones[-1].tombstone_id)
+    else:
+        next_cursors[TOMBSTONE_CURSOR] = (horizon, 0)
+
+    return changes, next_cursors, has_more
+
+def purge_tombstones(db: Session, older_than_days: int = RETENTION_DAYS) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    deleted = db.query(Tombstone).filter(Tombstone.deleted_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted
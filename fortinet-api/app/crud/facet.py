@@ -0,0 +1,228 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, literal, null, select, tuple_, union_all
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.models.firewall import Firewall
+from app.models.vdom import VDOM
+from app.models.interface import Interface
+from app.models.route import Route
+from app.models.route_type import RouteType
+from app.models.vip import VIP
+from app import events
+from app.cache import facet_cache
+
+# Sets of columns per request, and columns per set
+MAX_SETS = 8
+MAX_SET_COLUMNS = 3
+
+# {entity: (table, {joined table: (model, on clause, outer, joined tables it needs)})}
+SOURCES = {
+    "firewalls": (Firewall, {}),
+    "vdoms": (VDOM, {
+        "firewalls": (Firewall, VDOM.firewall_id == Firewall.firewall_id, False, ()),
+    }),
+    "interfaces": (Interface, {
+        # Interfaces without a VDOM count under a null vdom_name
+        "vdoms": (VDOM, Interface.vdom_id == VDOM.vdom_id, True, ()),
+        "firewalls": (Firewall, Interface.firewall_id == Firewall.firewall_id, False, ()),
+    }),
+    "routes": (Route, {
+        "vdoms": (VDOM, Route.vdom_id == VDOM.vdom_id, False, ()),
+        "firewalls": (Firewall, Route.firewall_id == Firewall.firewall_id, False, ()),
+        "route_types": (RouteType, Route.route_type_id == RouteType.route_type_id, False, ()),
+    }),
+    "vips": (VIP, {
+        "vdoms": (VDOM, VIP.vdom_id == VDOM.vdom_id, False, ()),
+        "firewalls": (Firewall, VDOM.firewall_id == Firewall.firewall_id, False, ("vdoms",)),
+    }),
+}
+
+# {entity: {name: (column, joined table or None)}}
+_PARENTS = {
+    "site": (Firewall.site, "firewalls"),
+    "fw_name": (Firewall.fw_name, "firewalls"),
+    "vdom_name": (VDOM.vdom_name, "vdoms"),
+}
+FACETS = {
+    "firewalls": {"site": (Firewall.site, None)},
+    "vdoms": {
+        "site": _PARENTS["site"], "fw_name": _PARENTS["fw_name"], "vdom_name": (VDOM.vdom_name, None),
+    },
+    "interfaces": {
+        "type": (Interface.type, None), "status": (Interface.status, None), **_PARENTS,
+    },
+    "routes": {
+        "route_type": (RouteType.route_type, "route_types"), **_PARENTS,
+    },
+    "vips": {
+        "vip_type": (VIP.vip_type, None), "external_interface": (VIP.external_interface, None), **_PARENTS,
+    },
+}
+
+# {entity: {filter: (column, joined table or None)}}
+FILTERS = {
+    "firewalls": {"firewall_id": (Firewall.firewall_id, None)},
+    "vdoms": {"firewall_id": (VDOM.firewall_id, None), "vdom_id": (VDOM.vdom_id, None)},
+    "interfaces": {"firewall_id": (Interface.firewall_id, None), "vdom_id": (Interface.vdom_id, None)},
+    "routes": {"firewall_id": (Route.firewall_id, None), "vdom_id": (Route.vdom_id, None)},
+    "vips": {"firewall_id": (VDOM.firewall_id, "vdoms"), "vdom_id": (VIP.vdom_id, None)},
+}
+
+def parse_group_by(entity: str, group_by: Sequence[str]) -> List[Tuple[str, Tuple[str, ...]]]:
+    """
+    The grouping sets of `group_by` as (key, column names): each value is
+    one set, with its columns separated by commas. Raises ValueError for
+    unknown entities or columns.
+    """
+    if entity not in FACETS:
+        raise ValueError(f"Unknown entity {entity}; expected {', '.join(FACETS)}")
+    sets, seen = [], set()
+    for value in group_by:
+        names = tuple(name.strip() for name in value.split(",") if name.strip())
+        unknown = [name for name in names if name not in FACETS[entity]]
+        if unknown:
+            raise ValueError(
+                f"Cannot group {entity} by {', '.join(unknown)}; expected {', '.join(FACETS[entity])}"
+            )
+        if not names or len(names) > MAX_SET_COLUMNS or len(set(names)) != len(names):
+            raise ValueError(f"Each group_by takes 1 to {MAX_SET_COLUMNS} different columns, separated by commas")
+        if frozenset(names) not in seen:
+            seen.add(frozenset(names))
+            sets.append((",".join(names), names))
+    if not sets:
+        raise ValueError("Give at least one group_by")
+    if len(sets) > MAX_SETS:
+        raise ValueError(f"At most {MAX_SETS} group_by values")
+    return sets
+
+def _source(entity: str, tables: set):
+    model, joins = SOURCES[entity]
+    needed = set()
+    pending = list(tables)
+    while pending:
+        table = pending.pop()
+        if table not in needed:
+            needed.add(table)
+            pending.extend(joins[table][3])
+    source = model.__table__
+    for table, (joined, on, outer, _) in joins.items():
+        if table in needed:
+            source = source.join(joined, on, isouter=outer)
+    return source, needed
+
+def _rank(items: List[dict], names: Sequence[str], limit: Optional[int]) -> None:
+    # Largest first, then by value with nulls last
+    items.sort(key=lambda item: (-item["count"], [(item[name] is None, str(item[name])) for name in names]))
+    if limit is not None:
+        del items[limit:]
+
+def get_facets(
+    db: Session,
+    entity: str,
+    group_by: Sequence[str],
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    limit: Optional[int] = 1000
+) -> Dict:
+    """
+    Counts of `entity` rows per value of each grouping set in `group_by`
+    (see parse_group_by), and their total: {"entity", "total", "facets":
+    {key: [{column: value, ..., "count"}]}}, each facet by count, largest
+    first, and cut to `limit` values (all of them with None).
+
+    PostgreSQL counts every set in one GROUP BY GROUPING SETS, so the rows
+    are read once; other databases run one GROUP BY per set in a UNION ALL.
+    Results are cached until an event touches a table they were read from
+    (see app.cache).
+    """
+    sets = parse_group_by(entity, group_by)
+    filters = {"firewall_id": firewall_id, "vdom_id": vdom_id}
+    filters = {name: value for name, value in filters.items() if value is not None}
+    unsupported = set(filters) - set(FILTERS[entity])
+    if unsupported:
+        raise ValueError(f"{entity} cannot be filtered by {', '.join(sorted(unsupported))}")
+
+    # Sessions of different shards count different rows (see app.sharding)
+    key = (entity, tuple(names for _, names in sets), tuple(sorted(filters.items())), limit, db.info.get("shard", 0))
+    facets = facet_cache.get(key)
+    if facets is not None:
+        return facets
+    sequence = facet_cache.sequence
+
+    names = list(dict.fromkeys(name for _, set_names in sets for name in set_names))
+    columns = {name: FACETS[entity][name][0] for name in names}
+    tables = {FACETS[entity][name][1] for name in names} | {FILTERS[entity][name][1] for name in filters}
+    source, tables = _source(entity, tables - {None})
+    conditions = [FILTERS[entity][name][0] == value for name, value in filters.items()]
+
+    # Each set is told apart by a grouping number; the total is the set of no columns
+    if db.get_bind().dialect.name == "postgresql":
+        # GROUPING() sets the bit of every column left out of a set, the first column highest
+        numbers = [
+            sum(1 << (len(names) - 1 - index) for index, name in enumerate(names) if name not in set_names)
+            for _, set_names in sets
+        ]
+        total_number = (1 << len(names)) - 1
+        statement = (
+            select(
+                *[column.label(name) for name, column in columns.items()],
+                func.grouping(*columns.values()).label("grouping"),
+                func.count().label("count"),
+            )
+            .select_from(source)
+            .where(*conditions)
+            .group_by(func.grouping_sets(
+                *[tuple_(*[columns[name] for name in set_names]) for _, set_names in sets], tuple_()
+            ))
+        )
+    else:
+        numbers = list(range(len(sets)))
+        total_number = len(sets)
+        statement = union_all(*[
+            select(
+                *[(column if name in set_names else null()).label(name) for name, column in columns.items()],
+                literal(number).label("grouping"),
+                func.count().label("count"),
+            )
+            .select_from(source)
+            .where(*conditions)
+            .group_by(*[columns[name] for name in set_names])
+            for number, (_, set_names) in zip(numbers, sets)
+        ], select(
+            *[null().label(name) for name in names],
+            literal(total_number).label("grouping"),
+            func.count().label("count"),
+        ).select_from(source).where(*conditions))
+
+    by_number = {number: (set_key, set_names) for number, (set_key, set_names) in zip(numbers, sets)}
+    values: Dict[str, List[dict]] = {set_key: [] for set_key, _ in sets}
+    total = 0
+    for row in db.execute(statement).mappings():
+        if row["grouping"] == total_number:
+            total = row["count"]
+            continue
+        set_key, set_names = by_number[row["grouping"]]
+        values[set_key].append({**{name: row[name] for name in set_names}, "count": row["count"]})
+    for set_key, set_names in sets:
+        _rank(values[set_key], set_names, limit)
+
+    facets = {"entity": entity, "total": total, "facets": values}
+    read_from = [entity, *(table for table in tables if table in events.ENTITIES)]
+    facet_cache.put(key, read_from, facets, sequence)
+    return facets
+
+def merge_facets(results: Sequence[Dict], limit: int) -> Dict:
+    """
+    One answer from the uncut answers of get_facets on several shards: the
+    counts of the same values are added, and so are the totals.
+    """
+    facets = {}
+    for set_key in results[0]["facets"]:
+        names = set_key.split(",")
+        counts: Dict[tuple, int] = {}
+        for result in results:
+            for item in result["facets"][set_key]:
+                values = tuple(item[name] for name in names)
+                counts[values] = counts.get(values, 0) + item["count"]
+        facets[set_key] = [{**dict(zip(names, values)), "count": count} for values, count in counts.items()]
+        _rank(facets[set_key], names, limit)
+    return {"entity": results[0]["entity"], "total": sum(result["total"] for result in results), "facets": facets}
@@ -1,9 +1,15 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func # Import func
-from typing import List, Optional, Tuple # Import Tuple
+from sqlalchemy import func, select # Import func
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple # Import Tuple
 from app.models.firewall import Firewall
 from app.models.vdom import VDOM # Import VDOM model
+from app.models.interface import Interface
+from app.models.route import Route
+from app.models.vip import VIP
+from app import events, partitioning
 from app.schemas.firewall import FirewallCreate, FirewallUpdate
+from operator import attrgetter
 
 def get_firewall(db: Session, firewall_id: int) -> Optional[Firewall]:
     return db.query(Firewall).filter(Firewall.firewall_id == firewall_id).first()
@@ -76,7 +82,13 @@ def get_firewalls(
 
     return processed_items, total_count
 
+def firewall_sort_key(sort_by: Optional[str], sort_order: Optional[str]):
+    # The order of get_firewalls, for merging the pages of shards (see app.sharding)
+    key = attrgetter("total_vdoms") if sort_by == "total_vdoms" else attrgetter("fw_name")
+    return key, bool(sort_by) and sort_order.lower() == "desc"
+
 def create_firewall(db: Session, firewall: FirewallCreate) -> Firewall:
+    partitioning.lock_partition_ddl(db.connection())
     db_firewall = Firewall(
         fw_name=firewall.fw_name,
         fw_ip=firewall.fw_ip,
@@ -85,6 +97,8 @@ def create_firewall(db: Session, firewall: FirewallCreate) -> Firewall:
         site=firewall.site
     )
     db.add(db_firewall)
+    db.flush()
+    partitioning.add_firewall_partitions(db.connection(), db_firewall.firewall_id)
     db.commit()
     db.refresh(db_firewall)
     return db_firewall
@@ -107,10 +121,50 @@ def update_firewall(
     return db_firewall
 
 def delete_firewall(db: Session, firewall_id: int) -> bool:
-    db_firewall = get_firewall(db, firewall_id)
-    if db_firewall is None:
+    partitioning.lock_partition_ddl(db.connection())
+    # One statement: ON DELETE CASCADE removes the VDOMs, interfaces, routes,
+    # VIPs and their search index rows without loading them
+    deleted = db.query(Firewall).filter(Firewall.firewall_id == firewall_id).delete(synchronize_session=False)
+    if not deleted:
         return False
-    
-    db.delete(db_firewall)
+
+    events.notify_delete(db, "firewalls", firewall_id, firewall_id=firewall_id)
+    db.commit()
+    return True
+
+def _cascaded_counts(db: Session, firewall_ids) -> Dict[str, int]:
+    vdom_ids = select(VDOM.vdom_id).where(VDOM.firewall_id.in_(firewall_ids))
+    return {
+        "vdoms": db.query(func.count(VDOM.vdom_id)).filter(VDOM.firewall_id.in_(firewall_ids)).scalar(),
+        "interfaces": db.query(func.count(Interface.interface_id)).filter(Interface.firewall_id.in_(firewall_ids)).scalar(),
+        "routes": db.query(func.count(Route.route_id)).filter(Route.vdom_id.in_(vdom_ids)).scalar(),
+        "vips": db.query(func.count(VIP.vip_id)).filter(VIP.vdom_id.in_(vdom_ids)).scalar(),
+    }
+
+def delete_firewalls(
+    db: Session,
+    firewall_ids: Optional[List[int]] = None,
+    fw_name: Optional[str] = None,
+    site: Optional[str] = None,
+    updated_before: Optional[datetime] = None
+) -> Tuple[int, Dict[str, int]]:
+    conditions = []
+    if firewall_ids:
+        conditions.append(Firewall.firewall_id.in_(firewall_ids))
+    if fw_name is not None:
+        conditions.append(Firewall.fw_name == fw_name)
+    if site is not None:
+        conditions.append(Firewall.site == site)
+    if updated_before is not None:
+        conditions.append(Firewall.last_updated < updated_before)
+    if not conditions:
+        raise ValueError("At least one filter is required")
+
+    partitioning.lock_partition_ddl(db.connection())
+    cascaded = _cascaded_counts(db, select(Firewall.firewall_id).where(*conditions))
+    deleted = db.query(Firewall).filter(*conditions).delete(synchronize_session=False)
+    if deleted:
+        single_id = firewall_ids[0] if firewall_ids and len(firewall_ids) == 1 else None
+        events.notify_delete(db, "firewalls", single_id, firewall_id=single_id)
     db.commit()
-    return True
\ No newline at end of file
+    return deleted, cascaded
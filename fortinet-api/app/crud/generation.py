@@ -0,0 +1,19 @@
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from app.models.generation import Generation
+
+def get_generations(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    source: Optional[str] = None
+) -> Tuple[List[Generation], int]:
+    """
+    Generations, latest first, and their total count.
+    """
+    query = db.query(Generation)
+    if source:
+        query = query.filter(Generation.source == source)
+    total_count = query.count()
+    generations = query.order_by(Generation.generation_id.desc()).offset(skip).limit(limit).all()
+    return generations, total_count
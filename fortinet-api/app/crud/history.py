@@ -0,0 +1,220 @@
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional, Tuple
+from app.models.interface import Interface
+from app import history
+
+BUCKETS = ("hour", "day", "week", "month")
+# Default range of a bucket query, per bucket size
+DEFAULT_SPANS = {
+    "hour": timedelta(days=2),
+    "day": timedelta(days=30),
+    "week": timedelta(weeks=26),
+    "month": timedelta(days=365),
+}
+MAX_BUCKETS = 5000
+
+def bucket_start(moment: datetime, bucket: str) -> datetime:
+    if bucket == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = datetime(moment.year, moment.month, moment.day)
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start: datetime, bucket: str) -> datetime:
+    if bucket == "hour":
+        return start + timedelta(hours=1)
+    if bucket == "day":
+        return start + timedelta(days=1)
+    if bucket == "week":
+        return start + timedelta(weeks=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+def bucket_starts(since: datetime, until: datetime, bucket: str) -> List[datetime]:
+    """
+    Start of every bucket overlapping [since, until).
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket {bucket}; use one of {', '.join(BUCKETS)}")
+    if until <= since:
+        raise ValueError("until must be after since")
+    starts = []
+    start = bucket_start(since, bucket)
+    while start < until:
+        starts.append(start)
+        if len(starts) > MAX_BUCKETS:
+            raise ValueError(f"More than {MAX_BUCKETS} buckets; use a larger bucket or a shorter range")
+        start = next_bucket(start, bucket)
+    return starts
+
+def get_interface_key(db: Session, interface_id: int) -> Optional[Tuple[int, str]]:
+    """
+    (firewall_id, interface_name) of an interface, which its history is kept by.
+    """
+    row = db.query(Interface.firewall_id, Interface.interface_name).filter(Interface.interface_id == interface_id).first()
+    return tuple(row) if row else None
+
+def get_interface_status_changes(
+    db: Session,
+    firewall_id: int,
+    interface_name: str,
+    since: datetime,
+    until: datetime,
+    limit: int = 1000
+) -> List[dict]:
+    """
+    The status changes of an interface in [since, until), latest first.
+    """
+    if not history.uses_history(db.get_bind()):
+        return []
+    rows = db.execute(text("""
+        SELECT status, changed_at, vdom_id, interface_id FROM interface_status_history
+        WHERE firewall_id = :firewall_id AND interface_name = :interface_name
+          AND changed_at >= :since AND changed_at < :until
+        ORDER BY changed_at DESC, history_id DESC
+        LIMIT :limit
+    """), {"firewall_id": firewall_id, "interface_name": interface_name, "since": since, "until": until, "limit": limit})
+    return [dict(row._mapping) for row in rows]
+
+def _groups(
+    db: Session,
+    raw_sql: str,
+    daily_sql: str,
+    daily_table: str,
+    params: dict,
+    since: datetime,
+    until: datetime,
+    bucket: str
+) -> List[dict]:
+    # Hours come from the raw rows. Larger buckets are built from days:
+    # rolled-up days from the daily table and the rest from the raw rows.
+    if bucket == "hour":
+        return [dict(row._mapping) for row in db.execute(
+            text(raw_sql), {**params, "unit": "hour", "start": since, "end": until}
+        )]
+    rolled = history.rolled_up_through(db.connection(), daily_table)
+    split = datetime.combine(rolled + timedelta(days=1), datetime.min.time()) if rolled else since
+    # A partial last day comes from the raw rows
+    split = min(max(split, since), datetime.combine(until.date(), datetime.min.time()))
+    groups = []
+    if split > since:
+        groups.extend(
+            {**row._mapping, "start": datetime.combine(row.start, datetime.min.time())}
+            for row in db.execute(text(daily_sql), {**params, "start": since.date(), "end": split.date()})
+        )
+    if until > split:
+        groups.extend(dict(row._mapping) for row in db.execute(
+            text(raw_sql), {**params, "unit": "day", "start": split, "end": until}
+        ))
+    return sorted(groups, key=lambda group: group["start"])
+
+def get_interface_status_buckets(
+    db: Session,
+    firewall_id: int,
+    interface_name: str,
+    since: datetime,
+    until: datetime,
+    bucket: str = "day"
+) -> List[dict]:
+    """
+    Per bucket: the number of status changes, how many were to "down", and
+    the status at the end of the bucket.
+    """
+    starts = bucket_starts(since, until, bucket)
+    if not history.uses_history(db.get_bind()):
+        return []
+    since = starts[0]
+    params = {"firewall_id": firewall_id, "interface_name": interface_name}
+    where = "firewall_id = :firewall_id AND interface_name = :interface_name"
+    groups = _groups(
+        db,
+        f"SELECT date_trunc(:unit, changed_at) AS start, {history.INTERFACE_STATUS_AGGREGATES} "
+        f"FROM interface_status_history WHERE {where} AND changed_at >= :start AND changed_at < :end GROUP BY 1",
+        f"SELECT day AS start, transitions, downs, last_status FROM interface_status_daily "
+        f"WHERE {where} AND day >= :start AND day < :end",
+        "interface_status_daily", params, since, until, bucket
+    )
+    # The status when the range starts
+    status = db.execute(text(
+        f"SELECT status FROM interface_status_history WHERE {where} AND changed_at < :since "
+        f"ORDER BY changed_at DESC LIMIT 1"
+    ), {**params, "since": since}).first()
+    if status is None:
+        status = db.execute(text(
+            f"SELECT last_status FROM interface_status_daily WHERE {where} AND day < :since ORDER BY day DESC LIMIT 1"
+        ), {**params, "since": since.date()}).first()
+    status = status[0] if status else None
+
+    buckets = []
+    position = 0
+    for start in starts:
+        end = next_bucket(start, bucket)
+        transitions = downs = 0
+        while position < len(groups) and groups[position]["start"] < end:
+            group = groups[position]
+            transitions += group["transitions"]
+            downs += group["downs"]
+            status = group["last_status"]
+            position += 1
+        buckets.append({"start": start, "transitions": transitions, "downs": downs, "status": status})
+    return buckets
+
+def get_vdom_count_buckets(
+    db: Session,
+    vdom_id: int,
+    since: datetime,
+    until: datetime,
+    bucket: str = "day"
+) -> List[dict]:
+    """
+    Per bucket: the minimum, maximum and last number of interfaces, routes
+    and VIPs of a VDOM. A count that did not change in a bucket carries over
+    from the one before.
+    """
+    starts = bucket_starts(since, until, bucket)
+    if not history.uses_history(db.get_bind()):
+        return []
+    since = starts[0]
+    columns = history.COUNTED_TABLES
+    groups = _groups(
+        db,
+        f"SELECT date_trunc(:unit, sampled_at) AS start, {history.VDOM_COUNT_AGGREGATES} "
+        f"FROM vdom_count_history WHERE vdom_id = :vdom_id AND sampled_at >= :start AND sampled_at < :end GROUP BY 1",
+        "SELECT day AS start, " + ", ".join(f"{c}_min, {c}_max, {c}_last" for c in columns) + " "
+        "FROM vdom_count_daily WHERE vdom_id = :vdom_id AND day >= :start AND day < :end",
+        "vdom_count_daily", {"vdom_id": vdom_id}, since, until, bucket
+    )
+    # The counts when the range starts
+    last = db.execute(text(
+        f"SELECT {', '.join(columns)} FROM vdom_count_history WHERE vdom_id = :vdom_id AND sampled_at < :since "
+        f"ORDER BY sampled_at DESC LIMIT 1"
+    ), {"vdom_id": vdom_id, "since": since}).first()
+    if last is None:
+        last = db.execute(text(
+            f"SELECT {', '.join(f'{c}_last' for c in columns)} FROM vdom_count_daily "
+            f"WHERE vdom_id = :vdom_id AND day < :since ORDER BY day DESC LIMIT 1"
+        ), {"vdom_id": vdom_id, "since": since.date()}).first()
+    current: Dict[str, Optional[int]] = dict(zip(columns, last)) if last else dict.fromkeys(columns)
+
+    buckets = []
+    position = 0
+    for start in starts:
+        end = next_bucket(start, bucket)
+        counts = {
+            column: {"min": current[column], "max": current[column], "last": current[column]}
+            for column in columns
+        }
+        while position < len(groups) and groups[position]["start"] < end:
+            group = groups[position]
+            for column in columns:
+                summary = counts[column]
+                summary["min"] = min(v for v in (summary["min"], group[f"{column}_min"]) if v is not None)
+                summary["max"] = max(v for v in (summary["max"], group[f"{column}_max"]) if v is not None)
+                summary["last"] = current[column] = group[f"{column}_last"]
+            position += 1
+        buckets.append({"start": start, **counts})
+    return buckets
@@ -1,33 +1,53 @@
 from sqlalchemy.orm import Session, joinedload # Import joinedload
-from typing import List, Optional, Tuple # Import Tuple
+from sqlalchemy import bindparam, select, text, update
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple # Import Tuple
 from app.models.interface import Interface
 from app.models.vdom import VDOM # Import VDOM model
-from app.schemas.interface import InterfaceCreate, InterfaceUpdate
+from app.models.firewall import Firewall
+from app.schemas.interface import InterfaceCreate, InterfaceUpdate, InterfaceResponse
+import app.crud.ip_address as ip_address_crud
+from app.crud.vdom import VDOM_SHAPE
+from app import events, history, partitioning, rows, versioning
+from operator import attrgetter
+
+# Columns written by replace_firewall_interfaces
+REPLACE_COLUMNS = [
+    "firewall_id", "vdom_id", "interface_name", "ip_address", "mask", "type",
+    "vlan_id", "description", "status", "physical_interface_name",
+]
+
+# Set-based status update of update_interface_statuses on PostgreSQL. The new
+# statuses travel as two arrays, so the statement is the same for any number
+# of rows and SQLAlchemy compiles it once; a VALUES list of 2 parameters per
+# row took longer to compile than to run.
+STATUS_UPDATE = text("""
+    UPDATE interfaces AS i
+    SET status = v.status, last_updated = now()
+    FROM unnest(CAST(:ids AS integer[]), CAST(:statuses AS text[])) AS v(interface_id, status)
+    WHERE i.interface_id = v.interface_id AND i.status IS DISTINCT FROM v.status
+    RETURNING i.interface_id, i.firewall_id
+""")
+# Interfaces per SELECT of update_interface_statuses elsewhere
+STATUS_BATCH_SIZE = 500
+
+# Interfaces with their VDOM and firewall, as returned by the list endpoints (see app.rows)
+INTERFACE_SHAPE = rows.Shape(InterfaceResponse, Interface.__table__.columns, nested={"vdom": VDOM_SHAPE})
+# Interfaces without their VDOM, as listed by the VDOM detail endpoint
+INTERFACE_ITEM_SHAPE = rows.Shape(InterfaceResponse, Interface.__table__.columns)
 
 def get_interface(db: Session, interface_id: int) -> Optional[Interface]:
     return db.query(Interface).filter(Interface.interface_id == interface_id).first()
 
-def get_interfaces(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+def _filter_interfaces(
+    query,
     firewall_id: Optional[int] = None,
     vdom_id: Optional[int] = None,
     interface_type: Optional[str] = None,
-    interface_name: Optional[str] = None, # Add interface_name
-    ip_address: Optional[str] = None, # Add ip_address
-    include_vdom: bool = False, # Add include_vdom
-    sort_by: Optional[str] = None, # Updated parameter name
-    sort_order: Optional[str] = "asc" # Updated parameter name
-) -> Tuple[List[Interface], int]: # Return list and total count
-    query = db.query(Interface)
-
-    # Join with VDOM if needed for sorting by vdom_name or if include_vdom is True
-    if include_vdom or sort_by == "vdom_name":
-        query = query.outerjoin(VDOM, Interface.vdom_id == VDOM.vdom_id)
-        if include_vdom:
-            query = query.options(joinedload(Interface.vdom))
-    
+    interface_name: Optional[str] = None,
+    ip_address: Optional[str] = None
+):
+    # Shared by ORM queries and the Core selects of get_interface_rows
     if firewall_id:
         query = query.filter(Interface.firewall_id == firewall_id)
     if vdom_id:
@@ -38,29 +58,104 @@ def get_interfaces(
         query = query.filter(Interface.interface_name.ilike(f"%{interface_name}%"))
     if ip_address: # Filter by ip_address
         query = query.filter(Interface.ip_address.ilike(f"%{ip_address}%"))
-    
-    # Add sorting
+    return query
+
+def _interface_order(sort_by: Optional[str], sort_order: Optional[str]):
+    # Sorting by vdom_name needs VDOM joined
     if sort_by:
-        if sort_by == "interface_name":
-            sort_column = Interface.interface_name
-        elif sort_by == "vdom_name":
+        if sort_by == "vdom_name":
             sort_column = VDOM.vdom_name
         else:
             # Fallback to interface_name if sort_by is not recognized
             sort_column = Interface.interface_name
         
         if sort_order.lower() == "desc":
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
+            return sort_column.desc()
+        return sort_column.asc()
+    # Default sorting by interface name
+    return Interface.interface_name.asc()
+
+def interface_sort_key(sort_by: Optional[str], sort_order: Optional[str]):
+    # _interface_order on rows, for merging the pages of shards (see app.sharding)
+    if sort_by == "vdom_name":
+        key = lambda row: row.vdom.vdom_name if row.vdom else None
     else:
-        # Default sorting by interface name
-        query = query.order_by(Interface.interface_name.asc())
+        key = attrgetter("interface_name")
+    return key, bool(sort_by) and sort_order.lower() == "desc"
+
+def get_interfaces(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    interface_type: Optional[str] = None,
+    interface_name: Optional[str] = None, # Add interface_name
+    ip_address: Optional[str] = None, # Add ip_address
+    include_vdom: bool = False, # Add include_vdom
+    sort_by: Optional[str] = None, # Updated parameter name
+    sort_order: Optional[str] = "asc" # Updated parameter name
+) -> Tuple[List[Interface], int]: # Return list and total count
+    query = db.query(Interface)
+
+    # Join with VDOM if needed for sorting by vdom_name or if include_vdom is True
+    if include_vdom or sort_by == "vdom_name":
+        query = query.outerjoin(VDOM, Interface.vdom_id == VDOM.vdom_id)
+        if include_vdom:
+            query = query.options(joinedload(Interface.vdom))
+    
+    query = _filter_interfaces(query, firewall_id, vdom_id, interface_type, interface_name, ip_address)
+    query = query.order_by(_interface_order(sort_by, sort_order))
         
     total_count = query.count() # Get total count before applying limit/offset
     interfaces = query.offset(skip).limit(limit).all()
     return interfaces, total_count
 
+def interface_rows_select():
+    # The select of get_interface_rows before filtering
+    return (
+        select(*INTERFACE_SHAPE.select_columns())
+        .select_from(Interface)
+        .outerjoin(VDOM, Interface.vdom_id == VDOM.vdom_id)
+        .outerjoin(Firewall, VDOM.firewall_id == Firewall.firewall_id)
+    )
+
+def get_interface_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    interface_type: Optional[str] = None,
+    interface_name: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc",
+    as_of: Optional[datetime] = None
+) -> Tuple[List[rows.Row], int]:
+    """
+    The interfaces of get_interfaces as read-only rows with their VDOM and
+    firewall (see app.rows), for the list endpoints, and their total count.
+    With as_of, the interfaces as they were then (see app.versioning).
+    """
+    versioning.check_as_of(db.get_bind(), as_of)
+    statement = _filter_interfaces(interface_rows_select(), firewall_id, vdom_id, interface_type, interface_name, ip_address)
+    statement = versioning.at(statement.order_by(_interface_order(sort_by, sort_order)), as_of)
+    total_count = rows.count(db, statement)
+    return rows.fetch(db, INTERFACE_SHAPE, statement.offset(skip).limit(limit)), total_count
+
+def get_vdom_interface_rows(db: Session, vdom_id: int, firewall_id: int, limit: int = 10000) -> List[rows.Row]:
+    """
+    The first interfaces of a VDOM by name, as rows without their VDOM.
+    """
+    statement = (
+        select(*INTERFACE_ITEM_SHAPE.select_columns())
+        .where(Interface.firewall_id == firewall_id, Interface.vdom_id == vdom_id)
+        .order_by(_interface_order(None, None))
+        .limit(limit)
+    )
+    return rows.fetch(db, INTERFACE_ITEM_SHAPE, statement)
+
 def get_interface_by_name(
     db: Session, 
     firewall_id: int, 
@@ -93,6 +188,8 @@ def create_interface(db: Session, interface: InterfaceCreate) -> Interface:
         physical_interface_name=interface.physical_interface_name
     )
     db.add(db_interface)
+    db.flush()
+    ip_address_crud.sync_interface(db, db_interface)
     db.commit()
     db.refresh(db_interface)
     return db_interface
@@ -110,19 +207,135 @@ def update_interface(
     for key, value in update_data.items():
         setattr(db_interface, key, value)
     
+    db.flush()
+    ip_address_crud.sync_interface(db, db_interface)
     db.commit()
     db.refresh(db_interface)
     return db_interface
 
+def update_interface_statuses(db: Session, statuses: Dict[int, str]) -> List[int]:
+    """
+    Set the status of many interfaces, keyed by interface_id, in one
+    transaction. Interfaces that already have the status, or do not exist,
+    are left alone. Returns the ids of the interfaces that changed.
+
+    On PostgreSQL this is a single UPDATE joined to the new statuses;
+    elsewhere the changed rows are updated one statement per row.
+    """
+    changed: Dict[int, int] = {}
+    # Sorted, so concurrent callers lock rows in the same order
+    items = sorted(statuses.items())
+    if db.get_bind().dialect.name == "postgresql":
+        result = db.execute(STATUS_UPDATE, {
+            "ids": [interface_id for interface_id, _ in items],
+            "statuses": [status for _, status in items],
+        })
+        changed.update(result.all())
+    else:
+        table = Interface.__table__
+        for start in range(0, len(items), STATUS_BATCH_SIZE):
+            batch = dict(items[start:start + STATUS_BATCH_SIZE])
+            for interface_id, firewall_id, status in db.execute(
+                select(Interface.interface_id, Interface.firewall_id, Interface.status)
+                .where(Interface.interface_id.in_(batch))
+            ):
+                if status != batch[interface_id]:
+                    changed[interface_id] = firewall_id
+        if changed:
+            # Core UPDATE, so last_updated's onupdate applies
+            db.execute(
+                update(table).where(table.c.interface_id == bindparam("id")).values(status=bindparam("new_status")),
+                [{"id": interface_id, "new_status": statuses[interface_id]} for interface_id in changed]
+            )
+
+    # One event per firewall rather than one per row
+    for firewall_id in sorted(set(changed.values())):
+        events.notify_change(db, "interfaces", "update", firewall_id=firewall_id)
+    db.commit()
+    return sorted(changed)
+
 def delete_interface(db: Session, interface_id: int) -> bool:
     db_interface = get_interface(db, interface_id)
     if db_interface is None:
         return False
     
+    ip_address_crud.remove_source(db, ip_address_crud.SOURCE_INTERFACE, db_interface.interface_id)
     db.delete(db_interface)
     db.commit()
     return True
 
+def delete_interfaces(
+    db: Session,
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    interface_type: Optional[str] = None,
+    status: Optional[str] = None,
+    updated_before: Optional[datetime] = None
+) -> int:
+    conditions = []
+    if firewall_id is not None:
+        conditions.append(Interface.firewall_id == firewall_id)
+    if vdom_id is not None:
+        conditions.append(Interface.vdom_id == vdom_id)
+    if interface_type is not None:
+        conditions.append(Interface.type == interface_type)
+    if status is not None:
+        conditions.append(Interface.status == status)
+    if updated_before is not None:
+        conditions.append(Interface.last_updated < updated_before)
+    if not conditions:
+        raise ValueError("At least one filter is required")
+
+    # Index rows first, while the ids can still be selected
+    ip_address_crud.remove_sources(db, ip_address_crud.SOURCE_INTERFACE, select(Interface.interface_id).where(*conditions))
+    deleted = db.query(Interface).filter(*conditions).delete(synchronize_session=False)
+    if deleted:
+        events.notify_change(db, "interfaces", "delete", firewall_id=firewall_id, vdom_id=vdom_id)
+    db.commit()
+    return deleted
+
+def replace_firewall_interfaces(
+    db: Session, firewall_id: int, interfaces: List[InterfaceCreate]
+) -> Tuple[int, int, bool]:
+    """
+    Replace all interfaces of a firewall in one transaction, the way
+    replace_firewall_routes replaces its routes. Returns (deleted, loaded,
+    swapped).
+    """
+    partitioning.lock_partition_ddl(db.connection())
+    vdom_ids = {interface.vdom_id for interface in interfaces if interface.vdom_id is not None}
+    own_vdoms = set(db.scalars(select(VDOM.vdom_id).where(VDOM.firewall_id == firewall_id, VDOM.vdom_id.in_(vdom_ids))))
+    foreign = sorted(vdom_ids - own_vdoms)
+    if foreign:
+        raise ValueError(f"VDOMs {', '.join(map(str, foreign))} do not belong to firewall {firewall_id}")
+
+    rows = [
+        [firewall_id, interface.vdom_id, interface.interface_name, interface.ip_address, interface.mask,
+         interface.type, interface.vlan_id, interface.description, interface.status, interface.physical_interface_name]
+        for interface in interfaces
+    ]
+    # Index rows first, while the old ids can still be selected
+    ip_address_crud.remove_sources(
+        db, ip_address_crud.SOURCE_INTERFACE, select(Interface.interface_id).where(Interface.firewall_id == firewall_id)
+    )
+    connection = db.connection()
+    swapped = partitioning.can_swap(connection, "interfaces", firewall_id)
+    if swapped:
+        deleted, loaded = partitioning.swap_partition(connection, "interfaces", firewall_id, REPLACE_COLUMNS, rows)
+        # COPY into the new partition does not fire the status triggers
+        history.record_interface_statuses(connection, firewall_id)
+    else:
+        deleted = db.query(Interface).filter(Interface.firewall_id == firewall_id).delete(synchronize_session=False)
+        if rows:
+            db.execute(Interface.__table__.insert(), [dict(zip(REPLACE_COLUMNS, row)) for row in rows])
+        loaded = len(rows)
+    ip_address_crud.index_firewall_interfaces(db, firewall_id)
+
+    events.notify_change(db, "interfaces", "delete", firewall_id=firewall_id)
+    events.notify_change(db, "interfaces", "create", firewall_id=firewall_id)
+    db.commit()
+    return deleted, loaded, swapped
+
 import ipaddress
 from typing import Tuple, List, Optional
 from sqlalchemy.orm import Session, joinedload
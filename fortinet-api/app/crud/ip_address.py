@@ -0,0 +1,271 @@
+import ipaddress
+from datetime import datetime
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, cast, select
+from sqlalchemy.dialects.postgresql import INET
+from typing import Dict, List, Optional, Tuple
+from app.models.ip_address import IPAddress
+from app.models.interface import Interface
+from app.models.route import Route
+from app.models.vdom import VDOM
+from app.models.vip import VIP
+from app.utils.ip_utils import host_network, prefix_network
+from app import rows, versioning
+
+SOURCE_INTERFACE = "interface"
+SOURCE_ROUTE = "route"
+SOURCE_VIP = "vip"
+SOURCE_TYPES = (SOURCE_INTERFACE, SOURCE_ROUTE, SOURCE_VIP)
+
+# Rows per INSERT when rebuilding the index
+REBUILD_BATCH_SIZE = 5000
+
+def supports_inet(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def _index_row(network: Optional[str], source_type: str, source_id: int, firewall_id: int, vdom_id: Optional[int]) -> Optional[dict]:
+    if network is None or firewall_id is None:
+        return None
+    return {
+        "network": network,
+        "source_type": source_type,
+        "source_id": source_id,
+        "firewall_id": firewall_id,
+        "vdom_id": vdom_id,
+    }
+
+def interface_index_rows(interface_id: int, firewall_id: int, vdom_id: Optional[int], ip_address: Optional[str]) -> List[dict]:
+    row = _index_row(host_network(ip_address), SOURCE_INTERFACE, interface_id, firewall_id, vdom_id)
+    return [row] if row else []
+
+def route_index_rows(route_id: int, firewall_id: int, vdom_id: int, destination_network: str, mask_length: int) -> List[dict]:
+    row = _index_row(prefix_network(destination_network, mask_length), SOURCE_ROUTE, route_id, firewall_id, vdom_id)
+    return [row] if row else []
+
+def vip_index_rows(vip_id: int, firewall_id: int, vdom_id: int, external_ip: str, mapped_ip: str) -> List[dict]:
+    # A VIP is found through either side of the translation
+    networks = {host_network(external_ip), host_network(mapped_ip)}
+    rows = [_index_row(network, SOURCE_VIP, vip_id, firewall_id, vdom_id) for network in networks]
+    return [row for row in rows if row]
+
+def remove_source(db: Session, source_type: str, source_id: int) -> None:
+    db.query(IPAddress).filter(
+        IPAddress.source_type == source_type,
+        IPAddress.source_id == source_id
+    ).delete(synchronize_session=False)
+
+def remove_sources(db: Session, source_type: str, source_ids) -> None:
+    """
+    Remove the index rows of many sources; source_ids may be a list or a
+    select of ids, so set-based deletes can clean up in one statement.
+    """
+    db.query(IPAddress).filter(
+        IPAddress.source_type == source_type,
+        IPAddress.source_id.in_(source_ids)
+    ).delete(synchronize_session=False)
+
+def _replace_source(db: Session, source_type: str, source_id: int, rows: List[dict]) -> None:
+    remove_source(db, source_type, source_id)
+    if rows:
+        db.bulk_insert_mappings(IPAddress, rows)
+
+# The sync_* functions run inside the caller's transaction, after a flush,
+# so the index commits (or rolls back) together with the source row
+def sync_interface(db: Session, interface: Interface) -> None:
+    _replace_source(db, SOURCE_INTERFACE, interface.interface_id, interface_index_rows(
+        interface.interface_id, interface.firewall_id, interface.vdom_id, interface.ip_address
+    ))
+
+def sync_route(db: Session, route: Route) -> None:
+    _replace_source(db, SOURCE_ROUTE, route.route_id, route_index_rows(
+        route.route_id, route.firewall_id, route.vdom_id, route.destination_network, route.mask_length
+    ))
+
+def sync_vip(db: Session, vip: VIP) -> None:
+    firewall_id = db.query(VDOM.firewall_id).filter(VDOM.vdom_id == vip.vdom_id).scalar()
+    _replace_source(db, SOURCE_VIP, vip.vip_id, vip_index_rows(
+        vip.vip_id, firewall_id, vip.vdom_id, vip.external_ip, vip.mapped_ip
+    ))
+
+def _iter_index_rows(db: Session):
+    interfaces = db.execute(
+        select(Interface.interface_id, Interface.firewall_id, Interface.vdom_id, Interface.ip_address)
+        .where(Interface.ip_address.isnot(None))
+    )
+    for row in interfaces:
+        yield from interface_index_rows(*row)
+
+    routes = db.execute(
+        select(Route.route_id, Route.firewall_id, Route.vdom_id, Route.destination_network, Route.mask_length)
+    )
+    for row in routes:
+        yield from route_index_rows(*row)
+
+    vips = db.execute(
+        select(VIP.vip_id, VDOM.firewall_id, VIP.vdom_id, VIP.external_ip, VIP.mapped_ip)
+        .join(VDOM, VIP.vdom_id == VDOM.vdom_id)
+    )
+    for row in vips:
+        yield from vip_index_rows(*row)
+
+def _insert_index_rows(db: Session, rows: List[dict]) -> int:
+    for start in range(0, len(rows), REBUILD_BATCH_SIZE):
+        db.bulk_insert_mappings(IPAddress, rows[start:start + REBUILD_BATCH_SIZE])
+    return len(rows)
+
+# The index_firewall_* functions add the index rows of all sources of one
+# firewall after they were replaced set-based. They run in the caller's transaction.
+def index_firewall_routes(db: Session, firewall_id: int) -> int:
+    routes = db.execute(
+        select(Route.route_id, Route.firewall_id, Route.vdom_id, Route.destination_network, Route.mask_length)
+        .where(Route.firewall_id == firewall_id)
+    )
+    return _insert_index_rows(db, [index_row for row in routes for index_row in route_index_rows(*row)])
+
+def index_firewall_interfaces(db: Session, firewall_id: int) -> int:
+    interfaces = db.execute(
+        select(Interface.interface_id, Interface.firewall_id, Interface.vdom_id, Interface.ip_address)
+        .where(Interface.firewall_id == firewall_id, Interface.ip_address.isnot(None))
+    )
+    return _insert_index_rows(db, [index_row for row in interfaces for index_row in interface_index_rows(*row)])
+
+def index_firewall_vips(db: Session, firewall_id: int) -> int:
+    vips = db.execute(
+        select(VIP.vip_id, VDOM.firewall_id, VIP.vdom_id, VIP.external_ip, VIP.mapped_ip)
+        .join(VDOM, VIP.vdom_id == VDOM.vdom_id)
+        .where(VDOM.firewall_id == firewall_id)
+    )
+    return _insert_index_rows(db, [index_row for row in vips for index_row in vip_index_rows(*row)])
+
+def rebuild_ip_addresses(db: Session, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """
+    Backfill job: rebuild the ip_addresses table from interfaces, routes and
+    VIPs in one transaction. Values that are not valid addresses are skipped.
+    """
+    db.query(IPAddress).delete(synchronize_session=False)
+    total = 0
+    batch = []
+    for row in _iter_index_rows(db):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.bulk_insert_mappings(IPAddress, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        db.bulk_insert_mappings(IPAddress, batch)
+        total += len(batch)
+    db.commit()
+    return total
+
+def _matches(entry_network: str, network, contained: bool) -> bool:
+    try:
+        entry = ipaddress.ip_network(entry_network, strict=False)
+    except ValueError:
+        return False
+    if entry.version != network.version:
+        return False
+    if contained:
+        return entry.subnet_of(network)
+    return entry.overlaps(network)
+
+def search_ip_addresses(
+    db: Session,
+    network,
+    contained: bool = False,
+    source_type: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 15,
+    as_of: Optional[datetime] = None
+) -> Tuple[List[Tuple[str, int]], int]:
+    """
+    Return one page of (source_type, source_id) pairs whose indexed address
+    overlaps the network (or lies inside it when contained is True), ordered
+    by source type and id, together with the total number of matching sources.
+    With as_of, the index as it was then (see app.versioning).
+    """
+    versioning.check_as_of(db.get_bind(), as_of)
+    if not supports_inet(db):
+        # No inet operators outside PostgreSQL: filter the index in Python
+        query = db.query(IPAddress.source_type, IPAddress.source_id, IPAddress.network)
+        if source_type:
+            query = query.filter(IPAddress.source_type == source_type)
+        matches = sorted({
+            (row.source_type, row.source_id) for row in query
+            if _matches(row.network, network, contained)
+        }, key=lambda hit: (SOURCE_TYPES.index(hit[0]), hit[1]))
+        return matches[skip:skip + limit], len(matches)
+
+    operator = "<<=" if contained else "&&"
+    condition = IPAddress.network.op(operator)(cast(str(network), INET))
+    query = db.query(
+        IPAddress.source_type,
+        IPAddress.source_id,
+        func.count().over().label("total_count")
+    ).filter(condition)
+    if source_type:
+        query = query.filter(IPAddress.source_type == source_type)
+
+    # One GiST scan; the window count runs over the grouped sources
+    page = (
+        query.group_by(IPAddress.source_type, IPAddress.source_id)
+        .order_by(IPAddress.source_type, IPAddress.source_id)
+        .offset(skip)
+        .limit(limit)
+    )
+    found = db.execute(versioning.at(page.statement, as_of)).all()
+    if found:
+        return [(row.source_type, row.source_id) for row in found], found[0].total_count
+    if skip == 0:
+        return [], 0
+
+    # Page past the end: count separately
+    count_query = db.query(IPAddress.source_type, IPAddress.source_id).filter(condition)
+    if source_type:
+        count_query = count_query.filter(IPAddress.source_type == source_type)
+    sources = versioning.at(count_query.distinct().statement, as_of).subquery()
+    return [], db.execute(select(func.count()).select_from(sources)).scalar()
+
+def _load_sources_as_of(db: Session, ids: Dict[str, List[int]], as_of: datetime) -> Dict[Tuple[str, int], object]:
+    # Read-only rows (see app.rows) from the list selects, which at() can rewrite
+    from app.crud.interface import INTERFACE_SHAPE, interface_rows_select
+    from app.crud.route import ROUTE_SHAPE, route_rows_select
+    from app.crud.vip import VIP_SHAPE, vip_rows_select
+
+    sources = {
+        SOURCE_INTERFACE: (INTERFACE_SHAPE, interface_rows_select(), Interface.interface_id),
+        SOURCE_ROUTE: (ROUTE_SHAPE, route_rows_select(), Route.route_id),
+        SOURCE_VIP: (VIP_SHAPE, vip_rows_select(), VIP.vip_id),
+    }
+    loaded = {}
+    for source_type, (shape, statement, key) in sources.items():
+        if ids[source_type]:
+            for row in rows.fetch(db, shape, versioning.at(statement.where(key.in_(ids[source_type])), as_of)):
+                loaded[(source_type, getattr(row, key.key))] = row
+    return loaded
+
+def load_sources(
+    db: Session,
+    hits: List[Tuple[str, int]],
+    as_of: Optional[datetime] = None
+) -> Dict[Tuple[str, int], object]:
+    """
+    Load the interface, route and VIP rows for a page of search hits, as
+    they were at as_of when it is given.
+    """
+    ids = {source_type: [] for source_type in SOURCE_TYPES}
+    for source_type, source_id in hits:
+        ids[source_type].append(source_id)
+    if as_of is not None:
+        return _load_sources_as_of(db, ids, as_of)
+
+    loaded = {}
+    if ids[SOURCE_INTERFACE]:
+        for iface in db.query(Interface).options(joinedload(Interface.vdom)).filter(Interface.interface_id.in_(ids[SOURCE_INTERFACE])):
+            loaded[(SOURCE_INTERFACE, iface.interface_id)] = iface
+    if ids[SOURCE_ROUTE]:
+        for route in db.query(Route).options(joinedload(Route.vdom)).filter(Route.route_id.in_(ids[SOURCE_ROUTE])):
+            loaded[(SOURCE_ROUTE, route.route_id)] = route
+    if ids[SOURCE_VIP]:
+        for vip in db.query(VIP).options(joinedload(VIP.vdom).joinedload(VDOM.firewall)).filter(VIP.vip_id.in_(ids[SOURCE_VIP])):
+            loaded[(SOURCE_VIP, vip.vip_id)] = vip
+    return loaded
@@ -0,0 +1,90 @@
+from operator import attrgetter
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import List, Optional, Tuple
+from app.models.policy import Policy
+from app.models.vdom import VDOM
+from app.schemas.policy import PolicyCreate, PolicyUpdate, PolicyMatchLookup
+from app.policy_match import get_policy_set
+
+def get_policy(db: Session, policy_id: int) -> Optional[Policy]:
+    return db.query(Policy).filter(Policy.policy_id == policy_id).first()
+
+def get_policy_by_number(db: Session, vdom_id: int, policy_number: int) -> Optional[Policy]:
+    return db.query(Policy).filter(Policy.vdom_id == vdom_id, Policy.policy_number == policy_number).first()
+
+# Their order on loaded policies, for merging the pages of shards (see app.sharding)
+POLICY_SORT_KEY = attrgetter("vdom_id", "sequence", "policy_number")
+
+def get_policies(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    vdom_id: Optional[int] = None,
+    action: Optional[str] = None,
+    status: Optional[str] = None,
+    name: Optional[str] = None
+) -> Tuple[List[Policy], int]:
+    """
+    Policies in evaluation order per VDOM, and their total count.
+    """
+    query = db.query(Policy)
+    if vdom_id:
+        query = query.filter(Policy.vdom_id == vdom_id)
+    if action:
+        query = query.filter(Policy.action == action)
+    if status:
+        query = query.filter(Policy.status == status)
+    if name:
+        query = query.filter(Policy.name.ilike(f"%{name}%"))
+    total_count = query.count()
+    policies = query.order_by(Policy.vdom_id, Policy.sequence, Policy.policy_number).offset(skip).limit(limit).all()
+    return policies, total_count
+
+def create_policy(db: Session, policy: PolicyCreate) -> Policy:
+    values = policy.model_dump()
+    if values["sequence"] is None:
+        # After the last policy of the VDOM
+        last = db.query(func.max(Policy.sequence)).filter(Policy.vdom_id == policy.vdom_id).scalar()
+        values["sequence"] = (last or 0) + 1
+    db_policy = Policy(**values)
+    db.add(db_policy)
+    db.commit()
+    db.refresh(db_policy)
+    return db_policy
+
+def update_policy(db: Session, policy_id: int, policy: PolicyUpdate) -> Optional[Policy]:
+    db_policy = get_policy(db, policy_id)
+    if db_policy is None:
+        return None
+    for key, value in policy.model_dump(exclude_unset=True).items():
+        setattr(db_policy, key, value)
+    db.commit()
+    db.refresh(db_policy)
+    return db_policy
+
+def delete_policy(db: Session, policy_id: int) -> bool:
+    db_policy = get_policy(db, policy_id)
+    if db_policy is None:
+        return False
+    db.delete(db_policy)
+    db.commit()
+    return True
+
+def match_policies(db: Session, vdom_id: int, lookups: List[PolicyMatchLookup]) -> Optional[List[Tuple[int, object]]]:
+    """
+    The protocol number and the first matching policy (a PolicyResponse, or
+    None for the implicit deny) of each flow, against the compiled policies
+    of the VDOM (see app.policy_match). None for an unknown VDOM; raises
+    ValueError for invalid flows.
+    """
+    firewall_id = db.query(VDOM.firewall_id).filter(VDOM.vdom_id == vdom_id).scalar()
+    if firewall_id is None:
+        return None
+    policy_set = get_policy_set(db, vdom_id, firewall_id)
+    return [
+        policy_set.match(
+            lookup.src, lookup.dst, lookup.proto, lookup.port, srcintf=lookup.srcintf, dstintf=lookup.dstintf
+        )
+        for lookup in lookups
+    ]
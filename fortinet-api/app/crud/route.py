@@ -1,16 +1,86 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from sqlalchemy import func, select
+from datetime import datetime
 from typing import List, Optional, Tuple # Import Tuple
 from app.models.route import Route
+from app.models.route_type import RouteType
+from app.models.route_nexthop import RouteNexthop
 from app.models.vdom import VDOM # Import VDOM model
-from app.schemas.route import RouteCreate, RouteUpdate
+from app.models.firewall import Firewall
+from app.schemas.route import RouteCreate, RouteUpdate, RouteResponse
+import app.crud.ip_address as ip_address_crud
+from app.crud.vdom import VDOM_SHAPE
+from app import dictionary, events, partitioning, rows, versioning
+from operator import attrgetter
+
+# Columns of the routes given to replace_firewall_routes, before encoding
+REPLACE_COLUMNS = [
+    "vdom_id", "firewall_id", "destination_network", "mask_length", "route_type",
+    "gateway", "exit_interface_name", "exit_interface_details",
+]
+
+# Routes with their VDOM and firewall, as returned by the list endpoints (see app.rows)
+ROUTE_SHAPE = rows.Shape(RouteResponse, dictionary.decoded_columns("routes"), nested={"vdom": VDOM_SHAPE})
+# Routes without their VDOM, as listed by the VDOM detail endpoint
+ROUTE_ITEM_SHAPE = rows.Shape(RouteResponse, dictionary.decoded_columns("routes"))
 
 def get_route(db: Session, route_id: int) -> Optional[Route]:
     return db.query(Route).filter(Route.route_id == route_id).first()
 
+def _vdom_firewall(vdom_id: int):
+    # Also filtering on the VDOM's firewall lets partitioned routes skip the other partitions
+    return Route.firewall_id == select(VDOM.firewall_id).where(VDOM.vdom_id == vdom_id).scalar_subquery()
+
+def _route_type(route_type: str):
+    # Compares the id, so the route type indexes serve the filter
+    return Route.route_type_id == select(RouteType.route_type_id).where(RouteType.route_type == route_type).scalar_subquery()
+
+def _filter_routes(
+    query,
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    route_type: Optional[str] = None,
+    vdom_name: Optional[str] = None
+):
+    # Shared by ORM queries and the Core selects of get_route_rows; vdom_name needs VDOM joined
+    if firewall_id:
+        query = query.filter(Route.firewall_id == firewall_id)
+    if vdom_id:
+        query = query.filter(Route.vdom_id == vdom_id, _vdom_firewall(vdom_id))
+    if route_type:
+        query = query.filter(_route_type(route_type))
+    if vdom_name:
+        query = query.filter(VDOM.vdom_name.ilike(f"%{vdom_name}%")) # Filter by vdom_name
+    return query
+
+def _route_order(sort_by: Optional[str], sort_order: Optional[str]):
+    # The sort column's table must be joined: route_nexthops, vdoms or, by default, route_types
+    if sort_by == "exit_interface_name":
+        sort_column = RouteNexthop.exit_interface_name
+    elif sort_by == "vdom_name":
+        sort_column = VDOM.vdom_name
+    else:
+        # Default sorting by route type
+        sort_column = RouteType.route_type
+    if sort_by and sort_order.lower() == "desc":
+        return sort_column.desc()
+    return sort_column.asc()
+
+def route_sort_key(sort_by: Optional[str], sort_order: Optional[str]):
+    # _route_order on rows, for merging the pages of shards (see app.sharding)
+    if sort_by == "exit_interface_name":
+        key = attrgetter("exit_interface_name")
+    elif sort_by == "vdom_name":
+        key = lambda row: row.vdom.vdom_name if row.vdom else None
+    else:
+        key = attrgetter("route_type")
+    return key, bool(sort_by) and sort_order.lower() == "desc"
+
 def get_routes(
     db: Session,
     skip: int = 0,
     limit: int = 100,
+    firewall_id: Optional[int] = None,
     vdom_id: Optional[int] = None,
     route_type: Optional[str] = None,
     vdom_name: Optional[str] = None, # Add vdom_name parameter
@@ -25,68 +95,92 @@ def get_routes(
         if include_vdom: # If also including vdom, ensure it's loaded efficiently
              query = query.options(joinedload(Route.vdom))
 
+    query = _filter_routes(query, firewall_id, vdom_id, route_type, vdom_name)
 
-    if vdom_id:
-        query = query.filter(Route.vdom_id == vdom_id)
-    if route_type:
-        query = query.filter(Route.route_type == route_type)
-    if vdom_name:
-        query = query.filter(VDOM.vdom_name.ilike(f"%{vdom_name}%")) # Filter by vdom_name
-
-    # Apply sorting
-    if sort_by:
-        if sort_by == "route_type":
-            sort_column = Route.route_type
-        elif sort_by == "exit_interface_name":
-            sort_column = Route.exit_interface_name
-        elif sort_by == "vdom_name":
-            sort_column = VDOM.vdom_name
-        else:
-            sort_column = Route.route_type  # Default fallback
-        
-        if sort_order.lower() == "desc":
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
-    else:
-        # Default sorting by route type
-        query = query.order_by(Route.route_type.asc())
+    # Apply sorting; the lookup joined for the sort also loads the values
+    if sort_by == "exit_interface_name":
+        query = query.join(Route.nexthop).options(contains_eager(Route.nexthop))
+    elif sort_by != "vdom_name":
+        query = query.join(Route.route_type_entry).options(contains_eager(Route.route_type_entry))
+    query = query.order_by(_route_order(sort_by, sort_order))
         
     return query.offset(skip).limit(limit).all()
 
+def route_rows_select():
+    # The select of get_route_rows before filtering
+    return (
+        select(*ROUTE_SHAPE.select_columns())
+        .select_from(Route)
+        .join(RouteType, Route.route_type_id == RouteType.route_type_id)
+        .join(RouteNexthop, Route.nexthop_id == RouteNexthop.nexthop_id)
+        .join(VDOM, Route.vdom_id == VDOM.vdom_id)
+        .join(Firewall, VDOM.firewall_id == Firewall.firewall_id)
+    )
+
+def get_route_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    route_type: Optional[str] = None,
+    vdom_name: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc",
+    as_of: Optional[datetime] = None
+) -> List[rows.Row]:
+    """
+    The routes of get_routes as read-only rows with their VDOM and firewall
+    (see app.rows), for the list endpoints. With as_of, the routes as they
+    were then (see app.versioning).
+    """
+    versioning.check_as_of(db.get_bind(), as_of)
+    statement = _filter_routes(route_rows_select(), firewall_id, vdom_id, route_type, vdom_name)
+    statement = statement.order_by(_route_order(sort_by, sort_order)).offset(skip).limit(limit)
+    return rows.fetch(db, ROUTE_SHAPE, versioning.at(statement, as_of))
+
+def get_vdom_route_rows(db: Session, vdom_id: int, firewall_id: int, limit: int = 10000) -> List[rows.Row]:
+    """
+    The first routes of a VDOM by route type, as rows without their VDOM.
+    """
+    statement = (
+        select(*ROUTE_ITEM_SHAPE.select_columns())
+        .select_from(Route)
+        .join(RouteType, Route.route_type_id == RouteType.route_type_id)
+        .join(RouteNexthop, Route.nexthop_id == RouteNexthop.nexthop_id)
+        .where(Route.firewall_id == firewall_id, Route.vdom_id == vdom_id)
+        .order_by(_route_order(None, None))
+        .limit(limit)
+    )
+    return rows.fetch(db, ROUTE_ITEM_SHAPE, statement)
+
 def get_routes_count(
     db: Session,
+    firewall_id: Optional[int] = None,
     vdom_id: Optional[int] = None,
     route_type: Optional[str] = None,
     vdom_name: Optional[str] = None, # Add vdom_name parameter
     sort_by: Optional[str] = None,
-    sort_order: Optional[str] = "asc"
+    sort_order: Optional[str] = "asc",
+    as_of: Optional[datetime] = None
 ) -> int:
-    query = db.query(Route)
+    versioning.check_as_of(db.get_bind(), as_of)
+    statement = select(func.count()).select_from(Route)
 
     if vdom_name: # Join if filtering by vdom_name
-        query = query.join(VDOM, Route.vdom_id == VDOM.vdom_id)
+        statement = statement.join(VDOM, Route.vdom_id == VDOM.vdom_id)
     
-    if vdom_id:
-        query = query.filter(Route.vdom_id == vdom_id)
-    if route_type:
-        query = query.filter(Route.route_type == route_type)
-    if vdom_name:
-        query = query.filter(VDOM.vdom_name.ilike(f"%{vdom_name}%")) # Filter by vdom_name
-        
-    return query.count()
+    statement = _filter_routes(statement, firewall_id, vdom_id, route_type, vdom_name)
+    return db.execute(versioning.at(statement, as_of)).scalar()
 
 def create_route(db: Session, route: RouteCreate) -> Route:
     db_route = Route(
-        vdom_id=route.vdom_id,
-        destination_network=route.destination_network,
-        mask_length=route.mask_length,
-        route_type=route.route_type,
-        gateway=route.gateway,
-        exit_interface_name=route.exit_interface_name,
-        exit_interface_details=route.exit_interface_details
+        firewall_id=db.query(VDOM.firewall_id).filter(VDOM.vdom_id == route.vdom_id).scalar(),
+        **dictionary.Encoder(db.connection(), "routes").encode(route.dict())
     )
     db.add(db_route)
+    db.flush()
+    ip_address_crud.sync_route(db, db_route)
     db.commit()
     db.refresh(db_route)
     return db_route
@@ -101,9 +195,15 @@ def update_route(
         return None
     
     update_data = route.dict(exclude_unset=True)
-    for key, value in update_data.items():
+    # Encoded values are replaced as a group: start from the current ones
+    values = {name: getattr(db_route, name) for name in RouteUpdate.model_fields}
+    values.update(update_data)
+    encoded = dictionary.Encoder(db.connection(), "routes").encode(values)
+    for key, value in encoded.items():
         setattr(db_route, key, value)
     
+    db.flush()
+    ip_address_crud.sync_route(db, db_route)
     db.commit()
     db.refresh(db_route)
     return db_route
@@ -113,10 +213,40 @@ def delete_route(db: Session, route_id: int) -> bool:
     if db_route is None:
         return False
     
+    ip_address_crud.remove_source(db, ip_address_crud.SOURCE_ROUTE, db_route.route_id)
     db.delete(db_route)
     db.commit()
     return True
 
+def delete_routes(
+    db: Session,
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    route_type: Optional[str] = None,
+    updated_before: Optional[datetime] = None
+) -> int:
+    conditions = []
+    if firewall_id is not None:
+        # firewall_id prunes partitions; the vdom_id subquery keeps the vdom index usable on a plain table
+        conditions.append(Route.firewall_id == firewall_id)
+        conditions.append(Route.vdom_id.in_(select(VDOM.vdom_id).where(VDOM.firewall_id == firewall_id)))
+    if vdom_id is not None:
+        conditions.append(Route.vdom_id == vdom_id)
+    if route_type is not None:
+        conditions.append(_route_type(route_type))
+    if updated_before is not None:
+        conditions.append(Route.last_updated < updated_before)
+    if not conditions:
+        raise ValueError("At least one filter is required")
+
+    # Index rows first, while the ids can still be selected
+    ip_address_crud.remove_sources(db, ip_address_crud.SOURCE_ROUTE, select(Route.route_id).where(*conditions))
+    deleted = db.query(Route).filter(*conditions).delete(synchronize_session=False)
+    if deleted:
+        events.notify_change(db, "routes", "delete", firewall_id=firewall_id, vdom_id=vdom_id)
+    db.commit()
+    return deleted
+
 import ipaddress
 from typing import Tuple, List, Optional
 from sqlalchemy.orm import Session, joinedload
@@ -166,4 +296,45 @@ def search_routes_by_ip(
         query = base_query.filter(Route.destination_network.ilike(f"%{ip_address_query}%"))
         total_count = query.count()
         routes = query.offset(skip).limit(limit).all()
-        return routes, total_count
\ No newline at end of file
+        return routes, total_count
+
+def replace_firewall_routes(db: Session, firewall_id: int, routes: List[RouteCreate]) -> Tuple[int, int, bool]:
+    """
+    Replace all routes of a firewall in one transaction. With LIST
+    partitioning the new routes are loaded into a fresh table that is swapped
+    in for the firewall's partition; otherwise the old routes are deleted and
+    the new ones inserted. Returns (deleted, loaded, swapped).
+    """
+    partitioning.lock_partition_ddl(db.connection())
+    vdom_ids = {route.vdom_id for route in routes}
+    own_vdoms = set(db.scalars(select(VDOM.vdom_id).where(VDOM.firewall_id == firewall_id, VDOM.vdom_id.in_(vdom_ids))))
+    foreign = sorted(vdom_ids - own_vdoms)
+    if foreign:
+        raise ValueError(f"VDOMs {', '.join(map(str, foreign))} do not belong to firewall {firewall_id}")
+
+    values = [
+        [route.vdom_id, firewall_id, route.destination_network, route.mask_length, route.route_type,
+         route.gateway, route.exit_interface_name, route.exit_interface_details]
+        for route in routes
+    ]
+    encoder = dictionary.Encoder(db.connection(), "routes")
+    encoder.resolve(REPLACE_COLUMNS, values)
+    columns, rows = encoder.encode_rows(REPLACE_COLUMNS, values)
+    rows = list(rows)
+    # Index rows first, while the old ids can still be selected
+    ip_address_crud.remove_sources(db, ip_address_crud.SOURCE_ROUTE, select(Route.route_id).where(Route.firewall_id == firewall_id))
+    connection = db.connection()
+    swapped = partitioning.can_swap(connection, "routes", firewall_id)
+    if swapped:
+        deleted, loaded = partitioning.swap_partition(connection, "routes", firewall_id, columns, rows)
+    else:
+        deleted = db.query(Route).filter(Route.firewall_id == firewall_id).delete(synchronize_session=False)
+        if rows:
+            db.execute(Route.__table__.insert(), [dict(zip(columns, row)) for row in rows])
+        loaded = len(rows)
+    ip_address_crud.index_firewall_routes(db, firewall_id)
+
+    events.notify_change(db, "routes", "delete", firewall_id=firewall_id)
+    events.notify_change(db, "routes", "create", firewall_id=firewall_id)
+    db.commit()
+    return deleted, loaded, swapped
@@ -0,0 +1,105 @@
+from operator import attrgetter
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from app.models.service import Service, ServiceGroup
+from app.schemas.service import ServiceCreate, ServiceUpdate, ServiceGroupCreate, ServiceGroupUpdate
+
+def get_service(db: Session, service_id: int) -> Optional[Service]:
+    return db.query(Service).filter(Service.service_id == service_id).first()
+
+def get_service_by_name(db: Session, vdom_id: int, name: str) -> Optional[Service]:
+    return db.query(Service).filter(Service.vdom_id == vdom_id, Service.name == name).first()
+
+# The order of the lists on loaded objects, for merging the pages of shards (see app.sharding)
+NAME_SORT_KEY = attrgetter("vdom_id", "name")
+
+def get_services(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    vdom_id: Optional[int] = None,
+    name: Optional[str] = None,
+    protocol: Optional[str] = None
+) -> Tuple[List[Service], int]:
+    query = db.query(Service)
+    if vdom_id:
+        query = query.filter(Service.vdom_id == vdom_id)
+    if name:
+        query = query.filter(Service.name.ilike(f"%{name}%"))
+    if protocol:
+        query = query.filter(Service.protocol == protocol)
+    total_count = query.count()
+    services = query.order_by(Service.vdom_id, Service.name).offset(skip).limit(limit).all()
+    return services, total_count
+
+def create_service(db: Session, service: ServiceCreate) -> Service:
+    db_service = Service(**service.model_dump())
+    db.add(db_service)
+    db.commit()
+    db.refresh(db_service)
+    return db_service
+
+def update_service(db: Session, service_id: int, service: ServiceUpdate) -> Optional[Service]:
+    db_service = get_service(db, service_id)
+    if db_service is None:
+        return None
+    for key, value in service.model_dump(exclude_unset=True).items():
+        setattr(db_service, key, value)
+    db.commit()
+    db.refresh(db_service)
+    return db_service
+
+def delete_service(db: Session, service_id: int) -> bool:
+    db_service = get_service(db, service_id)
+    if db_service is None:
+        return False
+    db.delete(db_service)
+    db.commit()
+    return True
+
+def get_service_group(db: Session, group_id: int) -> Optional[ServiceGroup]:
+    return db.query(ServiceGroup).filter(ServiceGroup.group_id == group_id).first()
+
+def get_service_group_by_name(db: Session, vdom_id: int, name: str) -> Optional[ServiceGroup]:
+    return db.query(ServiceGroup).filter(ServiceGroup.vdom_id == vdom_id, ServiceGroup.name == name).first()
+
+def get_service_groups(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    vdom_id: Optional[int] = None,
+    name: Optional[str] = None
+) -> Tuple[List[ServiceGroup], int]:
+    query = db.query(ServiceGroup)
+    if vdom_id:
+        query = query.filter(ServiceGroup.vdom_id == vdom_id)
+    if name:
+        query = query.filter(ServiceGroup.name.ilike(f"%{name}%"))
+    total_count = query.count()
+    groups = query.order_by(ServiceGroup.vdom_id, ServiceGroup.name).offset(skip).limit(limit).all()
+    return groups, total_count
+
+def create_service_group(db: Session, group: ServiceGroupCreate) -> ServiceGroup:
+    db_group = ServiceGroup(**group.model_dump())
+    db.add(db_group)
+    db.commit()
+    db.refresh(db_group)
+    return db_group
+
+def update_service_group(db: Session, group_id: int, group: ServiceGroupUpdate) -> Optional[ServiceGroup]:
+    db_group = get_service_group(db, group_id)
+    if db_group is None:
+        return None
+    for key, value in group.model_dump(exclude_unset=True).items():
+        setattr(db_group, key, value)
+    db.commit()
+    db.refresh(db_group)
+    return db_group
+
+def delete_service_group(db: Session, group_id: int) -> bool:
+    db_group = get_service_group(db, group_id)
+    if db_group is None:
+        return False
+    db.delete(db_group)
+    db.commit()
+    return True
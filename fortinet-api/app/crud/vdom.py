@@ -1,15 +1,104 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func # Import func
-from typing import List, Optional, Tuple # Import Tuple
+from sqlalchemy import func, select # Import func
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple # Import Tuple
+from app.models.firewall import Firewall
 from app.models.vdom import VDOM
 from app.models.route import Route # Import Route model
 from app.models.interface import Interface # Import the Interface model
 from app.models.vip import VIP # Import the VIP model
-from app.schemas.vdom import VDOMCreate, VDOMUpdate
+from app.schemas.firewall import FirewallResponse
+from app.schemas.vdom import VDOMCreate, VDOMUpdate, VDOMResponse
+from app import events, partitioning, rows
+from app.cache import vdom_detail_cache
+from operator import attrgetter
+
+# A VDOM and its firewall, as nested in the rows of the list endpoints (see app.rows);
+# selects using it join vdoms and firewalls
+VDOM_SHAPE = rows.Shape(
+    VDOMResponse, VDOM.__table__.columns,
+    nested={"firewall": rows.Shape(FirewallResponse, Firewall.__table__.columns, key="firewall_id")},
+    key="vdom_id",
+)
+
+# The sections of a VDOM detail, in the order they are read and streamed
+DETAIL_SECTIONS = ("interfaces", "routes", "vips")
+
+# A VDOM with its firewall and the number of rows in each section
+VDOM_DETAIL_SHAPE = rows.Shape(
+    VDOMResponse,
+    [
+        *VDOM.__table__.columns,
+        select(func.count()).select_from(Interface).where(Interface.vdom_id == VDOM.vdom_id)
+        .scalar_subquery().label("total_interfaces"),
+        select(func.count()).select_from(Route).where(Route.firewall_id == VDOM.firewall_id, Route.vdom_id == VDOM.vdom_id)
+        .scalar_subquery().label("total_routes"),
+        select(func.count()).select_from(VIP).where(VIP.vdom_id == VDOM.vdom_id)
+        .scalar_subquery().label("total_vips"),
+    ],
+    nested={"firewall": rows.Shape(FirewallResponse, Firewall.__table__.columns)},
+)
 
 def get_vdom(db: Session, vdom_id: int) -> Optional[VDOM]:
     return db.query(VDOM).filter(VDOM.vdom_id == vdom_id).first()
 
+def _section_rows(db: Session, section: str, vdom: rows.Row, limit: int) -> List[rows.Row]:
+    # Imported here: these modules import VDOM_SHAPE from this one
+    if section == "interfaces":
+        from app.crud.interface import get_vdom_interface_rows
+        return get_vdom_interface_rows(db, vdom.vdom_id, vdom.firewall_id, limit)
+    if section == "routes":
+        from app.crud.route import get_vdom_route_rows
+        return get_vdom_route_rows(db, vdom.vdom_id, vdom.firewall_id, limit)
+    from app.crud.vip import get_vdom_vip_rows
+    return get_vdom_vip_rows(db, vdom.vdom_id, limit)
+
+def iter_vdom_detail(
+    db: Session,
+    vdom_id: int,
+    sections: Sequence[str] = DETAIL_SECTIONS,
+    limit: int = 10000
+) -> Iterator[Tuple[str, bytes]]:
+    """
+    The parts of a VDOM detail as (name, JSON): "vdom", the VDOM with its
+    firewall and counts, then {"items", "total_count"} for each section with
+    its first `limit` rows. The items leave out their VDOM, which is given
+    once. Yields nothing for an unknown VDOM.
+
+    One select for the VDOM and one per section, each run when its part is
+    reached, so a streamed response sends the VDOM before reading the
+    sections. The parts of a complete detail are cached encoded until its
+    VDOM or firewall changes (see app.cache).
+    """
+    unknown = set(sections) - set(DETAIL_SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown section {', '.join(sorted(unknown))}; expected {', '.join(DETAIL_SECTIONS)}")
+    sections = [section for section in DETAIL_SECTIONS if section in sections]
+    key = (vdom_id, tuple(sections), limit)
+    detail = vdom_detail_cache.get(key)
+    if detail is not None:
+        yield from detail.items()
+        return
+
+    sequence = vdom_detail_cache.sequence
+    statement = (
+        select(*VDOM_DETAIL_SHAPE.select_columns())
+        .select_from(VDOM)
+        .join(Firewall, VDOM.firewall_id == Firewall.firewall_id)
+        .where(VDOM.vdom_id == vdom_id)
+    )
+    found = rows.fetch(db, VDOM_DETAIL_SHAPE, statement)
+    if not found:
+        return
+    vdom = found[0]
+    detail = {"vdom": rows.dumps(vdom)}
+    yield "vdom", detail["vdom"]
+    for section in sections:
+        items = _section_rows(db, section, vdom, limit)
+        detail[section] = rows.dumps({"items": items, "total_count": getattr(vdom, f"total_{section}")})
+        yield section, detail[section]
+    vdom_detail_cache.put(key, vdom.firewall_id, detail, sequence)
+
 def get_vdoms(
     db: Session,
     skip: int = 0,
@@ -105,6 +194,16 @@ def get_vdoms(
 
     return processed_items, total_count
 
+def vdom_sort_key(sort_by: Optional[str], sort_order: Optional[str]):
+    # The order of get_vdoms, for merging the pages of shards (see app.sharding)
+    if sort_by == "fw_name":
+        key = lambda vdom: vdom.firewall.fw_name
+    elif sort_by in ("total_interfaces", "total_vips", "total_routes"):
+        key = attrgetter(sort_by)
+    else:
+        key = attrgetter("vdom_name")
+    return key, bool(sort_by) and sort_order.lower() == "desc"
+
 def get_vdom_by_name_and_firewall(
     db: Session, 
     vdom_name: str, 
@@ -144,10 +243,75 @@ def update_vdom(
     return db_vdom
 
 def delete_vdom(db: Session, vdom_id: int) -> bool:
-    db_vdom = get_vdom(db, vdom_id)
-    if db_vdom is None:
+    firewall_id = db.query(VDOM.firewall_id).filter(VDOM.vdom_id == vdom_id).scalar()
+    if firewall_id is None:
         return False
-    
-    db.delete(db_vdom)
+
+    # One statement: ON DELETE CASCADE removes the interfaces, routes, VIPs
+    # and their search index rows without loading them
+    db.query(VDOM).filter(VDOM.vdom_id == vdom_id).delete(synchronize_session=False)
+    events.notify_delete(db, "vdoms", vdom_id, firewall_id=firewall_id, vdom_id=vdom_id)
+    db.commit()
+    return True
+
+def _cascaded_counts(db: Session, vdom_ids) -> Dict[str, int]:
+    return {
+        "interfaces": db.query(func.count(Interface.interface_id)).filter(Interface.vdom_id.in_(vdom_ids)).scalar(),
+        "routes": db.query(func.count(Route.route_id)).filter(Route.vdom_id.in_(vdom_ids)).scalar(),
+        "vips": db.query(func.count(VIP.vip_id)).filter(VIP.vdom_id.in_(vdom_ids)).scalar(),
+    }
+
+def delete_vdoms(
+    db: Session,
+    firewall_id: Optional[int] = None,
+    vdom_ids: Optional[List[int]] = None,
+    vdom_name: Optional[str] = None,
+    updated_before: Optional[datetime] = None
+) -> Tuple[int, Dict[str, int]]:
+    conditions = []
+    if firewall_id is not None:
+        conditions.append(VDOM.firewall_id == firewall_id)
+    if vdom_ids:
+        conditions.append(VDOM.vdom_id.in_(vdom_ids))
+    if vdom_name is not None:
+        conditions.append(VDOM.vdom_name == vdom_name)
+    if updated_before is not None:
+        conditions.append(VDOM.last_updated < updated_before)
+    if not conditions:
+        raise ValueError("At least one filter is required")
+
+    partitioning.lock_partition_ddl(db.connection())
+    cascaded = _cascaded_counts(db, select(VDOM.vdom_id).where(*conditions))
+    deleted = db.query(VDOM).filter(*conditions).delete(synchronize_session=False)
+    if deleted:
+        single_id = vdom_ids[0] if vdom_ids and len(vdom_ids) == 1 else None
+        events.notify_delete(db, "vdoms", single_id, firewall_id=firewall_id, vdom_id=single_id)
     db.commit()
-    return True
\ No newline at end of file
+    return deleted, cascaded
+
+def sync_firewall_vdoms(db: Session, firewall_id: int, vdoms: List[VDOMCreate]) -> Dict[str, int]:
+    """
+    Make the VDOMs of a firewall exactly `vdoms`, matched by name: new ones
+    are added, changed indexes updated and missing ones deleted with
+    everything in them. Returns {vdom_name: vdom_id}.
+    """
+    partitioning.lock_partition_ddl(db.connection())
+    existing = {vdom.vdom_name: vdom for vdom in db.query(VDOM).filter(VDOM.firewall_id == firewall_id)}
+    kept = {}
+    for vdom in vdoms:
+        db_vdom = existing.get(vdom.vdom_name)
+        if db_vdom is None:
+            db_vdom = VDOM(firewall_id=firewall_id, vdom_name=vdom.vdom_name, vdom_index=vdom.vdom_index)
+            db.add(db_vdom)
+        elif db_vdom.vdom_index != vdom.vdom_index:
+            db_vdom.vdom_index = vdom.vdom_index
+        kept[vdom.vdom_name] = db_vdom
+    db.flush()
+    # Read before the commit, which expires them
+    vdom_ids = {name: db_vdom.vdom_id for name, db_vdom in kept.items()}
+    missing = [db_vdom.vdom_id for name, db_vdom in existing.items() if name not in kept]
+    db.commit()
+
+    if missing:
+        delete_vdoms(db, firewall_id=firewall_id, vdom_ids=missing)
+    return vdom_ids
@@ -1,12 +1,47 @@
 from sqlalchemy.orm import Session, joinedload # Import joinedload
+from sqlalchemy import select
+from datetime import datetime
 from typing import List, Optional, Tuple # Import Tuple
 from app.models.vip import VIP
-from app.schemas.vip import VIPCreate, VIPUpdate
+from app.models.firewall import Firewall
+from app.schemas.vip import VIPCreate, VIPUpdate, VIPResponse
+import app.crud.ip_address as ip_address_crud
+from app.crud.vdom import VDOM_SHAPE
+from app import events, rows, versioning
 from app.models.vdom import VDOM # Added for eager loading
+from operator import attrgetter
+
+# VIPs with their VDOM and firewall, as returned by the list endpoints (see app.rows)
+VIP_SHAPE = rows.Shape(VIPResponse, VIP.__table__.columns, nested={"vdom": VDOM_SHAPE})
+# VIPs without their VDOM, as listed by the VDOM detail endpoint
+VIP_ITEM_SHAPE = rows.Shape(VIPResponse, VIP.__table__.columns)
 
 def get_vip(db: Session, vip_id: int) -> Optional[VIP]:
     return db.query(VIP).options(joinedload(VIP.vdom).joinedload(VDOM.firewall)).filter(VIP.vip_id == vip_id).first()
 
+def _vip_order(sort_by: Optional[str], sort_order: Optional[str]):
+    # Sorting by vdom_name needs VDOM joined
+    if sort_by:
+        if sort_by == "vdom_name":
+            sort_column = VDOM.vdom_name
+        else:
+            # Fallback to external_ip if sort_by is not recognized
+            sort_column = VIP.external_ip
+        
+        if sort_order.lower() == "desc":
+            return sort_column.desc()
+        return sort_column.asc()
+    # Default sorting by external IP
+    return VIP.external_ip.asc()
+
+def vip_sort_key(sort_by: Optional[str], sort_order: Optional[str]):
+    # _vip_order on rows, for merging the pages of shards (see app.sharding)
+    if sort_by == "vdom_name":
+        key = lambda row: row.vdom.vdom_name if row.vdom else None
+    else:
+        key = attrgetter("external_ip")
+    return key, bool(sort_by) and sort_order.lower() == "desc"
+
 def get_vips(
     db: Session,
     skip: int = 0,
@@ -31,27 +66,58 @@ def get_vips(
         query = query.filter(VIP.vdom_id == vdom_id)
     if vip_type:
         query = query.filter(VIP.vip_type == vip_type)
-    
-    # Add sorting
-    if sort_by:
-        if sort_by == "vdom_name":
-            sort_column = VDOM.vdom_name
-        else:
-            # Fallback to external_ip if sort_by is not recognized
-            sort_column = VIP.external_ip
-        
-        if sort_order.lower() == "desc":
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
-    else:
-        # Default sorting by external IP
-        query = query.order_by(VIP.external_ip.asc())
+    query = query.order_by(_vip_order(sort_by, sort_order))
         
     total_count = query.count() # Get total count before applying limit/offset
     vips = query.offset(skip).limit(limit).all()
     return vips, total_count
 
+def vip_rows_select():
+    # The select of get_vip_rows before filtering
+    return (
+        select(*VIP_SHAPE.select_columns())
+        .select_from(VIP)
+        .join(VDOM, VIP.vdom_id == VDOM.vdom_id)
+        .join(Firewall, VDOM.firewall_id == Firewall.firewall_id)
+    )
+
+def get_vip_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    vdom_id: Optional[int] = None,
+    vip_type: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc",
+    as_of: Optional[datetime] = None
+) -> Tuple[List[rows.Row], int]:
+    """
+    The VIPs of get_vips as read-only rows with their VDOM and firewall (see
+    app.rows), for the list endpoints, and their total count. With as_of,
+    the VIPs as they were then (see app.versioning).
+    """
+    versioning.check_as_of(db.get_bind(), as_of)
+    statement = vip_rows_select()
+    if vdom_id:
+        statement = statement.filter(VIP.vdom_id == vdom_id)
+    if vip_type:
+        statement = statement.filter(VIP.vip_type == vip_type)
+    statement = versioning.at(statement.order_by(_vip_order(sort_by, sort_order)), as_of)
+    total_count = rows.count(db, statement)
+    return rows.fetch(db, VIP_SHAPE, statement.offset(skip).limit(limit)), total_count
+
+def get_vdom_vip_rows(db: Session, vdom_id: int, limit: int = 10000) -> List[rows.Row]:
+    """
+    The first VIPs of a VDOM by external IP, as rows without their VDOM.
+    """
+    statement = (
+        select(*VIP_ITEM_SHAPE.select_columns())
+        .where(VIP.vdom_id == vdom_id)
+        .order_by(_vip_order(None, None))
+        .limit(limit)
+    )
+    return rows.fetch(db, VIP_ITEM_SHAPE, statement)
+
 def create_vip(db: Session, vip: VIPCreate) -> VIP:
     db_vip = VIP(
         vdom_id=vip.vdom_id,
@@ -64,6 +130,8 @@ def create_vip(db: Session, vip: VIPCreate) -> VIP:
         mask=vip.mask
     )
     db.add(db_vip)
+    db.flush()
+    ip_address_crud.sync_vip(db, db_vip)
     db.commit()
     db.refresh(db_vip)
     return db_vip
@@ -81,6 +149,8 @@ def update_vip(
     for key, value in update_data.items():
         setattr(db_vip, key, value)
     
+    db.flush()
+    ip_address_crud.sync_vip(db, db_vip)
     db.commit()
     db.refresh(db_vip)
     return db_vip
@@ -90,10 +160,61 @@ def delete_vip(db: Session, vip_id: int) -> bool:
     if db_vip is None:
         return False
     
+    ip_address_crud.remove_source(db, ip_address_crud.SOURCE_VIP, db_vip.vip_id)
     db.delete(db_vip)
     db.commit()
     return True
 
+def delete_vips(
+    db: Session,
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    vip_type: Optional[str] = None,
+    updated_before: Optional[datetime] = None
+) -> int:
+    conditions = []
+    if firewall_id is not None:
+        conditions.append(VIP.vdom_id.in_(select(VDOM.vdom_id).where(VDOM.firewall_id == firewall_id)))
+    if vdom_id is not None:
+        conditions.append(VIP.vdom_id == vdom_id)
+    if vip_type is not None:
+        conditions.append(VIP.vip_type == vip_type)
+    if updated_before is not None:
+        conditions.append(VIP.last_updated < updated_before)
+    if not conditions:
+        raise ValueError("At least one filter is required")
+
+    # Index rows first, while the ids can still be selected
+    ip_address_crud.remove_sources(db, ip_address_crud.SOURCE_VIP, select(VIP.vip_id).where(*conditions))
+    deleted = db.query(VIP).filter(*conditions).delete(synchronize_session=False)
+    if deleted:
+        events.notify_change(db, "vips", "delete", firewall_id=firewall_id, vdom_id=vdom_id)
+    db.commit()
+    return deleted
+
+def replace_firewall_vips(db: Session, firewall_id: int, vips: List[VIPCreate]) -> Tuple[int, int]:
+    """
+    Replace the VIPs of all VDOMs of a firewall in one transaction. Returns
+    (deleted, loaded).
+    """
+    firewall_vdoms = select(VDOM.vdom_id).where(VDOM.firewall_id == firewall_id)
+    vdom_ids = {vip.vdom_id for vip in vips}
+    foreign = sorted(vdom_ids - set(db.scalars(firewall_vdoms.where(VDOM.vdom_id.in_(vdom_ids)))))
+    if foreign:
+        raise ValueError(f"VDOMs {', '.join(map(str, foreign))} do not belong to firewall {firewall_id}")
+
+    # Index rows first, while the old ids can still be selected
+    ip_address_crud.remove_sources(db, ip_address_crud.SOURCE_VIP, select(VIP.vip_id).where(VIP.vdom_id.in_(firewall_vdoms)))
+    deleted = db.query(VIP).filter(VIP.vdom_id.in_(firewall_vdoms)).delete(synchronize_session=False)
+    if vips:
+        db.execute(VIP.__table__.insert(), [vip.model_dump() for vip in vips])
+    ip_address_crud.index_firewall_vips(db, firewall_id)
+
+    events.notify_change(db, "vips", "delete", firewall_id=firewall_id)
+    events.notify_change(db, "vips", "create", firewall_id=firewall_id)
+    db.commit()
+    return deleted, len(vips)
+
 import ipaddress
 from typing import Tuple, List, Optional
 from sqlalchemy.orm import Session, joinedload
@@ -136,4 +257,33 @@ def search_vips_by_ip(
         )
         total_count = query.count()
         vips = query.offset(skip).limit(limit).all()
-        return vips, total_count
\ No newline at end of file
+        return vips, total_count
+
+from app.utils.nat_index import NATIndex
+
+# Keep IN lists well below driver/planner limits for large batches
+RESOLVE_CHUNK_SIZE = 1000
+
+def get_nat_index(db: Session, ips: List[str], reverse: bool = False) -> NATIndex:
+    # Only load the VIPs whose lookup address is in the batch; the composite
+    # (ip, port) indexes serve the IN filter
+    ip_column = VIP.mapped_ip if reverse else VIP.external_ip
+    unique_ips = sorted(set(ips))
+    vips = []
+    for i in range(0, len(unique_ips), RESOLVE_CHUNK_SIZE):
+        chunk = unique_ips[i:i + RESOLVE_CHUNK_SIZE]
+        vips.extend(
+            db.query(VIP)
+            .options(joinedload(VIP.vdom).joinedload(VDOM.firewall))
+            .filter(ip_column.in_(chunk))
+            .all()
+        )
+    return NATIndex(vips, reverse=reverse)
+
+def resolve_vips(
+    db: Session,
+    lookups: List[Tuple[str, Optional[int]]],
+    reverse: bool = False
+) -> Tuple[NATIndex, List[List[VIP]]]:
+    index = get_nat_index(db, [ip for ip, _ in lookups], reverse=reverse)
+    return index, [index.lookup(ip, port) for ip, port in lookups]
@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,15 +21,127 @@ if not SQLALCHEMY_DATABASE_URL:
     DB_PORT = os.getenv("DB_PORT", "5432")
     SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def enforce_foreign_keys(engine):
+    """
+    Turn on foreign keys for every connection of a SQLite engine: SQLite
+    leaves them off, and deletes rely on ON DELETE CASCADE for the rows
+    below a firewall or VDOM.
+    """
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", lambda connection, _: connection.execute("PRAGMA foreign_keys = ON"))
+    return engine
+
+# A local SQLite snapshot to serve reads from instead (see app.edge)
+EDGE_SNAPSHOT_PATH = os.getenv("EDGE_SNAPSHOT_PATH")
+
+if EDGE_SNAPSHOT_PATH:
+    from app.edge import EdgeSnapshot
+
+    edge = EdgeSnapshot(EDGE_SNAPSHOT_PATH)
+    # Sessions bind to the file being served at the time they are opened
+    engine = edge.engine
+    SessionLocal = edge.session
+else:
+    edge = None
+    engine = enforce_foreign_keys(create_engine(SQLALCHEMY_DATABASE_URL))
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Streaming replicas for list and search reads (see app.replicas)
+from app.replicas import READ_PRIMARY_COOKIE, REPLICA_CONNECT_TIMEOUT, ReplicaSet  # noqa: E402
+
+DATABASE_READ_URLS = [] if edge else [url.strip() for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url.strip()]
+replicas = ReplicaSet([
+    create_engine(url, pool_pre_ping=True, connect_args={"connect_timeout": REPLICA_CONNECT_TIMEOUT})
+    for url in DATABASE_READ_URLS
+])
+
+# Shards 1 to N-1 next to DATABASE_URL, shard 0 (see app.sharding)
+from app.sharding import ShardSet  # noqa: E402
+
+SHARD_DATABASE_URLS = [] if edge else [url.strip() for url in os.getenv("SHARD_DATABASE_URLS", "").split(",") if url.strip()]
+shards = ShardSet([engine, *(enforce_foreign_keys(create_engine(url)) for url in SHARD_DATABASE_URLS)], SessionLocal)
 
 Base = declarative_base()
 
+async def route_shard(request: Request) -> Optional[int]:
+    """
+    The shard of the ids a request names, or None when it names none.
+    """
+    if not shards.sharded:
+        return None
+    body = {}
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            # Already read and kept by FastAPI for the endpoint's body parameter
+            body = await request.json()
+        except ValueError:
+            pass
+    return shards.route(
+        request.path_params.items(),
+        request.query_params.multi_items(),
+        body.items() if isinstance(body, dict) else ()
+    )
+
 # Dependency to get DB session
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request, shard: Optional[int] = Depends(route_shard)):
+    batch = getattr(request.state, "batch", None)
+    if batch is not None:
+        # A sub-request of POST /api/batch, on the batch's snapshot (see app.batch)
+        with batch.primary.lend() as db:
+            yield db
+        return
+    db = SessionLocal() if shard is None else shards.session(shard)
+    try:
+        yield db
+    finally:
+        shards.close(db)
+
+def get_read_db(request: Request, shard: Optional[int] = Depends(route_shard)):
+    """
+    Session for read-only endpoints: on a replica, or on the primary when
+    none is usable or the client wrote within READ_YOUR_WRITES_SECONDS.
+    Replicas serve shard 0; a request routed to another shard reads its
+    primary. The route is left in request.state for the X-Database-Route
+    header.
+    """
+    batch = getattr(request.state, "batch", None)
+    if batch is not None:
+        pool, request.state.database_route = batch.read_pool(READ_PRIMARY_COOKIE in request.cookies)
+        with pool.lend() as db:
+            yield db
+        return
+    if shard:
+        db = shards.session(shard)
+        request.state.database_route = f"shard {shard}"
+        try:
+            yield db
+        finally:
+            shards.close(db)
+        return
+    replica = None
+    sticky = READ_PRIMARY_COOKIE in request.cookies
+    if replicas and not sticky:
+        replica = replicas.pick()
+    db = None
+    if replica is not None:
+        db = SessionLocal(bind=replica.engine)
+        try:
+            # Connect now, so that a replica gone since its last check
+            # falls back to the primary instead of failing the request
+            db.connection()
+        except SQLAlchemyError as e:
+            db.close()
+            db = None
+            replicas.mark_down(replica, str(e).splitlines()[0])
+    if db is None:
+        replicas.count_primary_read(sticky)
+        db = SessionLocal()
+        request.state.database_route = "primary"
+    else:
+        request.state.database_route = "replica"
+    if shard is not None:
+        db.info["shard"] = shard
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        shards.close(db)
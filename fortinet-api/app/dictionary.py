@@ -0,0 +1,182 @@
+"""
+Dictionary encoding of repeated column values.
+
+Routes repeat a handful of route types, and every prefix behind the same
+gateway repeats that gateway, the exit interface and its status text
+('vlan interface with ip 213.166.34.38/29 is up'). The routes table stores
+a two-byte route_type_id and a four-byte nexthop_id instead, pointing at the
+route_types and route_nexthops lookup tables.
+
+Readers get the values back through joins (see app.models.route). Writers
+(the crud layer, the importer and snapshot restore) hold rows of values and
+pass them through an Encoder, which swaps the values for ids and adds the
+values a lookup table does not hold yet. Lookup rows are only ever added,
+also by replacing imports and restores, so an id keeps its meaning: the
+archived versions of routes (see app.versioning) decode with the same joins.
+"""
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import Column, Table, or_, select
+from sqlalchemy.dialects import postgresql
+
+# {table: {id column: lookup table}}
+ENCODED_COLUMNS = {
+    "routes": {"route_type_id": "route_types", "nexthop_id": "route_nexthops"},
+}
+LOOKUP_TABLES = tuple(lookup for columns in ENCODED_COLUMNS.values() for lookup in columns.values())
+
+def _table(name: str) -> Table:
+    from app.database import Base
+    import app.models  # noqa: F401 - register all mappers
+
+    return Base.metadata.tables[name]
+
+def _key(lookup: str) -> Column:
+    return list(_table(lookup).primary_key.columns)[0]
+
+def value_columns(lookup: str) -> List[Column]:
+    # Every column of a lookup table but its key
+    return [column for column in _table(lookup).columns if not column.primary_key]
+
+def decoded_columns(table: str) -> List[Column]:
+    """
+    The columns of a table as writers and readers see them: every encoded id
+    column is replaced by the value columns of its lookup table.
+    """
+    encoded = ENCODED_COLUMNS.get(table, {})
+    columns = []
+    for column in _table(table).columns:
+        if column.name in encoded:
+            columns.extend(value_columns(encoded[column.name]))
+        else:
+            columns.append(column)
+    return columns
+
+def decoded_select(table: str, names: Sequence[str]):
+    """
+    A select of the named decoded columns of a table, joining its lookups.
+    """
+    sa_table = _table(table)
+    by_name = {column.name: column for column in decoded_columns(table)}
+    source = sa_table
+    for id_column, lookup in ENCODED_COLUMNS.get(table, {}).items():
+        source = source.join(_table(lookup), sa_table.c[id_column] == _key(lookup))
+    return select(*[by_name[name] for name in names]).select_from(source)
+
+class Encoder:
+    """
+    Swaps the values of encoded columns for lookup ids in rows of one table.
+
+    New values are added to the lookup tables on `connection`, in whatever
+    transaction it is in: rows that use them must be written in the same
+    transaction, or after it commits. Bulk writers pass preload=True to read
+    the lookup tables once instead of looking up each new value; writers of
+    a few thousand rows call resolve() with them instead.
+    """
+
+    def __init__(self, connection, table: str, preload: bool = False):
+        self.connection = connection
+        self.encoded = ENCODED_COLUMNS.get(table, {})
+        self._ids: Dict[str, Dict[tuple, int]] = {lookup: {} for lookup in self.encoded.values()}
+        if preload:
+            for lookup in self.encoded.values():
+                names = value_columns(lookup)
+                for row in connection.execute(select(_key(lookup), *names)):
+                    self._ids[lookup][tuple(row[1:])] = row[0]
+
+    def lookup_id(self, lookup: str, values: tuple) -> int:
+        ids = self._ids[lookup]
+        found = ids.get(values)
+        if found is None:
+            found = ids[values] = self._find(lookup, values) or self._add(lookup, values)
+        return found
+
+    def _find(self, lookup: str, values: tuple):
+        conditions = [
+            column.is_(None) if value is None else column == value
+            for column, value in zip(value_columns(lookup), values)
+        ]
+        return self.connection.execute(select(_key(lookup)).where(*conditions)).scalar()
+
+    def _add(self, lookup: str, values: tuple) -> int:
+        table = _table(lookup)
+        row = {column.name: value for column, value in zip(value_columns(lookup), values)}
+        if self.connection.dialect.name != "postgresql":
+            return self.connection.execute(table.insert().values(row)).inserted_primary_key[0]
+        # A concurrent writer may add the same values first
+        added = self.connection.execute(
+            postgresql.insert(table).values(row).on_conflict_do_nothing().returning(_key(lookup))
+        ).scalar()
+        return added if added is not None else self._find(lookup, values)
+
+    def resolve(self, columns: Sequence[str], rows: Sequence[Sequence]) -> None:
+        """
+        Find the ids of the values used in rows of values in `columns` order,
+        one select per lookup table, and on PostgreSQL add the missing values
+        in one insert.
+        """
+        for lookup in self.encoded.values():
+            names = value_columns(lookup)
+            indexes = [columns.index(column.name) if column.name in columns else None for column in names]
+            ids = self._ids[lookup]
+            wanted = {tuple(None if i is None else row[i] for i in indexes) for row in rows} - ids.keys()
+            if not wanted:
+                continue
+            # Selects a superset of the wanted values; the exact ones are kept below
+            conditions = []
+            for position, column in enumerate(names):
+                present = {values[position] for values in wanted if values[position] is not None}
+                condition = column.in_(present) if present else None
+                if any(values[position] is None for values in wanted):
+                    condition = column.is_(None) if condition is None else or_(condition, column.is_(None))
+                conditions.append(condition)
+            for row in self.connection.execute(select(_key(lookup), *names).where(*conditions)):
+                if tuple(row[1:]) in wanted:
+                    ids[tuple(row[1:])] = row[0]
+
+            missing = sorted(wanted - ids.keys(), key=lambda values: [(value is None, "" if value is None else value) for value in values])
+            if missing and self.connection.dialect.name == "postgresql":
+                # Sorted, so concurrent writers insert shared values in the same order;
+                # values a concurrent writer adds first are found by lookup_id
+                added = self.connection.execute(
+                    postgresql.insert(_table(lookup))
+                    .values([{column.name: value for column, value in zip(names, values)} for values in missing])
+                    .on_conflict_do_nothing()
+                    .returning(_key(lookup), *names)
+                )
+                for row in added:
+                    ids[tuple(row[1:])] = row[0]
+
+    def encode(self, row: Dict[str, object]) -> Dict[str, object]:
+        """
+        A copy of a row of decoded column values with the ids in place of the
+        values. Missing values count as NULL.
+        """
+        row = dict(row)
+        for id_column, lookup in self.encoded.items():
+            values = tuple(row.pop(column.name, None) for column in value_columns(lookup))
+            row[id_column] = self.lookup_id(lookup, values)
+        return row
+
+    def encode_rows(
+        self, columns: Sequence[str], rows: Iterable[Sequence]
+    ) -> Tuple[List[str], Iterator[list]]:
+        """
+        The stored columns and rows for rows of values in `columns` order.
+        """
+        positions = []
+        for lookup in self.encoded.values():
+            names = [column.name for column in value_columns(lookup)]
+            positions.append((lookup, [columns.index(name) if name in columns else None for name in names]))
+        value_names = {column.name for lookup in self.encoded.values() for column in value_columns(lookup)}
+        kept = [i for i, name in enumerate(columns) if name not in value_names]
+        stored = [columns[i] for i in kept] + list(self.encoded)
+
+        def encoded():
+            for row in rows:
+                values = [row[i] for i in kept]
+                for lookup, indexes in positions:
+                    values.append(self.lookup_id(lookup, tuple(None if i is None else row[i] for i in indexes)))
+                yield values
+
+        return stored, encoded()
@@ -0,0 +1,205 @@
+"""
+Edge snapshots: the read API served from a local SQLite file.
+
+Branch sites and DR hosts run the API with EDGE_SNAPSHOT_PATH set instead
+of a PostgreSQL connection. `python -m app.cli edge publish PATH` writes
+the file on a host that has the database: the schema at head with its
+indexes, filled with the inventory, the route dictionaries, the IP search
+index and the policy objects from one repeatable-read transaction. Change
+history, row versions and tombstones are left empty. The file is written
+under a temporary name and renamed into place.
+
+Workers open the file read-only and immutable, memory-mapped up to
+EDGE_MMAP_BYTES, so every worker on the host reads the same pages of the
+page cache. At most every EDGE_CHECK_SECONDS a request checks whether the
+file was replaced. A new file is opened and checked first, then swapped
+in under the lock; sessions already open keep reading the old file,
+whose inode stays readable until they close. The swap publishes a resync
+event, which empties the caches of app.cache and app.topology.
+
+Publishers must replace the file by rename (rsync does by default), never
+rewrite it in place. Writes are refused with 405 (see app.main).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from app.events import POLICY_ENTITIES, RESYNC_ENTITY, broker, make_event
+
+logger = logging.getLogger(__name__)
+
+# Bumped when files of an older layout can no longer be served
+FORMAT_VERSION = 1
+EDGE_TABLES = (
+    "firewalls", "vdoms", "route_types", "route_nexthops", "interfaces", "routes", "vips", "ip_addresses",
+    *POLICY_ENTITIES,
+)
+EDGE_CHECK_SECONDS = float(os.getenv("EDGE_CHECK_SECONDS", "5"))
+EDGE_MMAP_BYTES = int(os.getenv("EDGE_MMAP_BYTES", str(4 * 2**30)))
+EDGE_POOL_SIZE = int(os.getenv("EDGE_POOL_SIZE", "8"))
+# Rows per INSERT while publishing
+PUBLISH_BATCH_SIZE = 10000
+
+class EdgeSnapshotError(Exception):
+    pass
+
+def _file_id(path: str) -> Tuple[int, int, int]:
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+def open_snapshot(path: str) -> Engine:
+    """
+    A read-only engine on a snapshot file, checked to be one.
+    """
+    uri = f"file:{os.path.abspath(path)}?mode=ro&immutable=1"
+
+    def connect():
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        connection.execute(f"PRAGMA mmap_size = {EDGE_MMAP_BYTES}")
+        connection.execute("PRAGMA query_only = 1")
+        return connection
+
+    engine = create_engine("sqlite://", creator=connect, poolclass=QueuePool, pool_size=EDGE_POOL_SIZE)
+    try:
+        with engine.connect() as connection:
+            version = connection.execute(text("PRAGMA user_version")).scalar()
+            tables = set(connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+    except Exception as e:
+        engine.dispose()
+        raise EdgeSnapshotError(f"{path}: not a readable SQLite file ({str(e).splitlines()[0]})")
+    missing = [table for table in EDGE_TABLES if table not in tables]
+    if version != FORMAT_VERSION or missing:
+        engine.dispose()
+        raise EdgeSnapshotError(
+            f"{path}: format {version} (expected {FORMAT_VERSION})" + (f", missing {', '.join(missing)}" if missing else "")
+        )
+    return engine
+
+class EdgeSnapshot:
+    """
+    The snapshot file a worker serves, swapped when the file is replaced.
+    """
+
+    def __init__(self, path: str, check_seconds: float = EDGE_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._file_id = _file_id(path)
+        self._engine = open_snapshot(path)
+        self._checked_at = time.monotonic()
+        self.loaded_at = time.time()
+        self.swaps = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def engine(self) -> Engine:
+        """
+        The current engine, after swapping in a replaced file if one is due.
+        """
+        if time.monotonic() - self._checked_at >= self.check_seconds:
+            self.refresh()
+        return self._engine
+
+    def refresh(self) -> bool:
+        """
+        Swap in the file if it was replaced. A file that cannot be opened is
+        logged and the current one kept. Returns whether it swapped.
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                file_id = _file_id(self.path)
+                if file_id == self._file_id:
+                    return False
+                engine = open_snapshot(self.path)
+            except (OSError, EdgeSnapshotError) as e:
+                if str(e) != self.last_error:
+                    logger.error("Keeping the current edge snapshot: %s", e)
+                self.last_error = str(e)
+                return False
+            old, self._engine = self._engine, engine
+            self._file_id = file_id
+            self.loaded_at = time.time()
+            self.swaps += 1
+            self.last_error = None
+        # Checked-out connections keep the old file open until they are returned
+        old.dispose()
+        logger.info("Swapped in edge snapshot %s", self.path)
+        broker.publish(make_event(RESYNC_ENTITY, "resync"))
+        return True
+
+    def session(self, **kwargs) -> Session:
+        kwargs.setdefault("bind", self.engine)
+        return Session(autoflush=False, **kwargs)
+
+    def stats(self) -> dict:
+        _, mtime_ns, size = self._file_id
+        return {
+            "path": self.path,
+            "bytes": size,
+            "published_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(mtime_ns / 1e9)),
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.loaded_at)),
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+        }
+
+def publish_snapshot(path: str, engine=None) -> dict:
+    """
+    Write an edge snapshot of the database to `path`, replacing any file
+    there in one rename. Returns the rows per table, the size and the time.
+    """
+    import app.models  # noqa: F401 - register all tables
+    from app.database import Base
+
+    if engine is None:
+        from app.database import engine
+    started_at = time.monotonic()
+    directory = os.path.dirname(os.path.abspath(path))
+    temporary = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    if os.path.exists(temporary):
+        os.remove(temporary)
+
+    target = create_engine(f"sqlite:///{temporary}")
+    rows: Dict[str, int] = {}
+    try:
+        Base.metadata.create_all(target)
+        with engine.connect() as source:
+            if engine.dialect.name == "postgresql":
+                # One consistent view of every table, without blocking writers
+                source = source.execution_options(isolation_level="REPEATABLE READ")
+            with source.begin(), target.begin() as destination:
+                for name in EDGE_TABLES:
+                    table = Base.metadata.tables[name]
+                    result = source.execution_options(stream_results=True, yield_per=PUBLISH_BATCH_SIZE).execute(
+                        select(table).order_by(*table.primary_key.columns)
+                    )
+                    rows[name] = 0
+                    for batch in result.mappings().partitions():
+                        destination.execute(insert(table), [dict(row) for row in batch])
+                        rows[name] += len(batch)
+        with target.connect() as connection:
+            connection.execute(text(f"PRAGMA user_version = {FORMAT_VERSION}"))
+            connection.execute(text("ANALYZE"))
+            connection.commit()
+            connection.exec_driver_sql("VACUUM")
+        target.dispose()
+        with open(temporary, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        target.dispose()
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+    size = os.path.getsize(path)
+    logger.info("Published edge snapshot %s: %d bytes", path, size)
+    return {"path": path, "rows": rows, "bytes": size, "seconds": round(time.monotonic() - started_at, 2)}
@@ -0,0 +1,360 @@
+"""
+Change notifications.
+
+Every ORM flush that creates, updates or deletes a firewall, VDOM, interface,
+route, VIP, policy, or address or service object emits a NOTIFY on the CHANNEL with a small JSON payload.
+The notifications of a flush go out in one statement. PostgreSQL delivers
+them when the transaction commits. Set-based writes (bulk
+deletes, loaders) call notify_change() themselves.
+
+Each API worker runs one PostgresListener thread holding a single LISTEN
+connection, which republishes notifications to the in-process `broker`.
+Subscribers are SSE streams (see app.routers.event) and callbacks that
+drop in-process caches.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import Text, bindparam, event, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "netcollect_changes"
+
+# Entities that emit change events (table names)
+ENTITIES = (
+    "firewalls", "vdoms", "interfaces", "routes", "vips",
+    "policies", "addresses", "address_groups", "services", "service_groups",
+)
+
+# Entities of a VDOM's policy set (see app.policy_match)
+POLICY_ENTITIES = ("policies", "addresses", "address_groups", "services", "service_groups")
+
+# Entity of events that invalidate everything (listener reconnects, overflow)
+RESYNC_ENTITY = "*"
+
+# Entities removed by ON DELETE CASCADE when a row of the key entity is deleted
+CASCADES = {
+    "firewalls": ("vdoms", "interfaces", "routes", "vips", *POLICY_ENTITIES),
+    "vdoms": ("interfaces", "routes", "vips", *POLICY_ENTITIES),
+}
+
+# Per-subscriber queue size; a subscriber that falls behind gets a resync event
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+class ChangeEvent(dict):
+    """
+    A change notification: {"entity", "op", "id", "firewall_id", "vdom_id"}.
+    "id" is None for set-based changes that touched many rows.
+    """
+
+    @property
+    def entity(self) -> str:
+        return self.get("entity")
+
+def make_event(
+    entity: str,
+    op: str,
+    entity_id: Optional[int] = None,
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None
+) -> ChangeEvent:
+    return ChangeEvent(entity=entity, op=op, id=entity_id, firewall_id=firewall_id, vdom_id=vdom_id)
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, entities: Optional[Set[str]], firewall_id: Optional[int]):
+        self.loop = loop
+        self.entities = entities
+        self.firewall_id = firewall_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def matches(self, change: ChangeEvent) -> bool:
+        if change.entity == RESYNC_ENTITY:
+            return True
+        if self.entities and change.entity not in self.entities:
+            return False
+        # Events without a firewall (e.g. bulk changes) go to everyone
+        if self.firewall_id is not None and change.get("firewall_id") not in (None, self.firewall_id):
+            return False
+        return True
+
+    def _put(self, change: ChangeEvent) -> None:
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            # Replace the backlog with a single resync marker
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(make_event(RESYNC_ENTITY, "resync"))
+
+class EventBroker:
+    """
+    Fans change events out to asyncio subscribers and plain callbacks, and
+    keeps a per-entity data version that caches can key on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+        self._listeners: List[Callable[[ChangeEvent], None]] = []
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._epoch = 0
+        self._changed_at = 0.0
+
+    def subscribe(self, entities: Optional[Set[str]] = None, firewall_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop(), entities, firewall_id)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def add_listener(self, callback: Callable[[ChangeEvent], None]) -> None:
+        with self._lock:
+            self._listeners.append(callback)
+
+    def version(self, entity: Optional[str] = None) -> int:
+        """
+        Data version of one entity, or of all entities when entity is None.
+        """
+        with self._lock:
+            if entity is None:
+                return self._epoch + sum(self._versions.values())
+            return self._epoch + self._versions[entity]
+
+    def changed_at(self) -> float:
+        """
+        Wall-clock time of the last event, comparable across workers unlike
+        version().
+        """
+        with self._lock:
+            return self._changed_at
+
+    def publish(self, change: ChangeEvent) -> None:
+        """
+        Publish an event; safe to call from any thread.
+        """
+        with self._lock:
+            if change.entity == RESYNC_ENTITY:
+                self._epoch += 1
+            else:
+                self._versions[change.entity] += 1
+            self._changed_at = time.time()
+            subscriptions = list(self._subscriptions)
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(change)
+            except Exception:
+                logger.exception("Change listener failed")
+        for subscription in subscriptions:
+            if subscription.matches(change):
+                subscription.loop.call_soon_threadsafe(subscription._put, change)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+broker = EventBroker()
+
+NOTIFY_MANY = text("SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload").bindparams(
+    bindparam("payloads", type_=ARRAY(Text))
+)
+
+def _uses_notify(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+def _emit(session: Session, changes: List[ChangeEvent]) -> None:
+    if not changes:
+        return
+    if _uses_notify(session.get_bind()):
+        # One statement per flush, still one notification per change
+        session.connection().execute(
+            NOTIFY_MANY,
+            {"channel": CHANNEL, "payloads": [json.dumps(change) for change in changes]}
+        )
+    else:
+        # No NOTIFY outside PostgreSQL: publish locally once the transaction commits
+        session.info.setdefault("pending_changes", []).extend(changes)
+
+def notify_change(
+    db: Session,
+    entity: str,
+    op: str,
+    entity_id: Optional[int] = None,
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None
+) -> None:
+    """
+    Queue a change notification in the current transaction. Use this for
+    set-based writes that bypass the ORM unit of work.
+    """
+    _emit(db, [make_event(entity, op, entity_id, firewall_id, vdom_id)])
+
+def notify_delete(
+    db: Session,
+    entity: str,
+    entity_id: Optional[int] = None,
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None
+) -> None:
+    """
+    Queue delete notifications for a set-based delete, including the child
+    entities the database removes by cascade.
+    """
+    changes = [make_event(entity, "delete", entity_id, firewall_id, vdom_id)]
+    changes.extend(make_event(child, "delete", None, firewall_id, vdom_id) for child in CASCADES.get(entity, ()))
+    _emit(db, changes)
+
+def _tracked_models():
+    from app.models.firewall import Firewall
+    from app.models.vdom import VDOM
+    from app.models.interface import Interface
+    from app.models.route import Route
+    from app.models.vip import VIP
+    from app.models.policy import Policy
+    from app.models.address import Address, AddressGroup
+    from app.models.service import Service, ServiceGroup
+    return {
+        Firewall: "firewall_id",
+        VDOM: "vdom_id",
+        Interface: "interface_id",
+        Route: "route_id",
+        VIP: "vip_id",
+        Policy: "policy_id",
+        Address: "address_id",
+        AddressGroup: "group_id",
+        Service: "service_id",
+        ServiceGroup: "group_id",
+    }
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    tracked = _tracked_models()
+    pending = []
+    for op, objects in (("create", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            id_column = tracked.get(type(obj))
+            if id_column is None:
+                continue
+            if op == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            pending.append((obj, op, id_column))
+    if not pending:
+        return
+
+    # VIPs, policies and their objects only carry vdom_id; resolve their firewall in one query
+    from app.models.vdom import VDOM
+    vdom_ids = {obj.vdom_id for obj, _, _ in pending if getattr(obj, "vdom_id", None) and not hasattr(obj, "firewall_id")}
+    firewall_by_vdom = {}
+    if vdom_ids:
+        rows = session.connection().execute(
+            sql_select(VDOM.vdom_id, VDOM.firewall_id).where(VDOM.vdom_id.in_(vdom_ids))
+        )
+        firewall_by_vdom = dict(rows.all())
+
+    changes = []
+    for obj, op, id_column in pending:
+        vdom_id = getattr(obj, "vdom_id", None)
+        firewall_id = getattr(obj, "firewall_id", None)
+        if firewall_id is None:
+            firewall_id = firewall_by_vdom.get(vdom_id)
+        changes.append(make_event(type(obj).__tablename__, op, getattr(obj, id_column), firewall_id, vdom_id))
+    _emit(session, changes)
+
+@event.listens_for(Session, "after_commit")
+def _publish_local(session: Session) -> None:
+    changes = session.info.pop("pending_changes", None)
+    for change in changes or ():
+        broker.publish(change)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_local(session: Session) -> None:
+    session.info.pop("pending_changes", None)
+
+class PostgresListener(threading.Thread):
+    """
+    Holds one LISTEN connection and republishes notifications to the broker.
+    Reconnects with backoff when the connection drops.
+    """
+
+    def __init__(self, dsn: str, channel: str = CHANNEL, target: EventBroker = broker):
+        super().__init__(name="pg-listener", daemon=True)
+        self.dsn = dsn
+        self.channel = channel
+        self.target = target
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+                backoff = 1.0
+            except Exception as e:
+                logger.warning("LISTEN connection failed (%s); retrying in %.0fs", e, backoff)
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _listen(self) -> None:
+        import psycopg2
+        import psycopg2.extensions
+
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {self.channel}")
+            logger.info("Listening for change notifications on '%s'", self.channel)
+            # Anything may have changed while we were disconnected
+            self.target.publish(make_event(RESYNC_ENTITY, "resync"))
+            while not self._stop_event.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notification = conn.notifies.pop(0)
+                    try:
+                        change = ChangeEvent(json.loads(notification.payload))
+                    except ValueError:
+                        logger.warning("Ignoring malformed notification: %r", notification.payload)
+                        continue
+                    self.target.publish(change)
+        finally:
+            conn.close()
+
+# One per database: each shard notifies the changes written to it
+_listeners: Dict[str, PostgresListener] = {}
+
+def start_listener(engine) -> None:
+    if not _uses_notify(engine):
+        return
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    if dsn in _listeners:
+        return
+    _listeners[dsn] = PostgresListener(dsn)
+    _listeners[dsn].start()
+
+def stop_listener() -> None:
+    for listener in _listeners.values():
+        listener.stop()
+    for listener in _listeners.values():
+        listener.join(timeout=5)
+    _listeners.clear()
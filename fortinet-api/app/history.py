@@ -0,0 +1,292 @@
+"""
+History of interface status and of per-VDOM row counts (PostgreSQL only).
+
+Rows are updated in place, so their past is kept in append-only tables:
+- interface_status_history: one row per status change of an interface
+  name, recorded by triggers on interfaces (see app.models.history). The
+  current status of each name is kept in interface_status_latest; a write
+  that does not change it records nothing.
+- vdom_count_history: the interface, route and VIP counts of a VDOM, a
+  row only when they differ from its previous sample. record_vdom_counts
+  samples them; the collector calls it after storing a firewall, and
+  `python -m app.cli history sample` covers the other writers.
+
+Both are runs of unchanged state stored once, so an interface that never
+flaps costs one row. They are partitioned by month; `history maintain`
+(run daily) creates the coming months' partitions, rolls complete days up
+into interface_status_daily and vdom_count_daily, drops raw months older
+than RAW_RETENTION_DAYS and daily rows older than DAILY_RETENTION_DAYS.
+Range queries (app.crud.history) read the daily rollups for whole days and
+the raw rows only for what has not been rolled up yet.
+"""
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Days of raw rows kept; whole months are dropped, so up to a month more stays
+RAW_RETENTION_DAYS = int(os.getenv("HISTORY_RAW_RETENTION_DAYS", "90"))
+DAILY_RETENTION_DAYS = int(os.getenv("HISTORY_DAILY_RETENTION_DAYS", "730"))
+# Partitions created ahead of the current month
+MONTHS_AHEAD = 2
+
+# Raw history tables with their time column
+HISTORY_TABLES = {
+    "interface_status_history": "changed_at",
+    "vdom_count_history": "sampled_at",
+}
+
+COUNTED_TABLES = ("interfaces", "routes", "vips")
+
+_PARTITION_NAME = re.compile(rf"({'|'.join(HISTORY_TABLES)})_(y\d{{4}}m\d{{2}}|default)")
+
+# Aggregates of one bucket of raw rows, shared by the rollups and by range
+# queries over days that are not rolled up yet
+INTERFACE_STATUS_AGGREGATES = (
+    "count(*) AS transitions, count(*) FILTER (WHERE status = 'down') AS downs, "
+    "(array_agg(status ORDER BY changed_at DESC, history_id DESC))[1] AS last_status"
+)
+VDOM_COUNT_AGGREGATES = ", ".join(
+    f"min({column}) AS {column}_min, max({column}) AS {column}_max, "
+    f"(array_agg({column} ORDER BY sampled_at DESC, history_id DESC))[1] AS {column}_last"
+    for column in COUNTED_TABLES
+)
+
+def uses_history(connection) -> bool:
+    return connection.dialect.name == "postgresql"
+
+def is_partition(name: str) -> bool:
+    """
+    True for the names of the history partitions; migrations ignore them.
+    """
+    return _PARTITION_NAME.fullmatch(name) is not None
+
+def _month(day: date) -> date:
+    return day.replace(day=1)
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+def month_partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month:%Y}m{month:%m}"
+
+def _month_partitions(connection, table: str) -> Dict[date, str]:
+    prefix = f"{table}_y"
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {"table": table}).scalars()
+    return {
+        date(int(name[len(prefix):len(prefix) + 4]), int(name[-2:]), 1): name
+        for name in names
+        if name.startswith(prefix)
+    }
+
+def _create_month_partition(connection, table: str, month: date) -> None:
+    column = HISTORY_TABLES[table]
+    name = month_partition_name(table, month)
+    bounds = f"FROM ('{month}') TO ('{_next_month(month)}')"
+    # Rows written before the partition existed are in the default partition,
+    # which must give them up before a partition covering them can be attached
+    stranded = f"{column} >= '{month}' AND {column} < '{_next_month(month)}'"
+    if connection.execute(text(f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {stranded})")).scalar():
+        connection.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+        connection.execute(text(
+            f"WITH moved AS (DELETE FROM {table}_default WHERE {stranded} RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ))
+        connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    else:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"))
+
+def ensure_partitions(
+    connection,
+    today: Optional[date] = None,
+    since: Optional[date] = None,
+    months_ahead: int = MONTHS_AHEAD
+) -> List[str]:
+    """
+    Create the monthly partitions from `since` (default: this month) to
+    `months_ahead` months after this one. Returns the names created.
+    """
+    if not uses_history(connection):
+        return []
+    month = _month(since or today or datetime.utcnow().date())
+    last = _month(today or datetime.utcnow().date())
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    created = []
+    for table in HISTORY_TABLES:
+        existing = _month_partitions(connection, table)
+        current = month
+        while current <= last:
+            if current not in existing:
+                _create_month_partition(connection, table, current)
+                created.append(month_partition_name(table, current))
+            current = _next_month(current)
+    return created
+
+def record_interface_statuses(connection, firewall_id: int) -> int:
+    """
+    Record the status changes of a firewall's interfaces the way the
+    triggers do, for rows written without firing them (partition swaps).
+    Returns the number of changes.
+    """
+    if not uses_history(connection):
+        return 0
+    return connection.execute(text("""
+        WITH current AS (
+            SELECT DISTINCT ON (interface_name) firewall_id, vdom_id, interface_id, interface_name, status
+            FROM interfaces WHERE firewall_id = :firewall_id
+            ORDER BY interface_name, interface_id
+        ), changed AS (
+            INSERT INTO interface_status_latest AS l (firewall_id, interface_name, status, changed_at)
+            SELECT firewall_id, interface_name, status, now() FROM current
+            ON CONFLICT (firewall_id, interface_name) DO UPDATE
+                SET status = EXCLUDED.status, changed_at = EXCLUDED.changed_at
+                WHERE l.status IS DISTINCT FROM EXCLUDED.status
+            RETURNING interface_name
+        )
+        INSERT INTO interface_status_history (firewall_id, vdom_id, interface_id, interface_name, status, changed_at)
+        SELECT c.firewall_id, c.vdom_id, c.interface_id, c.interface_name, c.status, now()
+        FROM current c JOIN changed USING (interface_name)
+    """), {"firewall_id": firewall_id}).rowcount
+
+def record_vdom_counts(connection, firewall_id: Optional[int] = None) -> int:
+    """
+    Sample the interface, route and VIP counts of every VDOM, or of one
+    firewall's, and record those that changed. Runs in the caller's
+    transaction; returns the number of VDOMs recorded.
+    """
+    if not uses_history(connection):
+        return 0
+    only = "WHERE firewall_id = :firewall_id" if firewall_id is not None else ""
+    vip_filter = "WHERE vdom_id IN (SELECT vdom_id FROM vdoms WHERE firewall_id = :firewall_id)" if firewall_id is not None else ""
+    return connection.execute(text(f"""
+        WITH counts AS (
+            SELECT v.vdom_id, v.firewall_id,
+                   coalesce(i.n, 0) AS interfaces, coalesce(r.n, 0) AS routes, coalesce(x.n, 0) AS vips
+            FROM (SELECT vdom_id, firewall_id FROM vdoms {only}) v
+            LEFT JOIN (SELECT vdom_id, count(*) AS n FROM interfaces {only} GROUP BY vdom_id) i USING (vdom_id)
+            LEFT JOIN (SELECT vdom_id, count(*) AS n FROM routes {only} GROUP BY vdom_id) r USING (vdom_id)
+            LEFT JOIN (SELECT vdom_id, count(*) AS n FROM vips {vip_filter} GROUP BY vdom_id) x USING (vdom_id)
+        ), changed AS (
+            INSERT INTO vdom_counts_latest AS l (vdom_id, firewall_id, interfaces, routes, vips, sampled_at)
+            SELECT vdom_id, firewall_id, interfaces, routes, vips, now() FROM counts
+            ON CONFLICT (vdom_id) DO UPDATE
+                SET firewall_id = EXCLUDED.firewall_id, interfaces = EXCLUDED.interfaces,
+                    routes = EXCLUDED.routes, vips = EXCLUDED.vips, sampled_at = EXCLUDED.sampled_at
+                WHERE (l.interfaces, l.routes, l.vips) IS DISTINCT FROM (EXCLUDED.interfaces, EXCLUDED.routes, EXCLUDED.vips)
+            RETURNING vdom_id, firewall_id, interfaces, routes, vips, sampled_at
+        )
+        INSERT INTO vdom_count_history (vdom_id, firewall_id, interfaces, routes, vips, sampled_at)
+        SELECT vdom_id, firewall_id, interfaces, routes, vips, sampled_at FROM changed
+    """), {"firewall_id": firewall_id}).rowcount
+
+def rolled_up_through(connection, table: str) -> Optional[date]:
+    """
+    The last day rolled up into a daily table (interface_status_daily or
+    vdom_count_daily), or None.
+    """
+    return connection.execute(
+        text("SELECT rolled_through FROM history_rollups WHERE daily_table = :table"), {"table": table}
+    ).scalar()
+
+ROLLUPS = {
+    "interface_status_daily": ("interface_status_history", "changed_at", f"""
+        INSERT INTO interface_status_daily (firewall_id, interface_name, day, transitions, downs, last_status)
+        SELECT firewall_id, interface_name, changed_at::date, {INTERFACE_STATUS_AGGREGATES}
+        FROM interface_status_history
+        WHERE changed_at >= :start AND changed_at < :end
+        GROUP BY firewall_id, interface_name, changed_at::date
+    """),
+    "vdom_count_daily": ("vdom_count_history", "sampled_at", f"""
+        INSERT INTO vdom_count_daily (vdom_id, day, firewall_id, {", ".join(
+            f"{column}_min, {column}_max, {column}_last" for column in COUNTED_TABLES
+        )})
+        SELECT vdom_id, sampled_at::date, max(firewall_id), {VDOM_COUNT_AGGREGATES}
+        FROM vdom_count_history
+        WHERE sampled_at >= :start AND sampled_at < :end
+        GROUP BY vdom_id, sampled_at::date
+    """),
+}
+
+def rollup(connection, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Roll the complete days since the last rollup into the daily tables.
+    Returns the rows written per daily table.
+    """
+    if not uses_history(connection):
+        return {}
+    today = today or datetime.utcnow().date()
+    written = {}
+    for daily, (raw, column, statement) in ROLLUPS.items():
+        last = rolled_up_through(connection, daily)
+        start = last + timedelta(days=1) if last else connection.execute(text(f"SELECT min({column})::date FROM {raw}")).scalar()
+        written[daily] = 0
+        if start is not None and start < today:
+            written[daily] = connection.execute(text(statement), {"start": start, "end": today}).rowcount
+            connection.execute(text(
+                "INSERT INTO history_rollups (daily_table, rolled_through) VALUES (:table, :day) "
+                "ON CONFLICT (daily_table) DO UPDATE SET rolled_through = EXCLUDED.rolled_through"
+            ), {"table": daily, "day": today - timedelta(days=1)})
+    return written
+
+def purge(connection, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Drop the raw partitions whose month ended more than RAW_RETENTION_DAYS
+    ago and delete daily rows older than DAILY_RETENTION_DAYS. Raw rows are
+    only dropped once rolled up. Returns the partitions and rows removed.
+    """
+    if not uses_history(connection):
+        return {}
+    today = today or datetime.utcnow().date()
+    cutoff = today - timedelta(days=RAW_RETENTION_DAYS)
+    removed = {"partitions": 0}
+    for daily, (raw, column, _) in ROLLUPS.items():
+        rolled = rolled_up_through(connection, daily)
+        for month, name in sorted(_month_partitions(connection, raw).items()):
+            end = _next_month(month)
+            if end > cutoff or rolled is None or end > rolled + timedelta(days=1):
+                continue
+            connection.execute(text(f"DROP TABLE {name}"))
+            removed["partitions"] += 1
+        removed[raw] = 0
+        if rolled is not None:
+            removed[raw] = connection.execute(
+                text(f"DELETE FROM {raw}_default WHERE {column} < :cutoff"),
+                {"cutoff": min(cutoff, rolled + timedelta(days=1))}
+            ).rowcount
+        removed[daily] = connection.execute(
+            text(f"DELETE FROM {daily} WHERE day < :cutoff"), {"cutoff": today - timedelta(days=DAILY_RETENTION_DAYS)}
+        ).rowcount
+    # The latest state of interfaces and VDOMs that no longer exist
+    removed["interface_status_latest"] = connection.execute(text(
+        "DELETE FROM interface_status_latest l WHERE NOT EXISTS ("
+        "SELECT 1 FROM interfaces i WHERE i.firewall_id = l.firewall_id AND i.interface_name = l.interface_name)"
+    )).rowcount
+    removed["vdom_counts_latest"] = connection.execute(text(
+        "DELETE FROM vdom_counts_latest l WHERE NOT EXISTS (SELECT 1 FROM vdoms v WHERE v.vdom_id = l.vdom_id)"
+    )).rowcount
+    return removed
+
+def maintain(engine, today: Optional[date] = None) -> dict:
+    """
+    The daily job: create partitions, roll up complete days and apply
+    retention, each in its own transaction. Returns what each step did.
+    """
+    if engine.dialect.name != "postgresql":
+        return {}
+    today = today or datetime.utcnow().date()
+    with engine.begin() as connection:
+        created = ensure_partitions(connection, today)
+    with engine.begin() as connection:
+        rolled_up = rollup(connection, today)
+    with engine.begin() as connection:
+        purged = purge(connection, today)
+    return {"created_partitions": len(created), "rolled_up": rolled_up, "purged": purged}
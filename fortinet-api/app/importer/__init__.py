@@ -0,0 +1,6 @@
+"""
+Bulk import of firewalls, VDOMs, interfaces, routes and VIPs from SQL
+dumps, CSV or NDJSON. Run it with `python -m app.cli import`.
+"""
+from app.importer.loader import DataImportError, run_import
+from app.importer.report import ImportReport
@@ -0,0 +1,287 @@
+"""
+Parallel bulk loader.
+
+One reader streams every source and dispatches rows to one worker thread per
+table. A worker starts once its parent tables are loaded (firewalls, then
+VDOMs, then interfaces, routes, VIPs and the policy objects side by side) and streams its rows
+into PostgreSQL with COPY on its own connection. With replace=True the
+tables are truncated first and their secondary indexes are dropped and
+rebuilt in parallel after the load.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import events, partitioning, versioning
+from app.dictionary import Encoder
+from app.importer.normalize import IMPORT_TABLES, PARENTS, PRIMARY_KEYS, TableNormalizer, inherited_values
+from app.importer.readers import read_source, table_for_path
+from app.importer.report import ImportReport
+from app.utils.bulk_load import (
+    copy_rows, create_indexes, drop_secondary_indexes, insert_rows, reset_sequences, truncate_tables
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows handed from the reader to a worker at a time, and batches buffered per worker
+DISPATCH_BATCH_SIZE = 1000
+QUEUE_BATCHES = 64
+# Parallel CREATE INDEX statements after a replace
+INDEX_WORKERS = 4
+
+# Tables rebuilt by an import besides IMPORT_TABLES
+DERIVED_TABLES = ("ip_addresses",)
+
+_END = object()
+
+class DataImportError(Exception):
+    pass
+
+def _ancestors(table: str) -> Set[str]:
+    parents = set(PARENTS[table].values())
+    for parent in list(parents):
+        parents |= _ancestors(parent)
+    return parents
+
+class TableLoader(threading.Thread):
+    def __init__(self, engine, table: str, normalizer: TableNormalizer, parents: List["TableLoader"]):
+        super().__init__(name=f"import-{table}", daemon=True)
+        self.engine = engine
+        self.table = table
+        self.normalizer = normalizer
+        self.parents = parents
+        self.queue: queue.Queue = queue.Queue(maxsize=QUEUE_BATCHES)
+        self.finished = threading.Event()
+        self.closed = False
+        self.loaded = 0
+        self.error: Optional[str] = None
+        self._ended = False
+
+    def put(self, item) -> None:
+        while True:
+            try:
+                self.queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                if self.finished.is_set():
+                    return
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.put(_END)
+
+    def _rows(self) -> Iterator[dict]:
+        normalize = self.normalizer.normalize
+        while True:
+            batch = self.queue.get()
+            if batch is _END:
+                self._ended = True
+                return
+            for raw in batch:
+                row = normalize(raw)
+                if row is not None:
+                    yield row
+
+    def run(self) -> None:
+        try:
+            for parent in self.parents:
+                parent.finished.wait()
+            failed = [parent.table for parent in self.parents if parent.error]
+            if failed:
+                raise DataImportError(f"not loaded because {failed[0]} failed")
+            self.loaded = self._load()
+            if self.table == "firewalls":
+                # Children go into per-firewall partitions that must exist first
+                partitioning.sync_partitions(self.engine)
+        except Exception as e:
+            self.error = str(e).strip()
+            logger.error("Loading %s failed: %s", self.table, self.error)
+            # Keep consuming so the reader never blocks on this queue
+            while not self._ended:
+                if self.queue.get() is _END:
+                    self._ended = True
+        finally:
+            self.finished.set()
+
+    def _load(self) -> int:
+        rows = self._rows()
+        first = next(rows, None)
+        if first is None:
+            return 0
+        # All rows of a table are written with the columns of its first row
+        columns = [name for name, _, _ in self.normalizer.columns if name in first]
+
+        def chained():
+            yield first
+            yield from rows
+
+        # New lookup values commit right away, so the COPY transaction sees them
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            encoder = Encoder(connection, self.table, preload=True)
+            if self.engine.dialect.name == "postgresql":
+                stored, values = encoder.encode_rows(columns, ([row.get(name) for name in columns] for row in chained()))
+                return copy_rows(self.engine, self.table, stored, values)
+
+            # Outside PostgreSQL the driver wants datetime objects
+            kinds = {name: kind for name, kind, _ in self.normalizer.columns}
+            timestamps = [i for i, name in enumerate(columns) if kinds[name] == "timestamp"]
+
+            def values():
+                for row in chained():
+                    value = [row.get(name) for name in columns]
+                    for i in timestamps:
+                        if value[i] is not None:
+                            value[i] = datetime.fromisoformat(value[i])
+                    yield value
+
+            stored, encoded = encoder.encode_rows(columns, values())
+            if encoder.encoded:
+                # SQLite has one writer at a time: add the lookup values before the insert starts
+                encoded = list(encoded)
+            return insert_rows(self.engine, self.table, stored, encoded)
+
+def _existing_ids(engine, table: str) -> Set[int]:
+    with engine.connect() as connection:
+        return {row[0] for row in connection.execute(text(f"SELECT {PRIMARY_KEYS[table]} FROM {table}"))}
+
+def _existing_values(engine, table: str, column: str) -> Dict[int, object]:
+    with engine.connect() as connection:
+        return dict(connection.execute(text(f"SELECT {PRIMARY_KEYS[table]}, {column} FROM {table}")).all())
+
+def _ordered(sources: List[Tuple[str, Optional[str], Optional[str]]]):
+    # Per-table files go in dependency order; multi-table dumps keep their place first
+    def rank(source):
+        table = source[2] or table_for_path(source[0])
+        return IMPORT_TABLES.index(table) + 1 if table in IMPORT_TABLES else 0
+    return sorted(sources, key=rank)
+
+def _dispatch(sources, loaders: Dict[str, TableLoader]) -> None:
+    batches: Dict[str, list] = {table: [] for table in IMPORT_TABLES}
+    started: Set[str] = set()
+
+    def flush(table: str) -> None:
+        if batches[table]:
+            loaders[table].put(batches[table])
+            batches[table] = []
+
+    for path, fmt, table in _ordered(sources):
+        logger.info("Reading %s", path)
+        for row_table, row in read_source(path, fmt, table):
+            if row_table not in batches:
+                continue
+            if loaders[row_table].closed:
+                raise DataImportError(
+                    f"Rows for {row_table} appear after rows that depend on it; "
+                    f"pass the sources in dependency order ({', '.join(IMPORT_TABLES)})"
+                )
+            if row_table not in started:
+                started.add(row_table)
+                # Parents are complete once a child appears; let them load
+                for ancestor in _ancestors(row_table):
+                    flush(ancestor)
+                    loaders[ancestor].close()
+            batch = batches[row_table]
+            batch.append(row)
+            if len(batch) >= DISPATCH_BATCH_SIZE:
+                flush(row_table)
+
+    for table in IMPORT_TABLES:
+        flush(table)
+
+def run_import(
+    sources: List[Tuple[str, Optional[str], Optional[str]]],
+    engine=None,
+    replace: bool = False,
+    rebuild_ip_index: bool = True,
+    index_workers: int = INDEX_WORKERS
+) -> ImportReport:
+    """
+    Load (path, format, table) sources; format and table may be None to
+    infer them from the file name. Returns the validation report.
+    """
+    if engine is None:
+        from app.database import engine
+    postgres = engine.dialect.name == "postgresql"
+    report = ImportReport(list(IMPORT_TABLES))
+    started_at = time.monotonic()
+    versioning.new_generation(engine, "import", "replace" if replace else "append")
+
+    known_ids: Dict[str, Set[int]] = {table: set() for table in IMPORT_TABLES}
+    parent_values = inherited_values()
+    if not replace:
+        # Appended rows may reference parents that are already loaded
+        for table in ("firewalls", "vdoms"):
+            known_ids[table] = _existing_ids(engine, table)
+        for (table, column), values in parent_values.items():
+            values.update(_existing_values(engine, table, column))
+
+    deferred: List[Tuple[str, str]] = []
+    if replace:
+        # The lookup tables stay: archived route versions still use their ids
+        truncate_tables(engine, IMPORT_TABLES + DERIVED_TABLES)
+        if postgres:
+            deferred = drop_secondary_indexes(engine, IMPORT_TABLES + DERIVED_TABLES)
+
+    try:
+        loaders: Dict[str, TableLoader] = {}
+        for table in IMPORT_TABLES:
+            parents = [loaders[parent] for parent in sorted(set(PARENTS[table].values()))]
+            loaders[table] = TableLoader(engine, table, TableNormalizer(table, known_ids, parent_values), parents)
+            loaders[table].start()
+
+        try:
+            _dispatch(sources, loaders)
+        except Exception as e:
+            report.errors.append(str(e))
+        finally:
+            for loader in loaders.values():
+                loader.close()
+            for loader in loaders.values():
+                loader.join()
+
+        for table, loader in loaders.items():
+            table_report = report.tables[table]
+            table_report.read = loader.normalizer.read
+            table_report.loaded = loader.loaded
+            table_report.rejected = loader.normalizer.rejected
+            table_report.nulled = loader.normalizer.nulled
+            table_report.error = loader.error
+
+        if postgres:
+            reset_sequences(engine, PRIMARY_KEYS)
+
+        db = Session(bind=engine)
+        try:
+            if rebuild_ip_index:
+                from app.crud.ip_address import rebuild_ip_addresses
+                report.ip_index_rows = rebuild_ip_addresses(db)
+            # Clients and caches cannot follow a bulk load row by row
+            events.notify_change(db, events.RESYNC_ENTITY, "resync")
+            db.commit()
+        finally:
+            db.close()
+    finally:
+        if deferred:
+            logger.info("Rebuilding %d indexes", len(deferred))
+            report.errors.extend(create_indexes(engine, deferred, index_workers))
+            report.indexes_rebuilt = len(deferred)
+
+    with engine.begin() as connection:
+        for table in IMPORT_TABLES:
+            if postgres:
+                connection.execute(text(f"ANALYZE {table}"))
+            report.tables[table].row_count = connection.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+    if replace:
+        for table in report.tables.values():
+            if table.error is None and table.row_count != table.loaded:
+                report.errors.append(f"{table.table}: loaded {table.loaded} rows but the table holds {table.row_count}")
+
+    report.seconds = time.monotonic() - started_at
+    return report
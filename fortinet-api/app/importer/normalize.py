@@ -0,0 +1,273 @@
+"""
+In-flight value normalization for imports.
+
+Replaces the sed clean-up passes of the old shell scripts: placeholder
+strings such as 'None' and 'n/a' become NULL, addresses are validated and
+written in canonical form, and rows that still violate the schema or point
+at unknown parents are rejected and counted instead of failing the load.
+"""
+import ipaddress
+import json
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import JSON, Boolean, DateTime, Integer
+
+from app.dictionary import decoded_columns
+
+# Tables in dependency order: parents before children. Every table that
+# references vdoms is listed, as TRUNCATE ... CASCADE empties them all.
+IMPORT_TABLES = (
+    "firewalls", "vdoms", "interfaces", "routes", "vips",
+    "policies", "addresses", "address_groups", "services", "service_groups",
+)
+
+# Parent tables of each table, by foreign key column
+PARENTS = {
+    "firewalls": {},
+    "vdoms": {"firewall_id": "firewalls"},
+    "interfaces": {"firewall_id": "firewalls", "vdom_id": "vdoms"},
+    "routes": {"vdom_id": "vdoms"},
+    "vips": {"vdom_id": "vdoms"},
+    "policies": {"vdom_id": "vdoms"},
+    "addresses": {"vdom_id": "vdoms"},
+    "address_groups": {"vdom_id": "vdoms"},
+    "services": {"vdom_id": "vdoms"},
+    "service_groups": {"vdom_id": "vdoms"},
+}
+
+# Denormalized columns copied from the parent row's column of the same name:
+# {table: {column: (foreign key column, parent table)}}
+INHERITED_COLUMNS = {
+    "routes": {"firewall_id": ("vdom_id", "vdoms")},
+}
+
+PRIMARY_KEYS = {
+    "firewalls": "firewall_id",
+    "vdoms": "vdom_id",
+    "interfaces": "interface_id",
+    "routes": "route_id",
+    "vips": "vip_id",
+    "policies": "policy_id",
+    "addresses": "address_id",
+    "address_groups": "group_id",
+    "services": "service_id",
+    "service_groups": "group_id",
+}
+
+# Text columns that must hold an IP address
+IP_COLUMNS = {
+    "firewalls": {"fw_ip", "fmg_ip", "faz_ip"},
+    "interfaces": {"ip_address"},
+    "routes": {"destination_network", "gateway"},
+    "vips": {"external_ip", "mapped_ip"},
+}
+
+# Placeholders that exporters wrote instead of NULL
+NULL_PLACEHOLDERS = {"none", "null", "n/a"}
+# Boolean spellings of PostgreSQL dumps, CSV exports and FortiOS
+TRUE_VALUES = {"true", "t", "1", "yes", "enable"}
+FALSE_VALUES = {"false", "f", "0", "no", "disable"}
+
+class RejectedRow(ValueError):
+    pass
+
+def inherited_values() -> Dict[Tuple[str, str], Dict[int, object]]:
+    """
+    Empty {(parent table, column): {parent id: value}} maps for every
+    inherited column, filled by the normalizers of the parent tables.
+    """
+    return {
+        (parent, column): {}
+        for columns in INHERITED_COLUMNS.values()
+        for column, (_, parent) in columns.items()
+    }
+
+def table_columns(table: str) -> List[Tuple[str, str, bool]]:
+    """
+    (column, kind, nullable) for every column of a table, read from the ORM
+    model so the importer follows the schema. Kind is int, bool, timestamp,
+    json, ip or text. Dictionary-encoded columns are listed by their values (see
+    app.dictionary); the versioning columns are left out.
+    """
+    from app.models.generation import VERSION_COLUMNS
+
+    columns = []
+    for column in decoded_columns(table):
+        if column.name in VERSION_COLUMNS:
+            continue
+        if column.name in IP_COLUMNS.get(table, ()):
+            kind = "ip"
+        elif isinstance(column.type, Boolean):
+            kind = "bool"
+        elif isinstance(column.type, Integer):
+            kind = "int"
+        elif isinstance(column.type, JSON):
+            kind = "json"
+        elif isinstance(column.type, DateTime):
+            kind = "timestamp"
+        else:
+            kind = "text"
+        columns.append((column.name, kind, bool(column.nullable)))
+    return columns
+
+def defaulted_columns(table: str) -> Set[str]:
+    """
+    Columns the database fills in when a row leaves them out.
+    """
+    return {column.name for column in decoded_columns(table) if column.server_default is not None}
+
+_IPV4 = re.compile(r"(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(?:\.(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)){3}")
+
+def _normalize_ip(value: str) -> Optional[str]:
+    # Fast path for canonical IPv4, by far the most common value
+    if _IPV4.fullmatch(value):
+        return value
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        pass
+    # Interface addresses are sometimes exported as address/prefix
+    try:
+        return str(ipaddress.ip_interface(value).ip)
+    except ValueError:
+        return None
+
+def _normalize_int(value) -> Optional[int]:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        return int(number) if number.is_integer() else None
+
+def _normalize_bool(value) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    return None
+
+def _normalize_json(value):
+    # Lists and objects as read from NDJSON, or their JSON text from SQL and CSV
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+def _normalize_timestamp(value) -> Optional[str]:
+    text = str(value).strip()
+    try:
+        datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return text
+
+class TableNormalizer:
+    """
+    Normalizes the rows of one table and keeps the counters for the report.
+    `known_ids` holds the accepted primary keys of each parent table and
+    `parent_values` the values that children inherit (see inherited_values).
+    """
+
+    def __init__(
+        self,
+        table: str,
+        known_ids: Dict[str, Set[int]],
+        parent_values: Optional[Dict[Tuple[str, str], Dict[int, object]]] = None
+    ):
+        self.table = table
+        self.columns = table_columns(table)
+        self.primary_key = PRIMARY_KEYS[table]
+        self.defaulted = defaulted_columns(table)
+        self.parents = PARENTS[table]
+        self.known_ids = known_ids
+        self.inherited = INHERITED_COLUMNS.get(table, {})
+        self.parent_values = parent_values if parent_values is not None else inherited_values()
+        self.read = 0
+        self.accepted = 0
+        self.nulled: Counter = Counter()
+        self.rejected: Counter = Counter()
+
+    def _reject(self, reason: str):
+        self.rejected[reason] += 1
+        raise RejectedRow(reason)
+
+    def _value(self, name: str, kind: str, nullable: bool, raw):
+        if isinstance(raw, str):
+            stripped = raw.strip()
+            if stripped.lower() in NULL_PLACEHOLDERS or (stripped == "" and kind != "text"):
+                self.nulled[name] += 1
+                raw = None
+        if raw is None:
+            if not nullable:
+                self._reject(f"{name} is empty")
+            return None
+
+        if kind == "int":
+            value = _normalize_int(raw)
+        elif kind == "ip":
+            value = _normalize_ip(str(raw).strip())
+        elif kind == "bool":
+            value = _normalize_bool(raw)
+        elif kind == "json":
+            value = _normalize_json(raw)
+        elif kind == "timestamp":
+            value = _normalize_timestamp(raw)
+        else:
+            return str(raw)
+
+        if value is None:
+            if not nullable:
+                self._reject(f"invalid {name}")
+            self.nulled[name] += 1
+        return value
+
+    def normalize(self, raw: Dict[str, object]) -> Optional[Dict[str, object]]:
+        """
+        Return the cleaned row, or None if it was rejected.
+        """
+        self.read += 1
+        row = {}
+        try:
+            for name, kind, nullable in self.columns:
+                if name not in raw:
+                    # Without a primary key the row takes the next sequence value
+                    if not nullable and name != self.primary_key and name not in self.inherited and name not in self.defaulted:
+                        self._reject(f"{name} is missing")
+                    continue
+                # Inherited columns are filled in below even when the source leaves them empty
+                row[name] = self._value(name, kind, nullable or name in self.inherited, raw[name])
+            for column, parent in self.parents.items():
+                parent_id = row.get(column)
+                if parent_id is not None and parent_id not in self.known_ids[parent]:
+                    self._reject(f"unknown {column}")
+            for column, (via, parent) in self.inherited.items():
+                value = self.parent_values[(parent, column)].get(row.get(via))
+                if row.get(column) is not None and row[column] != value:
+                    self._reject(f"{column} does not match {via}")
+                row[column] = value
+        except RejectedRow:
+            return None
+
+        self.accepted += 1
+        key = row.get(self.primary_key)
+        if key is not None:
+            self.known_ids[self.table].add(key)
+            for (parent, column), values in self.parent_values.items():
+                if parent == self.table:
+                    values[key] = row.get(column)
+        return row
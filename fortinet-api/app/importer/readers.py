@@ -0,0 +1,247 @@
+"""
+Streaming readers for import sources.
+
+Every reader yields (table, row) pairs, where row maps column names to raw
+values (strings, numbers or None). Sources are read in fixed-size chunks,
+so multi-gigabyte dumps never have to fit in memory.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.importer.normalize import IMPORT_TABLES
+
+Row = Dict[str, object]
+
+CHUNK_SIZE = 1 << 20
+# Statement headers are matched against at most this much lookahead
+HEADER_WINDOW = 1 << 16
+
+FORMATS = ("sql", "csv", "ndjson")
+
+class SourceError(ValueError):
+    pass
+
+# A single SQL literal inside a VALUES tuple
+_VALUE = r"""(?:'[^']*(?:''[^']*)*'|[Ee]'[^'\\]*(?:(?:\\.|'')[^'\\]*)*'|[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|[A-Za-z]+)(?:::[A-Za-z_ ]+)?"""
+_TUPLE = re.compile(r"\s*\(\s*(" + _VALUE + r"(?:\s*,\s*" + _VALUE + r")*)\s*\)\s*([,;])", re.S)
+_VALUE_ITEM = re.compile(_VALUE, re.S)
+_IDENT = r'(?:"(?:[^"]|"")+"|[A-Za-z_][A-Za-z0-9_$]*)'
+_INSERT = re.compile(
+    r"INSERT\s+INTO\s+(" + _IDENT + r"(?:\s*\.\s*" + _IDENT + r")?)\s*\(([^)]*)\)\s*VALUES\s*",
+    re.I | re.S
+)
+_COPY = re.compile(
+    r"COPY\s+(" + _IDENT + r"(?:\s*\.\s*" + _IDENT + r")?)\s*\(([^)]*)\)\s+FROM\s+stdin\s*;[^\n]*\n",
+    re.I | re.S
+)
+# Whitespace and comments between statements; pg_dump comments contain ';'
+_GAP = re.compile(r"(?:\s+|--[^\n]*(?:\n|\Z)|/\*.*?\*/)*", re.S)
+# Any other statement, up to its terminating semicolon
+_STATEMENT = re.compile(r"""(?:[^;'"]+|'[^']*(?:''[^']*)*'|"[^"]*(?:""[^"]*)*")*;""", re.S)
+
+_COPY_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v", "\\": "\\"}
+_COPY_ESCAPE = re.compile(r"\\(.)")
+
+def _unquote_identifier(name: str) -> str:
+    # "public"."routes" -> routes
+    last = re.findall(_IDENT, name)[-1]
+    if last.startswith('"'):
+        return last[1:-1].replace('""', '"')
+    return last.lower()
+
+def _columns(column_list: str) -> List[str]:
+    return [_unquote_identifier(column) for column in column_list.split(",")]
+
+def _literal(token: str):
+    if token[0] == "'" and token[-1] == "'":
+        body = token[1:-1]
+        return body.replace("''", "'") if "''" in body else body
+    if "::" in token:
+        token = token[:token.rindex("::")]
+    if token[0] == "'":
+        return token[1:-1].replace("''", "'")
+    if token[0] in "Ee" and len(token) > 1 and token[1] == "'":
+        body = token[2:-1].replace("''", "'")
+        return _COPY_ESCAPE.sub(lambda m: _COPY_ESCAPES.get(m.group(1), m.group(1)), body)
+    lowered = token.lower()
+    if lowered == "null":
+        return None
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    return token
+
+def _copy_field(field: str):
+    if field == "\\N":
+        return None
+    if "\\" not in field:
+        return field
+    return _COPY_ESCAPE.sub(lambda m: _COPY_ESCAPES.get(m.group(1), m.group(1)), field)
+
+class _Buffer:
+    """
+    Sliding window over a text stream. Patterns are matched against the
+    window; a match that touches its end is retried after reading more,
+    since the token may continue in the next chunk. A failed match is
+    retried too while less than `window` characters are buffered.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def match(self, pattern, window: Optional[int] = None):
+        while True:
+            m = pattern.match(self.text, self.pos)
+            if m and (m.end() < len(self.text) or self.eof):
+                return m
+            if m is None and window is not None and len(self.text) - self.pos >= window:
+                return None
+            if not self.fill():
+                return pattern.match(self.text, self.pos)
+
+    def readline(self) -> Optional[str]:
+        while True:
+            end = self.text.find("\n", self.pos)
+            if end >= 0:
+                line = self.text[self.pos:end]
+                self.pos = end + 1
+                return line
+            if not self.fill():
+                if self.pos >= len(self.text):
+                    return None
+                line = self.text[self.pos:]
+                self.pos = len(self.text)
+                return line
+
+    def at_end(self) -> bool:
+        while self.pos >= len(self.text):
+            if not self.fill():
+                return True
+        return False
+
+def read_sql_dump(stream) -> Iterator[Tuple[str, Row]]:
+    """
+    Parse INSERT statements (single or multi-row) and COPY ... FROM stdin
+    blocks as written by pg_dump and the Supabase exporter. Statements for
+    other tables and all other SQL are skipped.
+    """
+    buf = _Buffer(stream)
+    while True:
+        buf.pos = buf.match(_GAP).end()
+        if buf.at_end():
+            return
+
+        insert = buf.match(_INSERT, HEADER_WINDOW)
+        if insert:
+            table = _unquote_identifier(insert.group(1))
+            columns = _columns(insert.group(2))
+            buf.pos = insert.end()
+            while True:
+                values = buf.match(_TUPLE)
+                if values is None:
+                    raise SourceError(f"Malformed VALUES list for {table} near: {buf.text[buf.pos:buf.pos + 80]!r}")
+                buf.pos = values.end()
+                if table in IMPORT_TABLES:
+                    row = [_literal(token) for token in _VALUE_ITEM.findall(values.group(1))]
+                    if len(row) != len(columns):
+                        raise SourceError(f"{table}: expected {len(columns)} values, got {len(row)}")
+                    yield table, dict(zip(columns, row))
+                if values.group(2) == ";":
+                    break
+            continue
+
+        copy = buf.match(_COPY, HEADER_WINDOW)
+        if copy:
+            table = _unquote_identifier(copy.group(1))
+            columns = _columns(copy.group(2))
+            buf.pos = copy.end()
+            while True:
+                line = buf.readline()
+                if line is None or line == "\\.":
+                    break
+                if table in IMPORT_TABLES:
+                    yield table, dict(zip(columns, (_copy_field(f) for f in line.split("\t"))))
+            continue
+
+        statement = buf.match(_STATEMENT)
+        if statement is None:
+            # Trailing text without a semicolon
+            return
+        buf.pos = statement.end()
+
+def read_csv(stream, table: str) -> Iterator[Tuple[str, Row]]:
+    # CSV has no NULL; empty fields are read as NULL
+    for row in csv.DictReader(stream):
+        yield table, {name: (value if value != "" else None) for name, value in row.items()}
+
+def read_ndjson(stream, table: Optional[str]) -> Iterator[Tuple[str, Row]]:
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise SourceError(f"Line {line_number}: {e}")
+        row_table = row.pop("_table", None) or table
+        if row_table is None:
+            raise SourceError(f"Line {line_number}: no _table key and no table given")
+        yield row_table, row
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    if extension in ("jsonl", "json"):
+        return "ndjson"
+    if extension in FORMATS:
+        return extension
+    raise SourceError(f"Cannot tell the format of {path}; pass --format")
+
+def table_for_path(path: str) -> Optional[str]:
+    """
+    The table a file holds, from its name (routes.csv, routes_rows.sql).
+    """
+    base = os.path.basename(path).split(".")[0].lower()
+    for table in IMPORT_TABLES:
+        if base == table or base.startswith(table + "_"):
+            return table
+    return None
+
+def open_source(path: str):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def read_source(path: str, fmt: Optional[str] = None, table: Optional[str] = None) -> Iterator[Tuple[str, Row]]:
+    fmt = fmt or detect_format(path)
+    table = table or table_for_path(path)
+    with open_source(path) as stream:
+        if fmt == "sql":
+            yield from read_sql_dump(stream)
+        elif fmt == "csv":
+            if table is None:
+                raise SourceError(f"Cannot tell which table {path} holds; pass --table")
+            yield from read_csv(stream, table)
+        else:
+            yield from read_ndjson(stream, table)
@@ -0,0 +1,68 @@
+from collections import Counter
+from typing import Dict, List, Optional
+
+class TableReport:
+    def __init__(self, table: str):
+        self.table = table
+        self.read = 0
+        self.loaded = 0
+        self.rejected: Counter = Counter()
+        self.nulled: Counter = Counter()
+        self.row_count: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "read": self.read,
+            "loaded": self.loaded,
+            "rejected": dict(self.rejected),
+            "nulled": dict(self.nulled),
+            "row_count": self.row_count,
+            "error": self.error,
+        }
+
+class ImportReport:
+    """
+    Validation report of one import run.
+    """
+
+    def __init__(self, tables: List[str]):
+        self.tables: Dict[str, TableReport] = {table: TableReport(table) for table in tables}
+        self.errors: List[str] = []
+        self.ip_index_rows: Optional[int] = None
+        self.indexes_rebuilt = 0
+        self.seconds = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and not any(t.error for t in self.tables.values())
+
+    def as_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "seconds": round(self.seconds, 2),
+            "tables": {name: table.as_dict() for name, table in self.tables.items()},
+            "ip_index_rows": self.ip_index_rows,
+            "indexes_rebuilt": self.indexes_rebuilt,
+            "errors": self.errors,
+        }
+
+    def format(self) -> str:
+        lines = [f"{'table':<12}{'read':>10}{'loaded':>10}{'rejected':>10}{'in db':>10}"]
+        for table in self.tables.values():
+            row_count = "-" if table.row_count is None else table.row_count
+            lines.append(f"{table.table:<12}{table.read:>10}{table.loaded:>10}{sum(table.rejected.values()):>10}{row_count:>10}")
+        for table in self.tables.values():
+            for reason, count in table.rejected.most_common():
+                lines.append(f"  {table.table}: {count} rejected ({reason})")
+            for column, count in table.nulled.most_common():
+                lines.append(f"  {table.table}: {count} {column} values set to NULL")
+            if table.error:
+                lines.append(f"  {table.table}: FAILED: {table.error}")
+        if self.ip_index_rows is not None:
+            lines.append(f"IP search index: {self.ip_index_rows} rows")
+        lines.extend(f"ERROR: {error}" for error in self.errors)
+        total = sum(t.loaded for t in self.tables.values())
+        rate = total / self.seconds if self.seconds else 0
+        lines.append(f"{total} rows in {self.seconds:.1f}s ({rate:.0f} rows/s), {'OK' if self.ok else 'FAILED'}")
+        return "\n".join(lines)
@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import logging
@@ -10,7 +10,12 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Import your existing routers here
-from app.routers import firewall, vdom, interface, route, vip, search
+from app.routers import firewall, vdom, interface, route, vip, search, change, event, snapshot, history, generation, path, facet, policy, address, service, database, batch
+from app.database import edge, shards
+from app.replicas import READ_PRIMARY_COOKIE, READ_YOUR_WRITES_SECONDS
+from app.sharding import ShardingError
+from app.coalesce import coalescer
+from app import events, writebehind
 
 app = FastAPI(
     title="Fortinet Network Collector API",
@@ -29,14 +34,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reads sent as POST: served from edge snapshots and not counted as writes
+READ_POSTS = ("/api/policies/match", "/api/vips/resolve", "/api/batch")
+
+@app.middleware("http")
+async def route_reads(request: Request, call_next):
+    """
+    After a successful write, send this client's reads to the primary for
+    READ_YOUR_WRITES_SECONDS; report where get_read_db sessions read from.
+    """
+    response = await call_next(request)
+    if (
+        request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400
+        and not (request.method == "POST" and request.url.path.rstrip("/") in READ_POSTS)
+    ):
+        response.set_cookie(READ_PRIMARY_COOKIE, "1", max_age=int(READ_YOUR_WRITES_SECONDS + 0.999), httponly=True)
+    route = getattr(request.state, "database_route", None)
+    if route is not None:
+        response.headers["X-Database-Route"] = route
+    return response
+
+@app.middleware("http")
+async def refuse_edge_writes(request: Request, call_next):
+    """
+    Edge snapshots are read-only (see app.edge): refuse writes up front
+    rather than failing them in SQLite.
+    """
+    if (
+        edge is not None and request.method not in ("GET", "HEAD", "OPTIONS")
+        and not (request.method == "POST" and request.url.path.rstrip("/") in READ_POSTS)
+    ):
+        return JSONResponse(
+            status_code=405,
+            content={"detail": "This API serves a read-only edge snapshot"},
+            headers={"Allow": "GET, HEAD"}
+        )
+    return await call_next(request)
+
+@app.middleware("http")
+async def coalesce_reads(request: Request, call_next):
+    """
+    Identical GETs running at the same time share one response (see
+    app.coalesce). Added last, so the shared response has every header.
+    """
+    if not coalescer.applies(request):
+        return await call_next(request)
+    return await coalescer.handle(request, call_next)
+
+@app.exception_handler(ShardingError)
+async def sharding_error(request: Request, exc: ShardingError):
+    # The shards are configured but their id ranges are not (see app.sharding)
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting Fortinet API server")
     logger.info(f"Workers configured: {os.environ.get('WORKERS', 1)}")
+    # One LISTEN connection per worker and shard for change notifications
+    for shard_engine in shards.engines:
+        events.start_listener(shard_engine)
+    writebehind.start_flusher()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Fortinet API server")
+    # Write pending interface status updates before the worker exits
+    writebehind.stop_flusher()
+    events.stop_listener()
 
 @app.get("/health")
 async def health_check():
@@ -61,6 +125,18 @@ app.include_router(interface.router)
 app.include_router(route.router)
 app.include_router(vip.router)
 app.include_router(search.router)
+app.include_router(change.router)
+app.include_router(event.router)
+app.include_router(snapshot.router)
+app.include_router(history.router)
+app.include_router(generation.router)
+app.include_router(path.router)
+app.include_router(facet.router)
+app.include_router(policy.router)
+app.include_router(address.router)
+app.include_router(service.router)
+app.include_router(database.router)
+app.include_router(batch.router)
 
 if __name__ == "__main__":
     import uvicorn
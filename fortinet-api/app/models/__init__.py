@@ -3,8 +3,21 @@ from app.models.firewall import Firewall
 from app.models.vdom import VDOM
 from app.models.interface import Interface
 from app.models.route import Route
+from app.models.route_type import RouteType
+from app.models.route_nexthop import RouteNexthop
 from app.models.vip import VIP
+from app.models.address import Address, AddressGroup
+from app.models.service import Service, ServiceGroup
+from app.models.policy import Policy
+from app.models.ip_address import IPAddress
+from app.models.tombstone import Tombstone
+from app.models.history import (
+    InterfaceStatusLatest, InterfaceStatusHistory, InterfaceStatusDaily, VDOMCountLatest, VDOMCountHistory, VDOMCountDaily,
+    HistoryRollup
+)
+from app.models.generation import Generation, VERSIONED_TABLES, VERSIONS_TABLES
+from app.models.shard import ShardLayout, SHARDED_TABLES
 
 # Update relationships
-Firewall.vdoms = relationship("VDOM", back_populates="firewall", cascade="all, delete-orphan")
-Firewall.interfaces = relationship("Interface", back_populates="firewall", cascade="all, delete-orphan")
\ No newline at end of file
+Firewall.vdoms = relationship("VDOM", back_populates="firewall", cascade="all, delete-orphan", passive_deletes=True)
+Firewall.interfaces = relationship("Interface", back_populates="firewall", cascade="all, delete-orphan", passive_deletes=True)
\ No newline at end of file
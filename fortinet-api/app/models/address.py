@@ -0,0 +1,44 @@
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, JSON, sql, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class Address(Base):
+    __tablename__ = "addresses"
+
+    address_id = Column(Integer, primary_key=True)
+    vdom_id = Column(Integer, ForeignKey("vdoms.vdom_id", ondelete="CASCADE"), nullable=False)
+    name = Column(Text, nullable=False)
+    # FortiOS address type: ipmask and iprange are matched by policy lookups;
+    # fqdn, geography and the dynamic types are kept but never match
+    type = Column(Text, nullable=False, server_default="ipmask")
+    subnet = Column(Text, nullable=True)  # "10.0.0.0/24" or "10.0.0.0 255.255.255.0"
+    start_ip = Column(Text, nullable=True)
+    end_ip = Column(Text, nullable=True)
+    fqdn = Column(Text, nullable=True)
+    comment = Column(Text, nullable=True)
+    last_updated = Column(DateTime, server_default=sql.func.now(), onupdate=sql.func.now())
+
+    __table_args__ = (
+        UniqueConstraint('vdom_id', 'name', name='uq_addresses_vdom_name'),
+        {"sqlite_autoincrement": True},
+    )
+
+    vdom = relationship("VDOM")
+
+class AddressGroup(Base):
+    __tablename__ = "address_groups"
+
+    group_id = Column(Integer, primary_key=True)
+    vdom_id = Column(Integer, ForeignKey("vdoms.vdom_id", ondelete="CASCADE"), nullable=False)
+    name = Column(Text, nullable=False)
+    # Names of addresses and other groups of the VDOM
+    members = Column(JSON, nullable=False, default=list)
+    comment = Column(Text, nullable=True)
+    last_updated = Column(DateTime, server_default=sql.func.now(), onupdate=sql.func.now())
+
+    __table_args__ = (
+        UniqueConstraint('vdom_id', 'name', name='uq_address_groups_vdom_name'),
+        {"sqlite_autoincrement": True},
+    )
+
+    vdom = relationship("VDOM")
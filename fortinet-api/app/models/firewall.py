@@ -1,17 +1,29 @@
-from sqlalchemy import Column, Integer, String, DateTime, sql
+from sqlalchemy import Column, Integer, Text, DateTime, sql, Index, UniqueConstraint
 from app.database import Base
 from sqlalchemy.orm import relationship
 
 class Firewall(Base):
     __tablename__ = "firewalls"
 
-    firewall_id = Column(Integer, primary_key=True, index=True)
-    fw_name = Column(String, unique=True, nullable=False)
-    fw_ip = Column(String, unique=True, nullable=False)
-    fmg_ip = Column(String, nullable=True)
-    faz_ip = Column(String, nullable=True)
-    site = Column(String, nullable=True)
+    firewall_id = Column(Integer, primary_key=True)
+    fw_name = Column(Text, nullable=False)
+    fw_ip = Column(Text, nullable=False)
+    fmg_ip = Column(Text, nullable=True)
+    faz_ip = Column(Text, nullable=True)
+    site = Column(Text, nullable=True)
     last_updated = Column(DateTime, server_default=sql.func.now(), onupdate=sql.func.now())
+    # Start of this version of the row and the generation that wrote it (see app.versioning)
+    valid_from = Column(DateTime, server_default=sql.func.now(), nullable=False)
+    generation_id = Column(Integer, nullable=True)
 
-    vdoms = relationship("VDOM", back_populates="firewall", cascade="all, delete-orphan")
-    interfaces = relationship("Interface", back_populates="firewall", cascade="all, delete-orphan")
\ No newline at end of file
+    __table_args__ = (
+        UniqueConstraint('fw_name', name='uq_fw_name'),
+        UniqueConstraint('fw_ip', name='uq_fw_ip'),
+        Index('idx_firewalls_last_updated', 'last_updated'),
+        # On SQLite too, ids come from a sequence that shards init can move (see app.sharding)
+        {"sqlite_autoincrement": True},
+    )
+
+    # Children are removed by ON DELETE CASCADE, not loaded and deleted one by one
+    vdoms = relationship("VDOM", back_populates="firewall", cascade="all, delete-orphan", passive_deletes=True)
+    interfaces = relationship("Interface", back_populates="firewall", cascade="all, delete-orphan", passive_deletes=True)
\ No newline at end of file
@@ -0,0 +1,119 @@
+from sqlalchemy import Column, DateTime, Index, Integer, Table, Text, DDL, event, func, sql
+from app.database import Base
+from app.models.firewall import Firewall
+from app.models.vdom import VDOM
+from app.models.interface import Interface
+from app.models.route import Route
+from app.models.vip import VIP
+from app.models.ip_address import IPAddress
+
+class Generation(Base):
+    """
+    One load of the inventory: an import, a snapshot restore or a collector
+    round. Rows written while it is the latest generation carry its id.
+    """
+    __tablename__ = "generations"
+
+    generation_id = Column(Integer, primary_key=True)
+    source = Column(Text, nullable=False)  # import, restore, collector, ingest or migration
+    detail = Column(Text, nullable=True)
+    started_at = Column(DateTime, server_default=sql.func.now(), nullable=False)
+
+# Tables whose earlier states are kept in <table>_versions, with their primary key column
+VERSIONED_TABLES = {
+    "firewalls": "firewall_id",
+    "vdoms": "vdom_id",
+    "interfaces": "interface_id",
+    "routes": "route_id",
+    "vips": "vip_id",
+    "ip_addresses": "ip_address_id",
+}
+
+# Kept by the database: imports, snapshots and the API never carry them
+VERSION_COLUMNS = ("valid_from", "generation_id")
+
+def _versions_table(table: Table) -> Table:
+    # The live table's columns, without keys or defaults, closed by valid_to.
+    # No foreign keys: versions outlive the rows they point at.
+    name = f"{table.name}_versions"
+    columns = [Column(column.name, column.type, nullable=column.nullable) for column in table.columns]
+    versions = Table(name, Base.metadata, *columns, Column("valid_to", DateTime, nullable=False))
+    Index(f"idx_{name}_id", versions.c[VERSIONED_TABLES[table.name]])
+    # As-of reads find the versions whose range holds a point in time
+    Index(
+        f"idx_{name}_validity", func.tsrange(versions.c.valid_from, versions.c.valid_to), postgresql_using="gist"
+    ).ddl_if(dialect="postgresql")
+    # Versions are closed in time order, so compaction finds old ones in a few pages
+    Index(f"idx_{name}_valid_to", versions.c.valid_to, postgresql_using="brin")
+    return versions
+
+VERSIONS_TABLES = {
+    model.__tablename__: _versions_table(model.__table__)
+    for model in (Firewall, VDOM, Interface, Route, VIP, IPAddress)
+}
+
+# The latest generation, also while its load is still running. The default
+# of every generation_id column on PostgreSQL.
+CURRENT_GENERATION_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION current_generation() RETURNS integer AS $$
+  SELECT pg_sequence_last_value('generations_generation_id_seq')::integer
+$$ LANGUAGE sql
+"""
+
+# An updated row starts a new version in the current generation
+STAMP_VERSION_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION stamp_version() RETURNS trigger AS $$
+BEGIN
+  NEW.valid_from := now();
+  NEW.generation_id := current_generation();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def version_columns(table: str) -> str:
+    return ", ".join(column.name for column in Base.metadata.tables[table].columns)
+
+def archive_sql(table: str, source: str) -> str:
+    """
+    Close the versions of the rows in `source` (the table itself, one of its
+    partitions or a transition table) as of now. Rows that started in this
+    transaction were never visible to anyone else and are not kept.
+    """
+    columns = version_columns(table)
+    return (
+        f"INSERT INTO {table}_versions ({columns}, valid_to) "
+        f"SELECT {columns}, now() FROM {source} WHERE valid_from < now()"
+    )
+
+# Statement-level triggers see every changed row at once in a transition
+# table, so a bulk UPDATE or DELETE archives in one INSERT. They also fire
+# for ON DELETE CASCADE and ON UPDATE CASCADE.
+def archive_function_sql(table: str) -> str:
+    return f"""
+CREATE OR REPLACE FUNCTION archive_{table}() RETURNS trigger AS $$
+BEGIN
+  {archive_sql(table, "old_rows")};
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def version_triggers_sql(table: str) -> list:
+    return [
+        f"ALTER TABLE {table} ALTER COLUMN generation_id SET DEFAULT current_generation()",
+        f"CREATE TRIGGER trg_{table}_stamp_version BEFORE UPDATE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION stamp_version()",
+        # A trigger with transition tables takes a single event
+        f"CREATE TRIGGER trg_{table}_archive_update AFTER UPDATE ON {table} "
+        f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION archive_{table}()",
+        f"CREATE TRIGGER trg_{table}_archive_delete AFTER DELETE ON {table} "
+        f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION archive_{table}()",
+    ]
+
+event.listen(Base.metadata, "after_create", DDL(CURRENT_GENERATION_FUNCTION_SQL).execute_if(dialect="postgresql"))
+event.listen(Base.metadata, "after_create", DDL(STAMP_VERSION_FUNCTION_SQL).execute_if(dialect="postgresql"))
+for _table in VERSIONED_TABLES:
+    event.listen(Base.metadata, "after_create", DDL(archive_function_sql(_table)).execute_if(dialect="postgresql"))
+    for _statement in version_triggers_sql(_table):
+        event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
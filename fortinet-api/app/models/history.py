@@ -0,0 +1,141 @@
+from sqlalchemy import BigInteger, Column, Date, DateTime, Integer, Text, DDL, event, Index
+from app.database import Base
+
+# Row ids: bigint in PostgreSQL, the rowid alias in SQLite
+HistoryId = BigInteger().with_variant(Integer, "sqlite")
+
+# No foreign keys in this module: history outlives the rows it describes
+
+class InterfaceStatusLatest(Base):
+    """
+    The last recorded status of each interface, keyed by name rather than
+    interface_id, which changes when a collector replaces the interfaces.
+    """
+    __tablename__ = "interface_status_latest"
+
+    firewall_id = Column(Integer, primary_key=True)
+    interface_name = Column(Text, primary_key=True)
+    status = Column(Text, nullable=True)
+    changed_at = Column(DateTime, nullable=False)
+
+class InterfaceStatusHistory(Base):
+    """
+    One row per status change. In PostgreSQL the table is partitioned by
+    month of changed_at and its primary key is (history_id, changed_at).
+    """
+    __tablename__ = "interface_status_history"
+
+    history_id = Column(HistoryId, primary_key=True)
+    firewall_id = Column(Integer, nullable=False)
+    vdom_id = Column(Integer, nullable=True)
+    interface_id = Column(Integer, nullable=True)
+    interface_name = Column(Text, nullable=False)
+    status = Column(Text, nullable=True)
+    changed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index('idx_interface_status_history_name', 'firewall_id', 'interface_name', 'changed_at'),
+        Index('idx_interface_status_history_changed_at', 'changed_at', postgresql_using='brin'),
+    )
+
+class InterfaceStatusDaily(Base):
+    __tablename__ = "interface_status_daily"
+
+    firewall_id = Column(Integer, primary_key=True)
+    interface_name = Column(Text, primary_key=True)
+    day = Column(Date, primary_key=True)
+    transitions = Column(Integer, nullable=False)
+    # Transitions to "down"
+    downs = Column(Integer, nullable=False)
+    last_status = Column(Text, nullable=True)
+
+class VDOMCountLatest(Base):
+    __tablename__ = "vdom_counts_latest"
+
+    vdom_id = Column(Integer, primary_key=True)
+    firewall_id = Column(Integer, nullable=False)
+    interfaces = Column(Integer, nullable=False)
+    routes = Column(Integer, nullable=False)
+    vips = Column(Integer, nullable=False)
+    sampled_at = Column(DateTime, nullable=False)
+
+class VDOMCountHistory(Base):
+    """
+    One row per sample whose counts differ from the VDOM's previous one.
+    Partitioned by month of sampled_at like interface_status_history.
+    """
+    __tablename__ = "vdom_count_history"
+
+    history_id = Column(HistoryId, primary_key=True)
+    vdom_id = Column(Integer, nullable=False)
+    firewall_id = Column(Integer, nullable=False)
+    interfaces = Column(Integer, nullable=False)
+    routes = Column(Integer, nullable=False)
+    vips = Column(Integer, nullable=False)
+    sampled_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index('idx_vdom_count_history_vdom', 'vdom_id', 'sampled_at'),
+        Index('idx_vdom_count_history_sampled_at', 'sampled_at', postgresql_using='brin'),
+    )
+
+class VDOMCountDaily(Base):
+    """
+    Minimum, maximum and last of the samples taken on each day.
+    """
+    __tablename__ = "vdom_count_daily"
+
+    vdom_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    firewall_id = Column(Integer, nullable=False)
+    interfaces_min = Column(Integer, nullable=False)
+    interfaces_max = Column(Integer, nullable=False)
+    interfaces_last = Column(Integer, nullable=False)
+    routes_min = Column(Integer, nullable=False)
+    routes_max = Column(Integer, nullable=False)
+    routes_last = Column(Integer, nullable=False)
+    vips_min = Column(Integer, nullable=False)
+    vips_max = Column(Integer, nullable=False)
+    vips_last = Column(Integer, nullable=False)
+
+class HistoryRollup(Base):
+    """
+    The last day rolled up into each daily table. Days without changes
+    have no daily rows, so the tables themselves cannot tell.
+    """
+    __tablename__ = "history_rollups"
+
+    daily_table = Column(Text, primary_key=True)
+    rolled_through = Column(Date, nullable=False)
+
+# Every write of an interface's status goes through interface_status_latest;
+# a history row is added only when that changes the status. Inserts are
+# compared too, so a collector replacing a firewall's interfaces records
+# only the statuses that differ from before.
+INTERFACE_STATUS_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION record_interface_status() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO interface_status_latest AS l (firewall_id, interface_name, status, changed_at)
+  VALUES (NEW.firewall_id, NEW.interface_name, NEW.status, now())
+  ON CONFLICT (firewall_id, interface_name) DO UPDATE
+    SET status = EXCLUDED.status, changed_at = EXCLUDED.changed_at
+    WHERE l.status IS DISTINCT FROM EXCLUDED.status;
+  IF FOUND THEN
+    INSERT INTO interface_status_history (firewall_id, vdom_id, interface_id, interface_name, status, changed_at)
+    VALUES (NEW.firewall_id, NEW.vdom_id, NEW.interface_id, NEW.interface_name, NEW.status, now());
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+INTERFACE_STATUS_TRIGGERS_SQL = [
+    "CREATE TRIGGER trg_interfaces_status_insert AFTER INSERT ON interfaces "
+    "FOR EACH ROW EXECUTE FUNCTION record_interface_status()",
+    "CREATE TRIGGER trg_interfaces_status_update AFTER UPDATE OF status ON interfaces "
+    "FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status) EXECUTE FUNCTION record_interface_status()",
+]
+
+event.listen(Base.metadata, "after_create", DDL(INTERFACE_STATUS_FUNCTION_SQL).execute_if(dialect="postgresql"))
+for _trigger in INTERFACE_STATUS_TRIGGERS_SQL:
+    event.listen(Base.metadata, "after_create", DDL(_trigger).execute_if(dialect="postgresql"))
@@ -1,26 +1,33 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, sql, UniqueConstraint
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, sql, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Interface(Base):
     __tablename__ = "interfaces"
 
-    interface_id = Column(Integer, primary_key=True, index=True)
+    interface_id = Column(Integer, primary_key=True)
     firewall_id = Column(Integer, ForeignKey("firewalls.firewall_id", ondelete="CASCADE"), nullable=False)
     vdom_id = Column(Integer, ForeignKey("vdoms.vdom_id", ondelete="CASCADE"), nullable=True)
-    interface_name = Column(String, nullable=False)
-    ip_address = Column(String, nullable=True)
-    mask = Column(String, nullable=True)
-    type = Column(String, nullable=False)
+    interface_name = Column(Text, nullable=False)
+    ip_address = Column(Text, nullable=True)
+    mask = Column(Text, nullable=True)
+    type = Column(Text, nullable=False)
     vlan_id = Column(Integer, nullable=True)
-    description = Column(String, nullable=True)
-    status = Column(String, nullable=True)
-    physical_interface_name = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    status = Column(Text, nullable=True)
+    physical_interface_name = Column(Text, nullable=True)
     last_updated = Column(DateTime, server_default=sql.func.now(), onupdate=sql.func.now())
+    # Start of this version of the row and the generation that wrote it (see app.versioning)
+    valid_from = Column(DateTime, server_default=sql.func.now(), nullable=False)
+    generation_id = Column(Integer, nullable=True)
 
     # Define unique constraint
     __table_args__ = (
         UniqueConstraint('firewall_id', 'vdom_id', 'interface_name', name='uq_firewall_vdom_interface'),
+        Index('idx_interfaces_vdom_name', 'vdom_id', 'interface_name', postgresql_include=['interface_id']),
+        Index('idx_interfaces_name_trgm', 'interface_name', postgresql_using='gin', postgresql_ops={'interface_name': 'gin_trgm_ops'}),
+        Index('idx_interfaces_last_updated', 'last_updated'),
+        {"sqlite_autoincrement": True},
     )
     
     # Relationships
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, sql, Index
+from sqlalchemy.dialects.postgresql import INET
+from app.database import Base
+
+class IPAddress(Base):
+    __tablename__ = "ip_addresses"
+
+    ip_address_id = Column(Integer, primary_key=True)
+    # Host address (interfaces, VIPs) or prefix (routes); inet on PostgreSQL
+    network = Column(Text().with_variant(INET(), "postgresql"), nullable=False)
+    source_type = Column(Text, nullable=False)  # interface, route or vip
+    source_id = Column(Integer, nullable=False)
+    firewall_id = Column(Integer, ForeignKey("firewalls.firewall_id", ondelete="CASCADE"), nullable=False)
+    vdom_id = Column(Integer, ForeignKey("vdoms.vdom_id", ondelete="CASCADE"), nullable=True)
+    # Start of this version of the row and the generation that wrote it (see app.versioning)
+    valid_from = Column(DateTime, server_default=sql.func.now(), nullable=False)
+    generation_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index('idx_ip_addresses_network', 'network', postgresql_using='gist', postgresql_ops={'network': 'inet_ops'}),
+        Index('idx_ip_addresses_source', 'source_type', 'source_id'),
+    )
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, Text, Boolean, ForeignKey, DateTime, JSON, sql, UniqueConstraint, Index
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class Policy(Base):
+    __tablename__ = "policies"
+
+    policy_id = Column(Integer, primary_key=True)
+    vdom_id = Column(Integer, ForeignKey("vdoms.vdom_id", ondelete="CASCADE"), nullable=False)
+    # FortiOS policyid; policies are evaluated by sequence, not by this number
+    policy_number = Column(Integer, nullable=False)
+    sequence = Column(Integer, nullable=False)
+    name = Column(Text, nullable=True)
+    status = Column(Text, nullable=False, server_default="enable")
+    action = Column(Text, nullable=False, server_default="deny")
+    # Names of interfaces or zones, addresses or address groups, and services or
+    # service groups; "any", "all" and "ALL" as in FortiOS
+    srcintf = Column(JSON, nullable=False, default=list)
+    dstintf = Column(JSON, nullable=False, default=list)
+    srcaddr = Column(JSON, nullable=False, default=list)
+    dstaddr = Column(JSON, nullable=False, default=list)
+    service = Column(JSON, nullable=False, default=list)
+    srcaddr_negate = Column(Boolean, nullable=False, server_default=sql.false())
+    dstaddr_negate = Column(Boolean, nullable=False, server_default=sql.false())
+    service_negate = Column(Boolean, nullable=False, server_default=sql.false())
+    schedule = Column(Text, nullable=True)
+    nat = Column(Boolean, nullable=False, server_default=sql.false())
+    comments = Column(Text, nullable=True)
+    last_updated = Column(DateTime, server_default=sql.func.now(), onupdate=sql.func.now())
+
+    __table_args__ = (
+        UniqueConstraint('vdom_id', 'policy_number', name='uq_policies_vdom_number'),
+        Index('idx_policies_vdom_sequence', 'vdom_id', 'sequence'),
+        {"sqlite_autoincrement": True},
+    )
+
+    vdom = relationship("VDOM")
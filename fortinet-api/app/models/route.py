@@ -1,19 +1,55 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, sql
+from sqlalchemy import Column, Integer, SmallInteger, Text, ForeignKey, ForeignKeyConstraint, DateTime, sql, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Route(Base):
     __tablename__ = "routes"
 
-    route_id = Column(Integer, primary_key=True, index=True)
-    vdom_id = Column(Integer, ForeignKey("vdoms.vdom_id", ondelete="CASCADE"), nullable=False)
-    destination_network = Column(String, nullable=False)
+    route_id = Column(Integer, primary_key=True)
+    vdom_id = Column(Integer, nullable=False)
+    # Copy of the VDOM's firewall, so routes can be partitioned by firewall
+    firewall_id = Column(Integer, nullable=False)
+    destination_network = Column(Text, nullable=False)
     mask_length = Column(Integer, nullable=False)
-    route_type = Column(String, nullable=False)
-    gateway = Column(String, nullable=True)
-    exit_interface_name = Column(String, nullable=False)
-    exit_interface_details = Column(String, nullable=True)
+    # Dictionary-encoded attributes; writers get the ids from app.dictionary
+    route_type_id = Column(SmallInteger, ForeignKey("route_types.route_type_id"), nullable=False)
+    nexthop_id = Column(Integer, ForeignKey("route_nexthops.nexthop_id"), nullable=False)
     last_updated = Column(DateTime, server_default=sql.func.now(), onupdate=sql.func.now())
-    
+    # Start of this version of the row and the generation that wrote it (see app.versioning)
+    valid_from = Column(DateTime, server_default=sql.func.now(), nullable=False)
+    generation_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # Keeps firewall_id in step with the VDOM it belongs to
+        ForeignKeyConstraint(
+            ['vdom_id', 'firewall_id'], ['vdoms.vdom_id', 'vdoms.firewall_id'],
+            name='fk_routes_vdom_firewall', ondelete="CASCADE", onupdate="CASCADE"
+        ),
+        Index('idx_routes_vdom_type', 'vdom_id', 'route_type_id', postgresql_include=['route_id']),
+        Index('idx_routes_route_type', 'route_type_id'),
+        Index('idx_routes_last_updated', 'last_updated'),
+        {"sqlite_autoincrement": True},
+    )
+
     # Relationships
-    vdom = relationship("VDOM", back_populates="routes")
\ No newline at end of file
+    vdom = relationship("VDOM", back_populates="routes")
+    # The lookup tables are small enough to join on every read
+    route_type_entry = relationship("RouteType", lazy="joined", innerjoin=True)
+    nexthop = relationship("RouteNexthop", lazy="joined", innerjoin=True)
+
+    # Decoded attributes, read-only: lookup rows are shared between routes
+    @property
+    def route_type(self) -> str:
+        return self.route_type_entry.route_type
+
+    @property
+    def gateway(self):
+        return self.nexthop.gateway
+
+    @property
+    def exit_interface_name(self) -> str:
+        return self.nexthop.exit_interface_name
+
+    @property
+    def exit_interface_details(self):
+        return self.nexthop.exit_interface_details
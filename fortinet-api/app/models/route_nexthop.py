@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Text, UniqueConstraint
+from app.database import Base
+
+# Lookup table behind routes.nexthop_id (see app.dictionary): the gateway and
+# exit interface shared by every route that leaves through them
+class RouteNexthop(Base):
+    __tablename__ = "route_nexthops"
+
+    nexthop_id = Column(Integer, primary_key=True)
+    gateway = Column(Text, nullable=True)
+    exit_interface_name = Column(Text, nullable=False)
+    exit_interface_details = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # Connected routes have no gateway and many interfaces no details
+        UniqueConstraint(
+            'gateway', 'exit_interface_name', 'exit_interface_details',
+            name='uq_route_nexthops', postgresql_nulls_not_distinct=True
+        ),
+    )
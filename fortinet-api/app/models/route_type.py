@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, SmallInteger, Text, UniqueConstraint
+from app.database import Base
+
+# Lookup table behind routes.route_type_id (see app.dictionary)
+class RouteType(Base):
+    __tablename__ = "route_types"
+
+    # SQLite only auto-increments INTEGER primary keys
+    route_type_id = Column(SmallInteger().with_variant(Integer(), "sqlite"), primary_key=True)
+    route_type = Column(Text, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('route_type', name='uq_route_types_route_type'),
+    )
@@ -0,0 +1,44 @@
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, JSON, sql, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class Service(Base):
+    __tablename__ = "services"
+
+    service_id = Column(Integer, primary_key=True)
+    vdom_id = Column(Integer, ForeignKey("vdoms.vdom_id", ondelete="CASCADE"), nullable=False)
+    name = Column(Text, nullable=False)
+    # TCP/UDP/SCTP (the port ranges below), ICMP, ICMP6 or IP (protocol_number, 0 for all)
+    protocol = Column(Text, nullable=False, server_default="TCP/UDP/SCTP")
+    protocol_number = Column(Integer, nullable=True)
+    # FortiOS port ranges: "80 443 8000-8080", each optionally ":<source range>"
+    tcp_portrange = Column(Text, nullable=True)
+    udp_portrange = Column(Text, nullable=True)
+    sctp_portrange = Column(Text, nullable=True)
+    comment = Column(Text, nullable=True)
+    last_updated = Column(DateTime, server_default=sql.func.now(), onupdate=sql.func.now())
+
+    __table_args__ = (
+        UniqueConstraint('vdom_id', 'name', name='uq_services_vdom_name'),
+        {"sqlite_autoincrement": True},
+    )
+
+    vdom = relationship("VDOM")
+
+class ServiceGroup(Base):
+    __tablename__ = "service_groups"
+
+    group_id = Column(Integer, primary_key=True)
+    vdom_id = Column(Integer, ForeignKey("vdoms.vdom_id", ondelete="CASCADE"), nullable=False)
+    name = Column(Text, nullable=False)
+    # Names of services and other groups of the VDOM
+    members = Column(JSON, nullable=False, default=list)
+    comment = Column(Text, nullable=True)
+    last_updated = Column(DateTime, server_default=sql.func.now(), onupdate=sql.func.now())
+
+    __table_args__ = (
+        UniqueConstraint('vdom_id', 'name', name='uq_service_groups_vdom_name'),
+        {"sqlite_autoincrement": True},
+    )
+
+    vdom = relationship("VDOM")
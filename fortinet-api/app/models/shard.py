@@ -0,0 +1,30 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, sql
+from app.database import Base
+
+class ShardLayout(Base):
+    """
+    One epoch of the id ranges that tell which shard a row is on (see
+    app.sharding). Every shard holds the same rows.
+    """
+    __tablename__ = "shard_layout"
+
+    epoch = Column(Integer, primary_key=True, autoincrement=False)
+    # Shard k of the epoch numbers its rows from first_id + k * span
+    first_id = Column(BigInteger, nullable=False)
+    span = Column(BigInteger, nullable=False)
+    shard_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, server_default=sql.func.now(), nullable=False)
+
+# Tables whose ids come from the shard's range, with their primary key column
+SHARDED_TABLES = {
+    "firewalls": "firewall_id",
+    "vdoms": "vdom_id",
+    "interfaces": "interface_id",
+    "routes": "route_id",
+    "vips": "vip_id",
+    "policies": "policy_id",
+    "addresses": "address_id",
+    "address_groups": "group_id",
+    "services": "service_id",
+    "service_groups": "group_id",
+}
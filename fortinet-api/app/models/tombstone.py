@@ -0,0 +1,69 @@
+from sqlalchemy import Column, Integer, Text, DateTime, sql, DDL, event, Index
+from app.database import Base
+
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+
+    tombstone_id = Column(Integer, primary_key=True)
+    entity = Column(Text, nullable=False)  # firewalls, vdoms, interfaces, routes or vips
+    entity_id = Column(Integer, nullable=False)
+    # No foreign keys: the parent rows are usually deleted in the same statement
+    firewall_id = Column(Integer, nullable=True)
+    vdom_id = Column(Integer, nullable=True)
+    deleted_at = Column(DateTime, server_default=sql.func.now(), nullable=False)
+
+    __table_args__ = (
+        Index('idx_tombstones_deleted_at', 'deleted_at'),
+    )
+
+# Tables that leave a tombstone behind, with their primary key column
+TOMBSTONE_TABLES = {
+    "firewalls": "firewall_id",
+    "vdoms": "vdom_id",
+    "interfaces": "interface_id",
+    "routes": "route_id",
+    "vips": "vip_id",
+}
+
+# Row-level triggers also fire for ON DELETE CASCADE, so deleting a firewall
+# records every VDOM, interface, route and VIP removed with it
+TOMBSTONE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION record_tombstone() RETURNS trigger AS $$
+DECLARE
+  old_row jsonb := to_jsonb(OLD);
+BEGIN
+  INSERT INTO tombstones (entity, entity_id, firewall_id, vdom_id, deleted_at)
+  VALUES (
+    TG_TABLE_NAME,
+    (old_row ->> TG_ARGV[0])::integer,
+    (old_row ->> 'firewall_id')::integer,
+    (old_row ->> 'vdom_id')::integer,
+    now()
+  );
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def tombstone_trigger_sql(table: str, id_column: str) -> str:
+    return (
+        f"CREATE TRIGGER trg_{table}_tombstone AFTER DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION record_tombstone('{id_column}')"
+    )
+
+# SQLite has no trigger functions, so each table gets its own body. Cascaded
+# deletes fire them too once foreign keys are on (see app.database)
+def sqlite_tombstone_trigger_sql(table: str, id_column: str) -> str:
+    # Columns a table lacks are NULL, as in record_tombstone()
+    firewall_id = "NULL" if table == "vips" else "OLD.firewall_id"
+    vdom_id = "NULL" if table == "firewalls" else "OLD.vdom_id"
+    return (
+        f"CREATE TRIGGER trg_{table}_tombstone AFTER DELETE ON {table} FOR EACH ROW BEGIN "
+        f"INSERT INTO tombstones (entity, entity_id, firewall_id, vdom_id, deleted_at) "
+        f"VALUES ('{table}', OLD.{id_column}, {firewall_id}, {vdom_id}, CURRENT_TIMESTAMP); END"
+    )
+
+event.listen(Base.metadata, "after_create", DDL(TOMBSTONE_FUNCTION_SQL).execute_if(dialect="postgresql"))
+for _table, _id_column in TOMBSTONE_TABLES.items():
+    event.listen(Base.metadata, "after_create", DDL(tombstone_trigger_sql(_table, _id_column)).execute_if(dialect="postgresql"))
+    event.listen(Base.metadata, "after_create", DDL(sqlite_tombstone_trigger_sql(_table, _id_column)).execute_if(dialect="sqlite"))
@@ -1,23 +1,34 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, sql, UniqueConstraint
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, sql, UniqueConstraint, Index, DDL, event
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class VDOM(Base):
     __tablename__ = "vdoms"
 
-    vdom_id = Column(Integer, primary_key=True, index=True)
+    vdom_id = Column(Integer, primary_key=True)
     firewall_id = Column(Integer, ForeignKey("firewalls.firewall_id", ondelete="CASCADE"), nullable=False)
-    vdom_name = Column(String, nullable=False)
+    vdom_name = Column(Text, nullable=False)
     vdom_index = Column(Integer, nullable=True)
     last_updated = Column(DateTime, server_default=sql.func.now(), onupdate=sql.func.now())
+    # Start of this version of the row and the generation that wrote it (see app.versioning)
+    valid_from = Column(DateTime, server_default=sql.func.now(), nullable=False)
+    generation_id = Column(Integer, nullable=True)
 
     # Define unique constraint
     __table_args__ = (
         UniqueConstraint('firewall_id', 'vdom_name', name='uq_firewall_vdom'),
+        # Target of the (vdom_id, firewall_id) foreign key of routes
+        UniqueConstraint('vdom_id', 'firewall_id', name='uq_vdoms_vdom_firewall'),
+        Index('idx_vdoms_vdom_name_trgm', 'vdom_name', postgresql_using='gin', postgresql_ops={'vdom_name': 'gin_trgm_ops'}),
+        Index('idx_vdoms_last_updated', 'last_updated'),
+        {"sqlite_autoincrement": True},
     )
     
-    # Relationships
+    # Relationships; children are removed by ON DELETE CASCADE, not loaded and deleted one by one
     firewall = relationship("Firewall", back_populates="vdoms")
-    interfaces = relationship("Interface", back_populates="vdom", cascade="all, delete-orphan")
-    routes = relationship("Route", back_populates="vdom", cascade="all, delete-orphan")
-    vips = relationship("VIP", back_populates="vdom", cascade="all, delete-orphan")
\ No newline at end of file
+    interfaces = relationship("Interface", back_populates="vdom", cascade="all, delete-orphan", passive_deletes=True)
+    routes = relationship("Route", back_populates="vdom", cascade="all, delete-orphan", passive_deletes=True)
+    vips = relationship("VIP", back_populates="vdom", cascade="all, delete-orphan", passive_deletes=True)
+
+# The name search indexes on vdoms and interfaces use trigram operator classes
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
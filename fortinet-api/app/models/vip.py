@@ -1,20 +1,32 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, sql
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, sql, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class VIP(Base):
     __tablename__ = "vips"
 
-    vip_id = Column(Integer, primary_key=True, index=True)
+    vip_id = Column(Integer, primary_key=True)
     vdom_id = Column(Integer, ForeignKey("vdoms.vdom_id", ondelete="CASCADE"), nullable=False)
-    external_ip = Column(String, nullable=False)
+    external_ip = Column(Text, nullable=False)
     external_port = Column(Integer, nullable=True)
-    mapped_ip = Column(String, nullable=False)
+    mapped_ip = Column(Text, nullable=False)
     mapped_port = Column(Integer, nullable=True)
-    vip_type = Column(String, nullable=True)
-    external_interface = Column(String, nullable=True)
+    vip_type = Column(Text, nullable=True)
+    external_interface = Column(Text, nullable=True)
     mask = Column(Integer, nullable=True)
     last_updated = Column(DateTime, server_default=sql.func.now(), onupdate=sql.func.now())
+    # Start of this version of the row and the generation that wrote it (see app.versioning)
+    valid_from = Column(DateTime, server_default=sql.func.now(), nullable=False)
+    generation_id = Column(Integer, nullable=True)
+
+    # Composite indexes for NAT lookups (forward and reverse)
+    __table_args__ = (
+        Index('idx_vips_external_ip_port', 'external_ip', 'external_port'),
+        Index('idx_vips_mapped_ip_port', 'mapped_ip', 'mapped_port'),
+        Index('idx_vips_vdom_external_ip', 'vdom_id', 'external_ip', postgresql_include=['vip_id']),
+        Index('idx_vips_last_updated', 'last_updated'),
+        {"sqlite_autoincrement": True},
+    )
     
     # Relationships
     vdom = relationship("VDOM", back_populates="vips")
\ No newline at end of file
@@ -0,0 +1,320 @@
+"""
+Optional partitioning of routes and interfaces by firewall.
+
+Both tables carry firewall_id, so PostgreSQL can split them into one
+partition per firewall (LIST) or a fixed number of partitions (HASH):
+
+    python -m app.cli partitions enable --strategy list
+    python -m app.cli partitions enable --strategy hash --partitions 16
+    python -m app.cli partitions disable
+
+Queries that filter on firewall_id only touch the matching partitions. With
+LIST partitioning a firewall's routes can be replaced by loading them into
+a new table and swapping it in for the firewall's partition (see
+swap_partition), instead of deleting and inserting row by row.
+
+LIST partitions are named <table>_fw_<firewall_id>, with a <table>_default
+partition for rows of firewalls that have none yet. create_firewall adds
+the partitions of a new firewall; sync_partitions adds missing ones after
+bulk loads and drops those of deleted firewalls. HASH partitions are named
+<table>_p<n> and need no upkeep.
+
+Creating, attaching and detaching a partition locks the partitioned table
+and the tables its foreign keys reference. A transaction that writes
+firewalls or VDOMs and then touches a partitioned table, while another
+changes partitions, deadlocks with it; with LIST partitioning, the crud
+functions that do either take lock_partition_ddl first.
+
+Converting a table rewrites it under an ACCESS EXCLUSIVE lock: run enable
+and disable in a maintenance window.
+"""
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from app import versioning
+from app.utils.bulk_load import copy_into, index_definition
+
+logger = logging.getLogger(__name__)
+
+# Partitioned tables with their primary key column
+PARTITIONED_TABLES = {
+    "interfaces": "interface_id",
+    "routes": "route_id",
+}
+PARTITION_KEY = "firewall_id"
+STRATEGIES = ("list", "hash")
+DEFAULT_HASH_PARTITIONS = 16
+
+# pg_advisory_xact_lock key of lock_partition_ddl
+PARTITION_DDL_LOCK = 0x6E6574636F6C
+
+_STRATEGY_CODES = {"l": "list", "h": "hash"}
+_PARTITION_NAME = re.compile(rf"({'|'.join(PARTITIONED_TABLES)})_(fw_\d+(_new)?|p\d+|default)")
+
+class PartitioningError(Exception):
+    pass
+
+def partition_name(table: str, firewall_id: int) -> str:
+    return f"{table}_fw_{int(firewall_id)}"
+
+def is_partition(name: str) -> bool:
+    """
+    True for the names of partitions created here; migrations ignore them.
+    """
+    return _PARTITION_NAME.fullmatch(name) is not None
+
+def get_strategy(connection, table: str) -> Optional[str]:
+    """
+    "list" or "hash" when the table is partitioned, otherwise None.
+    """
+    if connection.dialect.name != "postgresql":
+        return None
+    code = connection.execute(
+        text("SELECT partstrat FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": table}
+    ).scalar()
+    return _STRATEGY_CODES.get(code)
+
+def _partitions(connection, table: str) -> List[str]:
+    return list(connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    ), {"table": table}).scalars())
+
+def _firewall_partitions(connection, table: str) -> Dict[int, str]:
+    prefix = f"{table}_fw_"
+    return {
+        int(name[len(prefix):]): name
+        for name in _partitions(connection, table)
+        if name.startswith(prefix) and name[len(prefix):].isdigit()
+    }
+
+def _create_firewall_partition(connection, table: str, firewall_id: int) -> bool:
+    # A partition cannot be created while the default partition holds its rows
+    stranded = connection.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {PARTITION_KEY} = :firewall_id)"),
+        {"firewall_id": firewall_id}
+    ).scalar()
+    if stranded:
+        logger.warning("%s of firewall %d stay in %s_default until they are replaced", table, firewall_id, table)
+        return False
+    connection.execute(text(
+        f"CREATE TABLE {partition_name(table, firewall_id)} PARTITION OF {table} FOR VALUES IN ({int(firewall_id)})"
+    ))
+    return True
+
+def _create_partitions(connection, table: str, strategy: str, partitions: int) -> None:
+    if strategy == "list":
+        for firewall_id in connection.execute(text("SELECT firewall_id FROM firewalls ORDER BY firewall_id")).scalars():
+            connection.execute(text(
+                f"CREATE TABLE {partition_name(table, firewall_id)} PARTITION OF {table} FOR VALUES IN ({firewall_id})"
+            ))
+        connection.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+    else:
+        for remainder in range(partitions):
+            connection.execute(text(
+                f"CREATE TABLE {table}_p{remainder} PARTITION OF {table} "
+                f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            ))
+
+def _rebuild(connection, table: str, strategy: Optional[str], partitions: int) -> None:
+    """
+    Rewrite a table as partitioned (strategy "list" or "hash") or as a plain
+    table (strategy None), keeping its rows, sequence, constraints, indexes
+    and triggers.
+    """
+    key = PARTITIONED_TABLES[table]
+    old = f"{table}_unpartitioned" if strategy else f"{table}_partitioned"
+    connection.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence(:table, :key)"), {"table": table, "key": key}).scalar()
+    constraints = connection.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(:table) AND contype IN ('u', 'f', 'c') ORDER BY conname"
+    ), {"table": table}).all()
+    indexes = connection.execute(text(
+        "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+        "WHERE i.schemaname = current_schema() AND i.tablename = :table "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname) ORDER BY i.indexname"
+    ), {"table": table}).all()
+    triggers = connection.execute(text(
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger "
+        "WHERE tgrelid = to_regclass(:table) AND NOT tgisinternal ORDER BY tgname"
+    ), {"table": table}).scalars().all()
+
+    # Free the names of the old table's indexes and constraints for the new one
+    for name, _ in indexes:
+        connection.execute(text(f'DROP INDEX "{name}"'))
+    for name, _ in constraints:
+        connection.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+    connection.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {table}_pkey"))
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+
+    partition_by = f" PARTITION BY {strategy.upper()} ({PARTITION_KEY})" if strategy else ""
+    connection.execute(text(f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS){partition_by}"))
+    # The primary key of a partitioned table must include the partition key
+    primary_key = f"{key}, {PARTITION_KEY}" if strategy else key
+    connection.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({primary_key})"))
+    if strategy:
+        _create_partitions(connection, table, strategy, partitions)
+
+    # Constraints and indexes after the rows, so each is built in one pass
+    connection.execute(text(f"INSERT INTO {table} SELECT * FROM {old}"))
+    for name, definition in constraints:
+        connection.execute(text(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}'))
+    for _, definition in indexes:
+        connection.execute(text(index_definition(definition)))
+    for definition in triggers:
+        connection.execute(text(definition))
+
+    connection.execute(text(f"DROP TABLE {old}"))
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{key}"))
+
+def _check_postgres(engine) -> None:
+    if engine.dialect.name != "postgresql":
+        raise PartitioningError("Partitioning needs PostgreSQL")
+
+def partition_tables(
+    engine,
+    strategy: str,
+    partitions: int = DEFAULT_HASH_PARTITIONS,
+    tables: Sequence[str] = tuple(PARTITIONED_TABLES)
+) -> None:
+    """
+    Convert plain tables to LIST or HASH partitioning on firewall_id.
+    """
+    _check_postgres(engine)
+    if strategy not in STRATEGIES:
+        raise PartitioningError(f"Unknown strategy {strategy}; use one of {', '.join(STRATEGIES)}")
+    if strategy == "hash" and partitions < 2:
+        raise PartitioningError("HASH partitioning needs at least 2 partitions")
+    for table in tables:
+        with engine.begin() as connection:
+            current = get_strategy(connection, table)
+            if current:
+                raise PartitioningError(f"{table} is already {current} partitioned; disable partitioning first")
+            logger.info("Partitioning %s by %s (%s)", table, PARTITION_KEY, strategy)
+            _rebuild(connection, table, strategy, partitions)
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text(f"ANALYZE {table}"))
+
+def unpartition_tables(engine, tables: Sequence[str] = tuple(PARTITIONED_TABLES)) -> None:
+    """
+    Convert partitioned tables back to plain tables.
+    """
+    _check_postgres(engine)
+    for table in tables:
+        with engine.begin() as connection:
+            if not get_strategy(connection, table):
+                continue
+            logger.info("Merging the partitions of %s", table)
+            _rebuild(connection, table, None, 0)
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text(f"ANALYZE {table}"))
+
+def describe(connection) -> Dict[str, dict]:
+    """
+    Strategy and partitions of each partitionable table.
+    """
+    return {
+        table: {"strategy": get_strategy(connection, table), "partitions": _partitions(connection, table)}
+        for table in PARTITIONED_TABLES
+    }
+
+def lock_partition_ddl(connection) -> None:
+    """
+    Wait for the other transactions that change partitions or write their
+    referenced tables, and keep them waiting until this one ends. Must come
+    before the transaction's first write; does nothing unless a table is LIST
+    partitioned.
+    """
+    if any(get_strategy(connection, table) == "list" for table in PARTITIONED_TABLES):
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_DDL_LOCK})
+
+def add_firewall_partitions(connection, firewall_id: int) -> None:
+    """
+    Create the partitions of a new firewall in every LIST partitioned table.
+    Runs in the caller's transaction.
+    """
+    for table in PARTITIONED_TABLES:
+        if get_strategy(connection, table) == "list" and firewall_id not in _firewall_partitions(connection, table):
+            _create_firewall_partition(connection, table, firewall_id)
+
+def sync_partitions(engine) -> Tuple[int, int]:
+    """
+    Give every firewall its LIST partitions and drop the partitions of
+    firewalls that no longer exist (ON DELETE CASCADE has emptied them).
+    Returns (created, dropped).
+    """
+    created = dropped = 0
+    if engine.dialect.name != "postgresql":
+        return created, dropped
+    with engine.begin() as connection:
+        firewall_ids = set(connection.execute(text("SELECT firewall_id FROM firewalls")).scalars())
+        for table in PARTITIONED_TABLES:
+            if get_strategy(connection, table) != "list":
+                continue
+            existing = _firewall_partitions(connection, table)
+            for firewall_id in sorted(firewall_ids - set(existing)):
+                created += _create_firewall_partition(connection, table, firewall_id)
+            for firewall_id in sorted(set(existing) - firewall_ids):
+                connection.execute(text(f"DROP TABLE {existing[firewall_id]}"))
+                dropped += 1
+    if created or dropped:
+        logger.info("Created %d and dropped %d firewall partitions", created, dropped)
+    return created, dropped
+
+def can_swap(connection, table: str, firewall_id: int) -> bool:
+    return get_strategy(connection, table) == "list" and firewall_id in _firewall_partitions(connection, table)
+
+def swap_partition(
+    connection,
+    table: str,
+    firewall_id: int,
+    columns: List[str],
+    rows: Iterable[Sequence]
+) -> Tuple[int, int]:
+    """
+    Replace all rows of one firewall in a LIST partitioned table: COPY the
+    new rows into a fresh table, then detach the firewall's partition, attach
+    the new table in its place and drop the old one. Deleted rows get their
+    tombstones and their closed versions in one statement each. Runs in the caller's transaction; readers
+    see the old rows until it commits. Returns (deleted, loaded).
+    """
+    partition = partition_name(table, firewall_id)
+    staging = f"{partition}_new"
+    connection.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    connection.execute(text(f"CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS)"))
+    # Proves the partition bound up front, so ATTACH does not scan the rows
+    connection.execute(text(
+        f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_bound "
+        f"CHECK ({PARTITION_KEY} IS NOT NULL AND {PARTITION_KEY} = {int(firewall_id)})"
+    ))
+    loaded = copy_into(connection.connection.cursor(), staging, columns, rows)
+
+    # DROP TABLE does not fire the tombstone trigger; record them the same way
+    deleted = connection.execute(text(
+        f"INSERT INTO tombstones (entity, entity_id, firewall_id, vdom_id, deleted_at) "
+        f"SELECT :table, {PARTITIONED_TABLES[table]}, firewall_id, vdom_id, now() FROM {partition}"
+    ), {"table": table}).rowcount
+    versioning.archive(connection, table, partition)
+
+    connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+    # Builds the partition's indexes and checks its foreign keys
+    connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {staging} FOR VALUES IN ({int(firewall_id)})"))
+    connection.execute(text(f"DROP TABLE {partition}"))
+    connection.execute(text(f"ALTER TABLE {staging} RENAME TO {partition}"))
+    connection.execute(text(f"ALTER TABLE {partition} DROP CONSTRAINT {staging}_bound"))
+    # ATTACH named the indexes after the staging table
+    for name in connection.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :partition AND indexname LIKE :prefix"),
+        {"partition": partition, "prefix": f"{staging}%"}
+    ).scalars().all():
+        connection.execute(text(f'ALTER INDEX "{name}" RENAME TO "{partition}{name[len(staging):]}"'))
+    return deleted, loaded
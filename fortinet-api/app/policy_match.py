@@ -0,0 +1,332 @@
+"""
+Policy lookup: the first policy of a VDOM that a flow matches.
+
+A VDOM's enabled policies are compiled once into a decision structure, with
+groups expanded. Each dimension maps a value to the bitset (a Python int)
+of the policies matching it, bit i for the i-th policy in evaluation order:
+- source and destination addresses: per IP version, the elementary
+  intervals cut by every address range, found by bisection
+- services: the same intervals over the destination ports of each of TCP,
+  UDP and SCTP, plus the policies accepting any port of a protocol
+- interfaces: a dict of names, plus the policies of "any"
+
+A lookup ANDs the bitsets of the dimensions (XOR the negated policies) and
+takes the lowest bit, so its cost depends on the number of distinct
+address and port boundaries, not on the number of policies.
+
+Compiled sets are cached per VDOM (see app.cache) until an event touches the
+VDOM's policies, addresses or services. Schedules are not evaluated, and
+FQDN, geography and dynamic addresses never match.
+"""
+import ipaddress
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from app.cache import policy_cache
+
+# Protocols whose services carry destination port ranges
+PORT_PROTOCOLS = {"tcp": 6, "udp": 17, "sctp": 132}
+PROTOCOL_NUMBERS = {**PORT_PROTOCOLS, "icmp": 1, "icmp6": 58}
+
+# Names FortiOS predefines: any interface, all addresses, all services
+ANY_INTERFACE = "any"
+ALL_ADDRESSES = "all"
+ALL_SERVICES = "ALL"
+
+_BITS = {4: 32, 6: 128}
+
+Range = Tuple[int, int]
+
+def _merge(ranges: Iterable[Range]) -> List[Range]:
+    # Sorted, disjoint and non-adjacent ranges covering the same values
+    merged: List[Range] = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            if high > merged[-1][1]:
+                merged[-1] = (merged[-1][0], high)
+        else:
+            merged.append((low, high))
+    return merged
+
+class IntervalMap:
+    """
+    Maps numbers to the bitset of the ranges holding them: the starts of
+    the elementary intervals cut by all range boundaries, and the bitset of
+    each interval. Equal bitsets are stored once.
+    """
+    __slots__ = ("starts", "bitsets")
+
+    def __init__(self, ranges: Dict[int, List[Range]]):
+        # ranges: {policy index: ranges}; each policy's ranges are merged so
+        # that its bit is toggled on at each start and off after each end
+        toggles: Dict[int, int] = defaultdict(int)
+        for index, index_ranges in ranges.items():
+            bit = 1 << index
+            for low, high in _merge(index_ranges):
+                toggles[low] ^= bit
+                toggles[high + 1] ^= bit
+        self.starts = [0]
+        self.bitsets = [0]
+        interned: Dict[int, int] = {0: 0}
+        current = 0
+        for point in sorted(toggles):
+            current ^= toggles[point]
+            bits = interned.setdefault(current, current)
+            if point == self.starts[-1]:
+                self.bitsets[-1] = bits
+            elif bits != self.bitsets[-1]:
+                self.starts.append(point)
+                self.bitsets.append(bits)
+
+    def lookup(self, value: int) -> int:
+        return self.bitsets[bisect_right(self.starts, value) - 1]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+def address_ranges(address) -> List[Tuple[int, Range]]:
+    """
+    The (IP version, (first, last)) ranges of an address object; none for
+    types that cannot be matched by address.
+    """
+    try:
+        if address.type == "iprange":
+            start, end = ipaddress.ip_address(address.start_ip.strip()), ipaddress.ip_address(address.end_ip.strip())
+            if start.version == end.version and start <= end:
+                return [(start.version, (int(start), int(end)))]
+        elif address.type == "ipmask" and address.subnet:
+            network = ipaddress.ip_network("/".join(address.subnet.split()), strict=False)
+            return [(network.version, (int(network.network_address), int(network.broadcast_address)))]
+    except (AttributeError, ValueError):
+        pass
+    return []
+
+def port_ranges(value: Optional[str]) -> List[Range]:
+    """
+    The destination port ranges of a FortiOS port range list such as
+    "80 443 8000-8080:1024-65535"; source ranges after ":" are ignored.
+    """
+    ranges = []
+    for token in (value or "").replace(",", " ").split():
+        destination = token.split(":", 1)[0]
+        low, _, high = destination.partition("-")
+        try:
+            low, high = int(low), int(high or low)
+        except ValueError:
+            continue
+        if 0 <= low <= high <= 65535:
+            ranges.append((low, high))
+    return ranges
+
+def parse_protocol(proto: Union[int, str]) -> int:
+    if isinstance(proto, int) or str(proto).isdigit():
+        number = int(proto)
+        if not 0 <= number <= 255:
+            raise ValueError(f"Invalid protocol number {number}")
+        return number
+    number = PROTOCOL_NUMBERS.get(str(proto).strip().lower())
+    if number is None:
+        raise ValueError(f"Unknown protocol {proto}; expected a number or one of {', '.join(PROTOCOL_NUMBERS)}")
+    return number
+
+def _expand(names: Sequence[str], objects: Dict[str, object], groups: Dict[str, List[str]]) -> List[object]:
+    # The objects named directly or through groups, nested groups included
+    found, seen, pending = [], set(), list(names)
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        if name in groups:
+            pending.extend(groups[name])
+        elif name in objects:
+            found.append(objects[name])
+    return found
+
+class _Resolver:
+    """
+    Expands name lists to objects, each name expanded once.
+    """
+
+    def __init__(self, objects: Dict[str, object], groups: Dict[str, List[str]]):
+        self.objects = objects
+        self.groups = groups
+        self.expanded: Dict[str, List[object]] = {}
+
+    def __call__(self, names: Sequence[str]) -> List[object]:
+        found = []
+        for name in names:
+            if name not in self.expanded:
+                self.expanded[name] = _expand([name], self.objects, self.groups)
+            found.extend(self.expanded[name])
+        return found
+
+class PolicySet:
+    """
+    The compiled policies of one VDOM.
+    """
+
+    def __init__(self, policies: Sequence, addresses: Sequence, address_groups: Sequence, services: Sequence, service_groups: Sequence):
+        # Policies in evaluation order; bit i stands for policies[i]
+        self.policies = list(policies)
+        # Addresses are parsed once, as their (IP version, range) lists
+        address_by_name = {address.name: address_ranges(address) for address in addresses}
+        resolve_addresses = _Resolver(address_by_name, {group.name: list(group.members or ()) for group in address_groups})
+        service_by_name = {service.name: service for service in services}
+        resolve_services = _Resolver(service_by_name, {group.name: list(group.members or ()) for group in service_groups})
+
+        self.negated = {"srcaddr": 0, "dstaddr": 0, "service": 0}
+        addresses_by_side: Dict[str, Dict[int, Dict[int, List[Range]]]] = {
+            "srcaddr": defaultdict(dict), "dstaddr": defaultdict(dict)
+        }
+        self.any_port: Dict[int, int] = defaultdict(int)  # {protocol: bitset}
+        self.all_services = 0
+        port_ranges_by_protocol: Dict[int, Dict[int, List[Range]]] = defaultdict(dict)
+        interface_names = {side: defaultdict(int) for side in ("srcintf", "dstintf")}
+        interface_any = {side: 0 for side in ("srcintf", "dstintf")}
+
+        for index, policy in enumerate(self.policies):
+            bit = 1 << index
+            for side in ("srcaddr", "dstaddr"):
+                if getattr(policy, f"{side}_negate"):
+                    self.negated[side] |= bit
+                names = getattr(policy, side) or []
+                by_version = addresses_by_side[side]
+                if ALL_ADDRESSES in names and ALL_ADDRESSES not in address_by_name:
+                    for version, bits in _BITS.items():
+                        by_version[version].setdefault(index, []).append((0, (1 << bits) - 1))
+                for ranges in resolve_addresses(names):
+                    for version, address_range in ranges:
+                        by_version[version].setdefault(index, []).append(address_range)
+
+            if policy.service_negate:
+                self.negated["service"] |= bit
+            names = policy.service or []
+            if ALL_SERVICES in names and ALL_SERVICES not in service_by_name:
+                self.all_services |= bit
+            for service in resolve_services(names):
+                protocol = (service.protocol or "").upper()
+                if protocol == "TCP/UDP/SCTP":
+                    for name, number in PORT_PROTOCOLS.items():
+                        ranges = port_ranges(getattr(service, f"{name}_portrange"))
+                        if ranges:
+                            port_ranges_by_protocol[number].setdefault(index, []).extend(ranges)
+                elif protocol in ("ICMP", "ICMP6"):
+                    self.any_port[PROTOCOL_NUMBERS[protocol.lower()]] |= bit
+                elif protocol == "IP":
+                    if not service.protocol_number:
+                        self.all_services |= bit
+                    else:
+                        self.any_port[service.protocol_number] |= bit
+
+            for side, by_name in interface_names.items():
+                for name in getattr(policy, side) or []:
+                    if name == ANY_INTERFACE:
+                        interface_any[side] |= bit
+                    else:
+                        by_name[name] |= bit
+
+        self.address_maps = {
+            side: {version: IntervalMap(ranges) for version, ranges in by_version.items()}
+            for side, by_version in addresses_by_side.items()
+        }
+        self.port_maps = {number: IntervalMap(ranges) for number, ranges in port_ranges_by_protocol.items()}
+        self.interfaces = {side: (dict(by_name), interface_any[side]) for side, by_name in interface_names.items()}
+        self.any_port = dict(self.any_port)
+
+    def _addresses(self, side: str, address) -> int:
+        interval_map = self.address_maps[side].get(address.version)
+        bits = interval_map.lookup(int(address)) if interval_map else 0
+        return bits ^ self.negated[side]
+
+    def _services(self, protocol: int, port: Optional[int]) -> int:
+        bits = self.all_services | self.any_port.get(protocol, 0)
+        port_map = self.port_maps.get(protocol)
+        if port_map is not None and port is not None:
+            bits |= port_map.lookup(port)
+        return bits ^ self.negated["service"]
+
+    def _interface(self, side: str, name: Optional[str]) -> int:
+        by_name, any_bits = self.interfaces[side]
+        return -1 if name is None else by_name.get(name, 0) | any_bits
+
+    def match(
+        self,
+        src: str,
+        dst: str,
+        proto: Union[int, str] = "tcp",
+        port: Optional[int] = None,
+        srcintf: Optional[str] = None,
+        dstintf: Optional[str] = None
+    ) -> Tuple[int, Optional[object]]:
+        """
+        The protocol number and the first policy matching the flow, or None.
+        Interfaces are only checked when given. Raises ValueError for bad
+        addresses, protocols or ports.
+        """
+        try:
+            source, destination = ipaddress.ip_address(src.strip()), ipaddress.ip_address(dst.strip())
+        except ValueError as e:
+            raise ValueError(f"Invalid address: {e}")
+        protocol = parse_protocol(proto)
+        if protocol in PORT_PROTOCOLS.values():
+            if port is None:
+                raise ValueError("port is required for tcp, udp and sctp")
+        if port is not None and not 0 <= port <= 65535:
+            raise ValueError(f"Invalid port {port}")
+        if not self.policies:
+            return protocol, None
+
+        bits = self._addresses("srcaddr", source)
+        if bits:
+            bits &= self._addresses("dstaddr", destination)
+        if bits:
+            bits &= self._services(protocol, port)
+        if bits:
+            bits &= self._interface("srcintf", srcintf) & self._interface("dstintf", dstintf)
+        # Negation sets bits beyond the last policy; keep the policies only
+        bits &= (1 << len(self.policies)) - 1
+        if not bits:
+            return protocol, None
+        return protocol, self.policies[(bits & -bits).bit_length() - 1]
+
+    @property
+    def intervals(self) -> int:
+        """
+        The number of elementary intervals held, a measure of its size.
+        """
+        maps = [*self.port_maps.values(), *(m for side in self.address_maps.values() for m in side.values())]
+        return sum(len(interval_map) for interval_map in maps)
+
+def compile_vdom(db, vdom_id: int) -> PolicySet:
+    from app.models.address import Address, AddressGroup
+    from app.models.policy import Policy
+    from app.models.service import Service, ServiceGroup
+    from app.schemas.policy import PolicyResponse
+
+    policies = (
+        db.query(Policy)
+        .filter(Policy.vdom_id == vdom_id, Policy.status == "enable")
+        .order_by(Policy.sequence, Policy.policy_number)
+        .all()
+    )
+    return PolicySet(
+        [PolicyResponse.model_validate(policy) for policy in policies],
+        db.query(Address).filter(Address.vdom_id == vdom_id).all(),
+        db.query(AddressGroup).filter(AddressGroup.vdom_id == vdom_id).all(),
+        db.query(Service).filter(Service.vdom_id == vdom_id).all(),
+        db.query(ServiceGroup).filter(ServiceGroup.vdom_id == vdom_id).all(),
+    )
+
+def get_policy_set(db, vdom_id: int, firewall_id: int) -> PolicySet:
+    """
+    The compiled policies of a VDOM, from the cache or compiled now.
+    """
+    key = (vdom_id,)
+    policy_set = policy_cache.get(key)
+    if policy_set is None:
+        sequence = policy_cache.sequence
+        policy_set = compile_vdom(db, vdom_id)
+        policy_cache.put(key, firewall_id, policy_set, sequence)
+    return policy_set
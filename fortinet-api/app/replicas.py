@@ -0,0 +1,175 @@
+"""
+Routing of reads to PostgreSQL streaming replicas.
+
+With DATABASE_READ_URLS set (comma-separated URLs), list and search
+endpoints read through get_read_db (see app.database), which binds their
+session to a replica picked by ReplicaSet.pick(); everything else,
+including every write, uses the primary. A replica is skipped:
+- while its replay lag exceeds REPLICA_MAX_LAG_SECONDS
+- for REPLICA_RETRY_SECONDS after a failed connection or lag check
+and reads fall back to the primary when no replica is left.
+
+Lag is checked on a replica at most every REPLICA_LAG_CHECK_SECONDS, by the
+request that finds it due, so checks cost no extra thread. A successful
+write sets the READ_PRIMARY_COOKIE for READ_YOUR_WRITES_SECONDS; reads
+carrying it go to the primary, so a client sees its own writes even
+before the replicas replay them. The window defaults to the largest lag a
+replica may have before it is skipped, plus one check interval.
+
+GET /api/database/replicas returns the state and counters of each worker's
+ReplicaSet.
+"""
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "2"))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "10"))
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", "2"))
+READ_YOUR_WRITES_SECONDS = float(
+    os.getenv("READ_YOUR_WRITES_SECONDS", str(REPLICA_MAX_LAG_SECONDS + REPLICA_LAG_CHECK_SECONDS))
+)
+READ_PRIMARY_COOKIE = "netcollect_read_primary"
+
+# Seconds since the last replayed transaction, or 0 when everything received
+# is replayed (an idle primary sends nothing to replay). NULL on a primary.
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM clock_timestamp() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+class Replica:
+    """
+    A replica's engine, its last measured lag and its counters.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.name = engine.url.render_as_string(hide_password=True)
+        self.lag: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.down_until = 0.0
+        self.reads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._checking = False
+
+    def usable(self, now: float) -> bool:
+        return now >= self.down_until and self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+    def as_dict(self, now: float) -> dict:
+        return {
+            "url": self.name,
+            "usable": self.usable(now),
+            "lag_seconds": round(self.lag, 3) if self.lag is not None else None,
+            "checked_seconds_ago": round(now - self.checked_at, 1) if self.checked_at is not None else None,
+            "down_for_seconds": round(self.down_until - now, 1) if self.down_until > now else 0,
+            "reads": self.reads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+class ReplicaSet:
+    """
+    The replicas of one worker, picked round-robin among the usable ones.
+    """
+
+    def __init__(self, engines: List[Engine]):
+        self.replicas = [Replica(engine) for engine in engines]
+        self._lock = threading.Lock()
+        self._next = 0
+        self.primary_reads = 0
+        self.sticky_reads = 0
+        self.fallbacks = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def check(self, replica: Replica) -> None:
+        """
+        Measure a replica's lag; a failure takes it out for REPLICA_RETRY_SECONDS.
+        """
+        try:
+            with replica.engine.connect() as connection:
+                lag = connection.execute(LAG_QUERY).scalar()
+            # A server out of recovery (promoted, or a primary listed by
+            # mistake) has no lag to measure but may miss our writes
+            if lag is None:
+                raise RuntimeError("not a replica (pg_is_in_recovery() is false)")
+            lag, error = float(lag), None
+        except (SQLAlchemyError, RuntimeError) as e:
+            lag, error = None, str(e).splitlines()[0]
+        now = time.monotonic()
+        with self._lock:
+            replica.lag = lag
+            replica.checked_at = now
+            replica._checking = False
+            if error is not None:
+                self._mark_down(replica, error, now)
+
+    def _mark_down(self, replica: Replica, error: str, now: float) -> None:
+        replica.failures += 1
+        replica.last_error = error
+        replica.down_until = now + REPLICA_RETRY_SECONDS
+        logger.warning("Replica %s unavailable for %ss: %s", replica.name, REPLICA_RETRY_SECONDS, error)
+
+    def mark_down(self, replica: Replica, error: str) -> None:
+        with self._lock:
+            self._mark_down(replica, error, time.monotonic())
+
+    def pick(self) -> Optional[Replica]:
+        """
+        The next usable replica, or None to read from the primary. Replicas
+        due for a lag check are checked first, one request each.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                replica for replica in self.replicas
+                if not replica._checking and now >= replica.down_until
+                and (replica.checked_at is None or now - replica.checked_at >= REPLICA_LAG_CHECK_SECONDS)
+            ]
+            for replica in due:
+                replica._checking = True
+        for replica in due:
+            self.check(replica)
+        now = time.monotonic()
+        with self._lock:
+            for offset in range(len(self.replicas)):
+                replica = self.replicas[(self._next + offset) % len(self.replicas)]
+                if replica.usable(now):
+                    self._next = (self._next + offset + 1) % len(self.replicas)
+                    replica.reads += 1
+                    return replica
+            self.fallbacks += 1
+            return None
+
+    def count_primary_read(self, sticky: bool) -> None:
+        with self._lock:
+            self.primary_reads += 1
+            if sticky:
+                self.sticky_reads += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "max_lag_seconds": REPLICA_MAX_LAG_SECONDS,
+                "read_your_writes_seconds": READ_YOUR_WRITES_SECONDS,
+                "primary_reads": self.primary_reads,
+                "sticky_reads": self.sticky_reads,
+                "fallbacks": self.fallbacks,
+                "replicas": [replica.as_dict(now) for replica in self.replicas],
+            }
@@ -0,0 +1,133 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db, get_read_db, shards
+from app.schemas.address import (
+    AddressCreate, AddressUpdate, AddressResponse, AddressPaginationResponse,
+    AddressGroupCreate, AddressGroupUpdate, AddressGroupResponse, AddressGroupPaginationResponse
+)
+import app.crud.address as crud
+import app.crud.vdom as vdom_crud
+
+router = APIRouter(
+    prefix="/api/addresses",
+    tags=["addresses"],
+    responses={404: {"description": "Address not found"}}
+)
+
+@router.get("/", response_model=AddressPaginationResponse)
+def read_addresses(
+    skip: int = 0,
+    limit: int = 1000,
+    vdom_id: Optional[int] = None,
+    name: Optional[str] = None,
+    type: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Retrieve address objects with optional filtering and pagination.
+    """
+    addresses, total_count = shards.gather(
+        db,
+        lambda db, skip, limit: crud.get_addresses(db, skip=skip, limit=limit, vdom_id=vdom_id, name=name, type=type),
+        skip, limit, crud.NAME_SORT_KEY
+    )
+    return {"items": addresses, "total_count": total_count}
+
+@router.get("/groups", response_model=AddressGroupPaginationResponse)
+def read_address_groups(
+    skip: int = 0,
+    limit: int = 1000,
+    vdom_id: Optional[int] = None,
+    name: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Retrieve address groups with optional filtering and pagination.
+    """
+    groups, total_count = shards.gather(
+        db,
+        lambda db, skip, limit: crud.get_address_groups(db, skip=skip, limit=limit, vdom_id=vdom_id, name=name),
+        skip, limit, crud.NAME_SORT_KEY
+    )
+    return {"items": groups, "total_count": total_count}
+
+@router.get("/groups/{group_id}", response_model=AddressGroupResponse)
+def read_address_group(group_id: int, db: Session = Depends(get_read_db)):
+    """
+    Get a specific address group by ID.
+    """
+    db_group = crud.get_address_group(db, group_id=group_id)
+    if db_group is None:
+        raise HTTPException(status_code=404, detail="Address group not found")
+    return db_group
+
+@router.post("/groups", response_model=AddressGroupResponse, status_code=201)
+def create_address_group(group: AddressGroupCreate, db: Session = Depends(get_db)):
+    """
+    Create a new address group. Members name addresses or other groups of the VDOM.
+    """
+    if vdom_crud.get_vdom(db, vdom_id=group.vdom_id) is None:
+        raise HTTPException(status_code=404, detail="VDOM not found")
+    if crud.get_address_group_by_name(db, group.vdom_id, group.name):
+        raise HTTPException(status_code=400, detail=f"Address group '{group.name}' already exists in this VDOM")
+    return crud.create_address_group(db=db, group=group)
+
+@router.put("/groups/{group_id}", response_model=AddressGroupResponse)
+def update_address_group(group_id: int, group: AddressGroupUpdate, db: Session = Depends(get_db)):
+    """
+    Update an address group by ID.
+    """
+    db_group = crud.update_address_group(db, group_id=group_id, group=group)
+    if db_group is None:
+        raise HTTPException(status_code=404, detail="Address group not found")
+    return db_group
+
+@router.delete("/groups/{group_id}", status_code=204)
+def delete_address_group(group_id: int, db: Session = Depends(get_db)):
+    """
+    Delete an address group by ID.
+    """
+    if not crud.delete_address_group(db, group_id=group_id):
+        raise HTTPException(status_code=404, detail="Address group not found")
+    return None
+
+@router.get("/{address_id}", response_model=AddressResponse)
+def read_address(address_id: int, db: Session = Depends(get_read_db)):
+    """
+    Get a specific address object by ID.
+    """
+    db_address = crud.get_address(db, address_id=address_id)
+    if db_address is None:
+        raise HTTPException(status_code=404, detail="Address not found")
+    return db_address
+
+@router.post("/", response_model=AddressResponse, status_code=201)
+def create_address(address: AddressCreate, db: Session = Depends(get_db)):
+    """
+    Create a new address object.
+    """
+    if vdom_crud.get_vdom(db, vdom_id=address.vdom_id) is None:
+        raise HTTPException(status_code=404, detail="VDOM not found")
+    if crud.get_address_by_name(db, address.vdom_id, address.name):
+        raise HTTPException(status_code=400, detail=f"Address '{address.name}' already exists in this VDOM")
+    return crud.create_address(db=db, address=address)
+
+@router.put("/{address_id}", response_model=AddressResponse)
+def update_address(address_id: int, address: AddressUpdate, db: Session = Depends(get_db)):
+    """
+    Update an address object by ID.
+    """
+    db_address = crud.update_address(db, address_id=address_id, address=address)
+    if db_address is None:
+        raise HTTPException(status_code=404, detail="Address not found")
+    return db_address
+
+@router.delete("/{address_id}", status_code=204)
+def delete_address(address_id: int, db: Session = Depends(get_db)):
+    """
+    Delete an address object by ID.
+    """
+    if not crud.delete_address(db, address_id=address_id):
+        raise HTTPException(status_code=404, detail="Address not found")
+    return None
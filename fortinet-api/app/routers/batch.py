@@ -0,0 +1,63 @@
+import json
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from app.batch import Batch, refused
+from app.schemas.batch import BatchRequest, BatchResponse
+
+router = APIRouter(
+    prefix="/api/batch",
+    tags=["batch"]
+)
+
+# Upper bound on sub-requests per batch
+MAX_BATCH_REQUESTS = 50
+
+def _result(status_code: int, headers, body: bytes) -> bytes:
+    # Splices JSON bodies in as they are rather than decoding them
+    head = {
+        name.decode("latin-1"): value.decode("latin-1") for name, value in headers
+        if name not in (b"content-length", b"vary") and not name.startswith(b"access-control-")
+    }
+    if not body:
+        value = b"null"
+    elif head.get("content-type", "").startswith("application/json"):
+        value = body
+    else:
+        value = json.dumps(body.decode("utf-8", "replace")).encode()
+    return json.dumps({"status": status_code, "headers": head})[:-1].encode() + b', "body": ' + value + b"}"
+
+@router.post("/", response_model=BatchResponse)
+async def run_batch(batch_request: BatchRequest, request: Request):
+    """
+    Run several GET requests in one call, on one database snapshot. Each
+    result has the status, headers and body the request would have had on
+    its own, in request order.
+    """
+    items = batch_request.requests
+    if len(items) > MAX_BATCH_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_REQUESTS} requests per batch")
+    errors = {}
+    for index, item in enumerate(items):
+        if item.method.upper() != "GET":
+            errors[index] = 405, "Only GET requests can be batched"
+        elif refused(item.path):
+            errors[index] = 400, refused(item.path)
+    runnable = [index for index in range(len(items)) if index not in errors]
+
+    batch = Batch()
+    try:
+        results = dict(zip(runnable, await batch.run(request.app, request.scope, [items[index].path for index in runnable])))
+    finally:
+        batch.close()
+    parts = []
+    for index in range(len(items)):
+        if index in errors:
+            status_code, detail = errors[index]
+            parts.append(_result(
+                status_code, [(b"content-type", b"application/json")], json.dumps({"detail": detail}).encode()
+            ))
+        else:
+            parts.append(_result(*results[index]))
+    return Response(b'{"responses": [' + b", ".join(parts) + b"]}", media_type="application/json")
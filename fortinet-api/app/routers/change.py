@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import edge, get_db, shards
+from app.schemas.change import ChangeFeedResponse
+import app.crud.change as crud
+
+router = APIRouter(
+    prefix="/api/changes",
+    tags=["changes"]
+)
+
+@router.get("/", response_model=ChangeFeedResponse)
+def read_changes(
+    since: Optional[str] = Query(None, description="Token from a previous response; omit for a full sync"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum rows per entity and for deletions, per shard"),
+    db: Session = Depends(get_db)
+):
+    """
+    Return rows created, updated, or deleted since the token. Keep calling
+    with next_token while has_more is true; store the last token for the next sync.
+    """
+    if edge is not None:
+        # Edge snapshots are published without tombstones (see app.edge)
+        raise HTTPException(status_code=400, detail="The change feed is not served from edge snapshots")
+    try:
+        cursors = crud.decode_token(since)
+        if shards.sharded:
+            # Every shard from its own cursors, whatever the session is routed to
+            changes, next_cursors, has_more = crud.merge_changes(shards.scatter(db, lambda session: crud.get_changes(
+                session, crud.shard_cursors(cursors, session.info.get("shard", 0)), limit=limit
+            )))
+        else:
+            changes, next_cursors, has_more = crud.get_changes(db, cursors, limit=limit)
+    except crud.InvalidChangeToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except crud.ExpiredChangeToken as e:
+        raise HTTPException(status_code=410, detail=f"{e}; run a full sync without 'since'")
+
+    return {
+        "changes": changes,
+        "next_token": crud.encode_token(next_cursors),
+        "has_more": has_more
+    }
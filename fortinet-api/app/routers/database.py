@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException
+from app.coalesce import coalescer
+from app.database import edge, replicas, shards
+
+router = APIRouter(
+    prefix="/api/database",
+    tags=["database"]
+)
+
+@router.get("/replicas")
+def read_replicas():
+    """
+    This worker's read replicas: their last measured lag in seconds,
+    whether reads go to them, and how many reads went where.
+    """
+    return replicas.stats()
+
+@router.get("/edge")
+def read_edge_snapshot():
+    """
+    The edge snapshot this worker serves: its file, size, publish time and
+    when it was loaded.
+    """
+    if edge is None:
+        raise HTTPException(status_code=404, detail="Not serving an edge snapshot")
+    return edge.stats()
+
+@router.get("/shards")
+def read_shards():
+    """
+    This worker's shards: their id ranges, firewalls and range usage, and
+    how many requests were routed to one shard or scattered to all.
+    """
+    if not shards.sharded:
+        raise HTTPException(status_code=404, detail="Not sharded")
+    return {**shards.status(), **shards.stats()}
+
+@router.get("/coalescing")
+def read_coalescing():
+    """
+    This worker's request coalescing: requests that ran the endpoint, that
+    shared a response of this worker or of another one, and Redis errors.
+    """
+    return coalescer.stats()
@@ -0,0 +1,51 @@
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from app.events import broker, ENTITIES, RESYNC_ENTITY
+
+router = APIRouter(
+    prefix="/api/events",
+    tags=["events"]
+)
+
+# Comment lines keep idle connections open through proxies
+KEEPALIVE_SECONDS = 15
+
+@router.get("/")
+async def stream_events(
+    request: Request,
+    entity: Optional[List[str]] = Query(None, description="Only send changes to these entities (firewalls, vdoms, interfaces, routes, vips)"),
+    firewall_id: Optional[int] = Query(None, description="Only send changes on this firewall"),
+):
+    """
+    Server-Sent Events stream of data changes. Each "change" event carries
+    {entity, op, id, firewall_id, vdom_id}; a "resync" event means changes may
+    have been missed and clients should reload.
+    """
+    entities = set(entity) if entity else None
+    if entities and not entities.issubset(ENTITIES):
+        raise HTTPException(status_code=400, detail=f"Unknown entity; expected one of: {', '.join(ENTITIES)}")
+
+    subscription = broker.subscribe(entities=entities, firewall_id=firewall_id)
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    change = await asyncio.wait_for(subscription.queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                event_name = "resync" if change.entity == RESYNC_ENTITY else "change"
+                yield f"event: {event_name}\ndata: {json.dumps(change)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
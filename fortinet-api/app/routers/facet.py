@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database import get_db, shards
+from app.schemas.facet import FacetResponse
+import app.crud.facet as crud
+
+router = APIRouter(
+    prefix="/api/facets",
+    tags=["facets"]
+)
+
+@router.get("/", response_model=FacetResponse)
+def read_facets(
+    entity: str = Query(..., description="firewalls, vdoms, interfaces, routes or vips"),
+    group_by: List[str] = Query(..., description="Columns to count by; repeat for more facets, join with commas to count combinations"),
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    limit: int = Query(1000, ge=1, le=10000, description="Values per facet"),
+    db: Session = Depends(get_db)
+):
+    """
+    Distinct values and their counts, for filters and dashboards: e.g.
+    `entity=routes&group_by=route_type&group_by=fw_name`. All facets are
+    counted in one query.
+    """
+    try:
+        if shards.sharded and "shard" not in db.info:
+            # Every shard counts all its values; the sums are ranked and cut
+            return crud.merge_facets(shards.scatter(db, lambda session: crud.get_facets(
+                session, entity, group_by, firewall_id=firewall_id, vdom_id=vdom_id, limit=None
+            )), limit)
+        return crud.get_facets(db, entity, group_by, firewall_id=firewall_id, vdom_id=vdom_id, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
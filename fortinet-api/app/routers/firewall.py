@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
+from datetime import datetime
+from app.database import get_db, get_read_db, shards
+from app.schemas.bulk import BulkDeleteResponse, BulkReplaceResponse
 from app.schemas.firewall import FirewallCreate, FirewallUpdate, FirewallResponse, FirewallPaginationResponse
+from app.schemas.route import RouteCreate
 import app.crud.firewall as crud
+import app.crud.route as route_crud
+from app.sharding import sum_counts
 
 router = APIRouter(
     prefix="/api/firewalls",
@@ -20,21 +25,25 @@ def read_firewalls(
     fw_name: Optional[str] = None,
     sort_by: Optional[str] = Query(None, description="Sort by field: fw_name, total_vdoms"),
     sort_order: Optional[str] = Query("asc", description="Sort order: asc or desc"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve firewalls with optional filtering by name and sorting.
     """
-    db_firewalls, total_count = crud.get_firewalls(
-        db, skip=skip, limit=limit, fw_name=fw_name,
-        sort_by=sort_by, sort_order=sort_order
+    db_firewalls, total_count = shards.gather(
+        db,
+        lambda db, skip, limit: crud.get_firewalls(
+            db, skip=skip, limit=limit, fw_name=fw_name,
+            sort_by=sort_by, sort_order=sort_order
+        ),
+        skip, limit, *crud.firewall_sort_key(sort_by, sort_order)
     )
     # Convert SQLAlchemy models to Pydantic schemas
     firewalls = [FirewallResponse.from_orm(fw) for fw in db_firewalls]
     return {"items": firewalls, "total_count": total_count}
 
 @router.get("/{firewall_id}", response_model=FirewallResponse)
-def read_firewall(firewall_id: int, db: Session = Depends(get_db)):
+def read_firewall(firewall_id: int, db: Session = Depends(get_read_db)):
     """
     Get a specific firewall by ID.
     """
@@ -46,16 +55,18 @@ def read_firewall(firewall_id: int, db: Session = Depends(get_db)):
 @router.post("/", response_model=FirewallResponse, status_code=201)
 def create_firewall(firewall: FirewallCreate, db: Session = Depends(get_db)):
     """
-    Create a new firewall.
+    Create a new firewall, on the shard its name is placed on.
     """
-    db_firewall = crud.get_firewall_by_name(db, fw_name=firewall.fw_name)
+    db_firewall = shards.find(db, lambda db: crud.get_firewall_by_name(db, fw_name=firewall.fw_name))
     if db_firewall:
         raise HTTPException(status_code=400, detail="Firewall name already registered")
     
-    db_firewall = crud.get_firewall_by_ip(db, fw_ip=firewall.fw_ip)
+    db_firewall = shards.find(db, lambda db: crud.get_firewall_by_ip(db, fw_ip=firewall.fw_ip))
     if db_firewall:
         raise HTTPException(status_code=400, detail="Firewall IP already registered")
     
+    if shards.sharded:
+        shards.bind(db, shards.place(firewall.fw_name))
     return crud.create_firewall(db=db, firewall=firewall)
 
 @router.put("/{firewall_id}", response_model=FirewallResponse)
@@ -72,6 +83,44 @@ def update_firewall(
         raise HTTPException(status_code=404, detail="Firewall not found")
     return db_firewall
 
+@router.put("/{firewall_id}/routes", response_model=BulkReplaceResponse)
+def replace_firewall_routes(firewall_id: int, routes: List[RouteCreate], db: Session = Depends(get_db)):
+    """
+    Replace all routes of a firewall with the given list in one transaction.
+    """
+    if crud.get_firewall(db, firewall_id=firewall_id) is None:
+        raise HTTPException(status_code=404, detail="Firewall not found")
+    try:
+        deleted, loaded, swapped = route_crud.replace_firewall_routes(db, firewall_id, routes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"deleted": deleted, "loaded": loaded, "swapped": swapped}
+
+@router.delete("/", response_model=BulkDeleteResponse)
+def delete_firewalls(
+    firewall_id: Optional[List[int]] = Query(None, description="Firewall IDs (repeatable)"),
+    fw_name: Optional[str] = Query(None, description="Exact firewall name"),
+    site: Optional[str] = None,
+    updated_before: Optional[datetime] = Query(None, description="Only firewalls not updated since this time"),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete all firewalls matching the filters in one statement. Their VDOMs,
+    interfaces, routes and VIPs are removed by the database cascade.
+    """
+    try:
+        deleted, cascaded = sum_counts(shards.each(
+            db,
+            lambda db, firewall_ids: crud.delete_firewalls(
+                db, firewall_ids=firewall_ids, fw_name=fw_name,
+                site=site, updated_before=updated_before
+            ),
+            firewall_id
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"deleted": deleted, "cascaded": cascaded}
+
 @router.delete("/{firewall_id}", status_code=204)
 def delete_firewall(firewall_id: int, db: Session = Depends(get_db)):
     """
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_read_db
+from app.schemas.generation import GenerationPaginationResponse
+import app.crud.generation as crud
+
+router = APIRouter(
+    prefix="/api/generations",
+    tags=["generations"]
+)
+
+@router.get("/", response_model=GenerationPaginationResponse)
+def read_generations(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    source: Optional[str] = Query(None, description="import, restore, collector, ingest or migration"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    The loads of the inventory, latest first. Pass a generation's started_at
+    as `as_of` to the list and search endpoints to see the state before it.
+    """
+    generations, total_count = crud.get_generations(db, skip=skip, limit=limit, source=source)
+    return {"items": generations, "total_count": total_count}
@@ -0,0 +1,87 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+from datetime import datetime
+from app.database import get_read_db
+from app.schemas.history import (
+    InterfaceStatusChangesResponse, InterfaceStatusBucketsResponse, VDOMCountBucketsResponse
+)
+import app.crud.history as crud
+
+router = APIRouter(
+    prefix="/api/history",
+    tags=["history"]
+)
+
+def _interface_key(db: Session, interface_id: Optional[int], firewall_id: Optional[int], interface_name: Optional[str]) -> Tuple[int, str]:
+    if interface_id is not None:
+        key = crud.get_interface_key(db, interface_id)
+        if key is None:
+            raise HTTPException(status_code=404, detail="Interface not found")
+        return key
+    if firewall_id is None or not interface_name:
+        raise HTTPException(status_code=400, detail="Give interface_id, or firewall_id and interface_name")
+    return firewall_id, interface_name
+
+def _range(since: Optional[datetime], until: Optional[datetime], bucket: str) -> Tuple[datetime, datetime]:
+    until = until or datetime.utcnow()
+    return since or until - crud.DEFAULT_SPANS.get(bucket, crud.DEFAULT_SPANS["day"]), until
+
+@router.get("/interfaces/status", response_model=InterfaceStatusChangesResponse)
+def read_interface_status_changes(
+    interface_id: Optional[int] = Query(None, description="A current interface"),
+    firewall_id: Optional[int] = Query(None, description="With interface_name, for interfaces that no longer exist"),
+    interface_name: Optional[str] = None,
+    since: Optional[datetime] = Query(None, description="Default: 30 days before until"),
+    until: Optional[datetime] = Query(None, description="Default: now"),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Status changes of an interface, latest first.
+    """
+    firewall_id, interface_name = _interface_key(db, interface_id, firewall_id, interface_name)
+    since, until = _range(since, until, "day")
+    items = crud.get_interface_status_changes(db, firewall_id, interface_name, since, until, limit=limit)
+    return {"firewall_id": firewall_id, "interface_name": interface_name, "items": items}
+
+@router.get("/interfaces/status/buckets", response_model=InterfaceStatusBucketsResponse)
+def read_interface_status_buckets(
+    interface_id: Optional[int] = Query(None, description="A current interface"),
+    firewall_id: Optional[int] = Query(None, description="With interface_name, for interfaces that no longer exist"),
+    interface_name: Optional[str] = None,
+    bucket: str = Query("day", description="hour, day, week or month"),
+    since: Optional[datetime] = Query(None, description="Default: a range that suits the bucket"),
+    until: Optional[datetime] = Query(None, description="Default: now"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Status changes of an interface per bucket, with its status at the end of
+    each bucket.
+    """
+    firewall_id, interface_name = _interface_key(db, interface_id, firewall_id, interface_name)
+    since, until = _range(since, until, bucket)
+    try:
+        items = crud.get_interface_status_buckets(db, firewall_id, interface_name, since, until, bucket=bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"firewall_id": firewall_id, "interface_name": interface_name, "bucket": bucket, "items": items}
+
+@router.get("/vdoms/{vdom_id}/counts", response_model=VDOMCountBucketsResponse)
+def read_vdom_count_buckets(
+    vdom_id: int,
+    bucket: str = Query("day", description="hour, day, week or month"),
+    since: Optional[datetime] = Query(None, description="Default: a range that suits the bucket"),
+    until: Optional[datetime] = Query(None, description="Default: now"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Minimum, maximum and last interface, route and VIP counts of a VDOM per
+    bucket.
+    """
+    since, until = _range(since, until, bucket)
+    try:
+        items = crud.get_vdom_count_buckets(db, vdom_id, since, until, bucket=bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"vdom_id": vdom_id, "bucket": bucket, "items": items}
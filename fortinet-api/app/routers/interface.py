@@ -1,11 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
-from app.schemas.interface import InterfaceCreate, InterfaceUpdate, InterfaceResponse, InterfacePaginationResponse
+from datetime import datetime
+from app.database import get_db, get_read_db, shards
+from app.rows import RowResponse
+from app.schemas.bulk import BulkDeleteResponse
+from app.schemas.interface import (
+    InterfaceCreate, InterfaceUpdate, InterfaceResponse, InterfacePaginationResponse,
+    InterfaceStatusUpdate, InterfaceStatusBatchResponse
+)
 import app.crud.interface as crud
 import app.crud.firewall as firewall_crud
 import app.crud.vdom as vdom_crud
+from app.writebehind import BufferFull, status_buffer
 
 router = APIRouter(
     prefix="/api/interfaces",
@@ -24,25 +32,63 @@ def read_interfaces(
     ip_address: Optional[str] = Query(None, description="Filter by IP address"),
     sort_by: Optional[str] = Query(None, description="Sort by field (e.g., interface_name, vdom_name)"),
     sort_order: Optional[str] = Query("asc", description="Sort order (asc or desc)"),
-    db: Session = Depends(get_db)
+    as_of: Optional[datetime] = Query(None, description="State at this time instead of now (PostgreSQL only)"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve interfaces with optional filtering, sorting, and pagination.
     """
-    interfaces, total_count = crud.get_interfaces(
-        db, skip=skip, limit=limit,
-        firewall_id=firewall_id, vdom_id=vdom_id,
-        interface_type=interface_type,
-        interface_name=interface_name,
-        ip_address=ip_address,
-        include_vdom=True, # Pass include_vdom=True
-        sort_by=sort_by,
-        sort_order=sort_order
-    )
-    return {"items": interfaces, "total_count": total_count}
+    try:
+        interfaces, total_count = shards.gather(
+            db,
+            lambda db, skip, limit: crud.get_interface_rows(
+                db, skip=skip, limit=limit,
+                firewall_id=firewall_id, vdom_id=vdom_id,
+                interface_type=interface_type,
+                interface_name=interface_name,
+                ip_address=ip_address,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                as_of=as_of
+            ),
+            skip, limit, *crud.interface_sort_key(sort_by, sort_order)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return RowResponse({"items": interfaces, "total_count": total_count})
+
+@router.patch("/status", response_model=InterfaceStatusBatchResponse, status_code=202)
+def update_interface_statuses(
+    updates: List[InterfaceStatusUpdate],
+    wait: bool = Query(False, description="Write the updates before responding"),
+):
+    """
+    Queue status changes of many interfaces. The latest status of each
+    interface is written within the flush interval, in one set-based UPDATE
+    with everything else pending; unknown interface IDs are ignored.
+    """
+    try:
+        accepted, coalesced = status_buffer.submit((update.interface_id, update.status) for update in updates)
+    except BufferFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    changed = None
+    if wait:
+        try:
+            changed = status_buffer.flush()
+        except SQLAlchemyError:
+            raise HTTPException(status_code=503, detail="Status updates are queued but could not be written yet")
+    return {"accepted": accepted, "coalesced": coalesced, "pending": status_buffer.pending, "changed": changed}
+
+@router.get("/status/metrics")
+def read_status_buffer_metrics():
+    """
+    State of this worker's status update buffer, with the latency and wait
+    of recent flushes in milliseconds.
+    """
+    return status_buffer.stats()
 
 @router.get("/{interface_id}", response_model=InterfaceResponse)
-def read_interface(interface_id: int, db: Session = Depends(get_db)):
+def read_interface(interface_id: int, db: Session = Depends(get_read_db)):
     """
     Get a specific interface by ID.
     """
@@ -54,7 +100,7 @@ def read_interface(interface_id: int, db: Session = Depends(get_db)):
 @router.get("/firewall/{firewall_id}", response_model=List[InterfaceResponse])
 def read_interfaces_by_firewall(
     firewall_id: int, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all interfaces for a specific firewall.
@@ -64,13 +110,13 @@ def read_interfaces_by_firewall(
     if firewall is None:
         raise HTTPException(status_code=404, detail="Firewall not found")
     
-    interfaces = crud.get_interfaces(db, firewall_id=firewall_id)
-    return interfaces
+    interfaces, _ = crud.get_interface_rows(db, firewall_id=firewall_id)
+    return RowResponse(interfaces)
 
 @router.get("/vdom/{vdom_id}", response_model=List[InterfaceResponse])
 def read_interfaces_by_vdom(
     vdom_id: int, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all interfaces for a specific VDOM.
@@ -80,8 +126,8 @@ def read_interfaces_by_vdom(
     if vdom is None:
         raise HTTPException(status_code=404, detail="VDOM not found")
     
-    interfaces = crud.get_interfaces(db, vdom_id=vdom_id)
-    return interfaces
+    interfaces, _ = crud.get_interface_rows(db, vdom_id=vdom_id)
+    return RowResponse(interfaces)
 
 @router.post("/", response_model=InterfaceResponse, status_code=201)
 def create_interface(interface: InterfaceCreate, db: Session = Depends(get_db)):
@@ -165,6 +211,31 @@ def update_interface(
     updated_interface = crud.update_interface(db, interface_id=interface_id, interface=interface)
     return updated_interface
 
+@router.delete("/", response_model=BulkDeleteResponse)
+def delete_interfaces(
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    interface_type: Optional[str] = None,
+    status: Optional[str] = None,
+    updated_before: Optional[datetime] = Query(None, description="Only interfaces not updated since this time"),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete all interfaces matching the filters in one statement.
+    """
+    try:
+        deleted = sum(shards.each(
+            db,
+            lambda db, _: crud.delete_interfaces(
+                db, firewall_id=firewall_id, vdom_id=vdom_id,
+                interface_type=interface_type, status=status,
+                updated_before=updated_before
+            )
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"deleted": deleted}
+
 @router.delete("/{interface_id}", status_code=204)
 def delete_interface(interface_id: int, db: Session = Depends(get_db)):
     """
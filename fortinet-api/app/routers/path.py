@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db
+from app.schemas.path import PathResponse
+from app.topology import MAX_HOPS, topology
+
+router = APIRouter(
+    prefix="/api/path",
+    tags=["path"]
+)
+
+@router.get("/", response_model=PathResponse)
+def trace_path(
+    src: str = Query(..., description="Source address"),
+    dst: str = Query(..., description="Destination address"),
+    vdom_id: Optional[int] = Query(None, description="VDOM to start from instead of the one holding src"),
+    max_hops: int = Query(MAX_HOPS, ge=1, le=256),
+    db: Session = Depends(get_db)
+):
+    """
+    Trace dst hop by hop from the VDOM holding src: the longest matching
+    route of each VDOM, then the VDOM owning its gateway. The status tells
+    how the trace ended: delivered, exited (the gateway is outside the
+    inventory), blackhole, loop or max_hops.
+    """
+    topology.refresh(db)
+    try:
+        return topology.trace(src, dst, vdom_id=vdom_id, max_hops=max_hops)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,126 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database import get_db, get_read_db, shards
+from app.schemas.policy import (
+    PolicyCreate, PolicyUpdate, PolicyResponse, PolicyPaginationResponse,
+    PolicyMatchLookup, PolicyMatchBatchRequest, PolicyMatchResult
+)
+import app.crud.policy as crud
+import app.crud.vdom as vdom_crud
+
+router = APIRouter(
+    prefix="/api/policies",
+    tags=["policies"],
+    responses={404: {"description": "Policy not found"}}
+)
+
+# Upper bound on lookups per batch request
+MAX_MATCH_BATCH = 10000
+
+def _match(db: Session, vdom_id: int, lookups: List[PolicyMatchLookup]) -> List[PolicyMatchResult]:
+    try:
+        results = crud.match_policies(db, vdom_id, lookups)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if results is None:
+        raise HTTPException(status_code=404, detail="VDOM not found")
+    return [
+        PolicyMatchResult(
+            src=lookup.src, dst=lookup.dst, proto=protocol, port=lookup.port,
+            action=policy.action if policy else "deny", policy=policy
+        )
+        for lookup, (protocol, policy) in zip(lookups, results)
+    ]
+
+@router.get("/", response_model=PolicyPaginationResponse)
+def read_policies(
+    skip: int = 0,
+    limit: int = 1000,
+    vdom_id: Optional[int] = None,
+    action: Optional[str] = None,
+    status: Optional[str] = None,
+    name: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Retrieve policies in evaluation order, with optional filtering and pagination.
+    """
+    policies, total_count = shards.gather(
+        db,
+        lambda db, skip, limit: crud.get_policies(
+            db, skip=skip, limit=limit, vdom_id=vdom_id, action=action, status=status, name=name
+        ),
+        skip, limit, crud.POLICY_SORT_KEY
+    )
+    return {"items": policies, "total_count": total_count}
+
+@router.get("/match", response_model=PolicyMatchResult)
+def match_policy(
+    vdom_id: int,
+    src: str = Query(..., description="Source address"),
+    dst: str = Query(..., description="Destination address"),
+    proto: str = Query("tcp", description="tcp, udp, sctp, icmp, icmp6 or a protocol number"),
+    port: Optional[int] = Query(None, description="Destination port; required for tcp, udp and sctp"),
+    srcintf: Optional[str] = Query(None, description="Incoming interface; not checked when left out"),
+    dstintf: Optional[str] = Query(None, description="Outgoing interface; not checked when left out"),
+    db: Session = Depends(get_db)
+):
+    """
+    The first enabled policy of the VDOM matching a flow, and its action.
+    Without a match the action is the implicit deny.
+    """
+    lookup = PolicyMatchLookup(src=src, dst=dst, proto=proto, port=port, srcintf=srcintf, dstintf=dstintf)
+    return _match(db, vdom_id, [lookup])[0]
+
+@router.post("/match", response_model=List[PolicyMatchResult])
+def match_policies_batch(request: PolicyMatchBatchRequest, db: Session = Depends(get_db)):
+    """
+    Match many flows against the policies of a VDOM in one call. Results are
+    returned in request order.
+    """
+    if len(request.lookups) > MAX_MATCH_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_MATCH_BATCH} lookups per request")
+    return _match(db, request.vdom_id, request.lookups)
+
+@router.get("/{policy_id}", response_model=PolicyResponse)
+def read_policy(policy_id: int, db: Session = Depends(get_read_db)):
+    """
+    Get a specific policy by ID.
+    """
+    db_policy = crud.get_policy(db, policy_id=policy_id)
+    if db_policy is None:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    return db_policy
+
+@router.post("/", response_model=PolicyResponse, status_code=201)
+def create_policy(policy: PolicyCreate, db: Session = Depends(get_db)):
+    """
+    Create a new policy.
+    """
+    vdom = vdom_crud.get_vdom(db, vdom_id=policy.vdom_id)
+    if vdom is None:
+        raise HTTPException(status_code=404, detail="VDOM not found")
+    if crud.get_policy_by_number(db, policy.vdom_id, policy.policy_number):
+        raise HTTPException(status_code=400, detail=f"Policy {policy.policy_number} already exists in this VDOM")
+    return crud.create_policy(db=db, policy=policy)
+
+@router.put("/{policy_id}", response_model=PolicyResponse)
+def update_policy(policy_id: int, policy: PolicyUpdate, db: Session = Depends(get_db)):
+    """
+    Update a policy by ID.
+    """
+    db_policy = crud.update_policy(db, policy_id=policy_id, policy=policy)
+    if db_policy is None:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    return db_policy
+
+@router.delete("/{policy_id}", status_code=204)
+def delete_policy(policy_id: int, db: Session = Depends(get_db)):
+    """
+    Delete a policy by ID.
+    """
+    success = crud.delete_policy(db, policy_id=policy_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    return None
@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
+from datetime import datetime
+from app.database import get_db, get_read_db, shards
+from app.rows import RowResponse
+from app.schemas.bulk import BulkDeleteResponse
 from app.schemas.route import RouteCreate, RouteUpdate, RouteResponse
 import app.crud.route as crud
 import app.crud.vdom as vdom_crud
@@ -16,30 +19,40 @@ router = APIRouter(
 def read_routes(
     skip: int = 0,
     limit: int = 10000,
+    firewall_id: Optional[int] = None,
     vdom_id: Optional[int] = None,
     route_type: Optional[str] = None,
     vdom_name: Optional[str] = Query(None, description="Filter routes by VDOM name"),
-    include_vdom: bool = Query(False, description="Include VDOM details in the response"),
+    include_vdom: bool = Query(False, description="Kept for compatibility; every route includes its VDOM"),
     sort_by: Optional[str] = Query(None, description="Sort by field: route_type, exit_interface_name, vdom_name"),
     sort_order: Optional[str] = Query("asc", description="Sort order: asc or desc"),
-    db: Session = Depends(get_db)
+    as_of: Optional[datetime] = Query(None, description="State at this time instead of now (PostgreSQL only)"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve routes with optional filtering and sorting in paginated format.
     """
-    db_routes = crud.get_routes(
-        db, skip=skip, limit=limit,
-        vdom_id=vdom_id, route_type=route_type, vdom_name=vdom_name,
-        include_vdom=include_vdom, sort_by=sort_by, sort_order=sort_order
-    )
-    total_count = crud.get_routes_count(
-        db, vdom_id=vdom_id, route_type=route_type, vdom_name=vdom_name
-    )
-    routes = [RouteResponse.model_validate(route) for route in db_routes]
-    return {"items": routes, "total_count": total_count}
+    try:
+        routes, total_count = shards.gather(
+            db,
+            lambda db, skip, limit: (
+                crud.get_route_rows(
+                    db, skip=skip, limit=limit, firewall_id=firewall_id,
+                    vdom_id=vdom_id, route_type=route_type, vdom_name=vdom_name,
+                    sort_by=sort_by, sort_order=sort_order, as_of=as_of
+                ),
+                crud.get_routes_count(
+                    db, firewall_id=firewall_id, vdom_id=vdom_id, route_type=route_type, vdom_name=vdom_name, as_of=as_of
+                )
+            ),
+            skip, limit, *crud.route_sort_key(sort_by, sort_order)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return RowResponse({"items": routes, "total_count": total_count})
 
 @router.get("/{route_id}", response_model=RouteResponse)
-def read_route(route_id: int, db: Session = Depends(get_db)):
+def read_route(route_id: int, db: Session = Depends(get_read_db)):
     """
     Get a specific route by ID.
     """
@@ -53,7 +66,7 @@ def read_routes_by_vdom(
     vdom_id: int,
     skip: int = 0,
     limit: int = 10000,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve routes for a specific VDOM.
@@ -63,12 +76,11 @@ def read_routes_by_vdom(
     if vdom is None:
         raise HTTPException(status_code=404, detail="VDOM not found")
     
-    db_routes = crud.get_routes_by_vdom(
+    routes = crud.get_route_rows(
         db, vdom_id=vdom_id, skip=skip, limit=limit
     )
     total_count = crud.get_routes_count(db, vdom_id=vdom_id)
-    routes = [RouteResponse.model_validate(route) for route in db_routes]
-    return {"items": routes, "total_count": total_count}
+    return RowResponse({"items": routes, "total_count": total_count})
 
 @router.post("/", response_model=RouteResponse, status_code=201)
 def create_route(route: RouteCreate, db: Session = Depends(get_db)):
@@ -96,6 +108,29 @@ def update_route(
         raise HTTPException(status_code=404, detail="Route not found")
     return db_route
 
+@router.delete("/", response_model=BulkDeleteResponse)
+def delete_routes(
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    route_type: Optional[str] = None,
+    updated_before: Optional[datetime] = Query(None, description="Only routes not updated since this time"),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete all routes matching the filters in one statement.
+    """
+    try:
+        deleted = sum(shards.each(
+            db,
+            lambda db, _: crud.delete_routes(
+                db, firewall_id=firewall_id, vdom_id=vdom_id,
+                route_type=route_type, updated_before=updated_before
+            )
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"deleted": deleted}
+
 @router.delete("/{route_id}", status_code=204)
 def delete_route(route_id: int, db: Session = Depends(get_db)):
     """
@@ -1,14 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
+from datetime import datetime
 
-from app.database import get_db
+from operator import itemgetter
+
+from app.database import get_read_db, shards
 from app.schemas.interface import InterfaceResponse
 from app.schemas.route import RouteResponse
 from app.schemas.vip import VIPResponse
 import app.crud.interface as interface_crud
 import app.crud.route as route_crud
 import app.crud.vip as vip_crud
+import app.crud.ip_address as ip_address_crud
+from app.schemas.ip_address import IPSearchHit, IPSearchResponse
+from app.utils.ip_utils import parse_ip_query
 
 router = APIRouter(
     prefix="/api/search",
@@ -22,6 +28,63 @@ class SearchResultItems(BaseModel):
     items: List[InterfaceResponse | RouteResponse | VIPResponse]
     total_count: int
 
+def _search_hits(db: Session, network, skip: int, limit: int, as_of: Optional[datetime] = None, **kwargs):
+    # (hit, loaded source) pairs, loaded on the shard the hits came from
+    hits, total_count = ip_address_crud.search_ip_addresses(db, network, skip=skip, limit=limit, as_of=as_of, **kwargs)
+    loaded = ip_address_crud.load_sources(db, hits, as_of=as_of)
+    return [(hit, loaded[hit]) for hit in hits if hit in loaded], total_count
+
+def _search_indexed(db: Session, network, source_type: str, skip: int, limit: int, as_of: Optional[datetime] = None):
+    found, total_count = shards.gather(
+        db,
+        lambda db, skip, limit: _search_hits(db, network, skip, limit, as_of, contained=True, source_type=source_type),
+        skip, limit, itemgetter(0)
+    )
+    return [source for _, source in found], total_count
+
+RESPONSE_MODELS = {
+    ip_address_crud.SOURCE_INTERFACE: InterfaceResponse,
+    ip_address_crud.SOURCE_ROUTE: RouteResponse,
+    ip_address_crud.SOURCE_VIP: VIPResponse,
+}
+
+@router.get("/ip/all", response_model=IPSearchResponse)
+def search_ip_all(
+    query: str = Query(..., min_length=1, description="IP address, partial address or subnet to search for"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    as_of: Optional[datetime] = Query(None, description="State at this time instead of now (PostgreSQL only)"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Search interfaces, routes, and VIPs in a single index scan with one result
+    list paginated across all categories (ordered by category, then ID).
+    Addresses and prefixes inside the searched address or subnet match;
+    routes that only cover it, such as 0.0.0.0/0, do not.
+    """
+    network, _ = parse_ip_query(query)
+    if network is None:
+        raise HTTPException(status_code=400, detail="Query is not an IP address or subnet")
+
+    try:
+        # Each shard's hits are in the index order, (source_type, source_id)
+        found, total_count = shards.gather(
+            db,
+            lambda db, skip, limit: _search_hits(db, network, skip, limit, as_of, contained=True),
+            skip, limit, itemgetter(0)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items = [
+        IPSearchHit(
+            source_type=source_type,
+            source_id=source_id,
+            item=RESPONSE_MODELS[source_type].model_validate(source)
+        )
+        for (source_type, source_id), source in found
+    ]
+    return {"items": items, "total_count": total_count}
+
 @router.get("/ip", response_model=Dict[str, SearchResultItems])
 def search_ip(
     query: str = Query(..., min_length=1, description="IP address or subnet to search for"),
@@ -31,20 +94,47 @@ def search_ip(
     routes_limit: int = Query(15, alias="routes.limit"),
     vips_skip: int = Query(0, alias="vips.skip"),
     vips_limit: int = Query(15, alias="vips.limit"),
-    db: Session = Depends(get_db)
+    as_of: Optional[datetime] = Query(None, description="State at this time instead of now (PostgreSQL only)"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Search for IP addresses across interfaces, routes, and VIPs with pagination.
+    Full addresses and subnets match the addresses and route prefixes inside
+    them, not the routes covering them; other queries match as substrings.
     """
-    interfaces, interfaces_total_count = interface_crud.search_interfaces_by_ip(
-        db, ip_address_query=query, skip=interfaces_skip, limit=interfaces_limit
-    )
-    routes, routes_total_count = route_crud.search_routes_by_ip(
-        db, ip_address_query=query, skip=routes_skip, limit=routes_limit
-    )
-    vips, vips_total_count = vip_crud.search_vips_by_ip(
-        db, ip_address_query=query, skip=vips_skip, limit=vips_limit
-    )
+    network, is_cidr = parse_ip_query(query)
+    # Subnets and full addresses are served by the ip_addresses index; partial
+    # or free-text queries keep the substring search on each table
+    if network is not None and (is_cidr or query.count('.') == 3) and ip_address_crud.supports_inet(db):
+        interfaces, interfaces_total_count = _search_indexed(
+            db, network, ip_address_crud.SOURCE_INTERFACE, interfaces_skip, interfaces_limit, as_of
+        )
+        routes, routes_total_count = _search_indexed(
+            db, network, ip_address_crud.SOURCE_ROUTE, routes_skip, routes_limit, as_of
+        )
+        vips, vips_total_count = _search_indexed(
+            db, network, ip_address_crud.SOURCE_VIP, vips_skip, vips_limit, as_of
+        )
+    elif as_of is not None:
+        # The substring searches load ORM objects, which at() cannot rewrite
+        raise HTTPException(status_code=400, detail="as_of needs a full address or subnet and PostgreSQL")
+    else:
+        # Unordered: the shards' matches follow each other in shard order
+        interfaces, interfaces_total_count = shards.gather(
+            db,
+            lambda db, skip, limit: interface_crud.search_interfaces_by_ip(db, ip_address_query=query, skip=skip, limit=limit),
+            interfaces_skip, interfaces_limit
+        )
+        routes, routes_total_count = shards.gather(
+            db,
+            lambda db, skip, limit: route_crud.search_routes_by_ip(db, ip_address_query=query, skip=skip, limit=limit),
+            routes_skip, routes_limit
+        )
+        vips, vips_total_count = shards.gather(
+            db,
+            lambda db, skip, limit: vip_crud.search_vips_by_ip(db, ip_address_query=query, skip=skip, limit=limit),
+            vips_skip, vips_limit
+        )
 
     # Convert interfaces to response models - ensures proper serialization
     interface_responses = [InterfaceResponse.from_orm(iface) for iface in interfaces]
@@ -0,0 +1,133 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db, get_read_db, shards
+from app.schemas.service import (
+    ServiceCreate, ServiceUpdate, ServiceResponse, ServicePaginationResponse,
+    ServiceGroupCreate, ServiceGroupUpdate, ServiceGroupResponse, ServiceGroupPaginationResponse
+)
+import app.crud.service as crud
+import app.crud.vdom as vdom_crud
+
+router = APIRouter(
+    prefix="/api/services",
+    tags=["services"],
+    responses={404: {"description": "Service not found"}}
+)
+
+@router.get("/", response_model=ServicePaginationResponse)
+def read_services(
+    skip: int = 0,
+    limit: int = 1000,
+    vdom_id: Optional[int] = None,
+    name: Optional[str] = None,
+    protocol: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Retrieve service objects with optional filtering and pagination.
+    """
+    services, total_count = shards.gather(
+        db,
+        lambda db, skip, limit: crud.get_services(db, skip=skip, limit=limit, vdom_id=vdom_id, name=name, protocol=protocol),
+        skip, limit, crud.NAME_SORT_KEY
+    )
+    return {"items": services, "total_count": total_count}
+
+@router.get("/groups", response_model=ServiceGroupPaginationResponse)
+def read_service_groups(
+    skip: int = 0,
+    limit: int = 1000,
+    vdom_id: Optional[int] = None,
+    name: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Retrieve service groups with optional filtering and pagination.
+    """
+    groups, total_count = shards.gather(
+        db,
+        lambda db, skip, limit: crud.get_service_groups(db, skip=skip, limit=limit, vdom_id=vdom_id, name=name),
+        skip, limit, crud.NAME_SORT_KEY
+    )
+    return {"items": groups, "total_count": total_count}
+
+@router.get("/groups/{group_id}", response_model=ServiceGroupResponse)
+def read_service_group(group_id: int, db: Session = Depends(get_read_db)):
+    """
+    Get a specific service group by ID.
+    """
+    db_group = crud.get_service_group(db, group_id=group_id)
+    if db_group is None:
+        raise HTTPException(status_code=404, detail="Service group not found")
+    return db_group
+
+@router.post("/groups", response_model=ServiceGroupResponse, status_code=201)
+def create_service_group(group: ServiceGroupCreate, db: Session = Depends(get_db)):
+    """
+    Create a new service group. Members name services or other groups of the VDOM.
+    """
+    if vdom_crud.get_vdom(db, vdom_id=group.vdom_id) is None:
+        raise HTTPException(status_code=404, detail="VDOM not found")
+    if crud.get_service_group_by_name(db, group.vdom_id, group.name):
+        raise HTTPException(status_code=400, detail=f"Service group '{group.name}' already exists in this VDOM")
+    return crud.create_service_group(db=db, group=group)
+
+@router.put("/groups/{group_id}", response_model=ServiceGroupResponse)
+def update_service_group(group_id: int, group: ServiceGroupUpdate, db: Session = Depends(get_db)):
+    """
+    Update an service group by ID.
+    """
+    db_group = crud.update_service_group(db, group_id=group_id, group=group)
+    if db_group is None:
+        raise HTTPException(status_code=404, detail="Service group not found")
+    return db_group
+
+@router.delete("/groups/{group_id}", status_code=204)
+def delete_service_group(group_id: int, db: Session = Depends(get_db)):
+    """
+    Delete an service group by ID.
+    """
+    if not crud.delete_service_group(db, group_id=group_id):
+        raise HTTPException(status_code=404, detail="Service group not found")
+    return None
+
+@router.get("/{service_id}", response_model=ServiceResponse)
+def read_service(service_id: int, db: Session = Depends(get_read_db)):
+    """
+    Get a specific service object by ID.
+    """
+    db_service = crud.get_service(db, service_id=service_id)
+    if db_service is None:
+        raise HTTPException(status_code=404, detail="Service not found")
+    return db_service
+
+@router.post("/", response_model=ServiceResponse, status_code=201)
+def create_service(service: ServiceCreate, db: Session = Depends(get_db)):
+    """
+    Create a new service object.
+    """
+    if vdom_crud.get_vdom(db, vdom_id=service.vdom_id) is None:
+        raise HTTPException(status_code=404, detail="VDOM not found")
+    if crud.get_service_by_name(db, service.vdom_id, service.name):
+        raise HTTPException(status_code=400, detail=f"Service '{service.name}' already exists in this VDOM")
+    return crud.create_service(db=db, service=service)
+
+@router.put("/{service_id}", response_model=ServiceResponse)
+def update_service(service_id: int, service: ServiceUpdate, db: Session = Depends(get_db)):
+    """
+    Update an service object by ID.
+    """
+    db_service = crud.update_service(db, service_id=service_id, service=service)
+    if db_service is None:
+        raise HTTPException(status_code=404, detail="Service not found")
+    return db_service
+
+@router.delete("/{service_id}", status_code=204)
+def delete_service(service_id: int, db: Session = Depends(get_db)):
+    """
+    Delete an service object by ID.
+    """
+    if not crud.delete_service(db, service_id=service_id):
+        raise HTTPException(status_code=404, detail="Service not found")
+    return None
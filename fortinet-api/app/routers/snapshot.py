@@ -0,0 +1,61 @@
+from fastapi import APIRouter, HTTPException
+from typing import List
+from app.schemas.snapshot import SnapshotCreate, SnapshotResponse, SnapshotDeleteResponse, SnapshotRestoreResponse
+import app.snapshot as snapshots
+
+router = APIRouter(
+    prefix="/api/snapshots",
+    tags=["snapshots"],
+    responses={404: {"description": "Snapshot not found"}}
+)
+
+@router.get("/", response_model=List[SnapshotResponse])
+def read_snapshots():
+    """
+    List snapshots, newest first.
+    """
+    return [snapshots.summarize(manifest) for manifest in snapshots.SnapshotStore().list_manifests()]
+
+@router.get("/{snapshot_id}", response_model=SnapshotResponse)
+def read_snapshot(snapshot_id: str):
+    """
+    Get a snapshot's summary.
+    """
+    try:
+        return snapshots.summarize(snapshots.SnapshotStore().load_manifest(snapshot_id))
+    except snapshots.SnapshotNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/", response_model=SnapshotResponse, status_code=201)
+def create_snapshot(snapshot: SnapshotCreate):
+    """
+    Snapshot all tables. Chunks unchanged since an earlier snapshot are shared.
+    """
+    try:
+        return snapshots.summarize(snapshots.create_snapshot(label=snapshot.label))
+    except snapshots.SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{snapshot_id}/restore", response_model=SnapshotRestoreResponse)
+def restore_snapshot(snapshot_id: str):
+    """
+    Replace all firewalls, VDOMs, interfaces, routes and VIPs with the snapshot.
+    """
+    try:
+        report = snapshots.restore_snapshot(snapshot_id)
+    except snapshots.SnapshotNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except snapshots.SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return report.as_dict()
+
+@router.delete("/{snapshot_id}", response_model=SnapshotDeleteResponse)
+def delete_snapshot(snapshot_id: str):
+    """
+    Delete a snapshot and the chunks no other snapshot uses.
+    """
+    try:
+        freed = snapshots.delete_snapshot(snapshot_id)
+    except snapshots.SnapshotNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"deleted": snapshot_id, "bytes_freed": freed}
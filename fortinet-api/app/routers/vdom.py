@@ -1,10 +1,16 @@
+import itertools
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
+from datetime import datetime
+from app.database import get_db, get_read_db, shards
+from app.schemas.bulk import BulkDeleteResponse
 from app.schemas.vdom import VDOMCreate, VDOMUpdate, VDOMResponse, VDOMPaginationResponse
+from app.schemas.vdom_detail import VDOMDetailResponse
 import app.crud.vdom as crud
 import app.crud.firewall as firewall_crud
+from app.sharding import sum_counts
 
 router = APIRouter(
     prefix="/api/vdoms",
@@ -21,29 +27,34 @@ def read_vdoms(
     vdom_name: Optional[str] = None,
     sort_by: Optional[str] = Query(None, description="Sort by field: vdom_name, fw_name, total_interfaces, total_vips, total_routes"),
     sort_order: Optional[str] = Query("asc", description="Sort order: asc or desc"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve VDOMs with optional filtering by firewall name and VDOM name, and sorting.
     """
     resolved_firewall_id = firewall_id # Use direct firewall_id if provided
     if fw_name: # If fw_name is provided, resolve it to firewall_id
-        firewall = firewall_crud.get_firewall_by_name(db, fw_name=fw_name)
+        # Routes db to the firewall's shard
+        firewall = shards.find(db, lambda db: firewall_crud.get_firewall_by_name(db, fw_name=fw_name))
         if firewall:
             resolved_firewall_id = firewall.firewall_id
         else:
             return {"items": [], "total_count": 0}
             
-    db_vdoms, total_count = crud.get_vdoms(
-        db, skip=skip, limit=limit, firewall_id=resolved_firewall_id,
-        vdom_name=vdom_name, sort_by=sort_by, sort_order=sort_order
+    db_vdoms, total_count = shards.gather(
+        db,
+        lambda db, skip, limit: crud.get_vdoms(
+            db, skip=skip, limit=limit, firewall_id=resolved_firewall_id,
+            vdom_name=vdom_name, sort_by=sort_by, sort_order=sort_order
+        ),
+        skip, limit, *crud.vdom_sort_key(sort_by, sort_order)
     )
     # Convert to response models
     vdoms = [VDOMResponse.from_orm(vdom) for vdom in db_vdoms]
     return {"items": vdoms, "total_count": total_count}
 
 @router.get("/{vdom_id}", response_model=VDOMResponse)
-def read_vdom(vdom_id: int, db: Session = Depends(get_db)):
+def read_vdom(vdom_id: int, db: Session = Depends(get_read_db)):
     """
     Get a specific VDOM by ID.
     """
@@ -52,6 +63,38 @@ def read_vdom(vdom_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="VDOM not found")
     return VDOMResponse.from_orm(db_vdom)
 
+@router.get("/{vdom_id}/detail", response_model=VDOMDetailResponse)
+def read_vdom_detail(
+    vdom_id: int,
+    section: Optional[List[str]] = Query(None, description="Sections to include (interfaces, routes, vips; repeatable); all by default"),
+    limit: int = Query(10000, ge=0, le=10000, description="Items per section"),
+    stream: bool = Query(False, description="Send one NDJSON line per part, each as soon as it is read"),
+    db: Session = Depends(get_db)
+):
+    """
+    A VDOM with its firewall and counts, and its interfaces, routes and VIPs,
+    in one response. The items leave out their VDOM, which is given once.
+    """
+    parts = crud.iter_vdom_detail(db, vdom_id, sections=section or crud.DETAIL_SECTIONS, limit=limit)
+    try:
+        first = next(parts, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if first is None:
+        raise HTTPException(status_code=404, detail="VDOM not found")
+    if not stream:
+        # The parts are already JSON; sections that were not requested are null
+        detail = {**dict.fromkeys(("vdom", *crud.DETAIL_SECTIONS), b"null"), **dict([first, *parts])}
+        body = b"{" + b",".join(b'"%s":%s' % (name.encode(), value) for name, value in detail.items()) + b"}"
+        return Response(body, media_type="application/json")
+
+    def lines():
+        # Each line is an object with one key: "vdom", then each section
+        for name, value in itertools.chain([first], parts):
+            yield b'{"%s":%s}\n' % (name.encode(), value)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.post("/", response_model=VDOMResponse, status_code=201)
 def create_vdom(vdom: VDOMCreate, db: Session = Depends(get_db)):
     """
@@ -91,6 +134,31 @@ def update_vdom(
         raise HTTPException(status_code=404, detail="VDOM not found")
     return VDOMResponse.from_orm(db_vdom)
 
+@router.delete("/", response_model=BulkDeleteResponse)
+def delete_vdoms(
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[List[int]] = Query(None, description="VDOM IDs (repeatable)"),
+    vdom_name: Optional[str] = Query(None, description="Exact VDOM name"),
+    updated_before: Optional[datetime] = Query(None, description="Only VDOMs not updated since this time"),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete all VDOMs matching the filters in one statement. Their interfaces,
+    routes and VIPs are removed by the database cascade.
+    """
+    try:
+        deleted, cascaded = sum_counts(shards.each(
+            db,
+            lambda db, vdom_ids: crud.delete_vdoms(
+                db, firewall_id=firewall_id, vdom_ids=vdom_ids,
+                vdom_name=vdom_name, updated_before=updated_before
+            ),
+            vdom_id
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"deleted": deleted, "cascaded": cascaded}
+
 @router.delete("/{vdom_id}", status_code=204)
 def delete_vdom(vdom_id: int, db: Session = Depends(get_db)):
     """
@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
+from datetime import datetime
+from app.database import get_db, get_read_db, shards
+from app.rows import RowResponse
+from app.schemas.bulk import BulkDeleteResponse
 from app.schemas.vip import VIPCreate, VIPUpdate, VIPResponse
 import app.crud.vip as crud
 import app.crud.vdom as vdom_crud
@@ -13,6 +16,23 @@ router = APIRouter(
 )
 
 from app.schemas.vip import VIPCreate, VIPUpdate, VIPResponse, VIPPaginationResponse # Import VIPPaginationResponse
+from app.schemas.vip import VIPResolveBatchRequest, VIPResolveResult
+from app.utils.nat_index import normalize_ip
+
+# Upper bound on lookups per batch request
+MAX_RESOLVE_BATCH = 10000
+
+def _build_resolve_result(index, ip: str, port: Optional[int], matches) -> VIPResolveResult:
+    translated_ip, translated_port = (None, None)
+    if matches:
+        translated_ip, translated_port = index.translate(matches[0], port)
+    return VIPResolveResult(
+        ip=ip,
+        port=port,
+        translated_ip=translated_ip,
+        translated_port=translated_port,
+        matches=[VIPResponse.model_validate(vip) for vip in matches]
+    )
 
 @router.get("/", response_model=VIPPaginationResponse)
 def read_vips(
@@ -22,20 +42,73 @@ def read_vips(
     vip_type: Optional[str] = None,
     sort_by: Optional[str] = Query(None, description="Sort by field (e.g., vdom_name)"),
     sort_order: Optional[str] = Query("asc", description="Sort order (asc or desc)"),
-    db: Session = Depends(get_db)
+    as_of: Optional[datetime] = Query(None, description="State at this time instead of now (PostgreSQL only)"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve VIPs with optional filtering, sorting, and pagination.
     """
-    vips, total_count = crud.get_vips(
-        db, skip=skip, limit=limit,
-        vdom_id=vdom_id, vip_type=vip_type,
-        sort_by=sort_by, sort_order=sort_order
-    )
-    return {"items": vips, "total_count": total_count}
+    try:
+        vips, total_count = shards.gather(
+            db,
+            lambda db, skip, limit: crud.get_vip_rows(
+                db, skip=skip, limit=limit,
+                vdom_id=vdom_id, vip_type=vip_type,
+                sort_by=sort_by, sort_order=sort_order, as_of=as_of
+            ),
+            skip, limit, *crud.vip_sort_key(sort_by, sort_order)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return RowResponse({"items": vips, "total_count": total_count})
+
+@router.get("/resolve", response_model=VIPResolveResult)
+def resolve_vip(
+    ip: Optional[str] = Query(None, description="External IP for a forward lookup"),
+    port: Optional[int] = Query(None, ge=0, le=65535, description="External port for a forward lookup"),
+    mapped_ip: Optional[str] = Query(None, description="Mapped (internal) IP for a reverse lookup"),
+    mapped_port: Optional[int] = Query(None, ge=0, le=65535, description="Mapped port for a reverse lookup"),
+    db: Session = Depends(get_db)
+):
+    """
+    Resolve a NAT translation. Use ip/port for a forward lookup (external to mapped)
+    or mapped_ip/mapped_port for a reverse lookup (which VIPs publish a server).
+    """
+    if (ip is None) == (mapped_ip is None):
+        raise HTTPException(status_code=400, detail="Provide either ip or mapped_ip")
+
+    reverse = mapped_ip is not None
+    lookup_ip = normalize_ip(mapped_ip if reverse else ip)
+    lookup_port = mapped_port if reverse else port
+    if lookup_ip is None:
+        raise HTTPException(status_code=400, detail="Invalid IP address")
+
+    index, results = crud.resolve_vips(db, [(lookup_ip, lookup_port)], reverse=reverse)
+    return _build_resolve_result(index, lookup_ip, lookup_port, results[0])
+
+@router.post("/resolve", response_model=List[VIPResolveResult])
+def resolve_vips_batch(request: VIPResolveBatchRequest, db: Session = Depends(get_db)):
+    """
+    Resolve many NAT translations in one call. Results are returned in request order.
+    """
+    if len(request.lookups) > MAX_RESOLVE_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RESOLVE_BATCH} lookups per request")
+
+    lookups = []
+    for lookup in request.lookups:
+        lookup_ip = normalize_ip(lookup.ip)
+        if lookup_ip is None:
+            raise HTTPException(status_code=400, detail=f"Invalid IP address: {lookup.ip}")
+        lookups.append((lookup_ip, lookup.port))
+
+    index, results = crud.resolve_vips(db, lookups, reverse=request.direction == "reverse")
+    return [
+        _build_resolve_result(index, lookup_ip, lookup_port, matches)
+        for (lookup_ip, lookup_port), matches in zip(lookups, results)
+    ]
 
 @router.get("/{vip_id}", response_model=VIPResponse)
-def read_vip(vip_id: int, db: Session = Depends(get_db)):
+def read_vip(vip_id: int, db: Session = Depends(get_read_db)):
     """
     Get a specific VIP by ID.
     """
@@ -47,7 +120,7 @@ def read_vip(vip_id: int, db: Session = Depends(get_db)):
 @router.get("/vdom/{vdom_id}", response_model=List[VIPResponse])
 def read_vips_by_vdom(
     vdom_id: int, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all VIPs for a specific VDOM.
@@ -86,6 +159,29 @@ def update_vip(
         raise HTTPException(status_code=404, detail="VIP not found")
     return db_vip
 
+@router.delete("/", response_model=BulkDeleteResponse)
+def delete_vips(
+    firewall_id: Optional[int] = None,
+    vdom_id: Optional[int] = None,
+    vip_type: Optional[str] = None,
+    updated_before: Optional[datetime] = Query(None, description="Only VIPs not updated since this time"),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete all VIPs matching the filters in one statement.
+    """
+    try:
+        deleted = sum(shards.each(
+            db,
+            lambda db, _: crud.delete_vips(
+                db, firewall_id=firewall_id, vdom_id=vdom_id,
+                vip_type=vip_type, updated_before=updated_before
+            )
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"deleted": deleted}
+
 @router.delete("/{vip_id}", status_code=204)
 def delete_vip(vip_id: int, db: Session = Depends(get_db)):
     """
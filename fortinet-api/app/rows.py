@@ -0,0 +1,160 @@
+"""
+Read-only rows for the list endpoints.
+
+Loading a large list through the ORM builds a mapped instance per row and
+per joined VDOM and firewall, registers each in the session's identity map,
+and then copies it into a Pydantic model that is encoded field by field. The
+list endpoints instead run a Core select over the joined tables and build
+Row objects: slotted objects with the fields of the response schema, whose
+nested objects are assembled from the joined columns and shared between the
+rows that reference the same parent. RowResponse encodes them to JSON
+directly. The schemas stay the endpoints' response_model, for the OpenAPI
+documentation, and define the fields and their order.
+"""
+import json
+from datetime import datetime
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Type
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.sql import ColumnElement, Select
+
+class Row:
+    """
+    Base of the row classes made by row_class.
+    """
+    __slots__ = ()
+
+    def as_dict(self) -> Dict[str, object]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+_row_classes: Dict[Type[BaseModel], type] = {}
+
+def row_class(schema: Type[BaseModel]) -> type:
+    """
+    The Row class with the fields of a response schema, in the same order.
+    """
+    cls = _row_classes.get(schema)
+    if cls is None:
+        name = schema.__name__.replace("Response", "") + "Row"
+        cls = _row_classes[schema] = type(name, (Row,), {"__slots__": tuple(schema.model_fields)})
+    return cls
+
+class Shape:
+    """
+    How to build the rows of one response schema from a select.
+
+    `columns` are matched to the schema fields by name; fields without a
+    column are None unless `nested` gives the Shape of a joined parent for
+    them. A Shape with a `key` builds one row per key value and shares it; a
+    NULL key (an outer join that found nothing) gives None.
+    """
+
+    def __init__(
+        self,
+        schema: Type[BaseModel],
+        columns: Iterable[ColumnElement],
+        nested: Optional[Dict[str, "Shape"]] = None,
+        key: Optional[str] = None
+    ):
+        self.row = row_class(schema)
+        self.nested = nested or {}
+        by_name = {column.name: column for column in columns}
+        self.columns = {name: by_name[name] for name in schema.model_fields if name in by_name and name not in self.nested}
+        self.key = key
+
+    def width(self) -> int:
+        return len(self.columns) + sum(shape.width() for shape in self.nested.values())
+
+    def select_columns(self, prefix: str = "") -> List[ColumnElement]:
+        """
+        The labeled columns of this Shape and its nested Shapes, in the order
+        builder() reads them.
+        """
+        selected = [column.label(prefix + name) for name, column in self.columns.items()]
+        for field, shape in self.nested.items():
+            selected.extend(shape.select_columns(f"{prefix}{field}__"))
+        return selected
+
+    def builder(self, start: int = 0) -> Callable[[Sequence], Optional[Row]]:
+        """
+        A function building the Row for one result row of a select of
+        select_columns(), whose columns start at `start`.
+        """
+        cls = self.row
+        names = list(self.columns)
+        getter = itemgetter(*range(start, start + len(names))) if len(names) > 1 else (lambda values: (values[start],))
+        position = start + len(names)
+        children = []
+        for field, shape in self.nested.items():
+            children.append((field, shape.builder(position)))
+            position += shape.width()
+        unset = [name for name in cls.__slots__ if name not in self.columns and name not in self.nested]
+        key_index = start + names.index(self.key) if self.key else None
+        shared: Dict[object, Row] = {}
+
+        def build(values: Sequence) -> Optional[Row]:
+            if key_index is not None:
+                key = values[key_index]
+                if key is None:
+                    return None
+                row = shared.get(key)
+                if row is not None:
+                    return row
+            row = cls.__new__(cls)
+            for name, value in zip(names, getter(values)):
+                setattr(row, name, value)
+            for field, child in children:
+                setattr(row, field, child(values))
+            for name in unset:
+                setattr(row, name, None)
+            if key_index is not None:
+                shared[key] = row
+            return row
+
+        return build
+
+def fetch(db, shape: Shape, statement: Select) -> List[Row]:
+    """
+    Run a select of shape.select_columns() and build its rows.
+    """
+    build = shape.builder()
+    return [build(values) for values in db.execute(statement)]
+
+def count(db, statement: Select) -> int:
+    """
+    The number of rows a select returns without its offset and limit. The
+    select must name its FROM clause with select_from().
+    """
+    return db.execute(
+        statement.with_only_columns(func.count()).order_by(None).offset(None).limit(None)
+    ).scalar()
+
+def _default(value):
+    if isinstance(value, Row):
+        return value.as_dict()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    """
+    Encode content that may hold Row objects as Pydantic would encode the
+    matching response schema.
+    """
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+class RowResponse(JSONResponse):
+    """
+    A JSON response whose content may hold Row objects (see dumps).
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
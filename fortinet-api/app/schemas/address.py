@@ -0,0 +1,59 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+from datetime import datetime
+
+class AddressBase(BaseModel):
+    vdom_id: int
+    name: str
+    type: str = "ipmask"
+    subnet: Optional[str] = None
+    start_ip: Optional[str] = None
+    end_ip: Optional[str] = None
+    fqdn: Optional[str] = None
+    comment: Optional[str] = None
+
+class AddressCreate(AddressBase):
+    pass
+
+class AddressUpdate(BaseModel):
+    name: Optional[str] = None
+    type: Optional[str] = None
+    subnet: Optional[str] = None
+    start_ip: Optional[str] = None
+    end_ip: Optional[str] = None
+    fqdn: Optional[str] = None
+    comment: Optional[str] = None
+
+class AddressResponse(AddressBase):
+    address_id: int
+    last_updated: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class AddressPaginationResponse(BaseModel):
+    items: List[AddressResponse]
+    total_count: int
+
+class AddressGroupBase(BaseModel):
+    vdom_id: int
+    name: str
+    members: List[str] = []
+    comment: Optional[str] = None
+
+class AddressGroupCreate(AddressGroupBase):
+    pass
+
+class AddressGroupUpdate(BaseModel):
+    name: Optional[str] = None
+    members: Optional[List[str]] = None
+    comment: Optional[str] = None
+
+class AddressGroupResponse(AddressGroupBase):
+    group_id: int
+    last_updated: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class AddressGroupPaginationResponse(BaseModel):
+    items: List[AddressGroupResponse]
+    total_count: int
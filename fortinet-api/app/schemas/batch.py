@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List
+
+class BatchItem(BaseModel):
+    # Path with its query string, e.g. /api/vdoms/?fw_name=fw1
+    path: str
+    method: str = "GET"
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+class BatchResult(BaseModel):
+    status: int
+    headers: Dict[str, str]
+    # The sub-request's JSON response, or its text for other content types
+    body: Any = None
+
+# Results in the order of the requests
+class BatchResponse(BaseModel):
+    responses: List[BatchResult]
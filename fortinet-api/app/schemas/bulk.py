@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Dict
+
+# Response for set-based deletes
+class BulkDeleteResponse(BaseModel):
+    deleted: int
+    # Child rows removed with them by ON DELETE CASCADE, per entity
+    cascaded: Dict[str, int] = {}
+
+# Response for replacing all rows of a firewall
+class BulkReplaceResponse(BaseModel):
+    deleted: int
+    loaded: int
+    # True when the rows were swapped in as a new partition
+    swapped: bool
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import Generic, List, TypeVar
+from app.schemas.firewall import FirewallResponse
+from app.schemas.vdom import VDOMResponse
+from app.schemas.interface import InterfaceResponse
+from app.schemas.route import RouteResponse
+from app.schemas.vip import VIPResponse
+
+T = TypeVar("T")
+
+class EntityChanges(BaseModel, Generic[T]):
+    upserted: List[T]
+    deleted: List[int]
+
+class ChangeSet(BaseModel):
+    firewalls: EntityChanges[FirewallResponse]
+    vdoms: EntityChanges[VDOMResponse]
+    interfaces: EntityChanges[InterfaceResponse]
+    routes: EntityChanges[RouteResponse]
+    vips: EntityChanges[VIPResponse]
+
+class ChangeFeedResponse(BaseModel):
+    changes: ChangeSet
+    next_token: str
+    has_more: bool
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List
+
+class FacetResponse(BaseModel):
+    entity: str
+    # Rows of the entity matching the filters
+    total: int
+    # {group_by value: [{column: value, ..., "count": n}]}, largest count first
+    facets: Dict[str, List[Dict[str, Any]]]
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+from datetime import datetime
+
+class GenerationResponse(BaseModel):
+    generation_id: int
+    source: str
+    detail: Optional[str] = None
+    # as_of=started_at returns the state just before the generation's load
+    started_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class GenerationPaginationResponse(BaseModel):
+    items: List[GenerationResponse]
+    total_count: int
@@ -0,0 +1,45 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class InterfaceStatusChange(BaseModel):
+    status: Optional[str] = None
+    changed_at: datetime
+    vdom_id: Optional[int] = None
+    # The interface row at the time; collectors replace interfaces with new IDs
+    interface_id: Optional[int] = None
+
+class InterfaceStatusChangesResponse(BaseModel):
+    firewall_id: int
+    interface_name: str
+    items: List[InterfaceStatusChange]
+
+class InterfaceStatusBucket(BaseModel):
+    start: datetime
+    transitions: int
+    # Transitions to "down"
+    downs: int
+    # Status at the end of the bucket
+    status: Optional[str] = None
+
+class InterfaceStatusBucketsResponse(BaseModel):
+    firewall_id: int
+    interface_name: str
+    bucket: str
+    items: List[InterfaceStatusBucket]
+
+class CountSummary(BaseModel):
+    min: Optional[int] = None
+    max: Optional[int] = None
+    last: Optional[int] = None
+
+class VDOMCountBucket(BaseModel):
+    start: datetime
+    interfaces: CountSummary
+    routes: CountSummary
+    vips: CountSummary
+
+class VDOMCountBucketsResponse(BaseModel):
+    vdom_id: int
+    bucket: str
+    items: List[VDOMCountBucket]
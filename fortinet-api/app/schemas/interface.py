@@ -38,4 +38,17 @@ class InterfaceResponse(InterfaceBase):
 
 class InterfacePaginationResponse(BaseModel):
     items: List[InterfaceResponse]
-    total_count: int
\ No newline at end of file
+    total_count: int
+
+class InterfaceStatusUpdate(BaseModel):
+    interface_id: int
+    status: str
+
+class InterfaceStatusBatchResponse(BaseModel):
+    accepted: int
+    # Updates that replaced a pending update of the same interface
+    coalesced: int
+    # Interfaces waiting for the next flush
+    pending: int
+    # Interfaces whose status changed, when the request waited for the write
+    changed: Optional[int] = None
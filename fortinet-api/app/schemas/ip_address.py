@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List, Union
+from app.schemas.interface import InterfaceResponse
+from app.schemas.route import RouteResponse
+from app.schemas.vip import VIPResponse
+
+class IPSearchHit(BaseModel):
+    source_type: str  # interface, route or vip
+    source_id: int
+    item: Union[InterfaceResponse, RouteResponse, VIPResponse]
+
+class IPSearchResponse(BaseModel):
+    items: List[IPSearchHit]
+    total_count: int
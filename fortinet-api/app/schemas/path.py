@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class PathRoute(BaseModel):
+    # route_id is null for a VDOM's own network when it has no routing table
+    route_id: Optional[int] = None
+    destination_network: Optional[str] = None
+    mask_length: Optional[int] = None
+    route_type: Optional[str] = None
+    gateway: Optional[str] = None
+    exit_interface_name: Optional[str] = None
+
+class PathHop(BaseModel):
+    firewall_id: int
+    fw_name: str
+    vdom_id: int
+    vdom_name: str
+    ingress_interface: Optional[str] = None
+    route: Optional[PathRoute] = None
+    # Other routes of the same prefix with a different gateway or exit interface
+    equal_routes: int = 0
+    next_hop: Optional[str] = None
+
+class PathDestination(BaseModel):
+    firewall_id: int
+    fw_name: str
+    vdom_id: int
+    vdom_name: str
+    interface_name: str
+
+class PathResponse(BaseModel):
+    src: str
+    dst: str
+    # delivered, exited, blackhole, loop or max_hops
+    status: str
+    hops: List[PathHop]
+    destination: Optional[PathDestination] = None
@@ -0,0 +1,77 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional, Union
+from datetime import datetime
+
+class PolicyBase(BaseModel):
+    vdom_id: int
+    policy_number: int
+    name: Optional[str] = None
+    status: str = "enable"
+    action: str = "deny"
+    srcintf: List[str] = []
+    dstintf: List[str] = []
+    srcaddr: List[str] = []
+    dstaddr: List[str] = []
+    service: List[str] = []
+    srcaddr_negate: bool = False
+    dstaddr_negate: bool = False
+    service_negate: bool = False
+    schedule: Optional[str] = None
+    nat: bool = False
+    comments: Optional[str] = None
+
+class PolicyCreate(PolicyBase):
+    # Evaluation order in the VDOM; default: after its last policy
+    sequence: Optional[int] = None
+
+class PolicyUpdate(BaseModel):
+    policy_number: Optional[int] = None
+    sequence: Optional[int] = None
+    name: Optional[str] = None
+    status: Optional[str] = None
+    action: Optional[str] = None
+    srcintf: Optional[List[str]] = None
+    dstintf: Optional[List[str]] = None
+    srcaddr: Optional[List[str]] = None
+    dstaddr: Optional[List[str]] = None
+    service: Optional[List[str]] = None
+    srcaddr_negate: Optional[bool] = None
+    dstaddr_negate: Optional[bool] = None
+    service_negate: Optional[bool] = None
+    schedule: Optional[str] = None
+    nat: Optional[bool] = None
+    comments: Optional[str] = None
+
+class PolicyResponse(PolicyBase):
+    policy_id: int
+    sequence: int
+    last_updated: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class PolicyPaginationResponse(BaseModel):
+    items: List[PolicyResponse]
+    total_count: int
+
+class PolicyMatchLookup(BaseModel):
+    src: str
+    dst: str
+    # Protocol name (tcp, udp, sctp, icmp, icmp6) or number
+    proto: Union[int, str] = "tcp"
+    # Destination port; required for tcp, udp and sctp
+    port: Optional[int] = None
+    srcintf: Optional[str] = None
+    dstintf: Optional[str] = None
+
+class PolicyMatchBatchRequest(BaseModel):
+    vdom_id: int
+    lookups: List[PolicyMatchLookup]
+
+class PolicyMatchResult(BaseModel):
+    src: str
+    dst: str
+    proto: int
+    port: Optional[int] = None
+    # accept or deny; deny with no policy is the implicit deny
+    action: str
+    policy: Optional[PolicyResponse] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from app.schemas.vdom import VDOMResponse # Import VDOMResponse
 
@@ -25,7 +25,12 @@ class RouteUpdate(BaseModel):
 
 class RouteResponse(RouteBase):
     route_id: int
+    firewall_id: int
     last_updated: datetime
     vdom: Optional[VDOMResponse] = None # Add vdom field
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class RoutePaginationResponse(BaseModel):
+    items: List[RouteResponse]
+    total_count: int
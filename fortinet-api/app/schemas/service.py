@@ -0,0 +1,59 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+from datetime import datetime
+
+class ServiceBase(BaseModel):
+    vdom_id: int
+    name: str
+    protocol: str = "TCP/UDP/SCTP"
+    protocol_number: Optional[int] = None
+    tcp_portrange: Optional[str] = None
+    udp_portrange: Optional[str] = None
+    sctp_portrange: Optional[str] = None
+    comment: Optional[str] = None
+
+class ServiceCreate(ServiceBase):
+    pass
+
+class ServiceUpdate(BaseModel):
+    name: Optional[str] = None
+    protocol: Optional[str] = None
+    protocol_number: Optional[int] = None
+    tcp_portrange: Optional[str] = None
+    udp_portrange: Optional[str] = None
+    sctp_portrange: Optional[str] = None
+    comment: Optional[str] = None
+
+class ServiceResponse(ServiceBase):
+    service_id: int
+    last_updated: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ServicePaginationResponse(BaseModel):
+    items: List[ServiceResponse]
+    total_count: int
+
+class ServiceGroupBase(BaseModel):
+    vdom_id: int
+    name: str
+    members: List[str] = []
+    comment: Optional[str] = None
+
+class ServiceGroupCreate(ServiceGroupBase):
+    pass
+
+class ServiceGroupUpdate(BaseModel):
+    name: Optional[str] = None
+    members: Optional[List[str]] = None
+    comment: Optional[str] = None
+
+class ServiceGroupResponse(ServiceGroupBase):
+    group_id: int
+    last_updated: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ServiceGroupPaginationResponse(BaseModel):
+    items: List[ServiceGroupResponse]
+    total_count: int
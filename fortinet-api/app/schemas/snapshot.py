@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+class SnapshotCreate(BaseModel):
+    label: Optional[str] = None
+
+class SnapshotResponse(BaseModel):
+    id: str
+    label: Optional[str] = None
+    created_at: str
+    format: int
+    rows: Dict[str, int]
+    chunks: int
+    # Compressed size of all chunks, and of the chunks this snapshot added
+    bytes_total: int
+    bytes_new: int
+    seconds: float
+
+class SnapshotDeleteResponse(BaseModel):
+    deleted: str
+    bytes_freed: int
+
+class TableRestoreReport(BaseModel):
+    read: int
+    loaded: int
+    row_count: Optional[int] = None
+    error: Optional[str] = None
+
+class SnapshotRestoreResponse(BaseModel):
+    ok: bool
+    seconds: float
+    tables: Dict[str, TableRestoreReport]
+    ip_index_rows: Optional[int] = None
+    indexes_rebuilt: int
+    errors: List[str]
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Optional
+from app.schemas.vdom import VDOMResponse
+from app.schemas.interface import InterfacePaginationResponse
+from app.schemas.route import RoutePaginationResponse
+from app.schemas.vip import VIPPaginationResponse
+
+class VDOMDetailResponse(BaseModel):
+    # The items of each section leave out their VDOM, given once in vdom;
+    # sections that were not requested are null
+    vdom: VDOMResponse
+    interfaces: Optional[InterfacePaginationResponse] = None
+    routes: Optional[RoutePaginationResponse] = None
+    vips: Optional[VIPPaginationResponse] = None
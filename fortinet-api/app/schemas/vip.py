@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional, List # Import List
+from typing import Optional, List, Literal # Import List
 from datetime import datetime
 from .vdom import VDOMResponse # Import VDOMResponse
 
@@ -34,4 +34,18 @@ class VIPResponse(VIPBase):
 
 class VIPPaginationResponse(BaseModel):
     items: List[VIPResponse]
-    total_count: int
\ No newline at end of file
+    total_count: int
+class VIPResolveLookup(BaseModel):
+    ip: str
+    port: Optional[int] = None
+
+class VIPResolveBatchRequest(BaseModel):
+    direction: Literal["forward", "reverse"] = "forward"
+    lookups: List[VIPResolveLookup]
+
+class VIPResolveResult(BaseModel):
+    ip: str
+    port: Optional[int] = None
+    translated_ip: Optional[str] = None
+    translated_port: Optional[int] = None
+    matches: List[VIPResponse]
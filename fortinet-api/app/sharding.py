@@ -0,0 +1,432 @@
+"""
+Horizontal sharding: each firewall, with everything under it, on one of
+several databases.
+
+Shard 0 is DATABASE_URL; SHARD_DATABASE_URLS (comma-separated) adds shards
+1 to N-1, each with the full schema (run the migrations on each).
+
+A row's shard is told by its id. `python -m app.cli shards init` gives
+every shard its own range of ids in each table of SHARDED_TABLES, by
+moving the table's sequence (sqlite_sequence on SQLite) into the range,
+and records the ranges in shard_layout on every shard. Rows created before
+sharding keep their ids, below the first range, and stay on shard 0.
+After adding a shard, init starts a new epoch of ranges above the old ones;
+rows do not move and the old ranges keep routing to their shards. Ids stay
+unique across shards, so the caches of app.cache need no shard in their
+keys; facets, counted per shard, have one.
+
+New firewalls are placed by a consistent-hash ring on fw_name: a name
+always lands on the same shard, whose unique constraint then holds for
+every shard. Their VDOMs, interfaces, routes, VIPs and policy objects are
+created on the firewall's shard, numbered from its ranges.
+
+get_db and get_read_db (see app.database) bind a request's session to the
+shard of the first id of ROUTING_KEYS that it names, in a path parameter,
+then a query parameter, then a JSON body; such a session is routed, and
+the others are on shard 0. On an unrouted session:
+- gather() runs a list or search on every shard in parallel, each for its
+  first skip + limit rows, merges them by the endpoint's sort key and cuts
+  the page; the totals are added
+- find() looks a firewall up by name on every shard
+- each() runs a bulk write on the shards of its ids, one transaction each
+
+Facets are counted on every shard (scatter()) and their counts added; path
+tracing loads the firewalls of every shard (see app.topology), and the
+change feed pages every shard with a cursor each in its token. History
+endpoints always name an id and are routed. Generations and snapshots read
+the database of their session: shard 0 unless the request names an id.
+Maintenance commands run on one database; point DATABASE_URL at each shard
+in turn.
+"""
+import bisect
+import hashlib
+import heapq
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Ids that route a request, most specific owner first
+ROUTING_KEYS = (
+    "firewall_id", "vdom_id", "interface_id", "route_id", "vip_id",
+    "policy_id", "address_id", "service_id", "group_id",
+)
+# Ids per shard and table in a new epoch
+SHARD_ID_SPAN = int(os.getenv("SHARD_ID_SPAN", "100000000"))
+SHARD_SCATTER_THREADS = int(os.getenv("SHARD_SCATTER_THREADS", "16"))
+# Points of each shard on the placement ring
+RING_POINTS = 64
+# The primary keys are int4
+MAX_ID = 2**31 - 1
+# The first range starts at a multiple of this above every existing id
+FIRST_ID_STEP = 1000000
+
+# An epoch: (first_id, span, shard_count)
+Epoch = Tuple[int, int, int]
+
+class ShardingError(Exception):
+    pass
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+class HashRing:
+    """
+    Consistent hashing of names onto shards: adding a shard takes over
+    about 1/N of the names and leaves the others where they were.
+    """
+
+    def __init__(self, shard_count: int, points: int = RING_POINTS):
+        ring = sorted(
+            (_ring_hash(f"shard-{shard}-{point}"), shard)
+            for shard in range(shard_count) for point in range(points)
+        )
+        self._hashes = [position for position, _ in ring]
+        self._shards = [shard for _, shard in ring]
+
+    def place(self, name: str) -> int:
+        index = bisect.bisect(self._hashes, _ring_hash(name)) % len(self._hashes)
+        return self._shards[index]
+
+def _is_id(value) -> bool:
+    return (isinstance(value, int) and not isinstance(value, bool)) or (isinstance(value, str) and value.isdigit())
+
+def _merge_key(key: Callable) -> Callable:
+    # NULLs last going up and first going down, as PostgreSQL sorts them
+    def merge_key(item):
+        value = key(item)
+        return value is None, value
+    return merge_key
+
+def sum_counts(results: Iterable[Tuple[int, Dict[str, int]]]) -> Tuple[int, Dict[str, int]]:
+    """
+    The sum of (deleted, cascaded) results of bulk deletes on several shards.
+    """
+    deleted, cascaded = 0, Counter()
+    for shard_deleted, shard_cascaded in results:
+        deleted += shard_deleted
+        cascaded.update(shard_cascaded)
+    return deleted, dict(cascaded)
+
+class ShardSet:
+    """
+    The shards of one worker: their engines, the id ranges read from
+    shard 0 and the placement ring.
+    """
+
+    def __init__(self, engines: List[Engine], session_factory: Callable[..., Session]):
+        self.engines = engines
+        self.session_factory = session_factory
+        self.ring = HashRing(len(engines))
+        self._epochs: Optional[List[Epoch]] = None
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.routed = [0] * len(engines)
+        self.scattered = 0
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.engines) > 1
+
+    def epochs(self) -> List[Epoch]:
+        """
+        The epochs of shard_layout, read once per worker; restart the API
+        after `shards init`.
+        """
+        if self._epochs is None:
+            from app.models.shard import ShardLayout
+
+            with Session(self.engines[0]) as db:
+                epochs = [
+                    tuple(row) for row in db.execute(
+                        select(ShardLayout.first_id, ShardLayout.span, ShardLayout.shard_count).order_by(ShardLayout.epoch)
+                    )
+                ]
+            if not epochs:
+                raise ShardingError("The shards have no id ranges yet; run `python -m app.cli shards init`")
+            if epochs[-1][2] != len(self.engines):
+                raise ShardingError(
+                    f"shard_layout is for {epochs[-1][2]} shards but {len(self.engines)} are configured; "
+                    "run `python -m app.cli shards init`"
+                )
+            self._epochs = epochs
+        return self._epochs
+
+    def shard_of(self, entity_id: int) -> int:
+        """
+        The shard of a row of SHARDED_TABLES, by its id.
+        """
+        shard = 0
+        for first_id, span, shard_count in self.epochs():
+            if entity_id < first_id:
+                break
+            shard = min((entity_id - first_id) // span, shard_count - 1)
+        return shard
+
+    def place(self, fw_name: str) -> int:
+        """
+        The shard a new firewall of this name goes to.
+        """
+        return self.ring.place(fw_name)
+
+    def route(self, *sources: Iterable[Tuple[str, object]]) -> Optional[int]:
+        """
+        The shard of the first key of ROUTING_KEYS found in the (key, value)
+        pairs of the first source that has one. A key whose values are on
+        several shards routes nothing.
+        """
+        for source in sources:
+            values: Dict[str, List[int]] = {}
+            for key, value in source:
+                if key in ROUTING_KEYS and _is_id(value):
+                    values.setdefault(key, []).append(int(value))
+            for key in ROUTING_KEYS:
+                shards = {self.shard_of(value) for value in values.get(key, ())}
+                if len(shards) == 1:
+                    shard = shards.pop()
+                    self.routed[shard] += 1
+                    return shard
+        return None
+
+    def session(self, index: int) -> Session:
+        """
+        A new session routed to a shard.
+        """
+        return self.session_factory(bind=self.engines[index], info={"shard": index})
+
+    def bind(self, db: Session, index: int) -> Session:
+        """
+        Route a request's session to a shard, ending what it had begun.
+        """
+        if db.info.get("shard") != index:
+            db.close()
+            db.bind = self.engines[index]
+            db.info["shard"] = index
+        return db
+
+    def _session_for(self, db: Session, index: int) -> Session:
+        # The request's session on its own shard, else one closed with it (see close)
+        if db.info.get("shard", 0) == index:
+            return db
+        session = self.session(index)
+        db.info.setdefault("shard_sessions", []).append(session)
+        return session
+
+    def close(self, db: Session) -> None:
+        """
+        Close a request's session and the sessions opened on other shards for it.
+        """
+        for session in db.info.pop("shard_sessions", ()):
+            session.close()
+        db.close()
+
+    def scatter(self, db: Session, fn: Callable[[Session], object]) -> list:
+        """
+        fn on a session of every shard, in parallel. Returns the results in
+        shard order; the first exception raised is raised again.
+        """
+        sessions = [self._session_for(db, index) for index in range(len(self.engines))]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=SHARD_SCATTER_THREADS, thread_name_prefix="shard-scatter")
+            self.scattered += 1
+        futures = [self._executor.submit(fn, session) for session in sessions]
+        return [future.result() for future in futures]
+
+    def gather(
+        self,
+        db: Session,
+        fetch: Callable[[Session, int, int], Tuple[list, int]],
+        skip: int,
+        limit: int,
+        key: Optional[Callable] = None,
+        descending: bool = False
+    ) -> Tuple[list, int]:
+        """
+        A page of a list: fetch(db, skip, limit) returns (items, total_count).
+        A routed session reads its shard only. Otherwise the shards' pages
+        are merged by key, which must order the items as fetch sorts them,
+        or concatenated in shard order without one.
+        """
+        if not self.sharded or "shard" in db.info:
+            return fetch(db, skip, limit)
+        pages = self.scatter(db, lambda session: fetch(session, 0, skip + limit))
+        items = [page for page, _ in pages]
+        if key is None:
+            merged = chain.from_iterable(items)
+        else:
+            merged = heapq.merge(*items, key=_merge_key(key), reverse=descending)
+        return list(islice(merged, skip, skip + limit)), sum(total for _, total in pages)
+
+    def find(self, db: Session, fn: Callable[[Session], object]):
+        """
+        The first result of fn that is not None, looking on every shard;
+        an unrouted db is routed to the shard it came from.
+        """
+        if not self.sharded or "shard" in db.info:
+            return fn(db)
+        for index, result in enumerate(self.scatter(db, fn)):
+            if result is not None:
+                self.bind(db, index)
+                return result
+        return None
+
+    def each(self, db: Session, fn: Callable[[Session, Optional[List[int]]], object], ids: Optional[Sequence[int]] = None) -> list:
+        """
+        fn(session, ids) on the shard of each group of ids, or on every shard
+        (with None) when no ids are given; a routed session runs it on its
+        shard only. Returns the results. Each shard commits on its own.
+        """
+        if not self.sharded or "shard" in db.info:
+            return [fn(db, list(ids) if ids else None)]
+        if ids:
+            groups: Dict[int, Optional[List[int]]] = {}
+            for entity_id in ids:
+                groups.setdefault(self.shard_of(entity_id), []).append(entity_id)
+        else:
+            groups = dict.fromkeys(range(len(self.engines)))
+        return [fn(self._session_for(db, index), shard_ids) for index, shard_ids in sorted(groups.items())]
+
+    def group(self, ids: Iterable[int]) -> Dict[int, List[int]]:
+        """
+        Ids by shard; all on shard 0 without sharding.
+        """
+        groups: Dict[int, List[int]] = {}
+        for entity_id in ids:
+            groups.setdefault(self.shard_of(entity_id) if self.sharded else 0, []).append(entity_id)
+        return groups
+
+    def firewall_session(self, fw_name: str) -> Session:
+        """
+        A session on the shard of a firewall, or on the shard a new one of
+        that name is placed on.
+        """
+        if not self.sharded:
+            return self.session_factory()
+        from app.models.firewall import Firewall
+
+        placed = self.place(fw_name)
+        for index in [placed, *(index for index in range(len(self.engines)) if index != placed)]:
+            with self.session(index) as db:
+                if db.scalar(select(Firewall.firewall_id).where(Firewall.fw_name == fw_name)) is not None:
+                    return self.session(index)
+        return self.session(placed)
+
+    def init(self, span: int = SHARD_ID_SPAN) -> dict:
+        """
+        Give every shard its id ranges, starting a new epoch when the number
+        of shards changed, and write shard_layout to every shard. Running it
+        again changes nothing.
+        """
+        from app.models.shard import SHARDED_TABLES, ShardLayout
+
+        if not self.sharded:
+            raise ShardingError("Only one database is configured; list the other shards in SHARD_DATABASE_URLS")
+        with Session(self.engines[0]) as db:
+            epochs = [
+                tuple(row) for row in db.execute(
+                    select(ShardLayout.first_id, ShardLayout.span, ShardLayout.shard_count).order_by(ShardLayout.epoch)
+                )
+            ]
+        shard_count = len(self.engines)
+        if not epochs or epochs[-1][2] != shard_count:
+            if epochs:
+                first_id, last_span, last_count = epochs[-1]
+                first_id += last_count * last_span
+            else:
+                highest = max(
+                    _highest_id(engine, table, key) for engine in self.engines for table, key in SHARDED_TABLES.items()
+                )
+                first_id = (highest // FIRST_ID_STEP + 1) * FIRST_ID_STEP
+            if first_id + shard_count * span - 1 > MAX_ID:
+                raise ShardingError(f"{shard_count} ranges of {span} ids from {first_id} do not fit in int4 ids; lower SHARD_ID_SPAN")
+            epochs.append((first_id, span, shard_count))
+            logger.info("Shard epoch %d: %d shards of %d ids from %d", len(epochs), shard_count, span, first_id)
+
+        first_id, span, _ = epochs[-1]
+        for index, engine in enumerate(self.engines):
+            low = first_id + index * span
+            with engine.begin() as connection:
+                connection.execute(delete(ShardLayout))
+                connection.execute(insert(ShardLayout), [
+                    {"epoch": number, "first_id": epoch_first, "span": epoch_span, "shard_count": epoch_count}
+                    for number, (epoch_first, epoch_span, epoch_count) in enumerate(epochs, 1)
+                ])
+                for table, key in SHARDED_TABLES.items():
+                    _move_sequence(connection, table, key, low, low + span - 1)
+        self._epochs = None
+        return self.status()
+
+    def status(self) -> dict:
+        """
+        The epochs and, per shard, its firewalls and how far each table
+        has used its current range.
+        """
+        from app.models.firewall import Firewall
+        from app.models.shard import SHARDED_TABLES
+
+        epochs = self.epochs()
+        first_id, span, _ = epochs[-1]
+        shards = []
+        for index, engine in enumerate(self.engines):
+            low = first_id + index * span
+            with engine.connect() as connection:
+                firewalls = connection.execute(select(func.count()).select_from(Firewall.__table__)).scalar()
+            used = {table: max(0, _highest_id(engine, table, key) - low + 1) for table, key in SHARDED_TABLES.items()}
+            table, most = max(used.items(), key=lambda item: item[1])
+            shards.append({
+                "shard": index,
+                "url": engine.url.render_as_string(hide_password=True),
+                "firewalls": firewalls,
+                "first_id": low,
+                "last_id": low + span - 1,
+                "fullest_table": table,
+                "used": round(most / span, 6),
+            })
+        return {
+            "epochs": [
+                {"epoch": number, "first_id": first, "span": epoch_span, "shard_count": count}
+                for number, (first, epoch_span, count) in enumerate(epochs, 1)
+            ],
+            "shards": shards,
+        }
+
+    def stats(self) -> dict:
+        # Requests routed to each shard, and scattered to all of them
+        return {"routed": list(self.routed), "scattered": self.scattered}
+
+def _highest_id(engine: Engine, table: str, key: str) -> int:
+    with engine.connect() as connection:
+        return connection.execute(text(f"SELECT coalesce(max({key}), 0) FROM {table}")).scalar()
+
+def _move_sequence(connection: Connection, table: str, key: str, low: int, high: int) -> None:
+    # Into [low, high]; a sequence already in the range stays where it is
+    if connection.dialect.name == "postgresql":
+        sequence = connection.execute(text("SELECT pg_get_serial_sequence(:table, :key)"), {"table": table, "key": key}).scalar()
+        if sequence is None:
+            raise ShardingError(f"{table}.{key} has no sequence")
+        last_value, is_called = connection.execute(text(f"SELECT last_value, is_called FROM {sequence}")).one()
+        if (last_value + 1 if is_called else last_value) < low:
+            connection.execute(text(f"ALTER SEQUENCE {sequence} MAXVALUE {high} RESTART WITH {low}"))
+        else:
+            connection.execute(text(f"ALTER SEQUENCE {sequence} MAXVALUE {high}"))
+        return
+    created = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :table"), {"table": table}
+    ).scalar()
+    if "AUTOINCREMENT" not in (created or "").upper():
+        raise ShardingError(f"{table} has no AUTOINCREMENT sequence; create this SQLite database again")
+    current = connection.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :table"), {"table": table}).scalar()
+    if current is None:
+        connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:table, :seq)"), {"table": table, "seq": low - 1})
+    elif current < low - 1:
+        connection.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :table"), {"table": table, "seq": low - 1})
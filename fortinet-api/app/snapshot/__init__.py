@@ -0,0 +1,7 @@
+"""
+Compressed, deduplicated snapshots of the collected data, restored with
+parallel COPY. Run them with `python -m app.cli snapshot` or through
+/api/snapshots.
+"""
+from app.snapshot.backup import SnapshotError, create_snapshot, delete_snapshot, restore_snapshot, summarize
+from app.snapshot.store import SnapshotNotFound, SnapshotStore
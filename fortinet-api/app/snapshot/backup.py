@@ -0,0 +1,284 @@
+"""
+Create and restore snapshots.
+
+A snapshot reads every table in primary key order inside one repeatable-read
+transaction and cuts it into chunks of BUCKET_SIZE consecutive keys. Chunk
+boundaries depend only on the keys, so a key range nobody touched encodes to
+the same bytes as last time and is stored once for all snapshots.
+
+Restore empties the tables, defers their secondary indexes and COPYs the
+chunks back in parallel, one dependency level at a time, before rebuilding
+the indexes and the IP search index.
+"""
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import events, partitioning, versioning
+from app.dictionary import ENCODED_COLUMNS, Encoder, decoded_select
+from app.importer.loader import DERIVED_TABLES
+from app.importer.normalize import IMPORT_TABLES, INHERITED_COLUMNS, PARENTS, PRIMARY_KEYS, table_columns
+from app.importer.report import ImportReport
+from app.snapshot.columnar import decode_chunk, encode_chunk
+from app.snapshot.store import SnapshotStore
+from app.utils.bulk_load import create_indexes, drop_secondary_indexes, load_rows, reset_sequences, truncate_tables
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+SNAPSHOT_TABLES = IMPORT_TABLES
+# Keys per chunk
+BUCKET_SIZE = 10000
+# Parallel chunk encoders on create and COPY connections on restore
+WORKERS = 4
+
+class SnapshotError(Exception):
+    pass
+
+def _columns(table: str) -> List[Tuple[str, str]]:
+    # Addresses are stored as text
+    return [(name, "text" if kind == "ip" else kind) for name, kind, _ in table_columns(table)]
+
+def _levels() -> List[List[str]]:
+    # Tables whose parents are all in earlier levels
+    depth: Dict[str, int] = {}
+    for table in SNAPSHOT_TABLES:
+        depth[table] = max([depth[parent] + 1 for parent in PARENTS[table].values()], default=0)
+    return [[t for t in SNAPSHOT_TABLES if depth[t] == level] for level in range(max(depth.values()) + 1)]
+
+def summarize(manifest: dict) -> dict:
+    return {
+        "id": manifest["id"],
+        "label": manifest.get("label"),
+        "created_at": manifest["created_at"],
+        "format": manifest["format"],
+        "rows": {table: info["rows"] for table, info in manifest["tables"].items()},
+        "chunks": sum(len(info["chunks"]) for info in manifest["tables"].values()),
+        "bytes_total": manifest["bytes_total"],
+        "bytes_new": manifest["bytes_new"],
+        "seconds": manifest["seconds"],
+    }
+
+def _write_chunk(store: SnapshotStore, columns: List[Tuple[str, str]], rows: List[tuple]) -> dict:
+    data = encode_chunk(columns, rows)
+    digest, new = store.put_chunk(data)
+    return {"digest": digest, "rows": len(rows), "first_key": rows[0][0], "last_key": rows[-1][0], "bytes": len(data), "new": new}
+
+def _dump_table(connection, table: str, store: SnapshotStore, pool: ThreadPoolExecutor) -> dict:
+    from app.database import Base
+
+    columns = _columns(table)
+    sa_table = Base.metadata.tables[table]
+    key = PRIMARY_KEYS[table]
+    # The key leads every chunk row so chunk boundaries can be read off it
+    names = [key] + [name for name, _ in columns if name != key]
+    columns = sorted(columns, key=lambda column: names.index(column[0]))
+    # Dictionary-encoded columns are stored by value, like the import formats
+    result = connection.execution_options(stream_results=True, yield_per=BUCKET_SIZE).execute(
+        decoded_select(table, names).order_by(sa_table.c[key])
+    )
+
+    futures = []
+    done = 0
+    bucket = None
+    rows: List[tuple] = []
+    for row in result:
+        row_bucket = row[0] // BUCKET_SIZE
+        if row_bucket != bucket and rows:
+            futures.append(pool.submit(_write_chunk, store, columns, rows))
+            rows = []
+            # Bound the rows held by queued chunks
+            while len(futures) - done > 2 * WORKERS:
+                futures[done].result()
+                done += 1
+        bucket = row_bucket
+        rows.append(tuple(row))
+    if rows:
+        futures.append(pool.submit(_write_chunk, store, columns, rows))
+
+    chunks = [future.result() for future in futures]
+    return {"columns": columns, "rows": sum(chunk["rows"] for chunk in chunks), "chunks": chunks}
+
+def create_snapshot(engine=None, store: Optional[SnapshotStore] = None, label: Optional[str] = None) -> dict:
+    """
+    Write a snapshot of all tables and return its manifest.
+    """
+    if label and not re.fullmatch(r"[A-Za-z0-9_.-]+", label):
+        raise SnapshotError("Labels may only contain letters, digits, '.', '_' and '-'")
+    if engine is None:
+        from app.database import engine
+    store = store or SnapshotStore()
+    started_at = time.monotonic()
+    created_at = datetime.utcnow()
+    # Millisecond ids, numbered on the rare collision (scripts snapshot back to back)
+    stamp = created_at.strftime("%Y%m%dT%H%M%S.%f")[:-3] + "Z"
+    suffix = f"-{label}" if label else ""
+    snapshot_id = stamp + suffix
+    attempt = 1
+    while store.exists(snapshot_id):
+        attempt += 1
+        snapshot_id = f"{stamp}-{attempt}{suffix}"
+
+    tables = {}
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            # One consistent view of every table, without blocking writers
+            connection = connection.execution_options(isolation_level="REPEATABLE READ")
+        with connection.begin(), ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            for table in SNAPSHOT_TABLES:
+                tables[table] = _dump_table(connection, table, store, pool)
+
+    bytes_new = 0
+    for info in tables.values():
+        for chunk in info["chunks"]:
+            if chunk.pop("new"):
+                bytes_new += chunk["bytes"]
+    manifest = {
+        "id": snapshot_id,
+        "label": label,
+        "format": FORMAT_VERSION,
+        "created_at": created_at.isoformat(),
+        "tables": tables,
+        "bytes_total": sum(chunk["bytes"] for info in tables.values() for chunk in info["chunks"]),
+        "bytes_new": bytes_new,
+        "seconds": round(time.monotonic() - started_at, 2),
+    }
+    store.save_manifest(manifest)
+    logger.info("Snapshot %s: %d bytes, %d new", snapshot_id, manifest["bytes_total"], bytes_new)
+    return manifest
+
+def _check_restorable(manifest: dict, store: SnapshotStore) -> None:
+    if manifest["format"] != FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot format {manifest['format']} is not supported")
+    for table, info in manifest["tables"].items():
+        if table not in SNAPSHOT_TABLES:
+            raise SnapshotError(f"Snapshot holds unknown table {table}")
+        current = {name for name, _ in _columns(table)}
+        missing = [name for name, _ in info["columns"] if name not in current]
+        if missing:
+            raise SnapshotError(f"{table}: columns {', '.join(missing)} no longer exist")
+        for chunk in info["chunks"]:
+            if not store.has_chunk(chunk["digest"]):
+                raise SnapshotError(f"{table}: chunk {chunk['digest']} is missing from the store")
+
+def _missing_inherited(engine, table: str, info: dict) -> Dict[str, Tuple[str, Dict[int, object]]]:
+    # Inherited columns added after the snapshot was taken, with the values
+    # of the parent rows that were restored before this table
+    names = {name for name, _ in info["columns"]}
+    missing = {}
+    for column, (via, parent) in INHERITED_COLUMNS.get(table, {}).items():
+        if column not in names:
+            with engine.connect() as connection:
+                values = dict(connection.execute(text(f"SELECT {PRIMARY_KEYS[parent]}, {column} FROM {parent}")).all())
+            missing[column] = (via, values)
+    return missing
+
+def _restore_chunk(engine, store: SnapshotStore, table: str, digest: str, missing: Optional[dict] = None) -> int:
+    names, rows = decode_chunk(store.get_chunk(digest))
+    for column, (via, values) in (missing or {}).items():
+        position = names.index(via)
+        names = names + [column]
+        rows = [row + (values.get(row[position]),) for row in rows]
+    if table in ENCODED_COLUMNS:
+        # Snapshots hold the values; the ids are handed out again
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            names, encoded = Encoder(connection, table, preload=True).encode_rows(names, rows)
+            rows = list(encoded)
+    return load_rows(engine, table, names, rows)
+
+def restore_snapshot(
+    snapshot_id: str,
+    engine=None,
+    store: Optional[SnapshotStore] = None,
+    workers: int = WORKERS,
+    rebuild_ip_index: bool = True
+) -> ImportReport:
+    """
+    Replace the contents of all tables with a snapshot. The snapshot is
+    checked before anything is deleted.
+    """
+    if engine is None:
+        from app.database import engine
+    store = store or SnapshotStore()
+    postgres = engine.dialect.name == "postgresql"
+    manifest = store.load_manifest(snapshot_id)
+    _check_restorable(manifest, store)
+
+    report = ImportReport(list(SNAPSHOT_TABLES))
+    started_at = time.monotonic()
+    for table, info in manifest["tables"].items():
+        report.tables[table].read = info["rows"]
+
+    versioning.new_generation(engine, "restore", snapshot_id)
+    # The lookup tables stay: archived route versions still use their ids
+    truncate_tables(engine, SNAPSHOT_TABLES + DERIVED_TABLES)
+    deferred: List[Tuple[str, str]] = []
+    if postgres:
+        deferred = drop_secondary_indexes(engine, SNAPSHOT_TABLES + DERIVED_TABLES)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for level in _levels():
+                missing = {
+                    table: _missing_inherited(engine, table, manifest["tables"][table])
+                    for table in level if table in manifest["tables"]
+                }
+                jobs = [
+                    (table, pool.submit(_restore_chunk, engine, store, table, chunk["digest"], missing[table]))
+                    for table in level if table in manifest["tables"]
+                    for chunk in manifest["tables"][table]["chunks"]
+                ]
+                for table, future in jobs:
+                    try:
+                        report.tables[table].loaded += future.result()
+                    except Exception as e:
+                        report.tables[table].error = str(e).strip()
+                if any(report.tables[table].error for table in level):
+                    report.errors.append("Restore stopped; the tables are incomplete")
+                    break
+                if "firewalls" in level:
+                    partitioning.sync_partitions(engine)
+
+        if postgres:
+            reset_sequences(engine, PRIMARY_KEYS)
+
+        db = Session(bind=engine)
+        try:
+            if rebuild_ip_index:
+                from app.crud.ip_address import rebuild_ip_addresses
+                report.ip_index_rows = rebuild_ip_addresses(db)
+            events.notify_change(db, events.RESYNC_ENTITY, "resync")
+            db.commit()
+        finally:
+            db.close()
+    finally:
+        if deferred:
+            logger.info("Rebuilding %d indexes", len(deferred))
+            report.errors.extend(create_indexes(engine, deferred, workers))
+            report.indexes_rebuilt = len(deferred)
+
+    with engine.begin() as connection:
+        for table in SNAPSHOT_TABLES:
+            if postgres:
+                connection.execute(text(f"ANALYZE {table}"))
+            report.tables[table].row_count = connection.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+    for table in report.tables.values():
+        if table.error is None and table.row_count != table.read:
+            report.errors.append(f"{table.table}: snapshot has {table.read} rows but the table holds {table.row_count}")
+
+    report.seconds = time.monotonic() - started_at
+    return report
+
+def delete_snapshot(snapshot_id: str, store: Optional[SnapshotStore] = None) -> int:
+    """
+    Delete a snapshot and the chunks only it used. Returns the bytes freed.
+    """
+    store = store or SnapshotStore()
+    store.delete_manifest(snapshot_id)
+    return store.prune()
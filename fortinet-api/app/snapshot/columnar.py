@@ -0,0 +1,143 @@
+"""
+Compact columnar chunk format.
+
+A chunk holds a run of rows of one table, stored column by column and
+compressed as a whole:
+
+    b"NCS1" + zlib(header length, JSON header, one length-prefixed block per column)
+
+Each block starts with a null bitmap (or a single zero byte when the column
+has no NULLs). Integers, booleans and timestamps (microseconds since the
+epoch) are delta-encoded 64-bit values, so sorted keys and rows written in
+the same collection run compress to almost nothing; text is a length array
+plus the concatenated UTF-8 bytes, and JSON is stored as such text with
+sorted keys. Encoding is deterministic: the same rows always
+give the same bytes, which is what lets snapshots share unchanged chunks.
+"""
+import json
+import struct
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+
+MAGIC = b"NCS1"
+COMPRESSION_LEVEL = 6
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+class ChunkError(ValueError):
+    pass
+
+def _null_bitmap(values: Sequence) -> bytes:
+    if all(value is not None for value in values):
+        return b"\x00"
+    bitmap = bytearray((len(values) + 7) // 8)
+    for i, value in enumerate(values):
+        if value is None:
+            bitmap[i >> 3] |= 1 << (i & 7)
+    return b"\x01" + bytes(bitmap)
+
+def _read_nulls(block: bytes, count: int) -> Tuple[Optional[bytes], int]:
+    if block[0] == 0:
+        return None, 1
+    size = (count + 7) // 8
+    return block[1:1 + size], 1 + size
+
+def _encode_ints(values: Sequence[Optional[int]]) -> bytes:
+    deltas = array("q")
+    previous = 0
+    for value in values:
+        value = previous if value is None else value
+        deltas.append(value - previous)
+        previous = value
+    return deltas.tobytes()
+
+def _decode_ints(data: bytes) -> List[int]:
+    deltas = array("q")
+    deltas.frombytes(data)
+    values = []
+    total = 0
+    for delta in deltas:
+        total += delta
+        values.append(total)
+    return values
+
+def _micros(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND
+
+def _encode_column(kind: str, values: Sequence) -> bytes:
+    nulls = _null_bitmap(values)
+    if kind in ("int", "bool"):
+        return nulls + _encode_ints([None if v is None else int(v) for v in values])
+    if kind == "timestamp":
+        return nulls + _encode_ints([None if v is None else _micros(v) for v in values])
+    if kind == "json":
+        values = [None if v is None else json.dumps(v, sort_keys=True, separators=(",", ":")) for v in values]
+    encoded = [b"" if value is None else str(value).encode("utf-8") for value in values]
+    lengths = array("I", [len(value) for value in encoded])
+    return nulls + lengths.tobytes() + b"".join(encoded)
+
+def _decode_column(kind: str, block: bytes, count: int) -> list:
+    nulls, offset = _read_nulls(block, count)
+    if kind == "int":
+        values = _decode_ints(block[offset:])
+    elif kind == "bool":
+        values = [bool(v) for v in _decode_ints(block[offset:])]
+    elif kind == "timestamp":
+        values = [_EPOCH + timedelta(microseconds=v) for v in _decode_ints(block[offset:])]
+    else:
+        lengths = array("I")
+        lengths.frombytes(block[offset:offset + 4 * count])
+        data = block[offset + 4 * count:]
+        values = []
+        position = 0
+        for length in lengths:
+            values.append(data[position:position + length].decode("utf-8"))
+            position += length
+        if kind == "json":
+            values = [json.loads(value) if value else None for value in values]
+    if len(values) != count:
+        raise ChunkError(f"column holds {len(values)} values, expected {count}")
+    if nulls is not None:
+        for i in range(count):
+            if nulls[i >> 3] & (1 << (i & 7)):
+                values[i] = None
+    return values
+
+def encode_chunk(columns: List[Tuple[str, str]], rows: List[Sequence]) -> bytes:
+    """
+    Encode rows (value sequences in column order) of (name, kind) columns.
+    """
+    header = json.dumps({"columns": columns, "rows": len(rows)}, separators=(",", ":")).encode()
+    parts = [struct.pack("<I", len(header)), header]
+    for i, (_, kind) in enumerate(columns):
+        block = _encode_column(kind, [row[i] for row in rows])
+        parts.append(struct.pack("<I", len(block)))
+        parts.append(block)
+    return MAGIC + zlib.compress(b"".join(parts), COMPRESSION_LEVEL)
+
+def decode_chunk(data: bytes) -> Tuple[List[str], List[tuple]]:
+    """
+    Return the column names and the rows of an encoded chunk.
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ChunkError("not a snapshot chunk")
+    try:
+        body = zlib.decompress(data[len(MAGIC):])
+    except zlib.error as e:
+        raise ChunkError(f"corrupt chunk: {e}")
+    (header_length,) = struct.unpack_from("<I", body, 0)
+    header = json.loads(body[4:4 + header_length])
+    count = header["rows"]
+    position = 4 + header_length
+    columns = []
+    for name, kind in header["columns"]:
+        (length,) = struct.unpack_from("<I", body, position)
+        position += 4
+        columns.append(_decode_column(kind, body[position:position + length], count))
+        position += length
+    return [name for name, _ in header["columns"]], list(zip(*columns)) if columns else []
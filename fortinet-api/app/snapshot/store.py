@@ -0,0 +1,129 @@
+"""
+On-disk snapshot store.
+
+    <root>/objects/ab/ab12...   chunks, named by the SHA-256 of their bytes
+    <root>/manifests/<id>.json  one manifest per snapshot
+
+Chunks are shared by every snapshot that contains them, so a snapshot only
+adds the chunks that changed since the previous one. Deleting a snapshot
+removes its manifest; prune() then drops chunks no manifest references.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Iterator, List, Set
+
+DEFAULT_SNAPSHOT_DIR = "/app/snapshots"
+# Unreferenced chunks younger than this may belong to a snapshot still being written
+PRUNE_GRACE_SECONDS = 3600
+
+_SNAPSHOT_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+class SnapshotNotFound(LookupError):
+    pass
+
+def snapshot_dir() -> str:
+    return os.environ.get("SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR)
+
+def _write_atomic(path: str, data: bytes) -> None:
+    temporary = f"{path}.tmp-{os.getpid()}"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+class SnapshotStore:
+    def __init__(self, root: str = None):
+        self.root = root or snapshot_dir()
+        self.objects = os.path.join(self.root, "objects")
+        self.manifests = os.path.join(self.root, "manifests")
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects, digest[:2], digest)
+
+    def _manifest_path(self, snapshot_id: str) -> str:
+        if not _SNAPSHOT_ID.fullmatch(snapshot_id):
+            raise SnapshotNotFound(f"Invalid snapshot id: {snapshot_id}")
+        return os.path.join(self.manifests, f"{snapshot_id}.json")
+
+    def put_chunk(self, data: bytes) -> tuple:
+        """
+        Store a chunk unless an identical one exists. Returns (digest, new).
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, data)
+        return digest, True
+
+    def get_chunk(self, digest: str) -> bytes:
+        with open(self._object_path(digest), "rb") as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Chunk {digest} is corrupt")
+        return data
+
+    def has_chunk(self, digest: str) -> bool:
+        return os.path.exists(self._object_path(digest))
+
+    def save_manifest(self, manifest: dict) -> None:
+        os.makedirs(self.manifests, exist_ok=True)
+        data = json.dumps(manifest, indent=2).encode()
+        _write_atomic(self._manifest_path(manifest["id"]), data)
+
+    def load_manifest(self, snapshot_id: str) -> dict:
+        try:
+            with open(self._manifest_path(snapshot_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise SnapshotNotFound(f"Snapshot {snapshot_id} not found")
+
+    def exists(self, snapshot_id: str) -> bool:
+        return os.path.exists(self._manifest_path(snapshot_id))
+
+    def list_manifests(self) -> List[dict]:
+        """
+        All manifests, newest first.
+        """
+        if not os.path.isdir(self.manifests):
+            return []
+        manifests = []
+        for name in os.listdir(self.manifests):
+            if name.endswith(".json"):
+                manifests.append(self.load_manifest(name[:-len(".json")]))
+        return sorted(manifests, key=lambda m: m["created_at"], reverse=True)
+
+    def delete_manifest(self, snapshot_id: str) -> None:
+        try:
+            os.remove(self._manifest_path(snapshot_id))
+        except FileNotFoundError:
+            raise SnapshotNotFound(f"Snapshot {snapshot_id} not found")
+
+    def _stored_chunks(self) -> Iterator[str]:
+        if not os.path.isdir(self.objects):
+            return
+        for prefix in os.listdir(self.objects):
+            directory = os.path.join(self.objects, prefix)
+            for name in os.listdir(directory):
+                if ".tmp-" not in name:
+                    yield name
+
+    def prune(self) -> int:
+        """
+        Delete chunks that no manifest references. Returns the bytes freed.
+        """
+        referenced: Set[str] = set()
+        for manifest in self.list_manifests():
+            for table in manifest["tables"].values():
+                referenced.update(chunk["digest"] for chunk in table["chunks"])
+        freed = 0
+        cutoff = time.time() - PRUNE_GRACE_SECONDS
+        for digest in list(self._stored_chunks()):
+            path = self._object_path(digest)
+            if digest not in referenced and os.path.getmtime(path) < cutoff:
+                freed += os.path.getsize(path)
+                os.remove(path)
+        return freed
@@ -0,0 +1,394 @@
+"""
+In-memory topology of the inventory, for tracing paths across firewalls.
+
+Tracing by hand chains the same questions: which VDOM holds the source,
+which of its routes matches the destination, which interface owns that
+route's gateway, and so on, each a few SQL queries. The Topology answers
+them from memory. It holds, per VDOM, its routes and the networks of its
+interfaces as longest-prefix-match tables (a dict per prefix length, keyed
+by the address's leading bits), and for the whole inventory which
+interfaces own each address. A trace is a few dict lookups per hop.
+
+The topology is built once per API worker and kept in step by change
+events (see app.events): a change to a firewall, its VDOMs, interfaces or
+routes reloads that firewall alone, the next time a path is traced.
+Resyncs and changes not naming a firewall reload everything, and so does
+age: without PostgreSQL other workers' changes publish no events here, so
+everything is reloaded after TOPOLOGY_MAX_AGE_SECONDS. With sharding, the
+firewalls are read from every shard (see app.sharding), so paths cross
+firewalls of different shards.
+"""
+import ipaddress
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from app import dictionary
+from app.events import ChangeEvent, RESYNC_ENTITY, broker
+
+logger = logging.getLogger(__name__)
+
+TOPOLOGY_MAX_AGE_SECONDS = float(os.getenv("TOPOLOGY_MAX_AGE_SECONDS", "600"))
+# Hops after which a trace stops, loop or not
+MAX_HOPS = 32
+
+# Entities whose changes move paths
+_TRACKED = ("firewalls", "vdoms", "interfaces", "routes")
+
+# Trace results
+DELIVERED = "delivered"   # the destination is on a network of the last VDOM
+EXITED = "exited"         # the next hop is not an interface in the inventory
+BLACKHOLE = "blackhole"   # no route matches, or a blackhole route does
+LOOP = "loop"             # the path came back to a VDOM it crossed
+MAX_HOPS_REACHED = "max_hops"
+
+_BITS = {4: 32, 6: 128}
+_NO_GATEWAY = {None, "", "0.0.0.0", "::"}
+_BLACKHOLE_NAMES = {"blackhole", "null", "Null"}
+
+# Routes are kept as tuples of these columns
+ROUTE_FIELDS = ("route_id", "destination_network", "mask_length", "route_type", "gateway", "exit_interface_name")
+ROUTE_ID, DESTINATION, MASK_LENGTH, ROUTE_TYPE, GATEWAY, EXIT_INTERFACE = range(len(ROUTE_FIELDS))
+
+def _interface_network(ip_address: Optional[str], mask: Optional[str]):
+    # Masks are prefix lengths ('24') or dotted ('255.255.255.0')
+    if not ip_address:
+        return None
+    try:
+        return ipaddress.ip_interface(f"{ip_address.strip()}/{(mask or '').strip() or 32}")
+    except ValueError:
+        return None
+
+class PrefixTable:
+    """
+    Longest-prefix match over networks of both IP versions. Each network
+    maps to a list of values, in the order they were added.
+    """
+    __slots__ = ("_lengths", "_entries")
+
+    def __init__(self):
+        # {version: prefix lengths, longest first}
+        self._lengths: Dict[int, List[int]] = {}
+        # {(version, length, leading bits): values}
+        self._entries: Dict[Tuple[int, int, int], list] = {}
+
+    def add(self, network, value) -> None:
+        self.add_prefix(network.network_address, network.prefixlen, value)
+
+    def add_prefix(self, address, length: int, value) -> None:
+        """
+        Add the network of `length` bits holding `address`.
+        """
+        version = address.version
+        key = (version, length, int(address) >> (_BITS[version] - length))
+        values = self._entries.get(key)
+        if values is None:
+            values = self._entries[key] = []
+            lengths = self._lengths.setdefault(version, [])
+            if length not in lengths:
+                lengths.append(length)
+                lengths.sort(reverse=True)
+        values.append(value)
+
+    def remove(self, network, value) -> None:
+        version, length = network.version, network.prefixlen
+        key = (version, length, int(network.network_address) >> (_BITS[version] - length))
+        values = self._entries.get(key)
+        if values and value in values:
+            values.remove(value)
+            if not values:
+                del self._entries[key]
+
+    def longest(self, address) -> Optional[Tuple[int, list]]:
+        """
+        The prefix length and values of the longest network holding
+        `address`, or None.
+        """
+        version = address.version
+        bits = _BITS[version]
+        number = int(address)
+        entries = self._entries
+        for length in self._lengths.get(version, ()):
+            values = entries.get((version, length, number >> (bits - length)))
+            if values:
+                return length, values
+        return None
+
+    def match(self, address) -> Optional[list]:
+        """
+        The values of the longest network holding `address`, or None.
+        """
+        found = self.longest(address)
+        return found[1] if found else None
+
+class VDOMNode:
+    """
+    A VDOM's routes and interface networks.
+    """
+    __slots__ = ("vdom_id", "vdom_name", "firewall_id", "fw_name", "routes", "connected", "connected_networks", "addresses")
+
+    def __init__(self, vdom_id: int, vdom_name: str, firewall_id: int, fw_name: str):
+        self.vdom_id = vdom_id
+        self.vdom_name = vdom_name
+        self.firewall_id = firewall_id
+        self.fw_name = fw_name
+        self.routes = PrefixTable()     # route tuples (ROUTE_FIELDS)
+        self.connected = PrefixTable()  # interface names, by interface network
+        self.connected_networks: List[tuple] = []  # (network, interface name)
+        self.addresses: Dict[object, str] = {}  # interface address -> name
+
+    def describe(self) -> dict:
+        return {
+            "firewall_id": self.firewall_id, "fw_name": self.fw_name,
+            "vdom_id": self.vdom_id, "vdom_name": self.vdom_name,
+        }
+
+class Topology:
+    """
+    The VDOMs of the inventory and the interfaces owning each address,
+    loaded per firewall. Thread-safe: loads and traces hold one lock.
+    """
+
+    def __init__(self, max_age: float = TOPOLOGY_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self.vdoms: Dict[int, VDOMNode] = {}
+        self._firewall_vdoms: Dict[int, List[int]] = {}
+        # {address: [(vdom_id, interface name)]} and the networks of all interfaces
+        self._owners: Dict[object, List[Tuple[int, str]]] = defaultdict(list)
+        self._networks = PrefixTable()
+        # Firewalls to reload; None means all of them
+        self._dirty: Optional[Set[int]] = None
+        self._loaded_at = 0.0
+
+    # Loading
+
+    def on_change(self, change: ChangeEvent) -> None:
+        if change.entity != RESYNC_ENTITY and change.entity not in _TRACKED:
+            return
+        firewall_id = change.get("firewall_id")
+        with self._lock:
+            if change.entity == RESYNC_ENTITY or firewall_id is None:
+                self._dirty = None
+            elif self._dirty is not None:
+                self._dirty.add(firewall_id)
+
+    def _drop_firewall(self, firewall_id: int) -> None:
+        for vdom_id in self._firewall_vdoms.pop(firewall_id, ()):
+            node = self.vdoms.pop(vdom_id)
+            for address, name in node.addresses.items():
+                owners = self._owners.get(address)
+                if owners:
+                    owners[:] = [owner for owner in owners if owner[0] != vdom_id]
+                    if not owners:
+                        del self._owners[address]
+            for network, name in node.connected_networks:
+                self._networks.remove(network, (vdom_id, name))
+
+    def _read(self, db, firewall_ids: Optional[Iterable[int]]) -> Dict[int, VDOMNode]:
+        # The VDOMs of one database, with their interfaces and routes
+        from app.models.firewall import Firewall
+        from app.models.interface import Interface
+        from app.models.route import Route
+        from app.models.vdom import VDOM
+
+        vdoms = (
+            select(VDOM.vdom_id, VDOM.vdom_name, VDOM.firewall_id, Firewall.fw_name)
+            .join(Firewall, VDOM.firewall_id == Firewall.firewall_id)
+        )
+        interfaces = select(
+            Interface.firewall_id, Interface.vdom_id, Interface.interface_name, Interface.ip_address, Interface.mask
+        ).where(Interface.vdom_id.isnot(None))
+        routes = dictionary.decoded_select("routes", ["vdom_id", *ROUTE_FIELDS]).order_by(Route.route_id)
+        if firewall_ids is not None:
+            vdoms = vdoms.where(VDOM.firewall_id.in_(firewall_ids))
+            interfaces = interfaces.where(Interface.firewall_id.in_(firewall_ids))
+            routes = routes.where(Route.firewall_id.in_(firewall_ids))
+
+        nodes = {row.vdom_id: VDOMNode(*row) for row in db.execute(vdoms)}
+        for row in db.execute(interfaces):
+            node = nodes.get(row.vdom_id)
+            network = _interface_network(row.ip_address, row.mask)
+            if node is None or network is None:
+                continue
+            node.addresses[network.ip] = row.interface_name
+            node.connected.add(network.network, row.interface_name)
+            node.connected_networks.append((network.network, row.interface_name))
+        # Routes repeat a few route types, gateways and exit interfaces; keep one copy of each
+        strings: Dict[str, str] = {}
+        for vdom_id, *route in db.execute(routes):
+            node = nodes.get(vdom_id)
+            if node is None:
+                continue
+            # Cheaper than ip_network(), which matters with a fleet's routes
+            try:
+                address = ipaddress.ip_address(route[DESTINATION].strip())
+            except (AttributeError, ValueError):
+                continue
+            if not 0 <= route[MASK_LENGTH] <= _BITS[address.version]:
+                continue
+            for index in (ROUTE_TYPE, GATEWAY, EXIT_INTERFACE):
+                if route[index] is not None:
+                    route[index] = strings.setdefault(route[index], route[index])
+            node.routes.add_prefix(address, route[MASK_LENGTH], tuple(route))
+        return nodes
+
+    def _load(self, db, firewall_ids: Optional[Iterable[int]]) -> None:
+        from app.database import shards
+
+        if firewall_ids is not None:
+            firewall_ids = sorted(firewall_ids)
+        if shards.sharded:
+            # Every shard, whichever the request's session is routed to
+            nodes = {}
+            for shard_nodes in shards.scatter(db, lambda session: self._read(session, firewall_ids)):
+                nodes.update(shard_nodes)
+        else:
+            nodes = self._read(db, firewall_ids)
+        with self._lock:
+            for firewall_id in (list(self._firewall_vdoms) if firewall_ids is None else firewall_ids):
+                self._drop_firewall(firewall_id)
+            for vdom_id, node in nodes.items():
+                self.vdoms[vdom_id] = node
+                self._firewall_vdoms.setdefault(node.firewall_id, []).append(vdom_id)
+                for address, name in node.addresses.items():
+                    self._owners[address].append((vdom_id, name))
+                for network, name in node.connected_networks:
+                    self._networks.add(network, (vdom_id, name))
+
+    def refresh(self, db) -> None:
+        """
+        Reload the firewalls changed since the last refresh, or everything.
+        """
+        with self._lock:
+            if self._dirty is not None and time.monotonic() - self._loaded_at > self.max_age:
+                self._dirty = None
+            dirty, self._dirty = self._dirty, set()
+            if dirty is not None and not dirty:
+                return
+            started = time.perf_counter()
+            if dirty is None:
+                self._loaded_at = time.monotonic()
+            try:
+                self._load(db, dirty)
+            except Exception:
+                # Reload everything on the next refresh
+                self._dirty = None
+                raise
+        logger.info(
+            "Topology: loaded %s in %.0f ms",
+            "all firewalls" if dirty is None else f"firewalls {', '.join(map(str, sorted(dirty)))}",
+            (time.perf_counter() - started) * 1000
+        )
+
+    # Tracing
+
+    def _owner(self, address, exclude: Optional[int] = None) -> Optional[Tuple[int, str]]:
+        for owner in self._owners.get(address, ()):
+            if owner[0] != exclude:
+                return owner
+        return None
+
+    def _source(self, address) -> Optional[Tuple[int, str]]:
+        # The VDOM owning the address, else the one with the longest network holding it
+        owner = self._owner(address)
+        if owner:
+            return owner
+        holders = self._networks.match(address)
+        return min(holders) if holders else None
+
+    def trace(
+        self,
+        src: str,
+        dst: str,
+        vdom_id: Optional[int] = None,
+        max_hops: int = MAX_HOPS
+    ) -> dict:
+        """
+        Follow dst from the VDOM holding src (or from vdom_id) through the
+        routes of each VDOM and the owners of their gateways. Returns
+        {"src", "dst", "status", "hops", "destination"}; raises ValueError
+        for bad addresses or an unknown start.
+        """
+        try:
+            source, target = ipaddress.ip_address(src.strip()), ipaddress.ip_address(dst.strip())
+        except ValueError as e:
+            raise ValueError(f"Invalid address: {e}")
+        if source.version != target.version:
+            raise ValueError("src and dst must be of the same IP version")
+
+        with self._lock:
+            ingress = None
+            if vdom_id is not None:
+                if vdom_id not in self.vdoms:
+                    raise ValueError(f"VDOM {vdom_id} not found")
+                current = vdom_id
+            else:
+                start = self._source(source)
+                if start is None:
+                    raise ValueError(f"No interface network holds {src}; give the VDOM to start from")
+                current, ingress = start
+
+            hops: List[dict] = []
+            visited: Set[int] = set()
+            destination = None
+            status = MAX_HOPS_REACHED
+            while len(hops) < max_hops:
+                if current in visited:
+                    status = LOOP
+                    break
+                visited.add(current)
+                node = self.vdoms[current]
+                hop = {**node.describe(), "ingress_interface": ingress, "route": None, "equal_routes": 0, "next_hop": None}
+                hops.append(hop)
+
+                if target in node.addresses:
+                    status, destination = DELIVERED, {**node.describe(), "interface_name": node.addresses[target]}
+                    break
+                # The longer prefix wins; on a tie, the attached network does,
+                # as in the kernel. VDOMs without a routing table still reach
+                # their own networks.
+                routed, connected = node.routes.longest(target), node.connected.longest(target)
+                if connected is not None and (routed is None or connected[0] >= routed[0]):
+                    length, names = connected
+                    network = ipaddress.ip_network((target, length), strict=False)
+                    routes = [(None, str(network.network_address), length, "connected", None, names[0])]
+                elif routed is not None:
+                    routes = routed[1]
+                else:
+                    status = BLACKHOLE
+                    break
+                route = routes[0]
+                hop["route"] = dict(zip(ROUTE_FIELDS, route))
+                hop["equal_routes"] = len({(other[GATEWAY], other[EXIT_INTERFACE]) for other in routes}) - 1
+                if route[ROUTE_TYPE] == "blackhole" or route[EXIT_INTERFACE] in _BLACKHOLE_NAMES:
+                    status = BLACKHOLE
+                    break
+                if route[GATEWAY] in _NO_GATEWAY:
+                    # Directly connected: the destination is on this VDOM's network
+                    status = DELIVERED
+                    owner = self._owner(target, exclude=current)
+                    if owner:
+                        destination = {**self.vdoms[owner[0]].describe(), "interface_name": owner[1]}
+                    break
+                try:
+                    gateway = ipaddress.ip_address(route[GATEWAY].strip())
+                except ValueError:
+                    status = EXITED
+                    break
+                hop["next_hop"] = str(gateway)
+                owner = self._owner(gateway, exclude=current)
+                if owner is None:
+                    status = EXITED
+                    break
+                current, ingress = owner
+
+        return {"src": str(source), "dst": str(target), "status": status, "hops": hops, "destination": destination}
+
+topology = Topology()
+broker.add_listener(topology.on_change)
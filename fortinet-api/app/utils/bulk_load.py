@@ -0,0 +1,173 @@
+"""
+Bulk loading helpers shared by the importer and snapshot restore: COPY
+streaming into PostgreSQL (batched INSERTs elsewhere), and the truncate,
+deferred index and sequence steps around a full reload.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT outside PostgreSQL
+INSERT_BATCH_SIZE = 1000
+
+def copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value, separators=(",", ":"))
+    value = str(value)
+    if "\\" in value or "\t" in value or "\n" in value or "\r" in value:
+        value = value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return value
+
+class CopyStream:
+    """
+    File-like adapter that feeds COPY text-format lines to copy_expert.
+    """
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._pending = b""
+
+    def read(self, size: int = -1) -> bytes:
+        parts = [self._pending]
+        length = len(self._pending)
+        for line in self._lines:
+            encoded = line.encode("utf-8")
+            parts.append(encoded)
+            length += len(encoded)
+            if 0 <= size <= length:
+                break
+        data = b"".join(parts)
+        if size < 0:
+            self._pending = b""
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+def copy_into(cursor, table: str, columns: List[str], rows: Iterable[Sequence]) -> int:
+    """
+    COPY rows (value sequences in column order) into a table through a
+    psycopg2 cursor, inside its connection's transaction. Returns the number
+    of rows written.
+    """
+    count = 0
+
+    def lines():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield "\t".join([copy_value(value) for value in row]) + "\n"
+
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", CopyStream(lines()), size=1 << 16)
+    return count
+
+def copy_rows(engine, table: str, columns: List[str], rows: Iterable[Sequence]) -> int:
+    """
+    COPY rows into a table on a connection of its own and commit.
+    """
+    connection = engine.raw_connection()
+    try:
+        count = copy_into(connection.cursor(), table, columns, rows)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    return count
+
+def insert_rows(engine, table: str, columns: List[str], rows: Iterable[Sequence]) -> int:
+    from app.database import Base
+
+    insert = Base.metadata.tables[table].insert()
+    count = 0
+    with engine.begin() as connection:
+        batch = []
+        for row in rows:
+            batch.append(dict(zip(columns, row)))
+            if len(batch) >= INSERT_BATCH_SIZE:
+                connection.execute(insert, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            connection.execute(insert, batch)
+            count += len(batch)
+    return count
+
+def load_rows(engine, table: str, columns: List[str], rows: Iterable[Sequence]) -> int:
+    if engine.dialect.name == "postgresql":
+        return copy_rows(engine, table, columns, rows)
+    return insert_rows(engine, table, columns, rows)
+
+def truncate_tables(engine, tables: Sequence[str]) -> None:
+    """
+    Empty tables given in dependency order, restarting their sequences. The
+    rows of versioned tables are archived first (see app.versioning).
+    """
+    from app import versioning
+
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql":
+            # TRUNCATE fires no row or statement triggers
+            versioning.archive_tables(connection, tables)
+            # CASCADE also empties any other table that references these
+            connection.execute(text(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE"))
+        else:
+            for table in reversed(tables):
+                connection.execute(text(f"DELETE FROM {table}"))
+
+def index_definition(definition: str) -> str:
+    """
+    An index definition from pg_indexes, made to cover every partition when
+    it belongs to a partitioned table (where it reads "ON ONLY").
+    """
+    return definition.replace(" ON ONLY ", " ON ", 1)
+
+def drop_secondary_indexes(engine, tables: Sequence[str]) -> List[Tuple[str, str]]:
+    """
+    Drop the secondary indexes of the tables and return their definitions.
+    Indexes behind primary key and unique constraints stay.
+    """
+    with engine.begin() as connection:
+        indexes = connection.execute(text(
+            "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+            "WHERE i.schemaname = current_schema() AND i.tablename = ANY(:tables) "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)"
+        ), {"tables": list(tables)}).all()
+        for name, definition in indexes:
+            # Logged so an interrupted run can be repaired by hand
+            logger.info("Deferring index: %s", definition)
+            connection.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+    return [(name, index_definition(definition)) for name, definition in indexes]
+
+def create_indexes(engine, indexes: List[Tuple[str, str]], workers: int) -> List[str]:
+    """
+    Run the index definitions in parallel. Returns one message per failure.
+    """
+    def create(definition: str) -> Optional[str]:
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(definition))
+        except Exception as e:
+            return f"{definition}: {e}"
+        return None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return [error for error in pool.map(create, [definition for _, definition in indexes]) if error]
+
+def reset_sequences(engine, primary_keys: dict) -> None:
+    """
+    Move each table's serial sequence past its largest key ({table: key}).
+    """
+    with engine.begin() as connection:
+        for table, key in primary_keys.items():
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{key}'), "
+                f"COALESCE(MAX({key}), 0) + 1, false) FROM {table}"
+            ))
@@ -45,4 +45,28 @@ def ip_is_in_network(ip_str: str, network: Union[ipaddress.IPv4Network, ipaddres
         ip = ipaddress.ip_address(ip_str)
         return ip in network
     except ValueError:
-        return False
\ No newline at end of file
+        return False
+def host_network(ip_str: Optional[str]) -> Optional[str]:
+    """
+    Return the single-address network (e.g. "10.0.0.1/32") for an IP string,
+    or None if the value is empty or not a valid IP address.
+    """
+    if not ip_str:
+        return None
+    try:
+        ip = ipaddress.ip_address(ip_str.strip())
+        return str(ipaddress.ip_network(ip))
+    except ValueError:
+        return None
+
+def prefix_network(network_str: Optional[str], mask_length: Optional[int]) -> Optional[str]:
+    """
+    Return the normalized prefix (e.g. "10.0.0.0/8") for a destination network
+    and mask length, or None if they do not form a valid network.
+    """
+    if not network_str or mask_length is None:
+        return None
+    try:
+        return str(ipaddress.ip_network(f"{network_str.strip()}/{mask_length}", strict=False))
+    except ValueError:
+        return None
@@ -0,0 +1,60 @@
+import ipaddress
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def normalize_ip(ip_str: str) -> Optional[str]:
+    """
+    Return the canonical text form of an IP address, or None if it is invalid.
+    VIP addresses are stored as text, so lookups must use the same spelling.
+    """
+    try:
+        return str(ipaddress.ip_address(ip_str.strip()))
+    except (ValueError, AttributeError):
+        return None
+
+class NATIndex:
+    """
+    Hash map of VIP translations keyed on (ip, port).
+
+    Forward indexes are keyed on (external_ip, external_port) and reverse
+    indexes on (mapped_ip, mapped_port). A VIP without a port translates the
+    whole port range of its address, so it is stored under (ip, None) and is
+    used whenever no exact (ip, port) entry exists.
+    """
+
+    def __init__(self, vips: Iterable, reverse: bool = False):
+        self.reverse = reverse
+        self._entries: Dict[Tuple[str, Optional[int]], List] = defaultdict(list)
+        self._by_ip: Dict[str, List] = defaultdict(list)
+        for vip in vips:
+            ip, port = self._key(vip)
+            if ip is None:
+                continue
+            self._entries[(ip, port)].append(vip)
+            self._by_ip[ip].append(vip)
+
+    def _key(self, vip) -> Tuple[Optional[str], Optional[int]]:
+        if self.reverse:
+            return normalize_ip(vip.mapped_ip or ""), vip.mapped_port
+        return normalize_ip(vip.external_ip or ""), vip.external_port
+
+    def lookup(self, ip: str, port: Optional[int] = None) -> List:
+        """
+        Return the VIPs translating ip:port. Exact port entries win over
+        all-ports entries; without a port every VIP on the address matches.
+        """
+        if port is None:
+            return list(self._by_ip.get(ip, ()))
+        exact = self._entries.get((ip, port))
+        if exact:
+            return list(exact)
+        return list(self._entries.get((ip, None), ()))
+
+    def translate(self, vip, port: Optional[int] = None) -> Tuple[str, Optional[int]]:
+        """
+        Return the (ip, port) a VIP translates to. A VIP without a port on the
+        other side keeps the original port.
+        """
+        if self.reverse:
+            return vip.external_ip, vip.external_port if vip.external_port is not None else port
+        return vip.mapped_ip, vip.mapped_port if vip.mapped_port is not None else port
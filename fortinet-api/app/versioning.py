@@ -0,0 +1,137 @@
+"""
+Point-in-time state of the inventory (PostgreSQL only).
+
+Every load of the inventory starts a generation (new_generation): an
+import, a snapshot restore, a collector round. Rows of firewalls, vdoms,
+interfaces, routes, vips and ip_addresses carry the generation that wrote
+them and valid_from, the time that version of the row started. When a row
+is updated or deleted, triggers (see app.models.generation) copy its old
+version into <table>_versions with valid_to, the time it ended, so each
+version covers [valid_from, valid_to). The bulk paths that bypass the
+triggers archive explicitly: TRUNCATE before a replacing import or a
+restore (app.utils.bulk_load) and the partition swap of a collector
+(app.partitioning).
+
+at() rewrites a select over the live tables into one over their state at
+a point in time: the live rows that already existed, plus the versions
+whose range holds it (a GiST index on tsrange(valid_from, valid_to) finds
+them). The list and search endpoints take it as `as_of=`, which replaces
+keeping a full dump before every import.
+
+Versions are kept whole for VERSION_RETENTION_DAYS. `python -m app.cli
+versions compact` (run daily) thins older ones to the state at each
+midnight, deletes generations older than the window, and deletes versions
+that ended more than VERSION_MAX_AGE_DAYS ago.
+"""
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import DateTime, cast, func, literal, select, text, union_all
+from sqlalchemy.sql import Select
+
+from app.models.generation import VERSIONED_TABLES, VERSIONS_TABLES, archive_sql
+
+logger = logging.getLogger(__name__)
+
+VERSION_RETENTION_DAYS = int(os.getenv("VERSION_RETENTION_DAYS", "30"))
+VERSION_MAX_AGE_DAYS = int(os.getenv("VERSION_MAX_AGE_DAYS", "365"))
+
+GENERATION_SOURCES = ("import", "restore", "collector", "ingest", "migration")
+
+def uses_versions(connection) -> bool:
+    return connection.dialect.name == "postgresql"
+
+def new_generation(engine, source: str, detail: Optional[str] = None) -> Optional[int]:
+    """
+    Start a generation and commit it, so rows written from now on by any
+    connection carry its id. Returns the id, or None without PostgreSQL.
+    """
+    if source not in GENERATION_SOURCES:
+        raise ValueError(f"Unknown generation source {source}")
+    if not uses_versions(engine):
+        return None
+    with engine.begin() as connection:
+        generation_id = connection.execute(
+            text("INSERT INTO generations (source, detail) VALUES (:source, :detail) RETURNING generation_id"),
+            {"source": source, "detail": detail}
+        ).scalar()
+    logger.info("Generation %d (%s%s)", generation_id, source, f": {detail}" if detail else "")
+    return generation_id
+
+def archive(connection, table: str, source: Optional[str] = None) -> int:
+    """
+    Close the current versions of all rows in a versioned table, or in
+    `source` (one of its partitions), before they are removed without
+    firing the triggers. Runs in the caller's transaction.
+    """
+    if table not in VERSIONED_TABLES or not uses_versions(connection):
+        return 0
+    return connection.execute(text(archive_sql(table, source or table))).rowcount
+
+def archive_tables(connection, tables: Sequence[str]) -> Dict[str, int]:
+    return {table: archive(connection, table) for table in tables if table in VERSIONED_TABLES}
+
+def as_of_table(name: str, as_of: datetime):
+    """
+    The rows of a versioned table at `as_of`, as a subquery with its columns.
+    """
+    from app.database import Base
+
+    live = Base.metadata.tables[name]
+    versions = VERSIONS_TABLES[name]
+    moment = cast(literal(as_of), DateTime)
+    return union_all(
+        select(*live.columns).where(live.c.valid_from <= moment),
+        select(*[versions.c[column.name] for column in live.columns]).where(
+            func.tsrange(versions.c.valid_from, versions.c.valid_to).op("@>")(moment)
+        ),
+    ).subquery(f"{name}_as_of")
+
+def at(statement: Select, as_of: Optional[datetime]) -> Select:
+    """
+    The select over the state of every versioned table at `as_of`; the
+    select itself when as_of is None.
+    """
+    if as_of is None:
+        return statement
+    from app.database import Base
+
+    for name in VERSIONED_TABLES:
+        statement = statement.replace_selectable(Base.metadata.tables[name], as_of_table(name, as_of))
+    return statement
+
+def check_as_of(connection, as_of: Optional[datetime]) -> None:
+    """
+    Raise ValueError when as_of is given but cannot be served.
+    """
+    if as_of is not None and not uses_versions(connection):
+        raise ValueError("as_of needs PostgreSQL")
+
+def compact(engine, today: Optional[date] = None) -> Dict[str, dict]:
+    """
+    Thin the versions that ended before the retention window to those that
+    hold a midnight, delete the versions that ended before
+    VERSION_MAX_AGE_DAYS and the generations older than the window (but
+    the latest). One transaction per table. Returns the rows deleted.
+    """
+    if not uses_versions(engine):
+        return {}
+    today = today or datetime.utcnow().date()
+    cutoff = datetime.combine(today - timedelta(days=VERSION_RETENTION_DAYS), datetime.min.time())
+    oldest = datetime.combine(today - timedelta(days=VERSION_MAX_AGE_DAYS), datetime.min.time())
+    deleted: Dict[str, int] = {}
+    for name in VERSIONED_TABLES:
+        with engine.begin() as connection:
+            # The last midnight before valid_to is not inside [valid_from, valid_to)
+            deleted[f"{name}_versions"] = connection.execute(text(
+                f"DELETE FROM {name}_versions WHERE valid_to < :cutoff AND ("
+                f"valid_to < :oldest OR date_trunc('day', valid_to - interval '1 microsecond') < valid_from)"
+            ), {"cutoff": cutoff, "oldest": oldest}).rowcount
+    with engine.begin() as connection:
+        generations = connection.execute(text(
+            "DELETE FROM generations WHERE started_at < :cutoff "
+            "AND generation_id < (SELECT max(generation_id) FROM generations)"
+        ), {"cutoff": cutoff}).rowcount
+    return {"versions": deleted, "generations": generations}
@@ -0,0 +1,267 @@
+"""
+Write-behind buffering of interface status updates.
+
+Interface status (up/down) changes more often than anything else the
+collectors report, and a flapping link reports it many times a second.
+PATCH /api/interfaces/status hands the updates to the worker's StatusBuffer
+and returns at once. The buffer keeps only the latest status of each
+interface; a flusher thread writes everything pending every FLUSH_INTERVAL
+seconds, or as soon as FLUSH_ROWS interfaces are pending, with
+update_interface_statuses: one set-based UPDATE and one commit.
+
+Each API worker has its own buffer. Updates to one interface that reach two
+workers in the same window are written in the order the workers flush; a
+collector that needs strict ordering sends an interface's updates in one
+request.
+
+A failed flush puts its updates back, under any newer ones, and the flusher
+retries with backoff. stop_flusher(), called on shutdown, writes whatever
+is still pending. FlushMetrics keeps the latency of recent flushes and how
+long their updates waited; GET /api/interfaces/status/metrics returns them.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import app.crud.interface as interface_crud
+from app.database import SessionLocal, shards
+
+logger = logging.getLogger(__name__)
+
+# Seconds between flushes
+FLUSH_INTERVAL = int(os.getenv("STATUS_FLUSH_INTERVAL_MS", "250")) / 1000
+# Pending interfaces that trigger a flush before the interval is up
+FLUSH_ROWS = int(os.getenv("STATUS_FLUSH_ROWS", "10000"))
+# Pending interfaces beyond which new updates are refused
+BUFFER_LIMIT = int(os.getenv("STATUS_BUFFER_LIMIT", "200000"))
+# Longest wait between retries while flushes fail
+MAX_RETRY_DELAY = 30.0
+# Flushes whose latency the metrics keep
+METRICS_WINDOW = 1000
+
+class BufferFull(Exception):
+    pass
+
+def _summary(values: List[float]) -> dict:
+    # Milliseconds; percentiles by nearest rank
+    if not values:
+        return {"last": None, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def percentile(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+    return {
+        "last": round(values[-1] * 1000, 2),
+        "mean": round(sum(values) / len(values) * 1000, 2),
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+class FlushMetrics:
+    """
+    Counters since startup, and the latency (time spent writing) and wait
+    (time from the oldest update's arrival to its commit) of recent flushes.
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.flushes = 0
+        self.failures = 0
+        self.rows_flushed = 0
+        self.rows_changed = 0
+        self.last_error: Optional[str] = None
+        self.last_flush_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window)
+        self._waits: deque = deque(maxlen=window)
+
+    def record(self, latency: float, wait: float, rows: int, changed: int) -> None:
+        with self._lock:
+            self.flushes += 1
+            self.rows_flushed += rows
+            self.rows_changed += changed
+            self.last_flush_at = time.time()
+            self._latencies.append(latency)
+            self._waits.append(wait)
+
+    def record_failure(self, error: Exception) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "flushes": self.flushes,
+                "failures": self.failures,
+                "rows_flushed": self.rows_flushed,
+                "rows_changed": self.rows_changed,
+                "last_flush_at": self.last_flush_at,
+                "last_error": self.last_error,
+                "latency_ms": _summary(list(self._latencies)),
+                "wait_ms": _summary(list(self._waits)),
+            }
+
+class StatusBuffer:
+    """
+    Coalesces interface status updates and writes them in batches from a
+    background thread; see the module docstring.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        interval: float = FLUSH_INTERVAL,
+        flush_rows: int = FLUSH_ROWS,
+        limit: int = BUFFER_LIMIT
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.flush_rows = flush_rows
+        self.limit = limit
+        self.metrics = FlushMetrics()
+        self.submitted = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[int, str] = {}
+        # time.monotonic() of the oldest pending update
+        self._oldest: Optional[float] = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def submit(self, updates: Iterable[Tuple[int, str]]) -> Tuple[int, int]:
+        """
+        Queue (interface_id, status) updates; a later update of an interface
+        replaces an earlier one. Returns (accepted, coalesced). Raises
+        BufferFull, queueing nothing, when the buffer is at its limit.
+        """
+        updates = list(updates)
+        with self._lock:
+            new = len({interface_id for interface_id, _ in updates} - self._pending.keys())
+            if new and len(self._pending) + new > self.limit:
+                raise BufferFull(f"{len(self._pending)} interface status updates are waiting to be written")
+            coalesced = len(updates) - new
+            for interface_id, status in updates:
+                self._pending[interface_id] = status
+            if updates and self._oldest is None:
+                self._oldest = time.monotonic()
+            self.submitted += len(updates)
+            self.coalesced += coalesced
+            pending = len(self._pending)
+        if pending >= self.flush_rows:
+            self._wake.set()
+        return len(updates), coalesced
+
+    def _write(self, statuses: Dict[int, str]) -> int:
+        # One UPDATE per shard holding some of the interfaces
+        changed = 0
+        for index, interface_ids in shards.group(statuses).items():
+            db = self.session_factory(bind=shards.engines[index]) if shards.sharded else self.session_factory()
+            try:
+                changed += len(interface_crud.update_interface_statuses(
+                    db, {interface_id: statuses[interface_id] for interface_id in interface_ids}
+                ))
+            finally:
+                db.close()
+        return changed
+
+    def flush(self) -> int:
+        """
+        Write everything pending now. Returns the number of interfaces whose
+        status changed. On a database error the updates are queued again and
+        the error is raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                statuses, self._pending = self._pending, {}
+                oldest, self._oldest = self._oldest, None
+            if not statuses:
+                return 0
+            started = time.monotonic()
+            try:
+                changed = self._write(statuses)
+            except SQLAlchemyError as exc:
+                with self._lock:
+                    # Updates that arrived meanwhile are newer
+                    for interface_id, status in statuses.items():
+                        self._pending.setdefault(interface_id, status)
+                    self._oldest = min(oldest, self._oldest or oldest)
+                self.metrics.record_failure(exc)
+                raise
+            finished = time.monotonic()
+            self.metrics.record(finished - started, finished - oldest, len(statuses), changed)
+            return changed
+
+    def _run(self) -> None:
+        delay = self.interval
+        while not self._stop_event.is_set():
+            if delay > self.interval:
+                # Backing off: pending updates must not wake us
+                self._stop_event.wait(delay)
+            else:
+                self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                delay = self.interval
+            except Exception as exc:
+                delay = min(max(delay * 2, 1.0), MAX_RETRY_DELAY)
+                logger.warning("Flushing interface status updates failed (%s); retrying in %.0fs", exc, delay)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="status-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stop the flusher thread and write what is still pending.
+        """
+        if self._thread is not None:
+            self._stop_event.set()
+            self._wake.set()
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        try:
+            self.flush()
+        except SQLAlchemyError as exc:
+            logger.error("Dropping %d interface status updates that could not be written: %s", self.pending, exc)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending, oldest = len(self._pending), self._oldest
+            submitted, coalesced = self.submitted, self.coalesced
+        return {
+            "running": self._thread is not None,
+            "flush_interval_ms": round(self.interval * 1000),
+            "pending": pending,
+            "oldest_pending_ms": round((time.monotonic() - oldest) * 1000, 2) if oldest is not None else None,
+            "submitted": submitted,
+            "coalesced": coalesced,
+            **self.metrics.as_dict(),
+        }
+
+status_buffer = StatusBuffer()
+
+def start_flusher() -> None:
+    status_buffer.start()
+
+def stop_flusher() -> None:
+    status_buffer.stop()
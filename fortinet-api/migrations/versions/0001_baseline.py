@@ -0,0 +1,186 @@
+"""Baseline: the schema of postgres-db/data/schema.sql
+
+Databases created from schema.sql before migrations existed already have
+all of this; mark them with `alembic stamp 0001_baseline` and upgrade from
+there.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2025-07-06 12:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# The SQL below is frozen as of this revision; app.models.tombstone describes
+# the schema at head
+
+# Tables that leave a tombstone behind, with their primary key column
+TOMBSTONE_TABLES = {
+    "firewalls": "firewall_id",
+    "vdoms": "vdom_id",
+    "interfaces": "interface_id",
+    "routes": "route_id",
+    "vips": "vip_id",
+}
+
+TOMBSTONE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION record_tombstone() RETURNS trigger AS $$
+DECLARE
+  old_row jsonb := to_jsonb(OLD);
+BEGIN
+  INSERT INTO tombstones (entity, entity_id, firewall_id, vdom_id, deleted_at)
+  VALUES (
+    TG_TABLE_NAME,
+    (old_row ->> TG_ARGV[0])::integer,
+    (old_row ->> 'firewall_id')::integer,
+    (old_row ->> 'vdom_id')::integer,
+    now()
+  );
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def _last_updated() -> sa.Column:
+    return sa.Column("last_updated", sa.DateTime(), server_default=sa.text("CURRENT_TIMESTAMP"), nullable=True)
+
+def upgrade() -> None:
+    op.create_table(
+        "firewalls",
+        sa.Column("firewall_id", sa.Integer(), nullable=False),
+        sa.Column("fw_name", sa.Text(), nullable=False),
+        sa.Column("fw_ip", sa.Text(), nullable=False),
+        sa.Column("fmg_ip", sa.Text(), nullable=True),
+        sa.Column("faz_ip", sa.Text(), nullable=True),
+        sa.Column("site", sa.Text(), nullable=True),
+        _last_updated(),
+        sa.PrimaryKeyConstraint("firewall_id", name="firewalls_pkey"),
+        sa.UniqueConstraint("fw_name", name="uq_fw_name"),
+        sa.UniqueConstraint("fw_ip", name="uq_fw_ip"),
+    )
+    op.create_index("idx_firewalls_fw_name", "firewalls", ["fw_name"])
+    op.create_index("idx_firewalls_last_updated", "firewalls", ["last_updated"])
+
+    op.create_table(
+        "vdoms",
+        sa.Column("vdom_id", sa.Integer(), nullable=False),
+        sa.Column("firewall_id", sa.Integer(), nullable=False),
+        sa.Column("vdom_name", sa.Text(), nullable=False),
+        sa.Column("vdom_index", sa.Integer(), nullable=True),
+        _last_updated(),
+        sa.PrimaryKeyConstraint("vdom_id", name="vdoms_pkey"),
+        sa.UniqueConstraint("firewall_id", "vdom_name", name="uq_firewall_vdom"),
+        sa.ForeignKeyConstraint(["firewall_id"], ["firewalls.firewall_id"], name="vdoms_firewall_id_fkey", ondelete="CASCADE"),
+    )
+    op.create_index("idx_vdoms_firewall_id", "vdoms", ["firewall_id"])
+    op.create_index("idx_vdoms_last_updated", "vdoms", ["last_updated"])
+
+    op.create_table(
+        "interfaces",
+        sa.Column("interface_id", sa.Integer(), nullable=False),
+        sa.Column("firewall_id", sa.Integer(), nullable=False),
+        sa.Column("vdom_id", sa.Integer(), nullable=True),
+        sa.Column("interface_name", sa.Text(), nullable=False),
+        sa.Column("ip_address", sa.Text(), nullable=True),
+        sa.Column("mask", sa.Text(), nullable=True),
+        sa.Column("type", sa.Text(), nullable=False),
+        sa.Column("vlan_id", sa.Integer(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("status", sa.Text(), nullable=True),
+        sa.Column("physical_interface_name", sa.Text(), nullable=True),
+        _last_updated(),
+        sa.PrimaryKeyConstraint("interface_id", name="interfaces_pkey"),
+        sa.UniqueConstraint("firewall_id", "vdom_id", "interface_name", name="uq_firewall_vdom_interface"),
+        sa.ForeignKeyConstraint(["firewall_id"], ["firewalls.firewall_id"], name="interfaces_firewall_id_fkey", ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["vdom_id"], ["vdoms.vdom_id"], name="interfaces_vdom_id_fkey", ondelete="CASCADE"),
+    )
+    op.create_index("idx_interfaces_firewall_id", "interfaces", ["firewall_id"])
+    op.create_index("idx_interfaces_vdom_id", "interfaces", ["vdom_id"])
+    op.create_index("idx_interfaces_last_updated", "interfaces", ["last_updated"])
+
+    op.create_table(
+        "routes",
+        sa.Column("route_id", sa.Integer(), nullable=False),
+        sa.Column("vdom_id", sa.Integer(), nullable=False),
+        sa.Column("destination_network", sa.Text(), nullable=False),
+        sa.Column("mask_length", sa.Integer(), nullable=False),
+        sa.Column("route_type", sa.Text(), nullable=False),
+        sa.Column("gateway", sa.Text(), nullable=True),
+        sa.Column("exit_interface_name", sa.Text(), nullable=False),
+        sa.Column("exit_interface_details", sa.Text(), nullable=True),
+        _last_updated(),
+        sa.PrimaryKeyConstraint("route_id", name="routes_pkey"),
+        sa.ForeignKeyConstraint(["vdom_id"], ["vdoms.vdom_id"], name="routes_vdom_id_fkey", ondelete="CASCADE"),
+    )
+    op.create_index("idx_routes_vdom_id", "routes", ["vdom_id"])
+    op.create_index("idx_routes_last_updated", "routes", ["last_updated"])
+
+    op.create_table(
+        "vips",
+        sa.Column("vip_id", sa.Integer(), nullable=False),
+        sa.Column("vdom_id", sa.Integer(), nullable=False),
+        sa.Column("external_ip", sa.Text(), nullable=False),
+        sa.Column("external_port", sa.Integer(), nullable=True),
+        sa.Column("mapped_ip", sa.Text(), nullable=False),
+        sa.Column("mapped_port", sa.Integer(), nullable=True),
+        sa.Column("vip_type", sa.Text(), nullable=True),
+        sa.Column("external_interface", sa.Text(), nullable=True),
+        sa.Column("mask", sa.Integer(), nullable=True),
+        _last_updated(),
+        sa.PrimaryKeyConstraint("vip_id", name="vips_pkey"),
+        sa.ForeignKeyConstraint(["vdom_id"], ["vdoms.vdom_id"], name="vips_vdom_id_fkey", ondelete="CASCADE"),
+    )
+    op.create_index("idx_vips_vdom_id", "vips", ["vdom_id"])
+    op.create_index("idx_vips_external_ip_port", "vips", ["external_ip", "external_port"])
+    op.create_index("idx_vips_mapped_ip_port", "vips", ["mapped_ip", "mapped_port"])
+    op.create_index("idx_vips_last_updated", "vips", ["last_updated"])
+
+    postgres = op.get_bind().dialect.name == "postgresql"
+    op.create_table(
+        "ip_addresses",
+        sa.Column("ip_address_id", sa.Integer(), nullable=False),
+        sa.Column("network", sa.dialects.postgresql.INET() if postgres else sa.Text(), nullable=False),
+        sa.Column("source_type", sa.Text(), nullable=False),
+        sa.Column("source_id", sa.Integer(), nullable=False),
+        sa.Column("firewall_id", sa.Integer(), nullable=False),
+        sa.Column("vdom_id", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("ip_address_id", name="ip_addresses_pkey"),
+        sa.ForeignKeyConstraint(["firewall_id"], ["firewalls.firewall_id"], name="ip_addresses_firewall_id_fkey", ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["vdom_id"], ["vdoms.vdom_id"], name="ip_addresses_vdom_id_fkey", ondelete="CASCADE"),
+    )
+    op.create_index(
+        "idx_ip_addresses_network", "ip_addresses", ["network"],
+        postgresql_using="gist", postgresql_ops={"network": "inet_ops"}
+    )
+    op.create_index("idx_ip_addresses_source", "ip_addresses", ["source_type", "source_id"])
+
+    op.create_table(
+        "tombstones",
+        sa.Column("tombstone_id", sa.Integer(), nullable=False),
+        sa.Column("entity", sa.Text(), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("firewall_id", sa.Integer(), nullable=True),
+        sa.Column("vdom_id", sa.Integer(), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(), server_default=sa.text("CURRENT_TIMESTAMP"), nullable=False),
+        sa.PrimaryKeyConstraint("tombstone_id", name="tombstones_pkey"),
+    )
+    op.create_index("idx_tombstones_deleted_at", "tombstones", ["deleted_at"])
+
+    if postgres:
+        op.execute(TOMBSTONE_FUNCTION_SQL)
+        for table, id_column in TOMBSTONE_TABLES.items():
+            op.execute(
+                f"CREATE TRIGGER trg_{table}_tombstone AFTER DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION record_tombstone('{id_column}')"
+            )
+
+def downgrade() -> None:
+    for table in ("tombstones", "ip_addresses", "vips", "routes", "interfaces", "vdoms", "firewalls"):
+        op.drop_table(table)
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP FUNCTION IF EXISTS record_tombstone()")
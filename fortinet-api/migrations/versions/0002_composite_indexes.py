@@ -0,0 +1,73 @@
+"""Composite and covering indexes for the list endpoints
+
+Each index matches a filter + sort combination of the crud layer; the
+benchmark in benchmarks/index_pack.py measures every one of them. The
+single-column indexes they make redundant are dropped, as are three that
+duplicate the leading column of a unique constraint. Everything is built
+and dropped CONCURRENTLY, outside a transaction, so the API keeps serving
+writes.
+
+Revision ID: 0002_composite_indexes
+Revises: 0001_baseline
+Create Date: 2025-07-06 12:00:00
+"""
+from alembic import op
+
+revision = "0002_composite_indexes"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+# (name, table, definition, (index it replaces, its definition))
+INDEXES = [
+    # GET /api/routes?vdom_id= (default sort route_type, optional route_type filter); route counts per VDOM
+    ("idx_routes_vdom_type", "routes", "(vdom_id, route_type) INCLUDE (route_id)", ("idx_routes_vdom_id", "(vdom_id)")),
+    # GET /api/routes (unfiltered pages sorted by route_type)
+    ("idx_routes_route_type", "routes", "(route_type)", None),
+    # GET /api/interfaces?vdom_id= (default sort interface_name); interface counts per VDOM
+    ("idx_interfaces_vdom_name", "interfaces", "(vdom_id, interface_name) INCLUDE (interface_id)", ("idx_interfaces_vdom_id", "(vdom_id)")),
+    # GET /api/vips?vdom_id= (default sort external_ip); VIP counts per VDOM
+    ("idx_vips_vdom_external_ip", "vips", "(vdom_id, external_ip) INCLUDE (vip_id)", ("idx_vips_vdom_id", "(vdom_id)")),
+]
+
+# Covered by the indexes behind uq_fw_name, uq_firewall_vdom and
+# uq_firewall_vdom_interface, which start with the same column: (name, table, definition)
+DUPLICATES = [
+    ("idx_firewalls_fw_name", "firewalls", "(fw_name)"),
+    ("idx_vdoms_firewall_id", "vdoms", "(firewall_id)"),
+    ("idx_interfaces_firewall_id", "interfaces", "(firewall_id)"),
+]
+
+def _create(name: str, table: str, definition: str, using: str = "btree") -> None:
+    # An interrupted CONCURRENTLY build leaves an invalid index behind
+    op.execute(
+        f"DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        f"WHERE c.relname = '{name}' AND NOT i.indisvalid) THEN EXECUTE 'DROP INDEX {name}'; END IF; END $$"
+    )
+    op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING {using} {definition}")
+
+def _drop(name: str) -> None:
+    op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for name, table, definition, _ in INDEXES:
+            _create(name, table, definition)
+        for _, _, _, replaced in INDEXES:
+            if replaced:
+                _drop(replaced[0])
+        for name, _, _ in DUPLICATES:
+            _drop(name)
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for name, table, definition in DUPLICATES:
+            _create(name, table, definition)
+        for name, table, _, replaced in INDEXES:
+            if replaced:
+                _create(replaced[0], table, replaced[1])
+            _drop(name)
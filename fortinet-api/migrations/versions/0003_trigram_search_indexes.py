@@ -0,0 +1,43 @@
+"""Trigram indexes for the substring filters
+
+The vdom_name and interface_name filters are ILIKE '%...%', which no btree
+(plain or on lower()) can serve. pg_trgm GIN indexes can. pg_trgm ships with
+the PostgreSQL contrib modules included in the postgres images.
+
+Revision ID: 0003_trigram_search_indexes
+Revises: 0002_composite_indexes
+Create Date: 2025-07-06 12:00:00
+"""
+from alembic import op
+
+revision = "0003_trigram_search_indexes"
+down_revision = "0002_composite_indexes"
+branch_labels = None
+depends_on = None
+
+# (name, table, column)
+INDEXES = [
+    # GET /api/vdoms?vdom_name= and GET /api/routes?vdom_name=
+    ("idx_vdoms_vdom_name_trgm", "vdoms", "vdom_name"),
+    # GET /api/interfaces?interface_name=
+    ("idx_interfaces_name_trgm", "interfaces", "interface_name"),
+]
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for name, table, column in INDEXES:
+            op.execute(
+                f"DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                f"WHERE c.relname = '{name}' AND NOT i.indisvalid) THEN EXECUTE 'DROP INDEX {name}'; END IF; END $$"
+            )
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)")
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,52 @@
+"""Denormalized firewall_id on routes
+
+Routes reach their firewall through vdoms. Partitioning them by firewall
+(see app.partitioning) needs the key on the row itself, so routes get a
+copy of the VDOM's firewall_id. A (vdom_id, firewall_id) foreign key with
+ON UPDATE CASCADE keeps the copy correct, which takes a matching unique
+constraint on vdoms.
+
+The backfill rewrites every route in one UPDATE; run it in a maintenance
+window on large databases.
+
+Revision ID: 0004_route_firewall_id
+Revises: 0003_trigram_search_indexes
+Create Date: 2025-07-13 12:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_route_firewall_id"
+down_revision = "0003_trigram_search_indexes"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+    # Batch mode, as SQLite cannot add a constraint to an existing table
+    with op.batch_alter_table("vdoms") as batch:
+        batch.create_unique_constraint("uq_vdoms_vdom_firewall", ["vdom_id", "firewall_id"])
+    op.add_column("routes", sa.Column("firewall_id", sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE routes SET firewall_id = "
+        "(SELECT vdoms.firewall_id FROM vdoms WHERE vdoms.vdom_id = routes.vdom_id)"
+    )
+    with op.batch_alter_table("routes") as batch:
+        batch.alter_column("firewall_id", existing_type=sa.Integer(), nullable=False)
+        batch.drop_constraint("routes_vdom_id_fkey", type_="foreignkey")
+        # NOT VALID, then VALIDATE: the check runs without blocking writes to vdoms
+        batch.create_foreign_key(
+            "fk_routes_vdom_firewall", "vdoms", ["vdom_id", "firewall_id"], ["vdom_id", "firewall_id"],
+            ondelete="CASCADE", onupdate="CASCADE", postgresql_not_valid=postgres
+        )
+    if postgres:
+        op.execute("ALTER TABLE routes VALIDATE CONSTRAINT fk_routes_vdom_firewall")
+
+def downgrade() -> None:
+    # Partitioned routes (app.partitioning) must be converted back to a plain table first
+    with op.batch_alter_table("routes") as batch:
+        batch.drop_constraint("fk_routes_vdom_firewall", type_="foreignkey")
+        batch.create_foreign_key("routes_vdom_id_fkey", "vdoms", ["vdom_id"], ["vdom_id"], ondelete="CASCADE")
+        batch.drop_column("firewall_id")
+    with op.batch_alter_table("vdoms") as batch:
+        batch.drop_constraint("uq_vdoms_vdom_firewall", type_="unique")
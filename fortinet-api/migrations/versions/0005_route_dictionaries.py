@@ -0,0 +1,129 @@
+"""Dictionary-encoded route attributes
+
+route_type becomes a smallint route_type_id into route_types, and gateway,
+exit_interface_name and exit_interface_details become a nexthop_id into
+route_nexthops (see app.dictionary). The route type indexes are rebuilt on
+the ids.
+
+Every route is rewritten twice: once to set the ids and once by VACUUM FULL,
+which returns the space of the dropped columns. Both hold an ACCESS
+EXCLUSIVE lock on routes; run the upgrade in a maintenance window.
+
+Revision ID: 0005_route_dictionaries
+Revises: 0004_route_firewall_id
+Create Date: 2025-07-20 12:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_route_dictionaries"
+down_revision = "0004_route_firewall_id"
+branch_labels = None
+depends_on = None
+
+# Columns of routes moved to route_nexthops
+NEXTHOP_COLUMNS = ["gateway", "exit_interface_name", "exit_interface_details"]
+
+def _nexthop_matches(alias: str) -> str:
+    # NULLs match each other; written so the join can hash the columns
+    return " AND ".join(
+        f"coalesce(n.{column}, '') = coalesce({alias}.{column}, '') "
+        f"AND (n.{column} IS NULL) = ({alias}.{column} IS NULL)"
+        for column in NEXTHOP_COLUMNS
+    )
+
+def upgrade() -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+    op.create_table(
+        "route_types",
+        # An INTEGER primary key on SQLite, the only kind it numbers by itself
+        sa.Column("route_type_id", sa.SmallInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True),
+        sa.Column("route_type", sa.Text(), nullable=False),
+        sa.UniqueConstraint("route_type", name="uq_route_types_route_type"),
+    )
+    op.create_table(
+        "route_nexthops",
+        sa.Column("nexthop_id", sa.Integer(), primary_key=True),
+        sa.Column("gateway", sa.Text(), nullable=True),
+        sa.Column("exit_interface_name", sa.Text(), nullable=False),
+        sa.Column("exit_interface_details", sa.Text(), nullable=True),
+        sa.UniqueConstraint(
+            *NEXTHOP_COLUMNS, name="uq_route_nexthops", postgresql_nulls_not_distinct=True
+        ),
+    )
+    op.execute("INSERT INTO route_types (route_type) SELECT DISTINCT route_type FROM routes ORDER BY 1")
+    op.execute(
+        f"INSERT INTO route_nexthops ({', '.join(NEXTHOP_COLUMNS)}) "
+        f"SELECT DISTINCT {', '.join(NEXTHOP_COLUMNS)} FROM routes ORDER BY 1, 2, 3"
+    )
+
+    op.add_column("routes", sa.Column("route_type_id", sa.SmallInteger(), nullable=True))
+    op.add_column("routes", sa.Column("nexthop_id", sa.Integer(), nullable=True))
+    if postgres:
+        op.execute(
+            "UPDATE routes r SET route_type_id = t.route_type_id, nexthop_id = n.nexthop_id "
+            f"FROM route_types t, route_nexthops n WHERE t.route_type = r.route_type AND {_nexthop_matches('r')}"
+        )
+    else:
+        op.execute(
+            "UPDATE routes SET "
+            "route_type_id = (SELECT t.route_type_id FROM route_types t WHERE t.route_type = routes.route_type), "
+            f"nexthop_id = (SELECT n.nexthop_id FROM route_nexthops n WHERE {_nexthop_matches('routes')})"
+        )
+
+    if postgres:
+        # 0002 built these on PostgreSQL only
+        op.drop_index("idx_routes_vdom_type", table_name="routes")
+        op.drop_index("idx_routes_route_type", table_name="routes")
+    with op.batch_alter_table("routes") as batch:
+        batch.alter_column("route_type_id", existing_type=sa.SmallInteger(), nullable=False)
+        batch.alter_column("nexthop_id", existing_type=sa.Integer(), nullable=False)
+        batch.drop_column("route_type")
+        for column in NEXTHOP_COLUMNS:
+            batch.drop_column(column)
+        batch.create_foreign_key("routes_route_type_id_fkey", "route_types", ["route_type_id"], ["route_type_id"])
+        batch.create_foreign_key("routes_nexthop_id_fkey", "route_nexthops", ["nexthop_id"], ["nexthop_id"])
+    if postgres:
+        op.create_index("idx_routes_vdom_type", "routes", ["vdom_id", "route_type_id"], postgresql_include=["route_id"])
+        op.create_index("idx_routes_route_type", "routes", ["route_type_id"])
+        # Rewrites the rows without the dropped columns
+        with op.get_context().autocommit_block():
+            op.execute("VACUUM (FULL, ANALYZE) routes")
+
+def downgrade() -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+    op.add_column("routes", sa.Column("route_type", sa.Text(), nullable=True))
+    op.add_column("routes", sa.Column("gateway", sa.Text(), nullable=True))
+    op.add_column("routes", sa.Column("exit_interface_name", sa.Text(), nullable=True))
+    op.add_column("routes", sa.Column("exit_interface_details", sa.Text(), nullable=True))
+    if postgres:
+        op.execute(
+            "UPDATE routes r SET route_type = t.route_type, gateway = n.gateway, "
+            "exit_interface_name = n.exit_interface_name, exit_interface_details = n.exit_interface_details "
+            "FROM route_types t, route_nexthops n WHERE t.route_type_id = r.route_type_id AND n.nexthop_id = r.nexthop_id"
+        )
+    else:
+        op.execute(
+            "UPDATE routes SET "
+            "route_type = (SELECT route_type FROM route_types t WHERE t.route_type_id = routes.route_type_id), "
+            + ", ".join(
+                f"{column} = (SELECT {column} FROM route_nexthops n WHERE n.nexthop_id = routes.nexthop_id)"
+                for column in NEXTHOP_COLUMNS
+            )
+        )
+
+    if postgres:
+        op.drop_index("idx_routes_vdom_type", table_name="routes")
+        op.drop_index("idx_routes_route_type", table_name="routes")
+    with op.batch_alter_table("routes") as batch:
+        batch.drop_constraint("routes_route_type_id_fkey", type_="foreignkey")
+        batch.drop_constraint("routes_nexthop_id_fkey", type_="foreignkey")
+        batch.alter_column("route_type", existing_type=sa.Text(), nullable=False)
+        batch.alter_column("exit_interface_name", existing_type=sa.Text(), nullable=False)
+        batch.drop_column("route_type_id")
+        batch.drop_column("nexthop_id")
+    if postgres:
+        op.create_index("idx_routes_vdom_type", "routes", ["vdom_id", "route_type"], postgresql_include=["route_id"])
+        op.create_index("idx_routes_route_type", "routes", ["route_type"])
+    op.drop_table("route_nexthops")
+    op.drop_table("route_types")
@@ -0,0 +1,213 @@
+"""History of interface status and per-VDOM counts
+
+Adds the history tables of app.history. On PostgreSQL the two raw tables
+are partitioned by month, with a default partition for rows written before
+`python -m app.cli history maintain` creates their month, and triggers on
+interfaces record status changes. The current status of every interface
+and the current counts of every VDOM are recorded as their first history.
+
+Revision ID: 0006_history
+Revises: 0005_route_dictionaries
+Create Date: 2025-07-27 12:00:00
+"""
+from datetime import date, datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_history"
+down_revision = "0005_route_dictionaries"
+branch_labels = None
+depends_on = None
+
+COUNT_COLUMNS = ["interfaces", "routes", "vips"]
+
+# The SQL below is frozen as of this revision; app.history and
+# app.models.history describe the schema at head
+
+# Raw history tables with their time column
+HISTORY_TABLES = {
+    "interface_status_history": "changed_at",
+    "vdom_count_history": "sampled_at",
+}
+# Month partitions created ahead of the current month
+MONTHS_AHEAD = 2
+
+INTERFACE_STATUS_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION record_interface_status() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO interface_status_latest AS l (firewall_id, interface_name, status, changed_at)
+  VALUES (NEW.firewall_id, NEW.interface_name, NEW.status, now())
+  ON CONFLICT (firewall_id, interface_name) DO UPDATE
+    SET status = EXCLUDED.status, changed_at = EXCLUDED.changed_at
+    WHERE l.status IS DISTINCT FROM EXCLUDED.status;
+  IF FOUND THEN
+    INSERT INTO interface_status_history (firewall_id, vdom_id, interface_id, interface_name, status, changed_at)
+    VALUES (NEW.firewall_id, NEW.vdom_id, NEW.interface_id, NEW.interface_name, NEW.status, now());
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+INTERFACE_STATUS_TRIGGERS_SQL = [
+    "CREATE TRIGGER trg_interfaces_status_insert AFTER INSERT ON interfaces "
+    "FOR EACH ROW EXECUTE FUNCTION record_interface_status()",
+    "CREATE TRIGGER trg_interfaces_status_update AFTER UPDATE OF status ON interfaces "
+    "FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status) EXECUTE FUNCTION record_interface_status()",
+]
+
+# The counts of every VDOM as their first sample
+RECORD_VDOM_COUNTS_SQL = """
+INSERT INTO vdom_counts_latest (vdom_id, firewall_id, interfaces, routes, vips, sampled_at)
+SELECT v.vdom_id, v.firewall_id, coalesce(i.n, 0), coalesce(r.n, 0), coalesce(x.n, 0), now()
+FROM vdoms v
+LEFT JOIN (SELECT vdom_id, count(*) AS n FROM interfaces GROUP BY vdom_id) i USING (vdom_id)
+LEFT JOIN (SELECT vdom_id, count(*) AS n FROM routes GROUP BY vdom_id) r USING (vdom_id)
+LEFT JOIN (SELECT vdom_id, count(*) AS n FROM vips GROUP BY vdom_id) x USING (vdom_id)
+"""
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+def _create_month_partitions() -> None:
+    # The tables are new, so their default partitions hold no rows to move
+    month = datetime.utcnow().date().replace(day=1)
+    for _ in range(MONTHS_AHEAD + 1):
+        for table in HISTORY_TABLES:
+            op.execute(
+                f"CREATE TABLE {table}_y{month:%Y}m{month:%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+            )
+        month = _next_month(month)
+
+def _history_id() -> sa.Column:
+    return sa.Column("history_id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False)
+
+def upgrade() -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+    op.create_table(
+        "interface_status_latest",
+        sa.Column("firewall_id", sa.Integer(), nullable=False),
+        sa.Column("interface_name", sa.Text(), nullable=False),
+        sa.Column("status", sa.Text(), nullable=True),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("firewall_id", "interface_name", name="interface_status_latest_pkey"),
+    )
+    op.create_table(
+        "interface_status_daily",
+        sa.Column("firewall_id", sa.Integer(), nullable=False),
+        sa.Column("interface_name", sa.Text(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("transitions", sa.Integer(), nullable=False),
+        sa.Column("downs", sa.Integer(), nullable=False),
+        sa.Column("last_status", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("firewall_id", "interface_name", "day", name="interface_status_daily_pkey"),
+    )
+    op.create_table(
+        "vdom_counts_latest",
+        sa.Column("vdom_id", sa.Integer(), nullable=False),
+        sa.Column("firewall_id", sa.Integer(), nullable=False),
+        *(sa.Column(column, sa.Integer(), nullable=False) for column in COUNT_COLUMNS),
+        sa.Column("sampled_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("vdom_id", name="vdom_counts_latest_pkey"),
+    )
+    op.create_table(
+        "vdom_count_daily",
+        sa.Column("vdom_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("firewall_id", sa.Integer(), nullable=False),
+        *(
+            sa.Column(f"{column}_{stat}", sa.Integer(), nullable=False)
+            for column in COUNT_COLUMNS for stat in ("min", "max", "last")
+        ),
+        sa.PrimaryKeyConstraint("vdom_id", "day", name="vdom_count_daily_pkey"),
+    )
+    op.create_table(
+        "history_rollups",
+        sa.Column("daily_table", sa.Text(), nullable=False),
+        sa.Column("rolled_through", sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint("daily_table", name="history_rollups_pkey"),
+    )
+
+    if postgres:
+        # The primary key of a partitioned table must include the partition key
+        op.execute(
+            "CREATE TABLE interface_status_history ("
+            "history_id bigserial NOT NULL, firewall_id integer NOT NULL, vdom_id integer, interface_id integer, "
+            "interface_name text NOT NULL, status text, changed_at timestamp NOT NULL, "
+            "CONSTRAINT interface_status_history_pkey PRIMARY KEY (history_id, changed_at)"
+            ") PARTITION BY RANGE (changed_at)"
+        )
+        op.execute(
+            "CREATE TABLE vdom_count_history ("
+            "history_id bigserial NOT NULL, vdom_id integer NOT NULL, firewall_id integer NOT NULL, "
+            "interfaces integer NOT NULL, routes integer NOT NULL, vips integer NOT NULL, sampled_at timestamp NOT NULL, "
+            "CONSTRAINT vdom_count_history_pkey PRIMARY KEY (history_id, sampled_at)"
+            ") PARTITION BY RANGE (sampled_at)"
+        )
+        for table in HISTORY_TABLES:
+            op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    else:
+        op.create_table(
+            "interface_status_history",
+            _history_id(),
+            sa.Column("firewall_id", sa.Integer(), nullable=False),
+            sa.Column("vdom_id", sa.Integer(), nullable=True),
+            sa.Column("interface_id", sa.Integer(), nullable=True),
+            sa.Column("interface_name", sa.Text(), nullable=False),
+            sa.Column("status", sa.Text(), nullable=True),
+            sa.Column("changed_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("history_id", name="interface_status_history_pkey"),
+        )
+        op.create_table(
+            "vdom_count_history",
+            _history_id(),
+            sa.Column("vdom_id", sa.Integer(), nullable=False),
+            sa.Column("firewall_id", sa.Integer(), nullable=False),
+            *(sa.Column(column, sa.Integer(), nullable=False) for column in COUNT_COLUMNS),
+            sa.Column("sampled_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("history_id", name="vdom_count_history_pkey"),
+        )
+    op.create_index(
+        "idx_interface_status_history_name", "interface_status_history", ["firewall_id", "interface_name", "changed_at"]
+    )
+    op.create_index("idx_vdom_count_history_vdom", "vdom_count_history", ["vdom_id", "sampled_at"])
+    if postgres:
+        # Rows arrive in time order, so a BRIN index covers time ranges in a few pages
+        op.create_index(
+            "idx_interface_status_history_changed_at", "interface_status_history", ["changed_at"], postgresql_using="brin"
+        )
+        op.create_index(
+            "idx_vdom_count_history_sampled_at", "vdom_count_history", ["sampled_at"], postgresql_using="brin"
+        )
+        _create_month_partitions()
+
+        op.execute(INTERFACE_STATUS_FUNCTION_SQL)
+        for trigger in INTERFACE_STATUS_TRIGGERS_SQL:
+            op.execute(trigger)
+        op.execute(
+            "INSERT INTO interface_status_latest (firewall_id, interface_name, status, changed_at) "
+            "SELECT DISTINCT ON (firewall_id, interface_name) firewall_id, interface_name, status, now() "
+            "FROM interfaces ORDER BY firewall_id, interface_name, interface_id"
+        )
+        op.execute(
+            "INSERT INTO interface_status_history (firewall_id, vdom_id, interface_id, interface_name, status, changed_at) "
+            "SELECT DISTINCT ON (firewall_id, interface_name) firewall_id, vdom_id, interface_id, interface_name, status, now() "
+            "FROM interfaces ORDER BY firewall_id, interface_name, interface_id"
+        )
+        op.execute(RECORD_VDOM_COUNTS_SQL)
+        op.execute(
+            "INSERT INTO vdom_count_history (vdom_id, firewall_id, interfaces, routes, vips, sampled_at) "
+            "SELECT vdom_id, firewall_id, interfaces, routes, vips, sampled_at FROM vdom_counts_latest"
+        )
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP TRIGGER IF EXISTS trg_interfaces_status_update ON interfaces")
+        op.execute("DROP TRIGGER IF EXISTS trg_interfaces_status_insert ON interfaces")
+        op.execute("DROP FUNCTION IF EXISTS record_interface_status()")
+    # Dropping a partitioned table drops its partitions
+    for table in ("history_rollups", "vdom_count_history", "vdom_count_daily", "vdom_counts_latest",
+                  "interface_status_history", "interface_status_daily", "interface_status_latest"):
+        op.drop_table(table)
@@ -0,0 +1,212 @@
+"""Versioned inventory tables for as-of queries
+
+Adds the generations table and, on every table of app.versioning,
+valid_from and generation_id plus a <table>_versions table for the rows'
+earlier versions. On PostgreSQL, triggers archive updated and deleted rows.
+The rows present now start at the time of the upgrade, in a first
+generation recorded as "migration".
+
+Revision ID: 0007_versioning
+Revises: 0006_history
+Create Date: 2025-08-10 12:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import INET
+
+revision = "0007_versioning"
+down_revision = "0006_history"
+branch_labels = None
+depends_on = None
+
+# The tables and SQL below are frozen as of this revision; app.models.generation
+# describes the schema at head
+
+# Versioned tables with their primary key column
+VERSIONED_TABLES = {
+    "firewalls": "firewall_id",
+    "vdoms": "vdom_id",
+    "interfaces": "interface_id",
+    "routes": "route_id",
+    "vips": "vip_id",
+    "ip_addresses": "ip_address_id",
+}
+
+# Columns of each table once valid_from and generation_id are added, which
+# its <table>_versions table copies without keys or defaults
+VERSION_COLUMNS = {
+    "firewalls": [
+        ("firewall_id", sa.Integer(), False),
+        ("fw_name", sa.Text(), False),
+        ("fw_ip", sa.Text(), False),
+        ("fmg_ip", sa.Text(), True),
+        ("faz_ip", sa.Text(), True),
+        ("site", sa.Text(), True),
+        ("last_updated", sa.DateTime(), True),
+        ("valid_from", sa.DateTime(), False),
+        ("generation_id", sa.Integer(), True),
+    ],
+    "vdoms": [
+        ("vdom_id", sa.Integer(), False),
+        ("firewall_id", sa.Integer(), False),
+        ("vdom_name", sa.Text(), False),
+        ("vdom_index", sa.Integer(), True),
+        ("last_updated", sa.DateTime(), True),
+        ("valid_from", sa.DateTime(), False),
+        ("generation_id", sa.Integer(), True),
+    ],
+    "interfaces": [
+        ("interface_id", sa.Integer(), False),
+        ("firewall_id", sa.Integer(), False),
+        ("vdom_id", sa.Integer(), True),
+        ("interface_name", sa.Text(), False),
+        ("ip_address", sa.Text(), True),
+        ("mask", sa.Text(), True),
+        ("type", sa.Text(), False),
+        ("vlan_id", sa.Integer(), True),
+        ("description", sa.Text(), True),
+        ("status", sa.Text(), True),
+        ("physical_interface_name", sa.Text(), True),
+        ("last_updated", sa.DateTime(), True),
+        ("valid_from", sa.DateTime(), False),
+        ("generation_id", sa.Integer(), True),
+    ],
+    "routes": [
+        ("route_id", sa.Integer(), False),
+        ("vdom_id", sa.Integer(), False),
+        ("firewall_id", sa.Integer(), False),
+        ("destination_network", sa.Text(), False),
+        ("mask_length", sa.Integer(), False),
+        ("route_type_id", sa.SmallInteger(), False),
+        ("nexthop_id", sa.Integer(), False),
+        ("last_updated", sa.DateTime(), True),
+        ("valid_from", sa.DateTime(), False),
+        ("generation_id", sa.Integer(), True),
+    ],
+    "vips": [
+        ("vip_id", sa.Integer(), False),
+        ("vdom_id", sa.Integer(), False),
+        ("external_ip", sa.Text(), False),
+        ("external_port", sa.Integer(), True),
+        ("mapped_ip", sa.Text(), False),
+        ("mapped_port", sa.Integer(), True),
+        ("vip_type", sa.Text(), True),
+        ("external_interface", sa.Text(), True),
+        ("mask", sa.Integer(), True),
+        ("last_updated", sa.DateTime(), True),
+        ("valid_from", sa.DateTime(), False),
+        ("generation_id", sa.Integer(), True),
+    ],
+    "ip_addresses": [
+        ("ip_address_id", sa.Integer(), False),
+        ("network", sa.Text().with_variant(INET(), "postgresql"), False),
+        ("source_type", sa.Text(), False),
+        ("source_id", sa.Integer(), False),
+        ("firewall_id", sa.Integer(), False),
+        ("vdom_id", sa.Integer(), True),
+        ("valid_from", sa.DateTime(), False),
+        ("generation_id", sa.Integer(), True),
+    ],
+}
+
+CURRENT_GENERATION_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION current_generation() RETURNS integer AS $$
+  SELECT pg_sequence_last_value('generations_generation_id_seq')::integer
+$$ LANGUAGE sql
+"""
+
+STAMP_VERSION_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION stamp_version() RETURNS trigger AS $$
+BEGIN
+  NEW.valid_from := now();
+  NEW.generation_id := current_generation();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def archive_function_sql(table: str) -> str:
+    columns = ", ".join(name for name, _, _ in VERSION_COLUMNS[table])
+    return f"""
+CREATE OR REPLACE FUNCTION archive_{table}() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO {table}_versions ({columns}, valid_to)
+  SELECT {columns}, now() FROM old_rows WHERE valid_from < now();
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def version_triggers_sql(table: str) -> list:
+    return [
+        f"ALTER TABLE {table} ALTER COLUMN generation_id SET DEFAULT current_generation()",
+        f"CREATE TRIGGER trg_{table}_stamp_version BEFORE UPDATE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION stamp_version()",
+        f"CREATE TRIGGER trg_{table}_archive_update AFTER UPDATE ON {table} "
+        f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION archive_{table}()",
+        f"CREATE TRIGGER trg_{table}_archive_delete AFTER DELETE ON {table} "
+        f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION archive_{table}()",
+    ]
+
+def upgrade() -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+    op.create_table(
+        "generations",
+        sa.Column("generation_id", sa.Integer(), nullable=False),
+        sa.Column("source", sa.Text(), nullable=False),
+        sa.Column("detail", sa.Text(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint("generation_id", name="generations_pkey"),
+    )
+    generation_id = op.get_bind().execute(sa.text(
+        "INSERT INTO generations (source, detail) VALUES ('migration', 'rows present before versioning') "
+        "RETURNING generation_id"
+    )).scalar()
+
+    for table in VERSIONED_TABLES:
+        # Constant defaults on PostgreSQL, so existing rows are not rewritten;
+        # SQLite cannot add a column defaulting to the time and copies the table
+        with op.batch_alter_table(table, recreate="auto" if postgres else "always") as batch:
+            batch.add_column(sa.Column("valid_from", sa.DateTime(), server_default=sa.func.now(), nullable=False))
+            batch.add_column(sa.Column("generation_id", sa.Integer(), server_default=str(generation_id), nullable=True))
+        if not postgres:
+            op.execute(f"UPDATE {table} SET generation_id = {generation_id}")
+
+        versions = f"{table}_versions"
+        op.create_table(
+            versions,
+            *(sa.Column(name, type_, nullable=nullable) for name, type_, nullable in VERSION_COLUMNS[table]),
+            sa.Column("valid_to", sa.DateTime(), nullable=False),
+        )
+        op.create_index(f"idx_{versions}_id", versions, [VERSIONED_TABLES[table]])
+        if postgres:
+            op.create_index(
+                f"idx_{versions}_validity", versions, [sa.text("tsrange(valid_from, valid_to)")],
+                postgresql_using="gist"
+            )
+        op.create_index(f"idx_{versions}_valid_to", versions, ["valid_to"], postgresql_using="brin")
+
+    if postgres:
+        op.execute(CURRENT_GENERATION_FUNCTION_SQL)
+        op.execute(STAMP_VERSION_FUNCTION_SQL)
+        for table in VERSIONED_TABLES:
+            op.execute(archive_function_sql(table))
+            # The first statement replaces the constant generation_id default
+            for statement in version_triggers_sql(table):
+                op.execute(statement)
+
+def downgrade() -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+    for table in VERSIONED_TABLES:
+        if postgres:
+            for trigger in ("stamp_version", "archive_update", "archive_delete"):
+                op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{trigger} ON {table}")
+            op.execute(f"DROP FUNCTION IF EXISTS archive_{table}()")
+        op.drop_table(f"{table}_versions")
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("generation_id")
+            batch.drop_column("valid_from")
+    if postgres:
+        op.execute("DROP FUNCTION IF EXISTS stamp_version()")
+        op.execute("DROP FUNCTION IF EXISTS current_generation()")
+    op.drop_table("generations")
@@ -0,0 +1,93 @@
+"""Firewall policies, address and service objects
+
+Adds the policies, addresses, address_groups, services and service_groups
+tables, all per VDOM and removed with it.
+
+Revision ID: 0008_policies
+Revises: 0007_versioning
+Create Date: 2025-08-24 12:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_policies"
+down_revision = "0007_versioning"
+branch_labels = None
+depends_on = None
+
+def _vdom_id() -> sa.Column:
+    return sa.Column("vdom_id", sa.Integer(), sa.ForeignKey("vdoms.vdom_id", ondelete="CASCADE"), nullable=False)
+
+def _last_updated() -> sa.Column:
+    return sa.Column("last_updated", sa.DateTime(), server_default=sa.func.now(), nullable=True)
+
+def upgrade() -> None:
+    op.create_table(
+        "addresses",
+        sa.Column("address_id", sa.Integer(), nullable=False),
+        _vdom_id(),
+        sa.Column("name", sa.Text(), nullable=False),
+        sa.Column("type", sa.Text(), server_default="ipmask", nullable=False),
+        sa.Column("subnet", sa.Text(), nullable=True),
+        sa.Column("start_ip", sa.Text(), nullable=True),
+        sa.Column("end_ip", sa.Text(), nullable=True),
+        sa.Column("fqdn", sa.Text(), nullable=True),
+        sa.Column("comment", sa.Text(), nullable=True),
+        _last_updated(),
+        sa.PrimaryKeyConstraint("address_id", name="addresses_pkey"),
+        sa.UniqueConstraint("vdom_id", "name", name="uq_addresses_vdom_name"),
+    )
+    for table in ("address_groups", "service_groups"):
+        op.create_table(
+            table,
+            sa.Column("group_id", sa.Integer(), nullable=False),
+            _vdom_id(),
+            sa.Column("name", sa.Text(), nullable=False),
+            sa.Column("members", sa.JSON(), nullable=False),
+            sa.Column("comment", sa.Text(), nullable=True),
+            _last_updated(),
+            sa.PrimaryKeyConstraint("group_id", name=f"{table}_pkey"),
+            sa.UniqueConstraint("vdom_id", "name", name=f"uq_{table}_vdom_name"),
+        )
+    op.create_table(
+        "services",
+        sa.Column("service_id", sa.Integer(), nullable=False),
+        _vdom_id(),
+        sa.Column("name", sa.Text(), nullable=False),
+        sa.Column("protocol", sa.Text(), server_default="TCP/UDP/SCTP", nullable=False),
+        sa.Column("protocol_number", sa.Integer(), nullable=True),
+        sa.Column("tcp_portrange", sa.Text(), nullable=True),
+        sa.Column("udp_portrange", sa.Text(), nullable=True),
+        sa.Column("sctp_portrange", sa.Text(), nullable=True),
+        sa.Column("comment", sa.Text(), nullable=True),
+        _last_updated(),
+        sa.PrimaryKeyConstraint("service_id", name="services_pkey"),
+        sa.UniqueConstraint("vdom_id", "name", name="uq_services_vdom_name"),
+    )
+    op.create_table(
+        "policies",
+        sa.Column("policy_id", sa.Integer(), nullable=False),
+        _vdom_id(),
+        sa.Column("policy_number", sa.Integer(), nullable=False),
+        sa.Column("sequence", sa.Integer(), nullable=False),
+        sa.Column("name", sa.Text(), nullable=True),
+        sa.Column("status", sa.Text(), server_default="enable", nullable=False),
+        sa.Column("action", sa.Text(), server_default="deny", nullable=False),
+        *(sa.Column(column, sa.JSON(), nullable=False) for column in ("srcintf", "dstintf", "srcaddr", "dstaddr", "service")),
+        *(
+            sa.Column(column, sa.Boolean(), server_default=sa.false(), nullable=False)
+            for column in ("srcaddr_negate", "dstaddr_negate", "service_negate")
+        ),
+        sa.Column("schedule", sa.Text(), nullable=True),
+        sa.Column("nat", sa.Boolean(), server_default=sa.false(), nullable=False),
+        sa.Column("comments", sa.Text(), nullable=True),
+        _last_updated(),
+        sa.PrimaryKeyConstraint("policy_id", name="policies_pkey"),
+        sa.UniqueConstraint("vdom_id", "policy_number", name="uq_policies_vdom_number"),
+    )
+    op.create_index("idx_policies_vdom_sequence", "policies", ["vdom_id", "sequence"])
+
+def downgrade() -> None:
+    op.drop_index("idx_policies_vdom_sequence", table_name="policies")
+    for table in ("policies", "services", "service_groups", "address_groups", "addresses"):
+        op.drop_table(table)
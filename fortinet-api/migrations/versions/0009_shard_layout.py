@@ -0,0 +1,30 @@
+"""Shard layout
+
+Adds the shard_layout table, which records the id ranges of the shards
+(see app.sharding). It stays empty until `python -m app.cli shards init`.
+
+Revision ID: 0009_shard_layout
+Revises: 0008_policies
+Create Date: 2025-09-07 12:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_shard_layout"
+down_revision = "0008_policies"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "shard_layout",
+        sa.Column("epoch", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("first_id", sa.BigInteger(), nullable=False),
+        sa.Column("span", sa.BigInteger(), nullable=False),
+        sa.Column("shard_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint("epoch", name="shard_layout_pkey"),
+    )
+
+def downgrade() -> None:
+    op.drop_table("shard_layout")
@@ -0,0 +1,41 @@
+"""SQLite tombstones
+
+Tombstones were recorded by PostgreSQL triggers only, so deletes on SQLite
+databases never reached the change feed. Adds per-table AFTER DELETE
+triggers on SQLite; PostgreSQL is unchanged.
+
+Revision ID: 0010_sqlite_tombstones
+Revises: 0009_shard_layout
+Create Date: 2025-09-14 12:00:00
+"""
+from alembic import op
+
+revision = "0010_sqlite_tombstones"
+down_revision = "0009_shard_layout"
+branch_labels = None
+depends_on = None
+
+# Table, primary key, firewall and VDOM of the deleted row, as of this revision
+TOMBSTONE_TABLES = (
+    ("firewalls", "firewall_id", "OLD.firewall_id", "NULL"),
+    ("vdoms", "vdom_id", "OLD.firewall_id", "OLD.vdom_id"),
+    ("interfaces", "interface_id", "OLD.firewall_id", "OLD.vdom_id"),
+    ("routes", "route_id", "OLD.firewall_id", "OLD.vdom_id"),
+    ("vips", "vip_id", "NULL", "OLD.vdom_id"),
+)
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table, id_column, firewall_id, vdom_id in TOMBSTONE_TABLES:
+        op.execute(
+            f"CREATE TRIGGER trg_{table}_tombstone AFTER DELETE ON {table} FOR EACH ROW BEGIN "
+            f"INSERT INTO tombstones (entity, entity_id, firewall_id, vdom_id, deleted_at) "
+            f"VALUES ('{table}', OLD.{id_column}, {firewall_id}, {vdom_id}, CURRENT_TIMESTAMP); END"
+        )
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table, *_ in TOMBSTONE_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_tombstone")
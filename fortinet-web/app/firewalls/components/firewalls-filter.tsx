@@ -19,7 +19,7 @@ import {
   PopoverTrigger,
 } from "@/components/ui/popover"
 import { useRouter, usePathname, useSearchParams } from "next/navigation"
-import { getFirewalls, getVdoms } from "@/services/api"
+import { getFacets, getFirewalls } from "@/services/api"
 import { Label } from "@/components/ui/label"
 
 interface FirewallsFilterProps {
@@ -40,24 +40,22 @@ export function FirewallsFilter({ initialFirewallName }: FirewallsFilterProps) {
     async function loadFirewallOptions() {
       setLoading(true);
       try {
-        const { items: firewalls } = await getFirewalls();
-const options = await Promise.all(firewalls.map(async (fw) => {
-  try {
-    const { items: vdoms } = await getVdoms({ fw_name: fw.fw_name });
-    return {
-      label: fw.fw_name,
-      value: fw.fw_name,
-      vdoms: vdoms.length > 0 ? vdoms.map(vdom => vdom.vdom_name) : ["No VDOMs found"]
-    };
-  } catch (error) {
-    console.error(`Failed to load vdoms for firewall ${fw.fw_name}:`, error);
-    return {
-      label: fw.fw_name,
-      value: fw.fw_name,
-      vdoms: ["No VDOMs found"]
-    };
-  }
-}));
+        // The VDOM names of every firewall come from one facet request
+        const [{ items: firewalls }, vdomFacets] = await Promise.all([
+          getFirewalls(),
+          getFacets("vdoms", ["fw_name,vdom_name"], { limit: "10000" }),
+        ]);
+        const vdomsByFirewall = new Map<string, string[]>();
+        for (const { fw_name, vdom_name } of vdomFacets.facets["fw_name,vdom_name"] || []) {
+          const names = vdomsByFirewall.get(String(fw_name)) || [];
+          names.push(String(vdom_name));
+          vdomsByFirewall.set(String(fw_name), names);
+        }
+        const options = firewalls.map((fw) => ({
+          label: fw.fw_name,
+          value: fw.fw_name,
+          vdoms: vdomsByFirewall.get(fw.fw_name) || ["No VDOMs found"]
+        }));
         setFirewallOptions(options);
       } catch (error) {
         console.error("Failed to load firewall options:", error);
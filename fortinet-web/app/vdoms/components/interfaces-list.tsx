@@ -1,7 +1,7 @@
 'use client';
 
 import { useState, useEffect } from 'react';
-import { getInterfaces } from '@/services/api';
+import { getVdomDetail } from '@/services/api';
 import { InterfaceResponse } from '@/types';
 import { ScrollArea } from '@/components/ui/scroll-area';
 import { TableCode } from '@/components/ui/table-code';
@@ -20,12 +20,9 @@ export function InterfacesList({ vdomId, vdomName }: InterfacesListProps) {
     const fetchInterfaces = async () => {
       try {
         setLoading(true);
-        // Request all interfaces for this VDOM without pagination limit
-        const { items: interfacesData } = await getInterfaces({
-          vdom_id: vdomId.toString(),
-          skip: '0',
-          limit: '10000'  // Set a very high limit to get all interfaces
-        });
+        // One detail request serves the interface, route and VIP lists of a VDOM
+        const detail = await getVdomDetail(vdomId);
+        const interfacesData = detail.interfaces?.items ?? [];
         setInterfaces(interfacesData);
       } catch (err) {
         console.error('Error loading interfaces:', err);
@@ -1,7 +1,7 @@
 'use client';
 
 import { useState, useEffect } from 'react';
-import { getRoutes } from '@/services/api';
+import { getVdomDetail } from '@/services/api';
 import { RouteResponse } from '@/types';
 import { TableCode } from '@/components/ui/table-code';
 
@@ -19,12 +19,9 @@ export function RoutesList({ vdomId, vdomName }: RoutesListProps) {
     const fetchRoutes = async () => {
       try {
         setLoading(true);
-        // Request all routes for this VDOM without pagination limit
-        const { items: routesData } = await getRoutes({
-          vdom_id: vdomId.toString(),
-          skip: '0',
-          limit: '10000'  // Set a very high limit to get all routes
-        });
+        // One detail request serves the interface, route and VIP lists of a VDOM
+        const detail = await getVdomDetail(vdomId);
+        const routesData = detail.routes?.items ?? [];
         setRoutes(routesData);
       } catch (err) {
         console.error('Error loading routes:', err);
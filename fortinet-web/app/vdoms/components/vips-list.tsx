@@ -1,7 +1,7 @@
 'use client';
 
 import { useState, useEffect } from 'react';
-import { getVips } from '@/services/api';
+import { getVdomDetail } from '@/services/api';
 import { VIPResponse } from '@/types';
 import { TableCode } from '@/components/ui/table-code';
 
@@ -19,12 +19,9 @@ export function VipsList({ vdomId, vdomName }: VipsListProps) {
     const fetchVips = async () => {
       try {
         setLoading(true);
-        // Request all VIPs for this VDOM without pagination limit
-        const { items: vipsData } = await getVips({
-          vdom_id: vdomId.toString(),
-          skip: '0',
-          limit: '10000'  // Set a very high limit to get all VIPs
-        });
+        // One detail request serves the interface, route and VIP lists of a VDOM
+        const detail = await getVdomDetail(vdomId);
+        const vipsData = detail.vips?.items ?? [];
         setVips(vipsData);
       } catch (err) {
         console.error('Error loading VIPs:', err);
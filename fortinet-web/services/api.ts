@@ -1,4 +1,4 @@
-import { FirewallResponse, VDOMResponse, InterfaceResponse, RouteResponse, VIPResponse } from '../types';
+import { FirewallResponse, VDOMResponse, VDOMDetailResponse, InterfaceResponse, RouteResponse, VIPResponse, FacetResponse } from '../types';
 import { apiRateLimiter, searchRateLimiter } from '@/lib/rate-limiter';
 
 
@@ -74,6 +74,34 @@ export async function getVdoms(params?: Record<string, string>): Promise<{ items
   }
 }
 
+// In-flight and recent detail requests per VDOM, so the interface, route and
+// VIP lists of one VDOM share a single request
+const vdomDetailRequests = new Map<number, { promise: Promise<VDOMDetailResponse>, at: number }>();
+const VDOM_DETAIL_REUSE_MS = 30000;
+
+export async function getVdomDetail(vdomId: number): Promise<VDOMDetailResponse> {
+  const cached = vdomDetailRequests.get(vdomId);
+  if (cached && Date.now() - cached.at < VDOM_DETAIL_REUSE_MS) {
+    return cached.promise;
+  }
+  const apiBaseUrl = getApiBaseUrl();
+  const promise = rateLimitedFetch(`${apiBaseUrl}/vdoms/${vdomId}/detail`).then(response => response.json());
+  vdomDetailRequests.set(vdomId, { promise, at: Date.now() });
+  // Failed requests are retried by the next caller
+  promise.catch(() => vdomDetailRequests.delete(vdomId));
+  return promise;
+}
+
+// Distinct values and counts; each groupBy entry is one facet, with columns joined by commas
+export async function getFacets(entity: string, groupBy: string[], params?: Record<string, string>): Promise<FacetResponse> {
+  const queryParams = new URLSearchParams(params || {});
+  queryParams.set('entity', entity);
+  groupBy.forEach(facet => queryParams.append('group_by', facet));
+  const apiBaseUrl = getApiBaseUrl();
+  const response = await rateLimitedFetch(`${apiBaseUrl}/facets/?${queryParams.toString()}`);
+  return response.json();
+}
+
 export async function getInterfaces(params?: Record<string, string>): Promise<{ items: InterfaceResponse[], total_count: number }> {
   const queryParams = params ? new URLSearchParams(params).toString() : '';
   const apiBaseUrl = getApiBaseUrl();
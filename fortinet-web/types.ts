@@ -68,6 +68,21 @@ export interface VIPResponse {
   vdom?: VDOMResponse | null;
 }
 
+export interface VDOMDetailResponse {
+  vdom: VDOMResponse;
+  // Items leave out their VDOM, given once in vdom
+  interfaces?: { items: InterfaceResponse[]; total_count: number } | null;
+  routes?: { items: RouteResponse[]; total_count: number } | null;
+  vips?: { items: VIPResponse[]; total_count: number } | null;
+}
+
+export interface FacetResponse {
+  entity: string;
+  total: number;
+  // Per group_by value: the column values and their count, largest count first
+  facets: Record<string, Array<Record<string, string | number | null> & { count: number }>>;
+}
+
 export interface SearchIPResult {
   interfaces: InterfaceResponse[];
   routes: RouteResponse[];
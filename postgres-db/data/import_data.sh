@@ -12,6 +12,7 @@ set -e  # Exit on any error
 
 # Configuration
 DB_CONTAINER="fortinet-supabase-db"
+API_CONTAINER="fortinet-api-1"
 DB_NAME="postgres"
 DB_USER="postgres"
 DB_PASSWORD="your_password_here"
@@ -176,11 +177,12 @@ backup_existing_data() {
     local existing_tables=$(docker exec "$DB_CONTAINER" psql -U "$DB_USER" -d "$DB_NAME" -t -c "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'public' AND table_name IN ('firewalls', 'vdoms', 'interfaces', 'routes', 'vips');" 2>/dev/null | tr -d ' ')
     
     if [ "$existing_tables" -gt 0 ]; then
-        log_warning "Existing tables found. Creating backup..."
-        local backup_file="/tmp/fortinet_backup_$(date +%Y%m%d_%H%M%S).sql"
+        log_warning "Existing tables found. Creating snapshot..."
         
-        if docker exec "$DB_CONTAINER" pg_dump -U "$DB_USER" -d "$DB_NAME" --schema=public > "$backup_file"; then
-            log_success "Backup created: $backup_file"
+        # Compressed and deduplicated against earlier snapshots; restore with
+        # docker exec $API_CONTAINER python -m app.cli snapshot restore <id>
+        if docker exec "$API_CONTAINER" python -m app.cli snapshot create --label before-import; then
+            log_success "Snapshot created (list them with: python -m app.cli snapshot list)"
         else
             log_warning "Backup creation failed, continuing anyway..."
         fi
@@ -205,67 +207,27 @@ main() {
     # Step 2: Backup existing data
     backup_existing_data
     
-    # Step 3: Create schema
+    # Step 3: Create schema (the importer also needs ip_addresses and tombstones)
     log "Creating database schema..."
-    if execute_sql "import_schema.sql" "Schema creation"; then
+    execute_sql_command "DROP TABLE IF EXISTS alembic_version, shard_layout, policies, addresses, address_groups, services, service_groups, ip_addresses, tombstones, vips, routes, route_nexthops, route_types, interfaces, vdoms, firewalls CASCADE;" "Dropping existing tables"
+    if execute_sql "schema.sql" "Schema creation"; then
         log_success "Database schema created successfully"
     else
         log_error "Schema creation failed"
         exit 1
     fi
     
-    # Step 4: Import data in dependency order
+    # Step 4: Stream the dumps through the API importer
+    # It normalizes values in flight ('None', 'n/a', malformed IPs), loads each
+    # table with COPY in dependency order, rebuilds the deferred indexes and the
+    # IP search index, and prints a validation report
     echo ""
-    log "Starting data import in dependency order..."
-    echo ""
-    
-    # Import firewalls (no dependencies)
-    log "Phase 1: Importing firewalls (parent table)"
-    if execute_sql "firewalls_rows.sql" "Firewalls import"; then
-        local count=$(get_record_count "firewalls")
-        log_success "Firewalls imported: $count records"
-    else
-        log_error "Firewalls import failed"
-        exit 1
-    fi
-    
-    # Import vdoms (depends on firewalls)
-    log "Phase 2: Importing VDOMs (depends on firewalls)"
-    if execute_sql "vdoms_rows.sql" "VDOMs import"; then
-        local count=$(get_record_count "vdoms")
-        log_success "VDOMs imported: $count records"
-    else
-        log_error "VDOMs import failed"
-        exit 1
-    fi
-    
-    # Import interfaces (depends on firewalls and vdoms)
-    log "Phase 3: Importing interfaces (depends on firewalls + vdoms)"
-    if execute_sql "interfaces_rows.sql" "Interfaces import"; then
-        local count=$(get_record_count "interfaces")
-        log_success "Interfaces imported: $count records"
+    log "Importing data through $API_CONTAINER..."
+    if cat firewalls_rows.sql vdoms_rows.sql interfaces_rows.sql routes_rows.sql vips_rows.sql | \
+        docker exec -i "$API_CONTAINER" python -m app.cli import --replace --format sql -; then
+        log_success "Data import completed"
     else
-        log_error "Interfaces import failed"
-        exit 1
-    fi
-    
-    # Import routes (depends on vdoms)
-    log "Phase 4: Importing routes (depends on vdoms)"
-    if execute_sql "routes_rows.sql" "Routes import"; then
-        local count=$(get_record_count "routes")
-        log_success "Routes imported: $count records"
-    else
-        log_error "Routes import failed"
-        exit 1
-    fi
-    
-    # Import vips (depends on vdoms)
-    log "Phase 5: Importing VIPs (depends on vdoms)"
-    if execute_sql "vips_rows.sql" "VIPs import"; then
-        local count=$(get_record_count "vips")
-        log_success "VIPs imported: $count records"
-    else
-        log_error "VIPs import failed"
+        log_error "Data import failed; see the report above"
         exit 1
     fi
     
@@ -273,11 +235,7 @@ main() {
     echo ""
     verify_import
     
-    # Step 6: Update statistics
-    log "Updating database statistics..."
-    execute_sql_command "ANALYZE;" "Database statistics update"
-    
-    # Step 7: Final success message
+    # Step 6: Final success message
     echo ""
     echo "=============================================="
     log_success "DATABASE IMPORT COMPLETED SUCCESSFULLY!"
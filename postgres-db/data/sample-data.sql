@@ -22,13 +22,24 @@ INSERT INTO interfaces (firewall_id, vdom_id, interface_name, ip_address, type,
 (2, 3, 'port1', '192.168.2.1', 'physical', 'up'),
 (3, 4, 'port1', '192.168.3.1', 'physical', 'down');
 
--- Insert routes (depends on VDOMs)
-INSERT INTO routes (vdom_id, destination_network, mask_length, route_type, gateway, exit_interface_name) VALUES
-(1, '0.0.0.0', 0, 'static', '192.168.1.254', 'port1'),
-(1, '10.0.0.0', 8, 'static', '10.0.1.254', 'port2'),
-(2, '172.16.0.0', 12, 'static', '172.16.1.254', 'port3'),
-(3, '0.0.0.0', 0, 'static', '192.168.2.254', 'port1'),
-(4, '192.168.0.0', 16, 'static', '192.168.3.254', 'port1');
+-- Insert route lookup values (no dependencies)
+INSERT INTO route_types (route_type) VALUES
+('static');
+
+INSERT INTO route_nexthops (gateway, exit_interface_name) VALUES
+('192.168.1.254', 'port1'),
+('10.0.1.254', 'port2'),
+('172.16.1.254', 'port3'),
+('192.168.2.254', 'port1'),
+('192.168.3.254', 'port1');
+
+-- Insert routes (depends on VDOMs and the route lookups)
+INSERT INTO routes (vdom_id, firewall_id, destination_network, mask_length, route_type_id, nexthop_id) VALUES
+(1, 1, '0.0.0.0', 0, 1, 1),
+(1, 1, '10.0.0.0', 8, 1, 2),
+(2, 1, '172.16.0.0', 12, 1, 3),
+(3, 2, '0.0.0.0', 0, 1, 4),
+(4, 3, '192.168.0.0', 16, 1, 5);
 
 -- Insert VIPs (depends on VDOMs)
 INSERT INTO vips (vdom_id, external_ip, external_port, mapped_ip, mapped_port, vip_type) VALUES
@@ -1,5 +1,23 @@
 -- Database schema for Fortinet Network Collector
 -- Contains table definitions, constraints, and indexes only (no data)
+-- Matches the newest Alembic migration (fortinet-api/migrations) and is stamped
+-- with its revision; change the schema with a migration and keep this file in step
+
+create extension IF not exists pg_trgm;
+
+-- 0. generations (loads of the inventory; rows carry the one that wrote them, see app/versioning.py)
+create table public.generations (
+  generation_id serial not null,
+  source text not null,
+  detail text null,
+  started_at timestamp without time zone not null default CURRENT_TIMESTAMP,
+  constraint generations_pkey primary key (generation_id)
+) TABLESPACE pg_default;
+
+-- The latest generation; the default of every generation_id column
+create or replace function public.current_generation() returns integer as $$
+  select pg_sequence_last_value('public.generations_generation_id_seq')::integer
+$$ language sql;
 
 -- 1. firewalls (no dependencies)
 create table public.firewalls (
@@ -10,12 +28,14 @@ create table public.firewalls (
   faz_ip text null,
   site text null,
   last_updated timestamp without time zone null default CURRENT_TIMESTAMP,
+  valid_from timestamp without time zone not null default now(),
+  generation_id integer null default public.current_generation(),
   constraint firewalls_pkey primary key (firewall_id),
   constraint uq_fw_name unique (fw_name),
   constraint uq_fw_ip unique (fw_ip)
 ) TABLESPACE pg_default;
 
-create index IF not exists idx_firewalls_fw_name on public.firewalls using btree (fw_name) TABLESPACE pg_default;
+create index IF not exists idx_firewalls_last_updated on public.firewalls using btree (last_updated) TABLESPACE pg_default;
 
 -- 2. vdoms (depends on firewalls)
 create table public.vdoms (
@@ -24,12 +44,16 @@ create table public.vdoms (
   vdom_name text not null,
   vdom_index integer null,
   last_updated timestamp without time zone null default CURRENT_TIMESTAMP,
+  valid_from timestamp without time zone not null default now(),
+  generation_id integer null default public.current_generation(),
   constraint vdoms_pkey primary key (vdom_id),
   constraint uq_firewall_vdom unique (firewall_id, vdom_name),
+  constraint uq_vdoms_vdom_firewall unique (vdom_id, firewall_id),
   constraint vdoms_firewall_id_fkey foreign KEY (firewall_id) references firewalls (firewall_id) on delete CASCADE
 ) TABLESPACE pg_default;
 
-create index IF not exists idx_vdoms_firewall_id on public.vdoms using btree (firewall_id) TABLESPACE pg_default;
+create index IF not exists idx_vdoms_vdom_name_trgm on public.vdoms using gin (vdom_name gin_trgm_ops) TABLESPACE pg_default;
+create index IF not exists idx_vdoms_last_updated on public.vdoms using btree (last_updated) TABLESPACE pg_default;
 
 -- 3. interfaces (depends on vdoms)
 create table public.interfaces (
@@ -45,33 +69,59 @@ create table public.interfaces (
   status text null,
   physical_interface_name text null,
   last_updated timestamp without time zone null default CURRENT_TIMESTAMP,
+  valid_from timestamp without time zone not null default now(),
+  generation_id integer null default public.current_generation(),
   constraint interfaces_pkey primary key (interface_id),
   constraint uq_firewall_vdom_interface unique (firewall_id, vdom_id, interface_name),
   constraint interfaces_firewall_id_fkey foreign KEY (firewall_id) references firewalls (firewall_id) on delete CASCADE,
   constraint interfaces_vdom_id_fkey foreign KEY (vdom_id) references vdoms (vdom_id) on delete CASCADE
 ) TABLESPACE pg_default;
 
-create index IF not exists idx_interfaces_firewall_id on public.interfaces using btree (firewall_id) TABLESPACE pg_default;
-create index IF not exists idx_interfaces_vdom_id on public.interfaces using btree (vdom_id) TABLESPACE pg_default;
+create index IF not exists idx_interfaces_vdom_name on public.interfaces using btree (vdom_id, interface_name) INCLUDE (interface_id) TABLESPACE pg_default;
+create index IF not exists idx_interfaces_name_trgm on public.interfaces using gin (interface_name gin_trgm_ops) TABLESPACE pg_default;
+create index IF not exists idx_interfaces_last_updated on public.interfaces using btree (last_updated) TABLESPACE pg_default;
+
+-- 4. route_types and route_nexthops (no dependencies; lookup tables for the
+-- dictionary-encoded columns of routes)
+create table public.route_types (
+  route_type_id smallserial not null,
+  route_type text not null,
+  constraint route_types_pkey primary key (route_type_id),
+  constraint uq_route_types_route_type unique (route_type)
+) TABLESPACE pg_default;
+
+create table public.route_nexthops (
+  nexthop_id serial not null,
+  gateway text null,
+  exit_interface_name text not null,
+  exit_interface_details text null,
+  constraint route_nexthops_pkey primary key (nexthop_id),
+  constraint uq_route_nexthops unique nulls not distinct (gateway, exit_interface_name, exit_interface_details)
+) TABLESPACE pg_default;
 
--- 4. routes (depends on vdoms)
+-- 5. routes (depends on vdoms and the lookups; firewall_id is a copy of the VDOM's, for partitioning)
 create table public.routes (
   route_id serial not null,
   vdom_id integer not null,
+  firewall_id integer not null,
   destination_network text not null,
   mask_length integer not null,
-  route_type text not null,
-  gateway text null,
-  exit_interface_name text not null,
-  exit_interface_details text null,
+  route_type_id smallint not null,
+  nexthop_id integer not null,
   last_updated timestamp without time zone null default CURRENT_TIMESTAMP,
+  valid_from timestamp without time zone not null default now(),
+  generation_id integer null default public.current_generation(),
   constraint routes_pkey primary key (route_id),
-  constraint routes_vdom_id_fkey foreign KEY (vdom_id) references vdoms (vdom_id) on delete CASCADE
+  constraint fk_routes_vdom_firewall foreign KEY (vdom_id, firewall_id) references vdoms (vdom_id, firewall_id) on update CASCADE on delete CASCADE,
+  constraint routes_route_type_id_fkey foreign KEY (route_type_id) references route_types (route_type_id),
+  constraint routes_nexthop_id_fkey foreign KEY (nexthop_id) references route_nexthops (nexthop_id)
 ) TABLESPACE pg_default;
 
-create index IF not exists idx_routes_vdom_id on public.routes using btree (vdom_id) TABLESPACE pg_default;
+create index IF not exists idx_routes_vdom_type on public.routes using btree (vdom_id, route_type_id) INCLUDE (route_id) TABLESPACE pg_default;
+create index IF not exists idx_routes_route_type on public.routes using btree (route_type_id) TABLESPACE pg_default;
+create index IF not exists idx_routes_last_updated on public.routes using btree (last_updated) TABLESPACE pg_default;
 
--- 5. vips (depends on vdoms)
+-- 6. vips (depends on vdoms)
 create table public.vips (
   vip_id serial not null,
   vdom_id integer not null,
@@ -83,8 +133,460 @@ create table public.vips (
   external_interface text null,
   mask integer null,
   last_updated timestamp without time zone null default CURRENT_TIMESTAMP,
+  valid_from timestamp without time zone not null default now(),
+  generation_id integer null default public.current_generation(),
   constraint vips_pkey primary key (vip_id),
   constraint vips_vdom_id_fkey foreign KEY (vdom_id) references vdoms (vdom_id) on delete CASCADE
 ) TABLESPACE pg_default;
 
-create index IF not exists idx_vips_vdom_id on public.vips using btree (vdom_id) TABLESPACE pg_default;
\ No newline at end of file
+create index IF not exists idx_vips_vdom_external_ip on public.vips using btree (vdom_id, external_ip) INCLUDE (vip_id) TABLESPACE pg_default;
+create index IF not exists idx_vips_external_ip_port on public.vips using btree (external_ip, external_port) TABLESPACE pg_default;
+create index IF not exists idx_vips_mapped_ip_port on public.vips using btree (mapped_ip, mapped_port) TABLESPACE pg_default;
+create index IF not exists idx_vips_last_updated on public.vips using btree (last_updated) TABLESPACE pg_default;
+
+-- 7. ip_addresses (normalized search index over interfaces, routes and vips)
+-- Maintained by the API write paths; rebuild with: python -m app.cli rebuild-ip-index
+create table public.ip_addresses (
+  ip_address_id serial not null,
+  network inet not null,
+  source_type text not null,
+  source_id integer not null,
+  firewall_id integer not null,
+  vdom_id integer null,
+  valid_from timestamp without time zone not null default now(),
+  generation_id integer null default public.current_generation(),
+  constraint ip_addresses_pkey primary key (ip_address_id),
+  constraint ip_addresses_firewall_id_fkey foreign KEY (firewall_id) references firewalls (firewall_id) on delete CASCADE,
+  constraint ip_addresses_vdom_id_fkey foreign KEY (vdom_id) references vdoms (vdom_id) on delete CASCADE
+) TABLESPACE pg_default;
+
+create index IF not exists idx_ip_addresses_network on public.ip_addresses using gist (network inet_ops) TABLESPACE pg_default;
+create index IF not exists idx_ip_addresses_source on public.ip_addresses using btree (source_type, source_id) TABLESPACE pg_default;
+
+-- 8. tombstones (change feed record of deleted rows, including cascades)
+create table public.tombstones (
+  tombstone_id serial not null,
+  entity text not null,
+  entity_id integer not null,
+  firewall_id integer null,
+  vdom_id integer null,
+  deleted_at timestamp without time zone not null default CURRENT_TIMESTAMP,
+  constraint tombstones_pkey primary key (tombstone_id)
+) TABLESPACE pg_default;
+
+create index IF not exists idx_tombstones_deleted_at on public.tombstones using btree (deleted_at) TABLESPACE pg_default;
+
+create or replace function public.record_tombstone() returns trigger as $$
+declare
+  old_row jsonb := to_jsonb(OLD);
+begin
+  insert into public.tombstones (entity, entity_id, firewall_id, vdom_id, deleted_at)
+  values (
+    TG_TABLE_NAME,
+    (old_row ->> TG_ARGV[0])::integer,
+    (old_row ->> 'firewall_id')::integer,
+    (old_row ->> 'vdom_id')::integer,
+    now()
+  );
+  return OLD;
+end;
+$$ language plpgsql;
+
+create trigger trg_firewalls_tombstone after delete on public.firewalls for each row execute function public.record_tombstone('firewall_id');
+create trigger trg_vdoms_tombstone after delete on public.vdoms for each row execute function public.record_tombstone('vdom_id');
+create trigger trg_interfaces_tombstone after delete on public.interfaces for each row execute function public.record_tombstone('interface_id');
+create trigger trg_routes_tombstone after delete on public.routes for each row execute function public.record_tombstone('route_id');
+create trigger trg_vips_tombstone after delete on public.vips for each row execute function public.record_tombstone('vip_id');
+
+-- 9. history of interface status and per-VDOM counts (see app/history.py)
+-- Month partitions are created by: python -m app.cli history maintain
+create table public.interface_status_latest (
+  firewall_id integer not null,
+  interface_name text not null,
+  status text null,
+  changed_at timestamp without time zone not null,
+  constraint interface_status_latest_pkey primary key (firewall_id, interface_name)
+) TABLESPACE pg_default;
+
+create table public.interface_status_history (
+  history_id bigserial not null,
+  firewall_id integer not null,
+  vdom_id integer null,
+  interface_id integer null,
+  interface_name text not null,
+  status text null,
+  changed_at timestamp without time zone not null,
+  constraint interface_status_history_pkey primary key (history_id, changed_at)
+) partition by range (changed_at);
+
+create table public.interface_status_history_default partition of public.interface_status_history default;
+
+create index IF not exists idx_interface_status_history_name on public.interface_status_history using btree (firewall_id, interface_name, changed_at);
+create index IF not exists idx_interface_status_history_changed_at on public.interface_status_history using brin (changed_at);
+
+create table public.interface_status_daily (
+  firewall_id integer not null,
+  interface_name text not null,
+  day date not null,
+  transitions integer not null,
+  downs integer not null,
+  last_status text null,
+  constraint interface_status_daily_pkey primary key (firewall_id, interface_name, day)
+) TABLESPACE pg_default;
+
+create table public.vdom_counts_latest (
+  vdom_id integer not null,
+  firewall_id integer not null,
+  interfaces integer not null,
+  routes integer not null,
+  vips integer not null,
+  sampled_at timestamp without time zone not null,
+  constraint vdom_counts_latest_pkey primary key (vdom_id)
+) TABLESPACE pg_default;
+
+create table public.vdom_count_history (
+  history_id bigserial not null,
+  vdom_id integer not null,
+  firewall_id integer not null,
+  interfaces integer not null,
+  routes integer not null,
+  vips integer not null,
+  sampled_at timestamp without time zone not null,
+  constraint vdom_count_history_pkey primary key (history_id, sampled_at)
+) partition by range (sampled_at);
+
+create table public.vdom_count_history_default partition of public.vdom_count_history default;
+
+create index IF not exists idx_vdom_count_history_vdom on public.vdom_count_history using btree (vdom_id, sampled_at);
+create index IF not exists idx_vdom_count_history_sampled_at on public.vdom_count_history using brin (sampled_at);
+
+create table public.vdom_count_daily (
+  vdom_id integer not null,
+  day date not null,
+  firewall_id integer not null,
+  interfaces_min integer not null,
+  interfaces_max integer not null,
+  interfaces_last integer not null,
+  routes_min integer not null,
+  routes_max integer not null,
+  routes_last integer not null,
+  vips_min integer not null,
+  vips_max integer not null,
+  vips_last integer not null,
+  constraint vdom_count_daily_pkey primary key (vdom_id, day)
+) TABLESPACE pg_default;
+
+create table public.history_rollups (
+  daily_table text not null,
+  rolled_through date not null,
+  constraint history_rollups_pkey primary key (daily_table)
+) TABLESPACE pg_default;
+
+create or replace function public.record_interface_status() returns trigger as $$
+begin
+  insert into public.interface_status_latest as l (firewall_id, interface_name, status, changed_at)
+  values (NEW.firewall_id, NEW.interface_name, NEW.status, now())
+  on conflict (firewall_id, interface_name) do update
+    set status = EXCLUDED.status, changed_at = EXCLUDED.changed_at
+    where l.status is distinct from EXCLUDED.status;
+  if found then
+    insert into public.interface_status_history (firewall_id, vdom_id, interface_id, interface_name, status, changed_at)
+    values (NEW.firewall_id, NEW.vdom_id, NEW.interface_id, NEW.interface_name, NEW.status, now());
+  end if;
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_interfaces_status_insert after insert on public.interfaces for each row execute function public.record_interface_status();
+create trigger trg_interfaces_status_update after update of status on public.interfaces for each row when (OLD.status is distinct from NEW.status) execute function public.record_interface_status();
+
+-- 10. versions of the inventory rows for as-of queries (see app/versioning.py)
+-- Thinned by: python -m app.cli versions compact
+create table public.firewalls_versions (
+  firewall_id integer not null,
+  fw_name text not null,
+  fw_ip text not null,
+  fmg_ip text null,
+  faz_ip text null,
+  site text null,
+  last_updated timestamp without time zone null,
+  valid_from timestamp without time zone not null,
+  generation_id integer null,
+  valid_to timestamp without time zone not null
+) TABLESPACE pg_default;
+
+create index IF not exists idx_firewalls_versions_id on public.firewalls_versions using btree (firewall_id) TABLESPACE pg_default;
+create index IF not exists idx_firewalls_versions_validity on public.firewalls_versions using gist (tsrange(valid_from, valid_to)) TABLESPACE pg_default;
+create index IF not exists idx_firewalls_versions_valid_to on public.firewalls_versions using brin (valid_to) TABLESPACE pg_default;
+
+create table public.vdoms_versions (
+  vdom_id integer not null,
+  firewall_id integer not null,
+  vdom_name text not null,
+  vdom_index integer null,
+  last_updated timestamp without time zone null,
+  valid_from timestamp without time zone not null,
+  generation_id integer null,
+  valid_to timestamp without time zone not null
+) TABLESPACE pg_default;
+
+create index IF not exists idx_vdoms_versions_id on public.vdoms_versions using btree (vdom_id) TABLESPACE pg_default;
+create index IF not exists idx_vdoms_versions_validity on public.vdoms_versions using gist (tsrange(valid_from, valid_to)) TABLESPACE pg_default;
+create index IF not exists idx_vdoms_versions_valid_to on public.vdoms_versions using brin (valid_to) TABLESPACE pg_default;
+
+create table public.interfaces_versions (
+  interface_id integer not null,
+  firewall_id integer not null,
+  vdom_id integer null,
+  interface_name text not null,
+  ip_address text null,
+  mask text null,
+  type text not null,
+  vlan_id integer null,
+  description text null,
+  status text null,
+  physical_interface_name text null,
+  last_updated timestamp without time zone null,
+  valid_from timestamp without time zone not null,
+  generation_id integer null,
+  valid_to timestamp without time zone not null
+) TABLESPACE pg_default;
+
+create index IF not exists idx_interfaces_versions_id on public.interfaces_versions using btree (interface_id) TABLESPACE pg_default;
+create index IF not exists idx_interfaces_versions_validity on public.interfaces_versions using gist (tsrange(valid_from, valid_to)) TABLESPACE pg_default;
+create index IF not exists idx_interfaces_versions_valid_to on public.interfaces_versions using brin (valid_to) TABLESPACE pg_default;
+
+create table public.routes_versions (
+  route_id integer not null,
+  vdom_id integer not null,
+  firewall_id integer not null,
+  destination_network text not null,
+  mask_length integer not null,
+  route_type_id smallint not null,
+  nexthop_id integer not null,
+  last_updated timestamp without time zone null,
+  valid_from timestamp without time zone not null,
+  generation_id integer null,
+  valid_to timestamp without time zone not null
+) TABLESPACE pg_default;
+
+create index IF not exists idx_routes_versions_id on public.routes_versions using btree (route_id) TABLESPACE pg_default;
+create index IF not exists idx_routes_versions_validity on public.routes_versions using gist (tsrange(valid_from, valid_to)) TABLESPACE pg_default;
+create index IF not exists idx_routes_versions_valid_to on public.routes_versions using brin (valid_to) TABLESPACE pg_default;
+
+create table public.vips_versions (
+  vip_id integer not null,
+  vdom_id integer not null,
+  external_ip text not null,
+  external_port integer null,
+  mapped_ip text not null,
+  mapped_port integer null,
+  vip_type text null,
+  external_interface text null,
+  mask integer null,
+  last_updated timestamp without time zone null,
+  valid_from timestamp without time zone not null,
+  generation_id integer null,
+  valid_to timestamp without time zone not null
+) TABLESPACE pg_default;
+
+create index IF not exists idx_vips_versions_id on public.vips_versions using btree (vip_id) TABLESPACE pg_default;
+create index IF not exists idx_vips_versions_validity on public.vips_versions using gist (tsrange(valid_from, valid_to)) TABLESPACE pg_default;
+create index IF not exists idx_vips_versions_valid_to on public.vips_versions using brin (valid_to) TABLESPACE pg_default;
+
+create table public.ip_addresses_versions (
+  ip_address_id integer not null,
+  network inet not null,
+  source_type text not null,
+  source_id integer not null,
+  firewall_id integer not null,
+  vdom_id integer null,
+  valid_from timestamp without time zone not null,
+  generation_id integer null,
+  valid_to timestamp without time zone not null
+) TABLESPACE pg_default;
+
+create index IF not exists idx_ip_addresses_versions_id on public.ip_addresses_versions using btree (ip_address_id) TABLESPACE pg_default;
+create index IF not exists idx_ip_addresses_versions_validity on public.ip_addresses_versions using gist (tsrange(valid_from, valid_to)) TABLESPACE pg_default;
+create index IF not exists idx_ip_addresses_versions_valid_to on public.ip_addresses_versions using brin (valid_to) TABLESPACE pg_default;
+
+create or replace function public.stamp_version() returns trigger as $$
+begin
+  NEW.valid_from := now();
+  NEW.generation_id := public.current_generation();
+  return NEW;
+end;
+$$ language plpgsql;
+
+create or replace function public.archive_firewalls() returns trigger as $$
+begin
+  insert into public.firewalls_versions (firewall_id, fw_name, fw_ip, fmg_ip, faz_ip, site, last_updated, valid_from, generation_id, valid_to)
+  select firewall_id, fw_name, fw_ip, fmg_ip, faz_ip, site, last_updated, valid_from, generation_id, now() from old_rows where valid_from < now();
+  return null;
+end;
+$$ language plpgsql;
+
+create or replace function public.archive_vdoms() returns trigger as $$
+begin
+  insert into public.vdoms_versions (vdom_id, firewall_id, vdom_name, vdom_index, last_updated, valid_from, generation_id, valid_to)
+  select vdom_id, firewall_id, vdom_name, vdom_index, last_updated, valid_from, generation_id, now() from old_rows where valid_from < now();
+  return null;
+end;
+$$ language plpgsql;
+
+create or replace function public.archive_interfaces() returns trigger as $$
+begin
+  insert into public.interfaces_versions (interface_id, firewall_id, vdom_id, interface_name, ip_address, mask, type, vlan_id, description, status, physical_interface_name, last_updated, valid_from, generation_id, valid_to)
+  select interface_id, firewall_id, vdom_id, interface_name, ip_address, mask, type, vlan_id, description, status, physical_interface_name, last_updated, valid_from, generation_id, now() from old_rows where valid_from < now();
+  return null;
+end;
+$$ language plpgsql;
+
+create or replace function public.archive_routes() returns trigger as $$
+begin
+  insert into public.routes_versions (route_id, vdom_id, firewall_id, destination_network, mask_length, route_type_id, nexthop_id, last_updated, valid_from, generation_id, valid_to)
+  select route_id, vdom_id, firewall_id, destination_network, mask_length, route_type_id, nexthop_id, last_updated, valid_from, generation_id, now() from old_rows where valid_from < now();
+  return null;
+end;
+$$ language plpgsql;
+
+create or replace function public.archive_vips() returns trigger as $$
+begin
+  insert into public.vips_versions (vip_id, vdom_id, external_ip, external_port, mapped_ip, mapped_port, vip_type, external_interface, mask, last_updated, valid_from, generation_id, valid_to)
+  select vip_id, vdom_id, external_ip, external_port, mapped_ip, mapped_port, vip_type, external_interface, mask, last_updated, valid_from, generation_id, now() from old_rows where valid_from < now();
+  return null;
+end;
+$$ language plpgsql;
+
+create or replace function public.archive_ip_addresses() returns trigger as $$
+begin
+  insert into public.ip_addresses_versions (ip_address_id, network, source_type, source_id, firewall_id, vdom_id, valid_from, generation_id, valid_to)
+  select ip_address_id, network, source_type, source_id, firewall_id, vdom_id, valid_from, generation_id, now() from old_rows where valid_from < now();
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_firewalls_stamp_version before update on public.firewalls for each row execute function public.stamp_version();
+create trigger trg_firewalls_archive_update after update on public.firewalls referencing old table as old_rows for each statement execute function public.archive_firewalls();
+create trigger trg_firewalls_archive_delete after delete on public.firewalls referencing old table as old_rows for each statement execute function public.archive_firewalls();
+create trigger trg_vdoms_stamp_version before update on public.vdoms for each row execute function public.stamp_version();
+create trigger trg_vdoms_archive_update after update on public.vdoms referencing old table as old_rows for each statement execute function public.archive_vdoms();
+create trigger trg_vdoms_archive_delete after delete on public.vdoms referencing old table as old_rows for each statement execute function public.archive_vdoms();
+create trigger trg_interfaces_stamp_version before update on public.interfaces for each row execute function public.stamp_version();
+create trigger trg_interfaces_archive_update after update on public.interfaces referencing old table as old_rows for each statement execute function public.archive_interfaces();
+create trigger trg_interfaces_archive_delete after delete on public.interfaces referencing old table as old_rows for each statement execute function public.archive_interfaces();
+create trigger trg_routes_stamp_version before update on public.routes for each row execute function public.stamp_version();
+create trigger trg_routes_archive_update after update on public.routes referencing old table as old_rows for each statement execute function public.archive_routes();
+create trigger trg_routes_archive_delete after delete on public.routes referencing old table as old_rows for each statement execute function public.archive_routes();
+create trigger trg_vips_stamp_version before update on public.vips for each row execute function public.stamp_version();
+create trigger trg_vips_archive_update after update on public.vips referencing old table as old_rows for each statement execute function public.archive_vips();
+create trigger trg_vips_archive_delete after delete on public.vips referencing old table as old_rows for each statement execute function public.archive_vips();
+create trigger trg_ip_addresses_stamp_version before update on public.ip_addresses for each row execute function public.stamp_version();
+create trigger trg_ip_addresses_archive_update after update on public.ip_addresses referencing old table as old_rows for each statement execute function public.archive_ip_addresses();
+create trigger trg_ip_addresses_archive_delete after delete on public.ip_addresses referencing old table as old_rows for each statement execute function public.archive_ip_addresses();
+
+-- 11. policies and the address and service objects they name (see app/policy_match.py)
+create table public.addresses (
+  address_id serial not null,
+  vdom_id integer not null,
+  name text not null,
+  type text not null default 'ipmask',
+  subnet text null,
+  start_ip text null,
+  end_ip text null,
+  fqdn text null,
+  comment text null,
+  last_updated timestamp without time zone null default now(),
+  constraint addresses_pkey primary key (address_id),
+  constraint uq_addresses_vdom_name unique (vdom_id, name),
+  constraint addresses_vdom_id_fkey foreign KEY (vdom_id) references vdoms (vdom_id) on delete CASCADE
+) TABLESPACE pg_default;
+
+create table public.address_groups (
+  group_id serial not null,
+  vdom_id integer not null,
+  name text not null,
+  members json not null,
+  comment text null,
+  last_updated timestamp without time zone null default now(),
+  constraint address_groups_pkey primary key (group_id),
+  constraint uq_address_groups_vdom_name unique (vdom_id, name),
+  constraint address_groups_vdom_id_fkey foreign KEY (vdom_id) references vdoms (vdom_id) on delete CASCADE
+) TABLESPACE pg_default;
+
+create table public.service_groups (
+  group_id serial not null,
+  vdom_id integer not null,
+  name text not null,
+  members json not null,
+  comment text null,
+  last_updated timestamp without time zone null default now(),
+  constraint service_groups_pkey primary key (group_id),
+  constraint uq_service_groups_vdom_name unique (vdom_id, name),
+  constraint service_groups_vdom_id_fkey foreign KEY (vdom_id) references vdoms (vdom_id) on delete CASCADE
+) TABLESPACE pg_default;
+
+create table public.services (
+  service_id serial not null,
+  vdom_id integer not null,
+  name text not null,
+  protocol text not null default 'TCP/UDP/SCTP',
+  protocol_number integer null,
+  tcp_portrange text null,
+  udp_portrange text null,
+  sctp_portrange text null,
+  comment text null,
+  last_updated timestamp without time zone null default now(),
+  constraint services_pkey primary key (service_id),
+  constraint uq_services_vdom_name unique (vdom_id, name),
+  constraint services_vdom_id_fkey foreign KEY (vdom_id) references vdoms (vdom_id) on delete CASCADE
+) TABLESPACE pg_default;
+
+create table public.policies (
+  policy_id serial not null,
+  vdom_id integer not null,
+  policy_number integer not null,
+  sequence integer not null,
+  name text null,
+  status text not null default 'enable',
+  action text not null default 'deny',
+  srcintf json not null,
+  dstintf json not null,
+  srcaddr json not null,
+  dstaddr json not null,
+  service json not null,
+  srcaddr_negate boolean not null default false,
+  dstaddr_negate boolean not null default false,
+  service_negate boolean not null default false,
+  schedule text null,
+  nat boolean not null default false,
+  comments text null,
+  last_updated timestamp without time zone null default now(),
+  constraint policies_pkey primary key (policy_id),
+  constraint uq_policies_vdom_number unique (vdom_id, policy_number),
+  constraint policies_vdom_id_fkey foreign KEY (vdom_id) references vdoms (vdom_id) on delete CASCADE
+) TABLESPACE pg_default;
+
+create index IF not exists idx_policies_vdom_sequence on public.policies using btree (vdom_id, sequence) TABLESPACE pg_default;
+
+-- 12. shard_layout (id ranges of the shards, see app/sharding.py)
+-- Filled by: python -m app.cli shards init
+create table public.shard_layout (
+  epoch integer not null,
+  first_id bigint not null,
+  span bigint not null,
+  shard_count integer not null,
+  created_at timestamp without time zone not null default now(),
+  constraint shard_layout_pkey primary key (epoch)
+) TABLESPACE pg_default;
+
+-- Alembic revision this schema corresponds to (0010_sqlite_tombstones changes SQLite only)
+create table public.alembic_version (
+  version_num varchar(32) not null,
+  constraint alembic_version_pkc primary key (version_num)
+) TABLESPACE pg_default;
+
+insert into public.alembic_version (version_num) values ('0010_sqlite_tombstones');
+
+-- Rows loaded into this schema belong to a first generation
+insert into public.generations (source, detail) values ('migration', 'schema created from schema.sql');
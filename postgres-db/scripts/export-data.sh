@@ -38,6 +38,8 @@ pg_dump -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
   --table=firewalls \
   --table=vdoms \
   --table=interfaces \
+  --table=route_types \
+  --table=route_nexthops \
   --table=routes \
   --table=vips \
   > "$EXPORT_FILE"
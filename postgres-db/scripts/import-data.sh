@@ -37,7 +37,9 @@ done
 
 echo "Database is ready. Starting import..."
 
-# Create backup before import
+# Create backup before import. The schema-first path below drops every table,
+# including the row versions that keep earlier states queryable with as_of
+# (python -m app.cli import --replace keeps them and needs no dump)
 BACKUP_FILE="/exports/backup_before_import_$(date +%Y%m%d_%H%M%S).sql"
 echo "Creating backup before import: $BACKUP_FILE"
 pg_dump -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
@@ -50,6 +52,8 @@ pg_dump -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
   --table=firewalls \
   --table=vdoms \
   --table=interfaces \
+  --table=route_types \
+  --table=route_nexthops \
   --table=routes \
   --table=vips \
   > "$BACKUP_FILE" || echo "Warning: Backup creation failed, continuing with import..."
@@ -61,8 +65,18 @@ if [ -f "$SCHEMA_FILE" ]; then
   # Drop existing tables to ensure clean schema
   echo "Dropping existing tables..."
   psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -c "
+    DROP TABLE IF EXISTS alembic_version, shard_layout;
+    DROP TABLE IF EXISTS generations, firewalls_versions, vdoms_versions, interfaces_versions,
+      routes_versions, vips_versions, ip_addresses_versions CASCADE;
+    DROP TABLE IF EXISTS history_rollups, interface_status_latest, interface_status_history, interface_status_daily,
+      vdom_counts_latest, vdom_count_history, vdom_count_daily CASCADE;
+    DROP TABLE IF EXISTS policies, addresses, address_groups, services, service_groups CASCADE;
+    DROP TABLE IF EXISTS ip_addresses CASCADE;
+    DROP TABLE IF EXISTS tombstones CASCADE;
     DROP TABLE IF EXISTS vips CASCADE;
     DROP TABLE IF EXISTS routes CASCADE;
+    DROP TABLE IF EXISTS route_nexthops CASCADE;
+    DROP TABLE IF EXISTS route_types CASCADE;
     DROP TABLE IF EXISTS interfaces CASCADE;
     DROP TABLE IF EXISTS vdoms CASCADE;
     DROP TABLE IF EXISTS firewalls CASCADE;
@@ -93,5 +107,6 @@ psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
   -f "$IMPORT_FILE"
 
 echo "Database import completed successfully!"
+echo "Note: rebuild the IP search index from the API container: python -m app.cli rebuild-ip-index"
 echo "Backup created: $BACKUP_FILE"
 echo "Schema-first import process completed."
\ No newline at end of file